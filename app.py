@@ -18,15 +18,27 @@
 
 import os
 import json
+import uuid
 import time
 import shutil
-from flask import Flask, request, send_from_directory, jsonify, Response
+import logging
+from flask import Flask, Request, request, send_from_directory, send_file, jsonify, redirect, Response
 from werkzeug.utils import secure_filename
 import torch
-import tensorflow as tf
-
-from utils.file import verify_uploaded_file
-from utils.converter import convert_pytorch_to_tflite
+from importlib.metadata import version, PackageNotFoundError
+
+from utils.jobs import job_key, file_digest, job_workspace, submit_job, get_job, job_artifacts
+from utils.scheduler import render_metrics
+from utils.memory import render_memory_metrics
+from utils.log import setup_logging, bind_context, render_log_metrics
+from utils.workqueue import dispatch_pipeline
+from utils.artifacts import resolve_artifact, prune_artifacts, stream_zip
+from utils.blobstore import collect_garbage, disk_usage, BLOB_STORE_DIR
+from utils.store import get_store, presigned_blob_url
+from utils.converter.sdk import load_sdk_registry, list_sdks, default_sdk
+from utils.converter.devices import load_device_registry, dla_suffixes
+from utils.upload import UploadStream, UploadTooLarge, open_upload_stream, finish_upload
+from utils.zoo import lookup_zoo_result, replay_zoo_result, start_background_warmup
 
 """
 MTK NeuronPilot AI Model Porting Platform
@@ -49,13 +61,36 @@ Supported Devices
 - Genio 1200 (MDLA 3.0)
 """
 
+class UploadRequest(Request):
+    """Decompress .gz/.zst uploads while the multipart body streams in (see utils.upload)."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # Decided by file name rather than URL: POST / with action=upload_and_verify shares the handler
+        user_id = secure_filename(self.headers.get('X-User-ID') or '')
+        if user_id:
+            stream = open_upload_stream(secure_filename(filename or ''), f'./users/{user_id}')
+            if stream is not None:
+                self.upload_streams = getattr(self, 'upload_streams', []) + [stream]
+                return stream
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+
 # Initialize Flask application
+setup_logging()
+log = logging.getLogger('app')
 app = Flask(__name__)
+app.request_class = UploadRequest
 app.config['UPLOAD_FOLDER'] = './uploads'
 
 # Configuration constants
 USERS_ROOT_DIR = './users'
 SESSION_EXPIRY_HOURS = 24
+ARTIFACT_MAX_AGE_SECONDS = 365 * 24 * 60 * 60
+
+# Discover installed NeuronPilot SDKs and probe each ncc-tflite once at startup
+load_sdk_registry()
+# Pre-convert the reference model zoo in the background; requests are served immediately
+start_background_warmup()
 
 def cleanup_expired_users():
     """
@@ -70,7 +105,10 @@ def cleanup_expired_users():
     2. 遍歷所有使用者子目錄
     3. 比較目錄修改時間與當前時間
     4. 移除超過 SESSION_EXPIRY_HOURS 的目錄
-    5. 記錄清理操作與例外處理
+    5. 移除產出索引中指向已刪除檔案的項目
+    6. 移除產出儲存中超過保留時間的物件（file 後端，每小時至多一次）
+    7. 釋放已無任何工作目錄參考的去重 blob（參考數即硬連結數）
+    8. 記錄清理操作、磁碟使用量與例外處理
 
     Note
     ----
@@ -81,6 +119,7 @@ def cleanup_expired_users():
     
     current_time = time.time()
     expiry_seconds = SESSION_EXPIRY_HOURS * 60 * 60
+    removed_dirs = 0
     
     for user_dir in os.listdir(USERS_ROOT_DIR):
         user_path = os.path.join(USERS_ROOT_DIR, user_dir)
@@ -90,10 +129,53 @@ def cleanup_expired_users():
         try:
             modified_time = os.path.getmtime(user_path)
             if current_time - modified_time > expiry_seconds:
+                if removed_dirs == 0:
+                    before = disk_usage(USERS_ROOT_DIR, BLOB_STORE_DIR)
                 shutil.rmtree(user_path)
-                print(f"[CLEANUP] Removed expired user directory: {user_path}")
+                removed_dirs += 1
+                log.info("Removed expired user directory: %s", user_path)
         except Exception as e:
-            print(f"[CLEANUP] Error processing {user_path}: {e}")
+            log.warning("Cleanup error processing %s: %s", user_path, e)
+
+    if removed_dirs:
+        prune_artifacts()
+
+    # Stored objects are copies, so expiring them never frees blobs
+    purged = get_store().purge()
+    if purged:
+        log.info("Purged %d expired object(s) from the artifact store", purged)
+
+    if removed_dirs:
+        # Blobs are freed only when the last workspace linking them is gone
+        freed, freed_bytes = collect_garbage()
+        after = disk_usage(USERS_ROOT_DIR, BLOB_STORE_DIR)
+        log.info("Freed %d unreferenced blob(s) (%.1f MB); disk usage %.1f MB -> %.1f MB", freed,
+                 freed_bytes / (1024 * 1024), before['actual_bytes'] / (1024 * 1024), after['actual_bytes'] / (1024 * 1024))
+
+
+def stream_job(job, is_new, user_dir):
+    """
+    工作事件串流包裝
+    ==============
+    將轉換工作的事件串流包裝為 SSE 回應內容，附加到既有工作時先送出提示訊息。
+
+    Parameters
+    ----------
+    job : utils.jobs.Job
+        要訂閱的轉換工作。
+    is_new : bool
+        是否為本請求新建立的工作。
+    user_dir : str
+        請求者的使用者目錄，附加的請求會在完成時取得產出檔案的連結。
+
+    Yields
+    ------
+    str
+        Server-sent event 格式化的事件字串。
+    """
+    if not is_new:
+        yield f'data: {json.dumps({"message": f"🔗 Identical conversion already running, attached to job {job.job_id}"})}\n\n'
+    yield from job.stream(user_dir)
 
 
 def inject_version_info(html_content):
@@ -114,7 +196,11 @@ def inject_version_info(html_content):
         注入版本資訊後的 HTML 內容，分頁按鈕將顯示對應的套件版本。
     """
     pytorch_version = torch.__version__
-    tensorflow_version = tf.__version__
+    # Read from package metadata so the web process never imports TensorFlow
+    try:
+        tensorflow_version = version('tensorflow')
+    except PackageNotFoundError:
+        tensorflow_version = 'N/A'
     
     # Update PyTorch tab button with version info
     html_content = html_content.replace(
@@ -131,6 +217,12 @@ def inject_version_info(html_content):
     return html_content
 
 
+@app.before_request
+def bind_request_context():
+    """Tag log records emitted while handling this request with the caller's user id."""
+    bind_context(user_id=request.headers.get('X-User-ID'), job_id=None, stage=None)
+
+
 @app.route('/', methods=['GET', 'POST'])
 def api_index():
     """
@@ -156,29 +248,36 @@ def api_index():
     
     # Handle POST requests
     if request.method == 'POST':
-        print(f'==> Request method: {request.method}')
+        log.debug("Request method: %s", request.method)
         
         if request.is_json:
             # Handle JSON requests (PyTorch model verification)
-            print('==> Processing JSON request')
+            log.debug('Processing JSON request')
             data = request.get_json()
             action = data.get('action', 'convert_tflite')
             
             if action == 'verify_model':
-                print('==> Routing to PyTorch model verification')
+                log.debug('Routing to PyTorch model verification')
                 return api_verify_model()
                 
         else:
             # Handle form data requests (file upload and conversion)
-            print('==> Processing form data request')
-            action = request.form.get('action', '')
-            print(f'==> Action: {action}')
+            log.debug('Processing form data request')
+            # Reading the form parses the whole body, which inflates compressed uploads
+            try:
+                action = request.form.get('action', '')
+            except RuntimeError as e:
+                for stream in getattr(request, 'upload_streams', []):
+                    if os.path.isfile(stream.path):
+                        os.remove(stream.path)
+                return jsonify({"error": str(e)}), 413 if isinstance(e, UploadTooLarge) else 400
+            log.debug('Action: %s', action)
             
             if action == 'upload_and_verify':
-                print('==> Routing to upload and verify')
+                log.debug('Routing to upload and verify')
                 return upload_and_verify()
             elif action == 'convert_tflite':
-                print('==> Routing to DLA download')
+                log.debug('Routing to DLA download')
                 return download_dla()
     
     # Serve the main HTML interface
@@ -201,7 +300,13 @@ def upload_and_verify():
     Request Format
     --------------
     POST multipart/form-data
-    - upload_pretrained_file : 上傳的模型檔案
+    - upload_pretrained_file : 上傳的模型檔案 (.onnx、.tflite，或 .gz / .zst 壓縮檔、含外部權重資料的 .zip 壓縮包)
+    - sdk_versions : 逗號分隔的 NeuronPilot SDK 版本 (選填，預設使用預設 SDK)
+    - targets : 逗號分隔的開發板或架構，例如 "genio1200" (選填，預設編譯所有架構)
+    - tune_profiles : 逗號分隔的 ncc-tflite 調校參數組合，"all" 表示全部 (選填，預設不調校)
+    - tune_objective : 調校目標 "size"、"compile_time" 或 ncc 成本估計名稱 (選填)
+    - diagnose : "1" 時於 DLA 編譯失敗後找出該架構無法編譯的運算子 (選填)
+    - partition : "1" 時將 DLA 編譯失敗的模型分割為多個 DLA 與 CPU 執行的 TFLite 片段 (選填)
     - X-User-ID header : 使用者會話識別碼
 
     Returns
@@ -216,12 +321,33 @@ def upload_and_verify():
     """
     user_id = request.headers.get('X-User-ID')
     
+    def error_response(message):
+        yield f'data: {json.dumps({"message": message, "error": True, "final": True})}\n\n'
+    
+    # Compressed uploads are decompressed while the body is parsed; bad archives fail here
+    try:
+        files = request.files
+        staged = None
+        if 'upload_pretrained_file' in files and isinstance(files['upload_pretrained_file'].stream, UploadStream):
+            staged = finish_upload(files['upload_pretrained_file'].stream)
+    except RuntimeError as e:
+        for stream in getattr(request, 'upload_streams', []):
+            if os.path.isfile(stream.path):
+                os.remove(stream.path)
+        return Response(
+            error_response(str(e)),
+            mimetype='text/event-stream',
+            headers={
+                'Cache-Control': 'no-cache',
+                'Connection': 'keep-alive',
+                'Access-Control-Allow-Origin': '*'
+            }
+        )
+    
     # Validate file upload
-    if 'upload_pretrained_file' not in request.files:
-        def error_response():
-            yield f'data: {json.dumps({"message": "❌ No file received (upload_pretrained_file)", "error": True, "final": True})}\n\n'
+    if 'upload_pretrained_file' not in files:
         return Response(
-            error_response(), 
+            error_response("❌ No file received (upload_pretrained_file)"), 
             mimetype='text/event-stream',
             headers={
                 'Cache-Control': 'no-cache',
@@ -231,28 +357,62 @@ def upload_and_verify():
         )
     
     # Process uploaded file
-    file = request.files['upload_pretrained_file']
-    filename = secure_filename(file.filename)
-    
-    # Create user directory and clean old conversion results
+    file = files['upload_pretrained_file']
     save_dir = f'./users/{user_id}'
     os.makedirs(save_dir, exist_ok=True)
     
-    # Clean previous conversion results (DLA files) before new upload
-    if os.path.exists(save_dir):
-        for root, dirs, files in os.walk(save_dir):
-            for filename_to_remove in files:
-                if filename_to_remove.endswith(('.vpu.dla', '.mdla2.dla', '.mdla3.dla')):
-                    old_dla_path = os.path.join(root, filename_to_remove)
-                    os.remove(old_dla_path)
-                    print(f"[CLEANUP] Removed old DLA file: {old_dla_path}")
+    if staged is None:
+        # Stage the upload under a unique name; the job moves it into its own workspace
+        filename = secure_filename(file.filename)
+        staging_path = os.path.join(save_dir, f'.upload_{uuid.uuid4().hex[:8]}_{filename}')
+        file.save(staging_path)
+        staged = {'staged': staging_path, 'model': None, 'files': [], 'filename': filename,
+                  'digest': file_digest(staging_path), 'bytes': os.path.getsize(staging_path)}
+    filename = staged['filename']
+    staging_path = staged['staged']
+    
+    def start_verification(work_dir):
+        if staged['model'] is None:
+            save_path = os.path.join(work_dir, filename)
+            os.replace(staging_path, save_path)
+        else:
+            # Zip bundle: keep external-data files next to the model
+            for entry in os.listdir(staging_path):
+                os.replace(os.path.join(staging_path, entry), os.path.join(work_dir, entry))
+            os.rmdir(staging_path)
+            save_path = os.path.join(work_dir, staged['model'])
+        return dispatch_pipeline('upload', {
+            'user_id': user_id,
+            'sdk_versions': sdk_versions,
+            'targets': targets,
+            'tune_profiles': tune_profiles,
+            'tune_objective': tune_objective,
+            'diagnose': diagnose,
+            'partition': partition,
+        }, work_dir, input_path=save_path, input_files=staged['files'])
     
-    save_path = os.path.join(save_dir, filename)
-    file.save(save_path)
+    # Coalesce identical uploads (same content, format and SDKs) into one job
+    sdk_versions = [v.strip() for v in request.form.get('sdk_versions', '').split(',') if v.strip()]
+    targets = sorted(t.strip() for t in request.form.get('targets', '').split(',') if t.strip())
+    tune_profiles = [p.strip() for p in request.form.get('tune_profiles', '').split(',') if p.strip()]
+    tune_objective = request.form.get('tune_objective') or None
+    diagnose = request.form.get('diagnose', '').lower() in ('1', 'true', 'on')
+    partition = request.form.get('partition', '').lower() in ('1', 'true', 'on')
+    file_extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    model_hash = staged['digest']
+    key = job_key('upload', file_extension, model_hash, sdk_versions, targets, tune_profiles, tune_objective,
+                  diagnose, partition)
+    job, is_new = submit_job(key, save_dir, start_verification, user=user_id, model_hash=model_hash,
+                             model_bytes=staged['bytes'])
+    if not is_new:
+        if os.path.isdir(staging_path):
+            shutil.rmtree(staging_path, ignore_errors=True)
+        else:
+            os.remove(staging_path)
     
     # Start verification process
     return Response(
-        verify_uploaded_file(filename, save_path, user_id),
+        stream_job(job, is_new, save_dir),
         mimetype='text/event-stream',
         headers={
             'Cache-Control': 'no-cache',
@@ -275,6 +435,14 @@ def api_verify_model():
     - pytorch_code : PyTorch 模型類別定義程式碼
     - model_entrypoint : 模型類別名稱 (預設: "SimpleModel")
     - input_shape : 輸入張量形狀 (預設: "(1, 10)")
+    - input_shapes : 形狀掃描用的輸入形狀列表 (選填)，提供時回傳形狀 × 裝置相容性矩陣
+    - sdk_versions : NeuronPilot SDK 版本列表 (選填，第一個為主要版本，各 SDK 平行編譯)
+    - targets : 要編譯的開發板或架構列表，例如 ["genio1200"] (選填，未選取的架構不編譯)
+    - tune_profiles : ncc-tflite 調校參數組合列表，["all"] 表示全部 (選填，提供時各架構保留最佳變體)
+    - tune_objective : 調校目標 "size"、"compile_time" 或 ncc 成本估計名稱 (選填)
+    - backend : PyTorch → TFLite 轉換後端 "onnx"、"ai-edge-torch" 或 "compare" (選填，形狀掃描固定使用 onnx)
+    - diagnose : DLA 編譯失敗時找出該架構無法編譯的運算子 (選填，預設 false，形狀掃描不支援)
+    - partition : DLA 編譯失敗時分割為多個 DLA 與 CPU 執行的 TFLite 片段 (選填，預設 false，形狀掃描不支援)
     - tf_code : TensorFlow 程式碼 (預留功能)
     - X-User-ID header : 使用者會話識別碼
 
@@ -293,14 +461,63 @@ def api_verify_model():
     model_entrypoint = data.get('model_entrypoint', 'SimpleModel')
     input_shape = data.get('input_shape', '(1, 10)')
 
+    input_shapes = data.get('input_shapes')
+    sdk_versions = data.get('sdk_versions') or []
+    targets = data.get('targets') or []
+    if isinstance(targets, str):
+        targets = [t.strip() for t in targets.split(',')]
+    targets = sorted(t for t in targets if t)
+    tune_profiles = data.get('tune_profiles') or []
+    if isinstance(tune_profiles, str):
+        tune_profiles = [p.strip() for p in tune_profiles.split(',')]
+    tune_profiles = [p for p in tune_profiles if p]
+    tune_objective = data.get('tune_objective') or None
+    backend = data.get('backend') or None
+    diagnose = bool(data.get('diagnose'))
+    partition = bool(data.get('partition'))
+
+    # Coalesce identical in-flight conversions into one job
+    user_dir = f'./users/{user_id}'
+    if input_shapes:
+        key = job_key('pytorch_sweep', pytorch_code, model_entrypoint, input_shapes, sdk_versions, targets,
+                      tune_profiles, tune_objective)
+        job, is_new = submit_job(key, user_dir, lambda work_dir: dispatch_pipeline('sweep', {
+            'user_id': user_id,
+            'pytorch_code': pytorch_code,
+            'model_entrypoint': model_entrypoint,
+            'input_shapes': input_shapes,
+            'sdk_versions': sdk_versions,
+            'targets': targets,
+            'tune_profiles': tune_profiles,
+            'tune_objective': tune_objective,
+        }, work_dir), user=user_id, cost=max(len(input_shapes), 1),
+            model_hash=job_key('model', pytorch_code, model_entrypoint, input_shapes))
+    else:
+        key = job_key('pytorch', pytorch_code, model_entrypoint, input_shape, sdk_versions, targets,
+                      tune_profiles, tune_objective, backend, diagnose, partition)
+        # Zoo records cover every target with default flags via the ONNX route; other requests run their own pipeline
+        custom = targets or tune_profiles or diagnose or partition or backend not in (None, 'onnx')
+        zoo_record = None if custom else lookup_zoo_result(pytorch_code, model_entrypoint, input_shape, sdk_versions)
+        if zoo_record:
+            job, is_new = submit_job(key, user_dir, lambda work_dir: replay_zoo_result(zoo_record), cost=0)
+        else:
+            job, is_new = submit_job(key, user_dir, lambda work_dir: dispatch_pipeline('pytorch', {
+                'user_id': user_id,
+                'pytorch_code': pytorch_code,
+                'model_entrypoint': model_entrypoint,
+                'input_shape': input_shape,
+                'sdk_versions': sdk_versions,
+                'targets': targets,
+                'tune_profiles': tune_profiles,
+                'tune_objective': tune_objective,
+                'backend': backend,
+                'diagnose': diagnose,
+                'partition': partition,
+            }, work_dir), user=user_id, model_hash=job_key('model', pytorch_code, model_entrypoint, input_shape))
+
     # Start conversion process
     return Response(
-        convert_pytorch_to_tflite(
-            user_id=user_id,
-            pytorch_code=pytorch_code,
-            model_entrypoint=model_entrypoint,
-            input_shape=input_shape
-        ),
+        stream_job(job, is_new, user_dir),
         mimetype='text/event-stream',
         headers={
             'Cache-Control': 'no-cache',
@@ -309,18 +526,66 @@ def api_verify_model():
         }
     )
 
+def send_artifact(digest, name, immutable=False):
+    """
+    產出檔案回應
+    ==========
+    本機（工作目錄、去重儲存或 read-through 快取）有檔案時直接傳送，支援 ETag 條件請求與 Range 續傳；
+    不在本機時，啟用預簽網址則重導向由物件儲存直接下載，否則先自產出儲存取得再傳送。
+
+    Parameters
+    ----------
+    digest : str
+        檔案的十六進位 SHA-256 摘要，同時作為強 ETag。
+    name : str
+        下載時使用的檔名。
+    immutable : bool
+        網址由內容摘要組成時為 True，回應可被長期快取。
+
+    Returns
+    -------
+    Response or None
+        檔案下載或重導向回應；找不到檔案時返回 None。
+    """
+    path = resolve_artifact(digest, name, fetch=False)
+    if path is None:
+        url = presigned_blob_url(digest, name)
+        if url:
+            return redirect(url)
+        path = resolve_artifact(digest, name)
+    if path is None:
+        return None
+
+    response = send_file(
+        path,
+        mimetype='application/octet-stream',
+        as_attachment=True,
+        download_name=name,
+        conditional=True,
+        etag=digest,
+        max_age=ARTIFACT_MAX_AGE_SECONDS if immutable else None,
+    )
+    if immutable:
+        # Content-addressed URLs never change content
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    return response
+
+
 @app.route('/download_dla', methods=['POST'])
 def download_dla():
     """
     DLA 檔案下載處理器
     ================
     搜尋使用者目錄中的 DLA 檔案並提供下載服務。
-    支援 VPU、MDLA 2.0、MDLA 3.0 格式的 DLA 檔案下載。
+    支援 VPU、MDLA 2.0、MDLA 3.0 格式的 DLA 檔案下載；指定的工作由其他 Web 副本執行時，
+    改由產出儲存中的工作產出清單取得。
 
     Request Format
     --------------
     POST application/json
-    - device : 目標裝置類型 ("vpu", "mdla2", "mdla3")
+    - device : 目標架構鍵值 (見裝置登錄，例如 "vpu", "mdla2", "mdla3")
+    - job_id : 轉換工作識別碼 (選填，提供時下載該工作的產出，否則下載使用者目錄中最新的 DLA)
     - X-User-ID header : 使用者會話識別碼
 
     Returns
@@ -334,32 +599,30 @@ def download_dla():
     400 : 無效的裝置類型
     404 : DLA 檔案不存在
     """
-    print("==> DLA download API called")
+    log.debug("DLA download API called")
     
     user_id = request.headers.get('X-User-ID')
     data = request.get_json()
-    target_device = data.get('device')  # vpu, mdla2, mdla3
+    target_device = data.get('device')  # arch key from the device registry
     
     # Device type to file suffix mapping
-    device_suffix_map = {
-        'vpu': '.vpu.dla',
-        'mdla2': '.mdla2.dla', 
-        'mdla3': '.mdla3.dla'
-    }
+    device_suffix_map = {suffix.split('.')[1]: suffix for suffix in dla_suffixes()}
     
     # Validate device type
     if target_device not in device_suffix_map:
-        print(f"==> Invalid device type: {target_device}")
+        log.info("Invalid device type: %s", target_device)
         return jsonify({"error": "Invalid device type"}), 400
     
-    # Search for DLA file in user directory (find the most recent one)
+    # Search for DLA file in the job workspace, or the most recent one in the user directory
     user_dir = f'./users/{user_id}'
+    job_id = data.get('job_id')
+    search_dir = job_workspace(user_dir, secure_filename(job_id)) if job_id else user_dir
     dla_suffix = device_suffix_map[target_device]
     dla_file = None
     latest_mtime = 0
     
-    if os.path.exists(user_dir):
-        for root, dirs, files in os.walk(user_dir):
+    if os.path.exists(search_dir):
+        for root, dirs, files in os.walk(search_dir):
             for filename in files:
                 if filename.endswith(dla_suffix):
                     file_path = os.path.join(root, filename)
@@ -368,13 +631,20 @@ def download_dla():
                         latest_mtime = file_mtime
                         dla_file = file_path
     
+    # The job may have run on another replica; its manifest lives in the artifact store
+    if (not dla_file or not os.path.exists(dla_file)) and job_id:
+        info = ((job_artifacts(secure_filename(job_id)) or {}).get('artifacts') or {}).get(target_device)
+        response = send_artifact(info['digest'], info['name']) if info else None
+        if response is not None:
+            return response
+
     # Validate file existence
     if not dla_file or not os.path.exists(dla_file):
-        print(f"==> DLA file not found for device {target_device} in {user_dir}")
+        log.info("DLA file not found for device %s in %s", target_device, search_dir)
         return jsonify({"error": "Requested DLA file not found"}), 404
 
     # Serve the file
-    print(f"==> Serving DLA file: {dla_file}")
+    log.info("Serving DLA file: %s", dla_file)
     original_filename = os.path.basename(dla_file)
     return send_from_directory(
         directory=os.path.dirname(dla_file),
@@ -385,6 +655,188 @@ def download_dla():
     )
 
 
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def resume_job_events(job_id):
+    """
+    工作事件續接處理器
+    ================
+    SSE 連線中斷後的續接端點：依 Last-Event-ID 重送遺漏的事件，再接續即時事件；
+    工作已結束時直接重送至最終結果為止，不需重新執行轉換管線。
+
+    Request Format
+    --------------
+    GET
+    - Last-Event-ID header（或 last_event_id 查詢參數）: 最後收到的事件序號
+    - X-User-ID header : 使用者會話識別碼
+
+    Returns
+    -------
+    Response
+        Server-sent events 串流，或 404 JSON 錯誤訊息（工作不存在或已過期）。
+    """
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found or expired"}), 404
+
+    user_id = request.headers.get('X-User-ID')
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    user_dir = f'./users/{user_id}' if user_id else None
+
+    return Response(
+        job.stream(user_dir, last_event_id=last_event_id),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'Connection': 'keep-alive',
+            'Access-Control-Allow-Origin': '*'
+        }
+    )
+
+@app.route('/artifacts/<digest>/<name>', methods=['GET'])
+def download_artifact(digest, name):
+    """
+    內容定址產出檔案下載
+    ==================
+    以 SHA-256 摘要定址的 GET 下載端點，適用於 DLA 與 TFLite 檔案。
+    摘要即為強 ETag，支援 If-None-Match 條件請求與 HTTP Range 續傳，
+    檔案以串流方式傳送而不整個讀入記憶體；不在本機的檔案由產出儲存取得（見 send_artifact）。
+
+    URL Parameters
+    --------------
+    digest : 檔案的十六進位 SHA-256 摘要
+    name : 下載時使用的檔名
+
+    Returns
+    -------
+    Response
+        200/206 檔案內容、302 預簽網址重導向、304 未修改，或 404 JSON 錯誤訊息。
+    """
+    response = send_artifact(digest, secure_filename(name) or digest, immutable=True)
+    if response is None:
+        return jsonify({"error": "Requested artifact not found"}), 404
+    return response
+
+
+@app.route('/jobs/<job_id>/bundle.zip', methods=['GET'])
+def download_bundle(job_id):
+    """
+    產出檔案打包下載
+    ==============
+    將工作產生的所有 DLA、TFLite 與相容性報告 (compatibility.json) 即時串流打包為 zip，
+    不建立暫存檔；其他 Web 副本執行的工作由產出儲存取得檔案。
+
+    URL Parameters
+    --------------
+    job_id : 轉換工作識別碼（最終事件中的 job_id）
+
+    Returns
+    -------
+    Response
+        application/zip 串流，或 404 JSON 錯誤訊息。
+    """
+    manifest = job_artifacts(job_id)
+    files = []
+    for info in (manifest or {}).get('artifacts', {}).values():
+        path = resolve_artifact(info['digest'], info['name'])
+        if path:
+            files.append((info['name'], path))
+    if not files:
+        return jsonify({"error": "Requested job bundle not found"}), 404
+
+    return Response(
+        stream_zip(files, manifest['report']),
+        mimetype='application/zip',
+        headers={
+            'Content-Disposition': f'attachment; filename=job_{job_id}.zip',
+            'Cache-Control': 'no-cache',
+        }
+    )
+
+
+@app.route('/jobs/<job_id>/artifacts/<role>', methods=['GET'])
+def download_job_artifact(job_id, role):
+    """
+    工作產出檔案下載
+    ==============
+    以工作識別碼與角色下載單一產出檔案，同一使用者同時進行的多個工作各自獨立下載；
+    其他 Web 副本執行的工作由產出儲存取得。
+
+    URL Parameters
+    --------------
+    job_id : 轉換工作識別碼（最終事件中的 job_id）
+    role : 產出角色，例如 "tflite"、"vpu"、"mdla2"、"mdla3"
+
+    Returns
+    -------
+    Response
+        檔案下載、302 預簽網址重導向，或 404 JSON 錯誤訊息。
+    """
+    info = ((job_artifacts(job_id) or {}).get('artifacts') or {}).get(role)
+    response = send_artifact(info['digest'], info['name']) if info else None
+    if response is None:
+        return jsonify({"error": "Requested job artifact not found"}), 404
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+def api_metrics():
+    """
+    排程指標
+    ======
+    以 Prometheus 文字格式輸出公平排程器的佇列深度、執行中工作、分派次數與佇列等待時間分佈，
+    以及記憶體預算、可用記憶體、保留量與工作峰值記憶體分佈。
+
+    Returns
+    -------
+    Response
+        text/plain; version=0.0.4
+    """
+    return Response(render_metrics() + render_memory_metrics() + render_log_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/devices', methods=['GET'])
+def api_list_devices():
+    """
+    裝置登錄
+    ======
+    回傳裝置登錄中的 NPU 架構與 Genio 開發板對應，前端據此產生目標選單與下拉選單。
+
+    Returns
+    -------
+    Response
+        JSON：{"archs": {arch: {"label"}}, "boards": {board: {"label", "archs"}}, "tune_profiles": {name: flags}}
+    """
+    registry = load_device_registry()
+    return jsonify({
+        "archs": {arch: {"label": spec['label']} for arch, spec in registry['archs'].items()},
+        "boards": registry['boards'],
+        "tune_profiles": registry['tune_profiles'],
+    })
+
+
+@app.route('/sdks', methods=['GET'])
+def api_list_sdks():
+    """
+    已安裝 SDK 列表
+    =============
+    回傳啟動時探測到的 NeuronPilot SDK 版本與支援的目標架構，供前端選擇。
+
+    Returns
+    -------
+    Response
+        JSON：{"sdks": [{"version", "reported_version", "devices"}], "default": 版本}
+    """
+    sdk = default_sdk()
+    return jsonify({
+        "sdks": [{k: info[k] for k in ('version', 'reported_version', 'devices')} for info in list_sdks()],
+        "default": sdk['version'] if sdk else None,
+    })
+
+
 if __name__ == '__main__':
     """
     應用程式進入點
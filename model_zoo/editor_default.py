@@ -0,0 +1,17 @@
+# Example: PyTorch Model
+import torch
+import torch.nn as nn
+
+class SimpleModel(nn.Module):
+    def __init__(self):
+        super(SimpleModel, self).__init__()
+        # 在這裡定義你的 layer，例如 nn.Linear, nn.Conv2d 等
+        self.fc1 = nn.Linear(10, 32)
+        self.fc2 = nn.Linear(32, 10)
+        self.relu = nn.ReLU()
+    
+    def forward(self, x):
+        # 在這裡定義 forward 的運算流程 (tensor 的流動)
+        x = self.relu(self.fc1(x))
+        x = self.fc2(x)
+        return x
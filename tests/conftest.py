@@ -0,0 +1,86 @@
+import json
+import os
+import sys
+
+import pytest
+
+# utils is a plain directory next to app.py rather than an installed package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import store  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def isolated_workdir(tmp_path, monkeypatch):
+    # Blob, artifact and history stores default to paths relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(store, '_store', None)
+    return tmp_path
+
+
+# Deterministic ncc-tflite: --opt=3 halves the DLA, --opt-accuracy fails, and any
+# model containing the bytes REJECT is refused as if it held an unsupported op
+_STUB_NCC = '''#!{python}
+import sys
+args = sys.argv[1:]
+if '--version' in args:
+    print('ncc-tflite version 0.0.0-test')
+    sys.exit(0)
+if '--help' in args:
+    print('--arch=<vpu|mdla2.0|mdla3.0>')
+    sys.exit(0)
+source = [a for a in args if a.endswith('.tflite')][0]
+with open(source, 'rb') as f:
+    model = f.read()
+if '--opt-accuracy' in args or b'REJECT' in model:
+    print('ERROR: unsupported operation', file=sys.stderr)
+    sys.exit(1)
+size = 4096 // (2 if '--opt=3' in args else 1)
+with open(args[args.index('-o') + 1], 'wb') as f:
+    f.write(b'D' * size)
+print('Estimated total cycles: %d' % (1000 if '--opt-footprint' in args else 5000))
+'''
+
+
+@pytest.fixture
+def stub_sdk(tmp_path, monkeypatch):
+    """A single registered NeuronPilot SDK whose ncc-tflite is _STUB_NCC."""
+    from utils.converter import sdk
+
+    root = tmp_path / 'sdk'
+    ncc = root / 'neuronpilot-0.0.0' / sdk.NCC_RELATIVE_PATH
+    ncc.parent.mkdir(parents=True)
+    ncc.write_text(_STUB_NCC.format(python=sys.executable))
+    ncc.chmod(0o755)
+    monkeypatch.setattr(sdk, '_registry', None)
+    return sdk.load_sdk_registry(str(root), refresh=True)['0.0.0']
+
+
+@pytest.fixture
+def graph_tool(monkeypatch):
+    """Install a fake TFLite graph tool describing a linear graph of the given op types. Extracted
+    segments holding a BAD op, or both PAIR_A and PAIR_B, carry the bytes the stub ncc-tflite refuses."""
+    from utils.converter import diagnose
+
+    def install(kinds):
+        def run(mode, path, arg, stats=None):
+            if mode == 'describe':
+                tensors = [{'name': f't{i}', 'shape': [1, 8], 'type': 0, 'dtype': 'float32', 'quantized': False}
+                           for i in range(len(kinds) + 1)]
+                ops = [{'op': kind, 'key': kind, 'inputs': [i], 'outputs': [i + 1], 'intermediates': []}
+                       for i, kind in enumerate(kinds)]
+                return {'tensors': tensors, 'ops': ops, 'inputs': [0], 'outputs': [len(kinds)]}
+            with open(arg, 'r', encoding='utf-8') as f:
+                requests = json.load(f)
+            for request in requests:
+                names = [kinds[i] for i in request['ops']]
+                reject = 'BAD' in names or {'PAIR_A', 'PAIR_B'} <= set(names)
+                with open(request['path'], 'wb') as f:
+                    f.write(b'TFL3 ' + (b'REJECT ' if reject else b'') + ' '.join(names).encode('utf-8'))
+            return [{'path': request['path']} for request in requests]
+
+        monkeypatch.setattr(diagnose, '_run_graph_script', run)
+
+    # DIAGNOSE_CACHE_PATH is relative, so each test starts from its own empty segment cache
+    monkeypatch.setattr(diagnose, '_cache', None)
+    return install
@@ -0,0 +1,105 @@
+import io
+import json
+import os
+import zipfile
+
+import pytest
+
+# app reports the installed PyTorch version at import time
+pytest.importorskip('torch')
+os.environ.setdefault('MODEL_ZOO_WARMUP', '0')
+
+import app as app_module  # noqa: E402
+from utils.artifacts import register_artifact  # noqa: E402
+from utils.jobs import job_key, submit_job  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    app_module.app.config['TESTING'] = True
+    return app_module.app.test_client()
+
+
+def sse(payload):
+    return f'data: {json.dumps(payload)}\n\n'
+
+
+def finished_job(tmp_path, files):
+    """Run a job whose pipeline produces the given {name: bytes} files and wait for it."""
+    def factory(work_dir):
+        def run():
+            paths = {}
+            for name, data in files.items():
+                paths[name.split('.')[-2]] = path = os.path.join(work_dir, name)
+                with open(path, 'wb') as f:
+                    f.write(data)
+            yield sse({'message': 'done', 'final': True, 'artifacts': paths})
+        return run()
+
+    job, _ = submit_job(job_key('test', str(tmp_path), *files), str(tmp_path / 'users' / 'u1'), factory, cost=0)
+    for _ in job.stream():
+        pass
+    return job
+
+
+def test_artifact_download_supports_etag_and_range(client, tmp_path):
+    path = tmp_path / 'model.mdla3.dla'
+    path.write_bytes(b'0123456789')
+    digest = register_artifact(str(path))
+
+    response = client.get(f'/artifacts/{digest}/model.mdla3.dla')
+    assert response.status_code == 200 and response.data == b'0123456789'
+    assert response.headers['ETag'] == f'"{digest}"'
+    assert 'immutable' in response.headers['Cache-Control']
+
+    assert client.get(f'/artifacts/{digest}/x.dla', headers={'If-None-Match': f'"{digest}"'}).status_code == 304
+    partial = client.get(f'/artifacts/{digest}/x.dla', headers={'Range': 'bytes=2-5'})
+    assert partial.status_code == 206 and partial.data == b'2345'
+
+
+def test_unknown_artifact_is_404(client):
+    assert client.get(f'/artifacts/{"0" * 64}/missing.dla').status_code == 404
+
+
+def test_bundle_streams_every_artifact_and_the_report(client, tmp_path):
+    job = finished_job(tmp_path, {'model.mdla3.dla': b'mdla3', 'model.vpu.dla': b'vpu'})
+    response = client.get(f'/jobs/{job.job_id}/bundle.zip')
+    assert response.status_code == 200 and response.mimetype == 'application/zip'
+    with zipfile.ZipFile(io.BytesIO(response.data)) as zf:
+        assert sorted(zf.namelist()) == ['compatibility.json', 'model.mdla3.dla', 'model.vpu.dla']
+        assert zf.read('model.vpu.dla') == b'vpu'
+
+    role = client.get(f'/jobs/{job.job_id}/artifacts/mdla3')
+    assert role.status_code == 200 and role.data == b'mdla3'
+    assert client.get('/jobs/000000000000/bundle.zip').status_code == 404
+
+
+def test_events_resume_from_last_event_id(client, tmp_path):
+    job = finished_job(tmp_path, {'model.vpu.dla': b'vpu'})
+    response = client.get(f'/jobs/{job.job_id}/events', headers={'Last-Event-ID': '1'})
+    assert response.mimetype == 'text/event-stream'
+    body = response.get_data(as_text=True)
+    assert 'id: 1\n' not in body and 'id: 2\n' in body
+    assert json.loads(body.rstrip().rsplit('data: ', 1)[1])['final']
+
+    by_query = client.get(f'/jobs/{job.job_id}/events?last_event_id=1').get_data(as_text=True)
+    assert by_query == body
+    assert client.get('/jobs/000000000000/events').status_code == 404
+
+
+def test_index_rejects_corrupt_compressed_upload(client):
+    data = {'action': 'upload_and_verify', 'upload_pretrained_file': (io.BytesIO(b'not gzip at all'), 'model.onnx.gz')}
+    response = client.post('/', data=data, headers={'X-User-ID': 'u1'}, content_type='multipart/form-data')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+    assert not [name for name in os.listdir('users/u1') if name.startswith('.upload_')]
+
+
+def test_index_rejects_oversized_compressed_upload(client, monkeypatch):
+    import gzip
+    from utils import upload
+    monkeypatch.setattr(upload, 'MAX_UPLOAD_MB', 1)
+    bomb = gzip.compress(b'\0' * (4 * 1024 * 1024))
+    data = {'action': 'upload_and_verify', 'upload_pretrained_file': (io.BytesIO(bomb), 'model.onnx.gz')}
+    response = client.post('/', data=data, headers={'X-User-ID': 'u1'}, content_type='multipart/form-data')
+    assert response.status_code == 413
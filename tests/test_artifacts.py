@@ -0,0 +1,75 @@
+import hashlib
+import io
+import json
+import os
+import zipfile
+
+import pytest
+
+from utils import artifacts
+from utils.artifacts import describe_artifacts, prune_artifacts, register_artifact, resolve_artifact, stream_zip
+
+
+@pytest.fixture(autouse=True)
+def empty_index(monkeypatch):
+    monkeypatch.setattr(artifacts, '_artifact_index', artifacts.OrderedDict())
+
+
+def write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+    return str(path)
+
+
+def test_register_and_resolve_by_digest(tmp_path):
+    path = write(tmp_path / 'model.mdla3.dla', b'dla bytes')
+    digest = register_artifact(path)
+    assert digest == hashlib.sha256(b'dla bytes').hexdigest()
+    assert resolve_artifact(digest, fetch=False) == os.path.abspath(path)
+
+
+def test_resolve_rejects_non_digests(tmp_path):
+    assert resolve_artifact('../../etc/passwd', fetch=False) is None
+    assert resolve_artifact('A' * 64, fetch=False) is None
+
+
+def test_describe_builds_content_addressed_urls(tmp_path):
+    path = write(tmp_path / 'model.vpu.dla', b'vpu')
+    described = describe_artifacts({'vpu': path})['vpu']
+    assert described['name'] == 'model.vpu.dla' and described['size'] == 3
+    assert described['url'] == f"/artifacts/{described['digest']}/model.vpu.dla"
+
+
+def test_prune_drops_deleted_files(tmp_path):
+    kept = register_artifact(write(tmp_path / 'kept.dla', b'kept'))
+    gone_path = write(tmp_path / 'gone.dla', b'gone')
+    gone = register_artifact(gone_path)
+    os.remove(gone_path)
+
+    assert prune_artifacts() == 1
+    assert set(artifacts._artifact_index) == {kept}
+    assert gone not in artifacts._artifact_index
+
+
+def test_index_is_bounded_least_recently_used_first(tmp_path, monkeypatch):
+    monkeypatch.setattr(artifacts, 'ARTIFACT_INDEX_MAX', 2)
+    first = register_artifact(write(tmp_path / 'a.dla', b'a'))
+    second = register_artifact(write(tmp_path / 'b.dla', b'b'))
+    resolve_artifact(first, fetch=False)
+    third = register_artifact(write(tmp_path / 'c.dla', b'c'))
+    assert list(artifacts._artifact_index) == [first, third]
+    assert second not in artifacts._artifact_index
+
+
+def test_stream_zip_round_trips_files_and_report(tmp_path, monkeypatch):
+    monkeypatch.setattr(artifacts, 'STREAM_CHUNK_SIZE', 1024)
+    big = os.urandom(10 * 1024)
+    files = [('model.mdla3.dla', write(tmp_path / 'm.dla', big)),
+             ('model.tflite', write(tmp_path / 'm.tflite', b'tflite'))]
+    chunks = list(stream_zip(files, {'compatible': True}))
+    assert len(chunks) > 2
+
+    with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as zf:
+        assert zf.namelist() == ['model.mdla3.dla', 'model.tflite', 'compatibility.json']
+        assert zf.read('model.mdla3.dla') == big
+        assert json.loads(zf.read('compatibility.json')) == {'compatible': True}
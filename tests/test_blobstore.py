@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from utils import blobstore
+from utils.blobstore import blob_path, collect_garbage, detach, disk_usage, intern_file, intern_paths
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(blobstore, 'BLOB_STORE_DIR', str(tmp_path / 'blobs'))
+    monkeypatch.setattr(blobstore, 'BLOB_MIN_BYTES', 16)
+    monkeypatch.setattr(blobstore, '_dedupe_disabled', False)
+    return tmp_path / 'blobs'
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return str(path)
+
+
+def test_duplicates_share_one_blob(tmp_path):
+    data = os.urandom(4096)
+    first = write(tmp_path / 'u1' / 'model.dla', data)
+    second = write(tmp_path / 'u2' / 'model.dla', data)
+
+    assert intern_file(first) == 0
+    assert intern_file(second) == len(data)
+    assert os.path.samefile(first, second)
+    assert os.stat(first).st_nlink == 3
+    usage = disk_usage(str(tmp_path / 'u1'), str(tmp_path / 'u2'))
+    assert usage['apparent_bytes'] == 2 * len(data)
+    assert usage['actual_bytes'] == len(data)
+
+
+def test_small_files_are_not_interned(tmp_path):
+    path = write(tmp_path / 'u1' / 'meta.json', b'{}')
+    intern_paths([str(tmp_path / 'u1')])
+    assert os.stat(path).st_nlink == 1
+
+
+def test_detach_keeps_shared_content(tmp_path):
+    data = os.urandom(1024)
+    first = write(tmp_path / 'u1' / 'a.tflite', data)
+    second = write(tmp_path / 'u2' / 'a.tflite', data)
+    intern_paths([first, second])
+
+    detach(first)
+    write(first, b'rewritten' * 10)
+    with open(second, 'rb') as f:
+        assert f.read() == data
+
+
+def test_garbage_collection_follows_references(tmp_path, store):
+    data = os.urandom(2048)
+    first = write(tmp_path / 'u1' / 'm.dla', data)
+    second = write(tmp_path / 'u2' / 'm.dla', data)
+    intern_paths([first, second])
+    digest = blobstore._file_digest(first)
+
+    os.remove(first)
+    assert collect_garbage() == (0, 0)
+    os.remove(second)
+    assert collect_garbage() == (1, len(data))
+    assert not os.path.exists(blob_path(digest))
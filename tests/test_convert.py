@@ -0,0 +1,52 @@
+import logging
+import os
+import subprocess
+
+import pytest
+
+from utils.converter import convert
+from utils.converter.convert import convert_tflite_to_dla
+
+
+@pytest.fixture
+def tflite(tmp_path):
+    path = tmp_path / 'model.tflite'
+    path.write_bytes(b'TFL3' + os.urandom(64))
+    return str(path)
+
+
+def test_compiles_with_the_stub_sdk(tflite, stub_sdk, caplog):
+    ncc_output = []
+    with caplog.at_level(logging.INFO, logger=convert.log.name):
+        dla = convert_tflite_to_dla(tflite, 'mdla3.0', 'mdla3', sdk=stub_sdk, ncc_output=ncc_output)
+    assert dla == tflite + '.mdla3.dla'
+    assert os.path.getsize(dla) == 4096
+    assert 'Estimated total cycles: 5000' in ncc_output[0]
+    assert any(dla in record.getMessage() for record in caplog.records)
+    assert sorted(os.listdir(os.path.dirname(tflite))) == ['model.tflite', 'model.tflite.mdla3.dla', 'sdk']
+
+
+def test_variant_is_part_of_the_file_name(tflite, stub_sdk):
+    dla = convert_tflite_to_dla(tflite, 'vpu', 'vpu', sdk=stub_sdk, ncc_flags=['--opt=3'], variant='opt3')
+    assert dla == tflite + '.tune-opt3.vpu.dla'
+    assert os.path.getsize(dla) == 2048
+
+
+def test_rejected_model_raises(tmp_path, stub_sdk):
+    path = tmp_path / 'model.tflite'
+    path.write_bytes(b'TFL3 REJECT')
+    with pytest.raises(RuntimeError, match='(?s)MDLA2 DLA conversion failed.*unsupported operation'):
+        convert_tflite_to_dla(str(path), 'mdla2.0', 'mdla2', sdk=stub_sdk)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.dla')]
+
+
+def test_partial_output_is_removed_on_failure(tflite, stub_sdk, monkeypatch):
+    def crash(cmd, stage, stats=None, timeout=None):
+        with open(cmd[cmd.index('-o') + 1], 'wb') as f:
+            f.write(b'partial')
+        return subprocess.CompletedProcess(cmd, -11, '', 'Segmentation fault')
+
+    monkeypatch.setattr(convert, 'run_limited', crash)
+    with pytest.raises(RuntimeError, match='Segmentation fault'):
+        convert_tflite_to_dla(tflite, 'mdla3.0', 'mdla3', sdk=stub_sdk)
+    assert not [name for name in os.listdir(os.path.dirname(tflite)) if name.endswith('.dla')]
@@ -0,0 +1,78 @@
+import json
+import os
+
+from utils.converter import convert_pytorch_to_tflite, stages
+
+
+def events(stream):
+    return [json.loads(event[len('data: '):]) for event in stream]
+
+
+def fake_onnx_route(monkeypatch, calls):
+    """Replace export → simplify → onnx2tf → validate with file-writing fakes."""
+    def export(user_id, pytorch_code, model_entrypoint, input_shape, stats=None, work_dir=None):
+        calls.append('export')
+        path = os.path.join(work_dir, 'model.onnx')
+        with open(path, 'wb') as f:
+            f.write(b'onnx')
+        return path
+
+    def to_tflite(onnx, stats=None, validate=False, scratch_dir=None, workspace_dir=None):
+        calls.append('onnx2tf')
+        path = os.path.join(workspace_dir, 'model_float32.tflite')
+        with open(path, 'wb') as f:
+            f.write(b'TFL3 onnx route')
+        return path
+
+    monkeypatch.setattr(stages, 'verify_pytorch_format', export)
+    monkeypatch.setattr(stages, 'simplify_onnx', lambda onnx, stats=None, scratch_dir=None: onnx)
+    monkeypatch.setattr(stages, 'onnx_to_tflite', to_tflite)
+    monkeypatch.setattr(stages, 'read_onnx_input_shape', lambda onnx: [1, 4])
+    monkeypatch.setattr(stages, 'validate_tflite', lambda tflite, shape=None, stats=None: {'shape': shape})
+
+
+def convert(tmp_path, backend):
+    # Distinct code per test keeps the process-wide stage cache from replaying another test's route
+    code = f'# {tmp_path.name}\nimport torch'
+    return events(convert_pytorch_to_tflite('u1', code, 'Net', '(1, 4)', sdk_versions=['0.0.0'],
+                                            work_dir=str(tmp_path / 'job'), backend=backend))
+
+
+def test_direct_backend_skips_the_onnx_route(tmp_path, monkeypatch, stub_sdk):
+    calls = []
+    fake_onnx_route(monkeypatch, calls)
+
+    def direct(user_id, pytorch_code, model_entrypoint, input_shape, stats=None, work_dir=None):
+        calls.append('direct')
+        path = os.path.join(work_dir, 'model_direct.tflite')
+        with open(path, 'wb') as f:
+            f.write(b'TFL3 direct route')
+        return path
+
+    monkeypatch.setattr(stages, 'export_tflite_direct', direct)
+    os.makedirs(tmp_path / 'job')
+    result = convert(tmp_path, 'direct')
+    assert calls == ['direct']
+    assert not any('Falling back' in e.get('message', '') for e in result)
+    final = result[-1]
+    assert final['final'] and final['backends']['ai-edge-torch']['status'] == 'done'
+    assert 'onnx' not in final['backends']
+
+
+def test_direct_backend_falls_back_to_onnx(tmp_path, monkeypatch, stub_sdk):
+    calls = []
+    fake_onnx_route(monkeypatch, calls)
+
+    def direct(*args, **kwargs):
+        calls.append('direct')
+        raise RuntimeError('ai-edge-torch is not installed')
+
+    monkeypatch.setattr(stages, 'export_tflite_direct', direct)
+    os.makedirs(tmp_path / 'job')
+    result = convert(tmp_path, 'ai-edge-torch')
+    assert calls == ['direct', 'export', 'onnx2tf']
+    assert any('Falling back to the ONNX' in e.get('message', '') for e in result)
+    backends = result[-1]['backends']
+    assert backends['ai-edge-torch']['status'] == 'failed'
+    assert 'not installed' in backends['ai-edge-torch']['error']
+    assert backends['onnx']['status'] == 'done'
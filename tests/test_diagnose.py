@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+from utils.converter import diagnose
+from utils.converter.diagnose import diagnose_tflite
+
+
+@pytest.fixture(autouse=True)
+def fresh_segment_cache(monkeypatch):
+    # DIAGNOSE_CACHE_PATH is relative, so each test reads and writes its own working directory
+    monkeypatch.setattr(diagnose, '_cache', None)
+
+
+def run_diagnosis(tmp_path, stub_sdk):
+    return diagnose_tflite(str(tmp_path / 'model.tflite'), 'mdla3', sdk=stub_sdk, work_dir=str(tmp_path),
+                           error='ncc-tflite failed:\nERROR: unsupported operation')
+
+
+def failing_indices(diagnosis):
+    return [[op['index'] for op in item['ops']] for item in diagnosis['failing']]
+
+
+def test_bisection_finds_single_failing_ops(tmp_path, stub_sdk, graph_tool):
+    graph_tool(['CONV', 'ADD', 'BAD', 'ADD', 'RELU', 'CONV', 'ADD', 'BAD'])
+    diagnosis = run_diagnosis(tmp_path, stub_sdk)
+    assert failing_indices(diagnosis) == [[2], [7]]
+    assert all(not item['combined'] for item in diagnosis['failing'])
+    assert 'unsupported operation' in diagnosis['failing'][0]['error']
+    assert diagnosis['op_types'] == {'BAD': 2}
+    assert not diagnosis['truncated'] and diagnosis['cached'] == 0
+    # Segment files live in the scratch directory only while diagnosing
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['diagnose_cache.json', 'sdk']
+
+
+def test_ops_that_fail_only_together_are_narrowed(tmp_path, stub_sdk, graph_tool):
+    graph_tool(['CONV', 'ADD', 'PAIR_A', 'ADD', 'PAIR_B', 'RELU', 'ADD', 'CONV'])
+    diagnosis = run_diagnosis(tmp_path, stub_sdk)
+    assert failing_indices(diagnosis) == [[2, 3, 4]]
+    assert diagnosis['failing'][0]['combined']
+    assert any('fail only together' in line for line in diagnose.format_diagnosis('mdla3', diagnosis))
+
+
+def test_repeated_diagnosis_is_served_from_the_cache(tmp_path, monkeypatch, stub_sdk, graph_tool):
+    graph_tool(['CONV', 'ADD', 'BAD', 'ADD'])
+    first = run_diagnosis(tmp_path, stub_sdk)
+    monkeypatch.setattr(diagnose, '_cache', None)
+    second = run_diagnosis(tmp_path, stub_sdk)
+    assert failing_indices(second) == failing_indices(first) == [[2]]
+    assert second['compiles'] == 0 and second['cached'] == first['compiles']
+
+
+def test_compile_budget_reports_unresolved_segments(tmp_path, monkeypatch, stub_sdk, graph_tool):
+    monkeypatch.setattr(diagnose, 'DIAGNOSE_MAX_COMPILES', 4)
+    graph_tool(['ADD'] * 7 + ['BAD'] + ['ADD'] * 8)
+    diagnosis = run_diagnosis(tmp_path, stub_sdk)
+    assert diagnosis['truncated'] and diagnosis['compiles'] == 4
+    assert failing_indices(diagnosis) == [[4, 5, 6, 7]]
+    assert diagnosis['failing'][0]['unresolved']
+
+
+def test_cache_entries_from_other_versions_are_dropped(tmp_path, monkeypatch):
+    path = tmp_path / 'diagnose_cache.json'
+    path.write_text(json.dumps({
+        'stale': {'ok': False, 'error': 'logger shadowed', 'updated': 1},
+        'old': {'ok': False, 'error': 'x', 'updated': 2, 'version': diagnose.SEGMENT_CACHE_VERSION - 1},
+        'fresh': {'ok': True, 'error': None, 'updated': 3, 'version': diagnose.SEGMENT_CACHE_VERSION},
+    }))
+    monkeypatch.setattr(diagnose, 'DIAGNOSE_CACHE_PATH', str(path))
+    with diagnose._cache_lock:
+        assert list(diagnose._load_cache()) == ['fresh']
+    diagnose.flush_segment_cache()
+    assert list(json.loads(path.read_text())) == ['fresh']
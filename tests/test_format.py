@@ -0,0 +1,71 @@
+import pytest
+
+from utils.converter import format as fmt
+from utils.converter.format import parse_input_shape, shape_tag
+
+
+@pytest.mark.parametrize('text, shape', [
+    ('(1, 3, 224, 224)', (1, 3, 224, 224)),
+    (' [4, 3, 32, 32] ', (4, 3, 32, 32)),
+    ('(8,)', (8,)),
+    ((1, 16), (1, 16)),
+])
+def test_parse_input_shape_accepts_literal_shapes(text, shape):
+    assert parse_input_shape(text) == shape
+
+
+@pytest.mark.parametrize('text', [
+    "__import__('os').system('true')",
+    '(1, 3) if True else ()',
+    '(1, -3, 224, 224)',
+    '(1, 0)',
+    '(1.5, 3)',
+    '(True, 3)',
+    '((1, 3), 2)',
+    '()',
+    '5',
+    'not a shape',
+])
+def test_parse_input_shape_rejects_anything_else(text):
+    with pytest.raises(RuntimeError, match='Invalid input shape'):
+        parse_input_shape(text)
+
+
+def test_shape_tag():
+    assert shape_tag('(1, 3, 224, 224)') == '1x3x224x224'
+    assert shape_tag([4, 3]) == '4x3'
+
+
+def test_sweep_rejects_bad_shapes_before_running_any_code(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError('subprocess must not run')
+
+    monkeypatch.setattr(fmt, 'run_limited', fail)
+    with pytest.raises(RuntimeError, match='Invalid input shape'):
+        fmt.export_pytorch_shapes('u', 'import torch', 'Net', ['(1, 3)', "__import__('os')"])
+    with pytest.raises(RuntimeError, match='Invalid input shape'):
+        fmt.verify_pytorch_format('u', 'import torch', 'Net', "(1, 3)); import os; os.system('true'")
+
+
+def test_direct_export_rejects_bad_shapes_before_running_any_code(monkeypatch, tmp_path):
+    def fail(*args, **kwargs):
+        raise AssertionError('subprocess must not run')
+
+    monkeypatch.setattr(fmt, 'run_limited', fail)
+    with pytest.raises(RuntimeError, match='Invalid input shape'):
+        fmt.export_tflite_direct('u', 'import torch', 'Net', "__import__('os').getcwd()", work_dir=str(tmp_path))
+
+
+@pytest.mark.parametrize('name, backend', [
+    ('onnx', 'onnx'),
+    (' Direct ', 'ai-edge-torch'),
+    ('litert', 'ai-edge-torch'),
+    ('compare', 'compare'),
+])
+def test_resolve_backend(name, backend):
+    assert fmt.resolve_backend(name) == backend
+
+
+def test_resolve_backend_rejects_unknown_names():
+    with pytest.raises(RuntimeError, match='Unknown conversion backend'):
+        fmt.resolve_backend('tvm')
@@ -0,0 +1,111 @@
+import json
+import os
+import threading
+
+from utils import jobs
+from utils.jobs import job_key, submit_job
+
+
+def sse(payload):
+    return f'data: {json.dumps(payload)}\n\n'
+
+
+def gated_pipeline(gate, calls, artifacts=()):
+    """Pipeline factory that holds the job in flight until gate is set."""
+    def factory(work_dir):
+        calls.append(work_dir)
+
+        def run():
+            yield sse({'message': 'started'})
+            gate.wait(10)
+            paths = {}
+            for name in artifacts:
+                paths[name.split('.')[-2]] = path = os.path.join(work_dir, name)
+                with open(path, 'wb') as f:
+                    f.write(b'dla')
+            yield sse({'message': 'done', 'final': True, 'artifacts': paths})
+        return run()
+    return factory
+
+
+def events(job, **kwargs):
+    return [json.loads(line[6:]) for chunk in job.stream(**kwargs)
+            for line in chunk.splitlines() if line.startswith('data: ')]
+
+
+def test_job_key_separates_parts():
+    assert job_key('upload', 'ab', 'c') != job_key('upload', 'a', 'bc')
+    assert job_key('upload', 'ab', 'c') == job_key('upload', 'ab', 'c')
+    assert job_key('upload', 'ab') != job_key('pytorch', 'ab')
+
+
+def test_identical_requests_attach_to_the_in_flight_job(tmp_path):
+    gate, calls = threading.Event(), []
+    key = job_key('upload', 'same-model', 'tflite')
+    first, is_new = submit_job(key, str(tmp_path / 'alice'), gated_pipeline(gate, calls), cost=0)
+    second, attached_new = submit_job(key, str(tmp_path / 'bob'), gated_pipeline(gate, calls), cost=0)
+    other, other_new = submit_job(job_key('upload', 'other-model', 'tflite'), str(tmp_path / 'bob'),
+                                  gated_pipeline(gate, calls), cost=0)
+
+    assert is_new and not attached_new and other_new
+    assert second is first and other is not first
+    assert len(calls) == 2
+
+    gate.set()
+    assert events(first)[-1]['final']
+    events(other)
+    # Once finished, the same key starts a fresh job
+    third, third_new = submit_job(key, str(tmp_path / 'alice'), gated_pipeline(gate, calls), cost=0)
+    assert third_new and third is not first
+    events(third)
+
+
+def test_attached_user_gets_the_artifacts_in_their_workspace(tmp_path):
+    gate, calls = threading.Event(), []
+    key = job_key('upload', 'shared-model', 'tflite')
+    job, _ = submit_job(key, str(tmp_path / 'alice'), gated_pipeline(gate, calls, ['model.mdla3.dla']), cost=0)
+    submit_job(key, str(tmp_path / 'bob'), gated_pipeline(gate, calls, ['model.mdla3.dla']), cost=0)
+    gate.set()
+
+    received = events(job, user_dir=str(tmp_path / 'bob'))
+    assert any('Linked 1 shared artifact' in e['message'] for e in received)
+    shared = os.path.join(jobs.job_workspace(str(tmp_path / 'bob'), job.job_id), 'model.mdla3.dla')
+    with open(shared, 'rb') as f:
+        assert f.read() == b'dla'
+    assert received[-1]['artifacts']['mdla3']['name'] == 'model.mdla3.dla'
+
+
+def sse_records(chunks):
+    """Parse (id, payload) pairs from SSE chunks; id is None for unnumbered notices."""
+    records = []
+    for chunk in chunks:
+        fields = dict(line.split(': ', 1) for line in chunk.splitlines() if ': ' in line)
+        if 'data' in fields:
+            records.append((int(fields['id']) if 'id' in fields else None, json.loads(fields['data'])))
+    return records
+
+
+def test_stream_numbers_events_and_replays_after_last_event_id(tmp_path):
+    gate, calls = threading.Event(), []
+    job, _ = submit_job(job_key('upload', 'replay'), str(tmp_path / 'alice'), gated_pipeline(gate, calls), cost=0)
+    live = job.stream()
+    assert next(live).startswith('retry: ')
+    first_id, first = sse_records([next(live)])[0]
+    assert first_id == 1 and first['job_id'] == job.job_id
+
+    # The client drops here and reconnects after the job has moved on
+    gate.set()
+    full = sse_records(job.stream())
+    assert [seq for seq, _ in full] == list(range(1, len(full) + 1))
+    resumed = sse_records(job.stream(last_event_id=2))
+    assert resumed == full[2:]
+    assert resumed[-1][1]['final']
+
+
+def test_stream_clamps_out_of_range_event_ids(tmp_path):
+    gate, calls = threading.Event(), []
+    gate.set()
+    job, _ = submit_job(job_key('upload', 'clamp'), str(tmp_path / 'alice'), gated_pipeline(gate, calls), cost=0)
+    full = sse_records(job.stream())
+    assert sse_records(job.stream(last_event_id=-5)) == full
+    assert sse_records(job.stream(last_event_id=10 ** 6)) == []
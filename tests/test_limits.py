@@ -0,0 +1,58 @@
+import sys
+
+import pytest
+
+from utils.converter import limits
+from utils.converter.limits import StageLimitExceeded, run_limited
+
+
+@pytest.fixture(autouse=True)
+def no_limits(monkeypatch):
+    monkeypatch.setattr(limits, 'JOB_CPU_LIMIT_SECONDS', 0)
+    monkeypatch.setattr(limits, 'JOB_MEMORY_LIMIT_MB', 0)
+    monkeypatch.setattr(limits, 'JOB_CGROUP_PARENT', '')
+
+
+def python(code):
+    return [sys.executable, '-c', code]
+
+
+def test_records_usage_and_output():
+    stats = []
+    result = run_limited(python('print("ok")'), 'test', stats=stats)
+    assert result.returncode == 0 and result.stdout.strip() == 'ok'
+    assert stats[0]['stage'] == 'test' and stats[0]['max_rss_mb'] > 0
+
+
+def test_wall_clock_timeout_kills_the_process_group():
+    with pytest.raises(StageLimitExceeded, match='wall-clock'):
+        run_limited(python('import time; time.sleep(30)'), 'test', timeout=0.5)
+
+
+def test_cpu_hungry_child_is_killed(monkeypatch):
+    monkeypatch.setattr(limits, 'JOB_CPU_LIMIT_SECONDS', 1)
+    with pytest.raises(StageLimitExceeded, match='CPU time'):
+        run_limited(python('while True: pass'), 'test', timeout=30)
+
+
+def test_cpu_limit_covers_children_forked_at_startup(monkeypatch):
+    monkeypatch.setattr(limits, 'JOB_CPU_LIMIT_SECONDS', 1)
+    # The grandchild is forked before the parent could react; it must still inherit the limit
+    code = ('import os, sys\n'
+            'pid = os.fork()\n'
+            'if pid == 0:\n'
+            '    while True: pass\n'
+            '_, status = os.waitpid(pid, 0)\n'
+            'sys.exit(0 if os.WIFSIGNALED(status) else 1)\n')
+    assert run_limited(python(code), 'test', timeout=30).returncode == 0
+
+
+def test_memory_hungry_child_is_killed_without_cgroup(monkeypatch):
+    monkeypatch.setattr(limits, 'JOB_MEMORY_LIMIT_MB', 256)
+    with pytest.raises(StageLimitExceeded, match='memory limit'):
+        run_limited(python('data = bytearray(1024 ** 3)'), 'test', timeout=30)
+
+
+def test_nonzero_exit_without_limits_is_returned():
+    result = run_limited(python('import sys; sys.exit(3)'), 'test')
+    assert result.returncode == 3
@@ -0,0 +1,120 @@
+import pytest
+
+from utils.converter.convert import tflite_op_counts, validate_tflite
+from utils.converter.litert import inspect_tflite, is_tflite_file
+
+# Minimal interpreter with the tf.lite.Interpreter surface the inspection script uses;
+# tensor names record which package served the call
+_FAKE_INTERPRETER = '''
+import numpy as np
+
+class Interpreter:
+    def __init__(self, model_path):
+        with open(model_path, 'rb') as f:
+            self.model = f.read()
+        if self.model[4:8] != b'TFL3':
+            raise ValueError('Model provided has model identifier %r, should be TFL3' % self.model[4:8])
+        self.allocated = False
+
+    def get_input_details(self):
+        return [{'name': '{backend}:input', 'index': 0, 'shape': np.array([1, 4], dtype=np.int32),
+                 'shape_signature': np.array([-1, 4], dtype=np.int32), 'dtype': np.float32}]
+
+    def get_output_details(self):
+        return [{'name': '{backend}:output', 'index': 1, 'shape': np.array([1, 2], dtype=np.int32),
+                 'shape_signature': np.array([-1, 2], dtype=np.int32), 'dtype': np.float32}]
+
+    def _get_ops_details(self):
+        return [{'op_name': name} for name in ('TRANSPOSE', 'CONV_2D', 'TRANSPOSE')]
+
+    def allocate_tensors(self):
+        self.allocated = True
+
+    def set_tensor(self, index, data):
+        assert self.allocated and data.shape == (1, 4)
+
+    def invoke(self):
+        if b'CRASH' in self.model:
+            raise RuntimeError('Node number 1 (CONV_2D) failed to invoke')
+'''
+
+
+def install_interpreter(root, package, backend):
+    module = root.joinpath(*package.split('.'))
+    module.parent.mkdir(parents=True, exist_ok=True)
+    for parent in [module.parent, *module.parent.parents]:
+        if parent == root:
+            break
+        (parent / '__init__.py').touch()
+    module.with_suffix('.py').write_text(_FAKE_INTERPRETER.replace('{backend}', backend))
+
+
+@pytest.fixture
+def interpreters(tmp_path, monkeypatch):
+    """Put fake LiteRT / TensorFlow interpreters on the inspection subprocess's path."""
+    root = tmp_path / 'site'
+    monkeypatch.setenv('PYTHONPATH', str(root))
+    return lambda package, backend: install_interpreter(root, package, backend)
+
+
+@pytest.fixture
+def model(tmp_path):
+    def write(body=b''):
+        path = tmp_path / 'model.tflite'
+        path.write_bytes(b'\x1c\x00\x00\x00TFL3' + body)
+        return str(path)
+    return write
+
+
+def test_is_tflite_file(tmp_path, model):
+    assert is_tflite_file(model())
+    (tmp_path / 'model.onnx').write_bytes(b'\x08\x07\x12\x07pytorch')
+    assert not is_tflite_file(str(tmp_path / 'model.onnx'))
+    (tmp_path / 'short.tflite').write_bytes(b'TFL3')
+    assert not is_tflite_file(str(tmp_path / 'short.tflite'))
+    assert not is_tflite_file(str(tmp_path / 'missing.tflite'))
+
+
+def test_inspection_prefers_litert(interpreters, model):
+    interpreters('ai_edge_litert.interpreter', 'litert')
+    interpreters('tensorflow.lite.python.interpreter', 'tensorflow')
+    stats = []
+    details = inspect_tflite(model(), 'ops', stats=stats)
+    assert details['inputs'] == [{'name': 'litert:input', 'shape': [1, 4], 'shape_signature': [-1, 4],
+                                  'dtype': 'float32'}]
+    assert details['ops'] == ['TRANSPOSE', 'CONV_2D', 'TRANSPOSE']
+    assert 'inference_ok' not in details
+    assert stats and stats[0]['stage'] == 'litert'
+
+
+def test_inspection_falls_back_to_tensorflow(interpreters, model):
+    interpreters('tensorflow.lite.python.interpreter', 'tensorflow')
+    assert inspect_tflite(model())['outputs'][0]['name'] == 'tensorflow:output'
+
+
+def test_unloadable_model_raises(interpreters, tmp_path):
+    interpreters('ai_edge_litert.interpreter', 'litert')
+    path = tmp_path / 'model.tflite'
+    path.write_bytes(b'\x1c\x00\x00\x00ONNX')
+    with pytest.raises(RuntimeError, match='TFLite model load failed: ValueError: .*should be TFL3'):
+        inspect_tflite(str(path))
+
+
+def test_validate_reports_shape_mismatch_and_inference_failure(interpreters, model):
+    interpreters('ai_edge_litert.interpreter', 'litert')
+    info = validate_tflite(model(), [1, 4])
+    assert info['shape_match'] and info['inference_ok'] and info['output_shape'] == [1, 2]
+    info = validate_tflite(model(b'CRASH'), [1, 3, 8, 8])
+    assert not info['shape_match'] and not info['inference_ok']
+
+
+def test_op_counts(interpreters, model):
+    interpreters('ai_edge_litert.interpreter', 'litert')
+    assert tflite_op_counts(model()) == {'ops': 3, 'transposes': 2, 'op_types': {'TRANSPOSE': 2, 'CONV_2D': 1}}
+
+
+def test_op_counts_are_none_for_unloadable_models(interpreters, tmp_path):
+    interpreters('ai_edge_litert.interpreter', 'litert')
+    path = tmp_path / 'model.tflite'
+    path.write_bytes(b'not a model')
+    assert tflite_op_counts(str(path)) is None
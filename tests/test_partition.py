@@ -0,0 +1,57 @@
+import json
+import os
+
+from utils.converter import partition
+from utils.converter.partition import format_partition, partition_tflite
+
+
+def run_partition(tmp_path, stub_sdk):
+    model = tmp_path / 'model.tflite'
+    model.write_bytes(b'TFL3 REJECT')
+    return partition_tflite(str(model), 'mdla3', sdk=stub_sdk, work_dir=str(tmp_path), output_dir=str(tmp_path / 'out'),
+                            error='ncc-tflite failed:\nERROR: unsupported operation')
+
+
+def layout(result):
+    return [(segment['device'], segment['ops']) for segment in result['segments']]
+
+
+def test_failing_ops_run_on_the_cpu(tmp_path, stub_sdk, graph_tool):
+    graph_tool(['CONV', 'ADD', 'BAD', 'ADD', 'RELU'])
+    result = run_partition(tmp_path, stub_sdk)
+    assert layout(result) == [('npu', [0, 1]), ('cpu', [2, 2]), ('npu', [3, 4])]
+    assert [(s['inputs'], s['outputs']) for s in result['segments']] == [
+        (['t0'], ['t2']), (['t2'], ['t3']), (['t3'], ['t5'])]
+    assert result['flops'] == {'total': 40, 'npu': 32, 'npu_ratio': 0.8}
+    assert not result['truncated']
+
+    # Only the DLAs, the CPU segment and the manifest ship; NPU segment TFLites are removed
+    assert sorted(os.listdir(tmp_path / 'out')) == [
+        'model.mdla3.ops0000-0001.tflite.mdla3.dla',
+        'model.mdla3.ops0002-0002.cpu.tflite',
+        'model.mdla3.ops0003-0004.tflite.mdla3.dla',
+        'model.mdla3.partitions.json',
+    ]
+    assert sorted(result['files']) == ['mdla3.manifest', 'mdla3.part00', 'mdla3.part01', 'mdla3.part02']
+    with open(result['manifest_path'], 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    assert manifest['segments'] == result['segments'] and manifest['sdk'] == '0.0.0'
+    assert '2 DLA + 1 CPU segment(s)' in format_partition('mdla3', result)[0]
+
+
+def test_ops_that_fail_together_give_up_the_last_op(tmp_path, stub_sdk, graph_tool):
+    graph_tool(['ADD', 'PAIR_A', 'ADD', 'PAIR_B', 'ADD'])
+    result = run_partition(tmp_path, stub_sdk)
+    assert layout(result) == [('npu', [0, 2]), ('cpu', [3, 3]), ('npu', [4, 4])]
+
+
+def test_tiny_npu_runs_fold_into_the_cpu(tmp_path, monkeypatch, stub_sdk, graph_tool):
+    monkeypatch.setattr(partition, 'PARTITION_MIN_NPU_SHARE', 0.3)
+    graph_tool(['ADD', 'BAD', 'ADD', 'ADD', 'ADD'])
+    result = run_partition(tmp_path, stub_sdk)
+    assert layout(result) == [('cpu', [0, 1]), ('npu', [2, 4])]
+    assert sorted(os.listdir(tmp_path / 'out')) == [
+        'model.mdla3.ops0000-0001.cpu.tflite',
+        'model.mdla3.ops0002-0004.tflite.mdla3.dla',
+        'model.mdla3.partitions.json',
+    ]
@@ -0,0 +1,111 @@
+import threading
+
+import pytest
+
+from utils.converter import pipeline
+from utils.converter.pipeline import Pipeline, Stage, StageCache
+
+
+def run(stages, initial, cache=None):
+    engine = Pipeline(stages, cache=cache or StageCache())
+    events = list(engine.run(initial))
+    return engine, events
+
+
+def test_stages_run_in_dependency_order_and_in_parallel():
+    both_started = threading.Barrier(2, timeout=5)
+
+    def branch(suffix):
+        def func(source, stats):
+            both_started.wait()
+            return source + suffix
+        return func
+
+    stages = [
+        Stage('join', lambda left, right, stats: f'{left}+{right}', inputs=['left', 'right'], outputs=['joined']),
+        Stage('left', branch('-l'), inputs=['source'], outputs=['left']),
+        Stage('right', branch('-r'), inputs=['source'], outputs=['right']),
+    ]
+    engine, _ = run(stages, {'source': 's'})
+    assert engine.context['joined'] == 's-l+s-r'
+    assert engine.results == {'left': 'done', 'right': 'done', 'join': 'done'}
+
+
+def test_failure_skips_only_dependent_stages():
+    def broken(source, stats):
+        raise RuntimeError('boom')
+
+    stages = [
+        Stage('broken', broken, inputs=['source'], outputs=['a']),
+        Stage('after', lambda a, stats: a, inputs=['a'], outputs=['b']),
+        Stage('other', lambda source, stats: source, inputs=['source'], outputs=['c']),
+    ]
+    engine, events = run(stages, {'source': 's'})
+    assert engine.results == {'broken': 'failed', 'after': 'skipped', 'other': 'done'}
+    assert engine.errors['broken'] == 'boom'
+    assert any(e['status'] == 'failed' and e['error'] for e in events)
+
+
+def test_cache_key_follows_file_content_not_path(tmp_path):
+    calls = []
+
+    def convert(model, stats):
+        calls.append(model)
+        return 'converted'
+
+    def stages():
+        return [Stage('convert', convert, inputs=['model'], outputs=['out'])]
+
+    cache = StageCache()
+    first, second = tmp_path / 'a.onnx', tmp_path / 'b.onnx'
+    first.write_bytes(b'same')
+    second.write_bytes(b'same')
+    run(stages(), {'model': str(first)}, cache)
+    _, events = run(stages(), {'model': str(second)}, cache)
+    assert events[-1]['status'] == 'cached' and len(calls) == 1
+
+    second.write_bytes(b'changed')
+    _, events = run(stages(), {'model': str(second)}, cache)
+    assert events[-1]['status'] == 'done' and len(calls) == 2
+
+
+def test_key_inputs_and_salt_scope_the_cache():
+    stage = Stage('ncc', lambda model, work_dir, stats: 'x', inputs=['model', 'work_dir'], outputs=['dla'],
+                  key_inputs=['model'], cache_salt='sdk-7')
+    cache = StageCache()
+    assert cache.key(stage, {'model': 'm', 'work_dir': '/a'}) == cache.key(stage, {'model': 'm', 'work_dir': '/b'})
+    other_sdk = Stage('ncc', stage.func, inputs=stage.inputs, outputs=['dla'], key_inputs=['model'],
+                      cache_salt='sdk-8')
+    assert cache.key(stage, {'model': 'm', 'work_dir': '/a'}) != cache.key(other_sdk, {'model': 'm', 'work_dir': '/a'})
+
+
+def test_file_fingerprints_are_memoized_until_the_file_changes(tmp_path, monkeypatch):
+    hashed = []
+    real_hash = pipeline._hash_file
+    monkeypatch.setattr(pipeline, '_hash_file', lambda path: hashed.append(path) or real_hash(path))
+    monkeypatch.setattr(pipeline, '_file_digests', pipeline.OrderedDict())
+    model = tmp_path / 'model.tflite'
+    model.write_bytes(b'v1')
+
+    first = pipeline._value_fingerprint(str(model))
+    assert pipeline._value_fingerprint(str(model)) == first
+    assert len(hashed) == 1
+
+    model.write_bytes(b'v2-longer')
+    assert pipeline._value_fingerprint(str(model)) != first
+    assert len(hashed) == 2
+
+
+def test_fingerprint_memo_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline, '_file_digests', pipeline.OrderedDict())
+    monkeypatch.setattr(pipeline, 'FILE_DIGEST_CACHE_MAX', 2)
+    for i in range(3):
+        path = tmp_path / f'{i}.bin'
+        path.write_bytes(bytes([i]))
+        pipeline._value_fingerprint(str(path))
+    assert len(pipeline._file_digests) == 2
+
+
+@pytest.mark.parametrize('value', [3, 'not/a/file', ('a', 1)])
+def test_non_file_values_use_repr(value):
+    assert pipeline._value_fingerprint(value) == 'value:' + repr(value)
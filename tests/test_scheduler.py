@@ -0,0 +1,93 @@
+import pytest
+
+from utils import scheduler
+from utils.scheduler import FairScheduler
+
+
+@pytest.fixture(autouse=True)
+def plenty_of_memory(monkeypatch):
+    monkeypatch.setattr(scheduler, 'available_memory_mb', lambda: None)
+
+
+def make_scheduler(**kwargs):
+    kwargs.setdefault('weights', {})
+    kwargs.setdefault('memory_budget', 0)
+    return FairScheduler(**kwargs)
+
+
+def dispatched(tickets):
+    return [t.job_id for t in tickets if t.dispatched_at is not None]
+
+
+def test_heavy_user_does_not_starve_others():
+    sched = make_scheduler(max_concurrent=1, max_per_user=1)
+    first = sched.submit('a1', 'alice')
+    bulk = [sched.submit(f'a{i}', 'alice') for i in range(2, 5)]
+    bob = sched.submit('b1', 'bob')
+    assert dispatched([first]) == ['a1']
+
+    sched.release(first)
+    # Bob starts at the current virtual time, ahead of alice's backlog
+    assert dispatched(bulk + [bob]) == ['b1']
+    sched.release(bob)
+    assert dispatched(bulk) == ['a2']
+
+
+def test_weight_scales_share():
+    sched = make_scheduler(max_concurrent=1, max_per_user=1, weights={'ci': 0.5})
+    blocker = sched.submit('x', 'other')
+    ci = [sched.submit(f'c{i}', 'ci') for i in range(2)]
+    user = [sched.submit(f'u{i}', 'user') for i in range(2)]
+    order = []
+    running = blocker
+    for _ in range(4):
+        sched.release(running)
+        running = next(t for t in ci + user if t.dispatched_at is not None and t.job_id not in order)
+        order.append(running.job_id)
+    assert order == ['c0', 'u0', 'u1', 'c1']
+
+
+def test_per_user_cap_defers_and_counts_each_ticket_once():
+    sched = make_scheduler(max_concurrent=4, max_per_user=2)
+    alice = [sched.submit(f'a{i}', 'alice') for i in range(3)]
+    bob = sched.submit('b0', 'bob')
+
+    assert dispatched(alice + [bob]) == ['a0', 'a1', 'b0']
+    # Waiting jobs re-run dispatch on every poll; the capped ticket is still one deferral
+    for _ in range(3):
+        assert not sched.wait(alice[2], timeout=0)
+    assert sched.snapshot()['cap_deferrals_total'] == 1
+
+    sched.release(alice[0])
+    assert alice[2].dispatched_at is not None
+
+
+def test_memory_admission_holds_the_slot_for_next_job():
+    sched = make_scheduler(max_concurrent=4, memory_budget=1000)
+    big = sched.submit('big', 'alice', memory_mb=800)
+    next_in_line = sched.submit('next', 'bob', memory_mb=500)
+    small = sched.submit('small', 'carol', memory_mb=100)
+
+    assert dispatched([big, next_in_line, small]) == ['big']
+    snap = sched.snapshot()
+    assert snap['memory_blocked'] == 1
+    assert snap['memory_deferrals_total'] == 1
+
+    sched.release(big)
+    assert dispatched([next_in_line, small]) == ['next', 'small']
+
+
+def test_oversized_job_runs_when_idle():
+    sched = make_scheduler(memory_budget=1000)
+    ticket = sched.submit('huge', 'alice', memory_mb=5000)
+    assert ticket.dispatched_at is not None
+
+
+def test_release_before_dispatch_removes_ticket():
+    sched = make_scheduler(max_concurrent=1)
+    running = sched.submit('r', 'alice')
+    waiting = sched.submit('w', 'bob')
+    sched.release(waiting)
+    assert sched.snapshot()['queued'] == 0
+    sched.release(running)
+    assert sched.snapshot()['completed_total'] == 1
@@ -0,0 +1,120 @@
+import os
+import time
+
+import pytest
+
+from utils import artifacts, blobstore, store
+from utils.artifacts import register_artifact, resolve_artifact
+from utils.store import LocalStore, blob_key, fetch_blob, get_store, publish_file
+
+
+@pytest.fixture
+def local_store(tmp_path):
+    return LocalStore(str(tmp_path / 'store'))
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return str(path)
+
+
+def test_publish_is_deduplicated_by_content(tmp_path, local_store):
+    data = os.urandom(1024)
+    digest = publish_file(write(tmp_path / 'a.dla', data), store=local_store)
+    os.utime(local_store.local_path(blob_key(digest)), (0, 0))
+    assert publish_file(write(tmp_path / 'b.dla', data), store=local_store) == digest
+    # The second publish only refreshes the retention clock
+    assert os.path.getmtime(local_store.local_path(blob_key(digest))) > 0
+    assert local_store.size(blob_key(digest)) == len(data)
+
+
+def test_store_and_cache_copies_leave_blob_refcounts_alone(tmp_path, monkeypatch, local_store):
+    monkeypatch.setattr(blobstore, 'BLOB_STORE_DIR', str(tmp_path / 'blobs'))
+    monkeypatch.setattr(blobstore, 'BLOB_MIN_BYTES', 16)
+    monkeypatch.setattr(blobstore, '_dedupe_disabled', False)
+    data = os.urandom(2048)
+    first = write(tmp_path / 'u1' / 'm.dla', data)
+    second = write(tmp_path / 'u2' / 'm.dla', data)
+    blobstore.intern_paths([first, second])
+    assert os.stat(first).st_nlink == 3
+
+    digest = publish_file(first, store=local_store)
+    cached = fetch_blob(digest, 'm.dla', store=local_store)
+    assert os.stat(first).st_nlink == 3
+    assert not os.path.samefile(cached, first)
+    assert not os.path.samefile(local_store.local_path(blob_key(digest)), first)
+
+    # Once the workspaces are gone the blob is garbage, whatever the store and cache hold
+    os.remove(first)
+    os.remove(second)
+    assert blobstore.collect_garbage() == (1, len(data))
+    with open(fetch_blob(digest, 'm.dla', store=local_store), 'rb') as f:
+        assert f.read() == data
+
+
+def test_fetch_reads_through_the_cache(tmp_path, local_store, monkeypatch):
+    digest = publish_file(write(tmp_path / 'a.dla', b'dla' * 100), store=local_store)
+    downloads = []
+    get_file = local_store.get_file
+    monkeypatch.setattr(local_store, 'get_file', lambda key, dest: downloads.append(key) or get_file(key, dest))
+
+    path = fetch_blob(digest, 'model.dla', store=local_store)
+    assert path == os.path.join(store.ARTIFACT_CACHE_DIR, digest[:2], digest, 'model.dla')
+    # Same content under another name, and a copy into a job directory: no new download
+    other = fetch_blob(digest, 'renamed.dla', dest_dir=str(tmp_path / 'job'), store=local_store)
+    assert other == str(tmp_path / 'job' / 'renamed.dla')
+    assert downloads == [blob_key(digest)]
+    assert fetch_blob('0' * 64, store=local_store) is None
+
+
+def test_cache_evicts_least_recently_used_entries(tmp_path, local_store, monkeypatch):
+    monkeypatch.setattr(store, 'ARTIFACT_CACHE_MAX_MB', 0)
+    first = publish_file(write(tmp_path / 'a.dla', b'a' * 100), store=local_store)
+    second = publish_file(write(tmp_path / 'b.dla', b'b' * 100), store=local_store)
+    fetch_blob(first, store=local_store)
+    fetch_blob(second, store=local_store)
+    cached = [digest for prefix in os.listdir(store.ARTIFACT_CACHE_DIR)
+              for digest in os.listdir(os.path.join(store.ARTIFACT_CACHE_DIR, prefix))]
+    assert cached == [second]
+
+
+def test_local_store_json_and_purge(local_store, tmp_path):
+    local_store.put_json('jobs/abc.json', {'artifacts': [1, 2]})
+    assert local_store.get_json('jobs/abc.json') == {'artifacts': [1, 2]}
+    assert local_store.get_json('jobs/missing.json') is None
+    publish_file(write(tmp_path / 'a.dla', b'x' * 10), store=local_store)
+    assert local_store.purge(older_than=-1) == 2
+    # At most one sweep per interval
+    local_store.put_json('jobs/abc.json', {})
+    assert local_store.purge(older_than=-1) == 0
+
+
+def test_unsupported_store_url():
+    with pytest.raises(RuntimeError, match='Unsupported ARTIFACT_STORE'):
+        get_store('ftp://host/path')
+
+
+def test_nothing_is_published_without_a_shared_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, 'ARTIFACT_STORE', '')
+    monkeypatch.setattr(artifacts, 'publish_file', lambda *args: pytest.fail('published without ARTIFACT_STORE'))
+    register_artifact(write(tmp_path / 'job' / 'model.dla', b'dla'))
+    assert not os.path.exists('artifact_store')
+
+
+def test_shared_store_publishes_in_the_background(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, 'ARTIFACT_STORE', f"file://{tmp_path / 'shared'}")
+    path = write(tmp_path / 'job' / 'model.dla', b'dla' * 1000)
+    digest = register_artifact(path)
+    deadline = time.time() + 5
+    while get_store().size(blob_key(digest)) is None and time.time() < deadline:
+        time.sleep(0.01)
+    assert get_store().size(blob_key(digest)) == 3000
+
+    # Another node (or this one after cleanup) resolves the digest through the store
+    os.remove(path)
+    monkeypatch.setattr(artifacts, '_artifact_index', type(artifacts._artifact_index)())
+    resolved = resolve_artifact(digest, 'model.dla')
+    with open(resolved, 'rb') as f:
+        assert f.read() == b'dla' * 1000
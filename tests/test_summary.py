@@ -0,0 +1,29 @@
+from types import SimpleNamespace
+
+from utils.converter.summary import summarize_sweep
+
+
+def test_sweep_matrix_reports_each_shape_and_arch(tmp_path):
+    dla = tmp_path / 'model_1x3.mdla3.dla'
+    dla.write_bytes(b'x' * 2048)
+    tflite = tmp_path / 'model_1x3.tflite'
+    tflite.write_bytes(b't' * 10)
+    pipeline = SimpleNamespace(
+        context={'tflite@1x3': str(tflite), 'dla_mdla3@1x3': str(dla)},
+        results={'dla_mdla3@1x3': 'done', 'dla_vpu@1x3': 'failed'},
+        errors={'dla_vpu@1x3': 'unsupported op', 'onnx2tf@4x3': 'onnx2tf crashed'},
+        timings={'dla_mdla3@1x3': 1.5},
+        stats=[],
+    )
+    exports = {'1x3': {'shape': [1, 3], 'onnx': 'a.onnx', 'error': None},
+               '4x3': {'shape': [4, 3], 'onnx': None, 'error': None}}
+
+    final = list(summarize_sweep(pipeline, exports, archs=['mdla3', 'vpu']))[-1]
+    rows = {row['tag']: row for row in final['sweep']['rows']}
+    assert final['sweep']['archs'] == ['mdla3', 'vpu']
+    assert rows['1x3']['cells']['mdla3'] == {'supported': True, 'status': 'done', 'seconds': 1.5, 'dla_size': 2048,
+                                             'error': None, 'tune_best': None}
+    assert rows['1x3']['cells']['vpu']['error'] == 'unsupported op'
+    assert rows['4x3']['error'] == 'onnx2tf crashed'
+    assert rows['4x3']['cells']['mdla3']['status'] == 'skipped'
+    assert final['artifacts']['mdla3@1x3'] == str(dla)
@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+from utils.converter import tune
+from utils.converter.pipeline import StageCache
+from utils.converter.tune import format_tuning, parse_ncc_estimates, tune_tflite_to_dla
+
+
+@pytest.fixture(autouse=True)
+def fresh_variant_cache(monkeypatch):
+    monkeypatch.setattr(tune, '_VARIANT_CACHE', StageCache())
+
+
+@pytest.fixture
+def tflite(tmp_path):
+    path = tmp_path / 'model.tflite'
+    path.write_bytes(b'TFL3' + os.urandom(64))
+    return str(path)
+
+
+def test_parse_ncc_estimates():
+    text = 'Compiling...\nEstimated total cycles: 12345\nDRAM bandwidth = 12.5 MB\nDone: 3 ops\n'
+    assert parse_ncc_estimates(text) == {'estimated_total_cycles': 12345.0, 'dram_bandwidth_mb': 12.5}
+
+
+def test_size_objective_picks_the_smallest_dla(tflite, stub_sdk):
+    result = tune_tflite_to_dla(tflite, 'mdla3', {'objective': 'size', 'profiles': ['relax-fp32', 'opt3']},
+                                sdk=stub_sdk)
+    assert result['tuning']['best'] == 'opt3'
+    assert result['dla'] == tflite + '.mdla3.dla'
+    assert os.path.getsize(result['dla']) == 2048
+    variants = {v['profile']: v for v in result['tuning']['variants']}
+    assert variants['relax-fp32']['dla_bytes'] == 4096 and variants['opt3']['objective_value'] == 2048
+    assert variants['opt3']['estimates'] == {'estimated_total_cycles': 5000.0}
+
+
+def test_estimate_objective_uses_parsed_ncc_output(tflite, stub_sdk):
+    result = tune_tflite_to_dla(tflite, 'vpu', {'objective': 'cycles', 'profiles': ['opt3', 'footprint']},
+                                sdk=stub_sdk)
+    assert result['tuning']['best'] == 'footprint'
+
+
+def test_failing_profiles_are_reported_not_fatal(tflite, stub_sdk):
+    result = tune_tflite_to_dla(tflite, 'mdla3', {'objective': 'size', 'profiles': ['accuracy', 'relax-fp32']},
+                                sdk=stub_sdk)
+    variants = {v['profile']: v for v in result['tuning']['variants']}
+    assert result['tuning']['best'] == 'relax-fp32'
+    assert 'unsupported operation' in variants['accuracy']['error']
+    assert any('accuracy' in line and '❌' in line for line in format_tuning('mdla3', result['tuning']))
+
+
+def test_all_profiles_failing_raises(tflite, stub_sdk):
+    with pytest.raises(RuntimeError, match='all tune profiles failed'):
+        tune_tflite_to_dla(tflite, 'mdla3', {'objective': 'size', 'profiles': ['accuracy']}, sdk=stub_sdk)
+
+
+def test_variants_are_cached_across_runs(tflite, stub_sdk):
+    profiles = {'objective': 'size', 'profiles': ['relax-fp32', 'opt3']}
+    tune_tflite_to_dla(tflite, 'mdla3', profiles, sdk=stub_sdk)
+    stats = []
+    again = tune_tflite_to_dla(tflite, 'mdla3', profiles, sdk=stub_sdk, stats=stats)
+    assert all(v['cached'] for v in again['tuning']['variants']) and stats == []
@@ -0,0 +1,104 @@
+import gzip
+import os
+import zipfile
+
+import pytest
+
+from utils import upload
+from utils.upload import UploadTooLarge, finish_upload, open_upload_stream, split_compression
+
+
+def feed(stream, data, chunk=4096):
+    for i in range(0, len(data), chunk):
+        stream.write(data[i:i + chunk])
+    return finish_upload(stream)
+
+
+def test_split_compression():
+    assert split_compression('model.onnx.gz') == ('model.onnx', 'gz')
+    assert split_compression('model.TFLITE.ZST') == ('model.TFLITE', 'zst')
+    assert split_compression('bundle.zip') == ('bundle.zip', 'zip')
+    assert split_compression('model.tflite') == ('model.tflite', None)
+
+
+def test_plain_upload_is_not_intercepted(tmp_path):
+    assert open_upload_stream('model.onnx', str(tmp_path)) is None
+
+
+def test_gzip_upload_is_inflated(tmp_path):
+    payload = os.urandom(300 * 1024)
+    staged = feed(open_upload_stream('model.onnx.gz', str(tmp_path)), gzip.compress(payload))
+    assert staged['filename'] == 'model.onnx'
+    assert staged['bytes'] == len(payload)
+    with open(staged['staged'], 'rb') as f:
+        assert f.read() == payload
+
+
+def test_gzip_bomb_is_rejected(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload, 'MAX_UPLOAD_MB', 1)
+    stream = open_upload_stream('model.onnx.gz', str(tmp_path))
+    with pytest.raises(UploadTooLarge):
+        feed(stream, gzip.compress(b'\0' * (8 * 1024 * 1024)))
+
+
+def test_truncated_gzip_is_rejected(tmp_path):
+    data = gzip.compress(os.urandom(64 * 1024))
+    with pytest.raises(RuntimeError, match='Truncated'):
+        feed(open_upload_stream('model.onnx.gz', str(tmp_path)), data[:-100])
+
+
+def write_bundle(path, members):
+    with zipfile.ZipFile(path, 'w') as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_zip_bundle_keeps_external_data(tmp_path):
+    data = write_bundle(tmp_path / 'src.zip', {'net/model.onnx': b'graph', 'net/weights.bin': b'w' * 10})
+    staged = feed(open_upload_stream('bundle.zip', str(tmp_path / 'user')), data)
+    assert staged['model'] == os.path.join('net', 'model.onnx')
+    assert staged['files'] == ['weights.bin']
+    assert os.path.isfile(os.path.join(staged['staged'], 'net', 'weights.bin'))
+
+
+def test_zip_path_traversal_is_skipped(tmp_path):
+    data = write_bundle(tmp_path / 'src.zip', {'model.onnx': b'graph', '../escape.txt': b'x',
+                                               '/abs/evil.txt': b'x'})
+    user_dir = tmp_path / 'user'
+    staged = feed(open_upload_stream('bundle.zip', str(user_dir)), data)
+    assert staged['files'] == []
+    assert not (tmp_path / 'escape.txt').exists()
+    assert not os.path.exists('/abs/evil.txt')
+    for root, dirs, names in os.walk(tmp_path):
+        assert 'evil.txt' not in names
+
+
+def test_zip_member_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload, 'MAX_BUNDLE_MEMBERS', 2)
+    data = write_bundle(tmp_path / 'src.zip', {f'{i}.bin': b'x' for i in range(3)})
+    with pytest.raises(RuntimeError, match='limit 2'):
+        feed(open_upload_stream('bundle.zip', str(tmp_path / 'user')), data)
+
+
+def test_zip_bundle_needs_one_model(tmp_path):
+    data = write_bundle(tmp_path / 'src.zip', {'a.onnx': b'1', 'b.onnx': b'2'})
+    user_dir = tmp_path / 'user'
+    with pytest.raises(RuntimeError, match='exactly one'):
+        feed(open_upload_stream('bundle.zip', str(user_dir)), data)
+    assert os.listdir(user_dir) == []
+
+
+def test_zip_decompressed_size_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload, 'MAX_UPLOAD_MB', 1)
+    path = tmp_path / 'src.zip'
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('model.onnx', b'\0' * (4 * 1024 * 1024))
+    with pytest.raises(UploadTooLarge):
+        feed(open_upload_stream('bundle.zip', str(tmp_path / 'user')), path.read_bytes())
+
+
+def test_corrupt_gzip_is_rejected(tmp_path):
+    with pytest.raises(RuntimeError, match='Corrupt'):
+        feed(open_upload_stream('model.onnx.gz', str(tmp_path)), b'not gzip at all')
@@ -0,0 +1,143 @@
+import json
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from utils import workqueue, worker
+from utils.workqueue import SQLiteQueue, remote_pipeline
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return SQLiteQueue(str(tmp_path / 'queue.db'))
+
+
+def sse(payload):
+    return f'data: {json.dumps(payload)}\n\n'
+
+
+def parse(chunk):
+    return json.loads(chunk[6:])
+
+
+def expire_leases(monkeypatch):
+    monkeypatch.setattr(workqueue, 'QUEUE_LEASE_SECONDS', -1)
+
+
+def test_claim_hands_each_job_to_one_worker(queue):
+    queue.enqueue('j1', {'kind': 'pytorch', 'params': {}})
+    assert queue.claim('w1') == ('j1', {'kind': 'pytorch', 'params': {}})
+    assert queue.claim('w2') is None
+    assert queue.state('j1')['worker'] == 'w1'
+
+
+def test_concurrent_publishers_get_distinct_ordered_seqs(queue):
+    def publish(name):
+        for i in range(25):
+            queue.publish('j1', {'message': f'{name}-{i}'})
+
+    threads = [threading.Thread(target=publish, args=(f't{n}',)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    events = queue.events('j1')
+    assert [seq for seq, _ in events] == list(range(1, 201))
+    assert [seq for seq, _ in queue.events('j1', after=190)] == list(range(191, 201))
+
+
+def test_files_round_trip_in_chunks(queue, tmp_path, monkeypatch):
+    monkeypatch.setattr(workqueue, 'FILE_CHUNK_SIZE', 1000)
+    data = os.urandom(4500)
+    (tmp_path / 'model.dla').write_bytes(data)
+    queue.put_file('j1', 'mdla3', 'model.dla', str(tmp_path / 'model.dla'))
+
+    path = queue.get_file('j1', 'mdla3', str(tmp_path / 'out'))
+    assert os.path.basename(path) == 'model.dla'
+    with open(path, 'rb') as f:
+        assert f.read() == data
+    queue.delete_files('j1')
+    assert queue.get_file('j1', 'mdla3', str(tmp_path / 'out')) is None
+
+
+def test_expired_lease_moves_the_job_and_fences_the_old_worker(queue, monkeypatch):
+    queue.enqueue('j1', {'kind': 'pytorch', 'params': {}})
+    queue.claim('w1')
+    expire_leases(monkeypatch)
+    assert queue.claim('w2')[0] == 'j1'
+
+    assert not queue.heartbeat('j1', 'w1')
+    assert not queue.finish('j1', 'w1')
+    assert queue.state('j1')['status'] == 'running'
+    assert queue.heartbeat('j1', 'w2')
+    assert queue.finish('j1', 'w2')
+    assert queue.state('j1')['status'] == 'done'
+
+
+def test_run_job_publishes_the_result_and_finishes(queue, tmp_path, monkeypatch):
+    monkeypatch.setattr(worker, 'WORKER_WORK_DIR', str(tmp_path / 'work'))
+
+    def pipeline(spec, work_dir, input_path=None):
+        path = os.path.join(work_dir, 'model.mdla3.dla')
+        with open(path, 'wb') as f:
+            f.write(b'dla')
+        yield sse({'message': 'compiling'})
+        yield sse({'message': 'done', 'final': True, 'artifacts': {'mdla3': path}})
+
+    monkeypatch.setattr(worker, 'local_pipeline', pipeline)
+    queue.enqueue('j1', {'kind': 'pytorch', 'params': {}})
+    job_id, spec = queue.claim('w1')
+    worker.run_job(queue, job_id, spec, 'w1')
+
+    payloads = [payload for _, payload in queue.events('j1')]
+    assert all(payload['worker'] == 'w1' for payload in payloads)
+    assert payloads[-1]['final'] and payloads[-1]['artifacts'] == {'mdla3': 'model.mdla3.dla'}
+    assert queue.state('j1')['status'] == 'done'
+    assert queue.get_file('j1', 'mdla3', str(tmp_path / 'out'))
+
+
+@pytest.mark.parametrize('final', [True, False])
+def test_worker_that_lost_its_lease_leaves_the_job_alone(queue, tmp_path, monkeypatch, final):
+    monkeypatch.setattr(worker, 'WORKER_WORK_DIR', str(tmp_path / 'work'))
+
+    def pipeline(spec, work_dir, input_path=None):
+        yield sse({'message': 'compiling'})
+        # The lease expires mid-run and another worker takes the job over
+        expire_leases(monkeypatch)
+        queue.claim('w2')
+        if final:
+            yield sse({'message': 'done', 'final': True, 'artifacts': {}})
+
+    monkeypatch.setattr(worker, 'local_pipeline', pipeline)
+    queue.enqueue('j1', {'kind': 'pytorch', 'params': {}})
+    job_id, spec = queue.claim('w1')
+    worker.run_job(queue, job_id, spec, 'w1')
+
+    assert not any(payload.get('final') for _, payload in queue.events('j1'))
+    state = queue.state('j1')
+    assert state['status'] == 'running' and state['worker'] == 'w2'
+
+
+def test_remote_pipeline_relays_only_the_latest_attempt(queue, tmp_path, monkeypatch):
+    monkeypatch.setattr(workqueue, 'QUEUE_POLL_SECONDS', 0.01)
+    stream = remote_pipeline(queue, {'kind': 'pytorch', 'params': {}}, str(tmp_path))
+    assert 'Dispatched' in parse(next(stream))['message']
+    with sqlite3.connect(queue.path) as conn:
+        (job_id,), = conn.execute('SELECT job_id FROM jobs').fetchall()
+
+    for worker_id, message in [('w1', 'export'), ('w2', 'export'), ('w1', 'stale'), ('w2', 'compile')]:
+        queue.publish(job_id, {'message': message, 'worker': worker_id})
+    queue.publish(job_id, {'message': 'done', 'final': True, 'artifacts': {}, 'worker': 'w2'})
+
+    messages = [parse(chunk)['message'] for chunk in stream]
+    assert messages == ['export', '🔁 Job requeued; restarted on worker w2', 'compile', 'done']
+    assert queue.state(job_id)['status'] == 'queued'
+
+
+def test_remote_pipeline_gives_up_after_the_job_timeout(queue, tmp_path, monkeypatch):
+    monkeypatch.setattr(workqueue, 'QUEUE_POLL_SECONDS', 0.01)
+    monkeypatch.setattr(workqueue, 'QUEUE_JOB_TIMEOUT', 0.05)
+    final = parse(list(remote_pipeline(queue, {'kind': 'pytorch', 'params': {}}, str(tmp_path)))[-1])
+    assert final['final'] and final['error'] and 'QUEUE_JOB_TIMEOUT' in final['message']
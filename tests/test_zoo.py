@@ -0,0 +1,61 @@
+import json
+import os
+
+import pytest
+
+from utils import zoo
+from utils.zoo import load_manifest, lookup_zoo_result, replay_zoo_result, zoo_key
+
+REPO_MANIFEST = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'model_zoo', 'manifest.json')
+
+CODE = 'import torch\nclass Net(torch.nn.Module):\n    pass\n'
+
+
+@pytest.fixture(autouse=True)
+def zoo_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(zoo, 'MODEL_ZOO_DIR', str(tmp_path / 'zoo_cache'))
+    monkeypatch.setattr(zoo, '_results', None)
+    return tmp_path / 'zoo_cache'
+
+
+def test_key_ignores_whitespace_and_shape_spelling():
+    key = zoo_key(CODE, 'Net', '(1, 10)')
+    assert zoo_key(CODE.replace('\n', '  \r\n') + '\n\n', ' Net ', '[1,10]') == key
+    assert zoo_key(CODE, 'Net', (1, 10)) == key
+    assert zoo_key(CODE, 'Net', '(1, 11)') != key
+    assert zoo_key(CODE, 'Net', '(1, 10)', ['7.0']) != key
+
+
+def test_key_never_evaluates_the_shape(tmp_path):
+    marker = tmp_path / 'evaluated'
+    shape = f"__import__('os').mkdir({str(marker)!r})"
+    zoo_key(CODE, 'Net', shape)
+    assert not marker.exists()
+
+
+def test_repo_manifest_expands_doc_examples():
+    specs = load_manifest(REPO_MANIFEST)
+    names = [spec['name'] for spec in specs]
+    assert len(names) == len(set(names)) > 1
+    assert any(name.startswith('docs_') for name in names)
+    for spec in specs:
+        assert spec['code'].strip() and spec['model_entrypoint'] and spec['input_shape']
+
+
+def test_lookup_and_replay_recorded_result(tmp_path, zoo_dir):
+    dla = tmp_path / 'net.mdla3.dla'
+    dla.write_bytes(b'dla')
+    record = {'name': 'net', 'messages': [{'message': 'converted'}],
+              'final': {'final': True, 'success': True, 'artifacts': {'mdla3': str(dla)}}, 'converted_at': 0}
+    zoo_dir.mkdir()
+    (zoo_dir / 'results.json').write_text(json.dumps({zoo_key(CODE, 'Net', '(1, 10)'): record}))
+
+    found = lookup_zoo_result(CODE, 'Net', '(1,10)')
+    assert found == record
+    events = [json.loads(chunk[6:]) for chunk in replay_zoo_result(found)]
+    assert 'net' in events[0]['message'] and events[1] == {'message': 'converted'}
+    assert events[-1]['final'] and events[-1]['zoo'] == 'net'
+
+    # A missing artifact turns the record into a miss
+    dla.unlink()
+    assert lookup_zoo_result(CODE, 'Net', '(1, 10)') is None
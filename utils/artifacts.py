@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+版權所有 © 2025 工業技術研究院 (ITRI) 及貢獻者。
+保留所有權利。
+
+本檔案由 Microsoft 訂閱的 GitHub Copilot AI 助理協助產生與優化，部分內容經人工審閱與修正。
+
+本程式碼僅供學術研究與內部使用，未經授權不得用於商業用途。
+
+重新發佈與使用（無論原始或二進位形式，是否經過修改）僅限於下列條件下：
+
+* 原始碼之再發佈必須保留上述版權聲明、條件列表及下列免責聲明。
+* 二進位形式之再發佈必須於相關文件或其他資料中重現上述版權聲明、條件列表及下列免責聲明。
+* 未經事先書面同意，不得使用工業技術研究院 (ITRI) 或貢獻者之名稱為本軟體衍生產品背書或推廣。
+
+本軟體以「現狀」提供，不附任何明示或暗示之保證，包括但不限於適售性及特定用途之適用性。工業技術研究院 (ITRI) 或貢獻者對於因本軟體使用或無法使用所生之任何直接、間接、附帶、特殊、懲罰性或衍生性損害（包括但不限於替代商品或服務之取得、使用損失、資料遺失、營業中斷等），無論於任何理論下（契約、侵權或其他），即使已被告知可能發生該等損害，亦不負任何責任。
+"""
+
+import os
+import re
+import json
+import hashlib
+import threading
+import zipfile
+import logging
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from .blobstore import blob_path
+from .store import publish_file, fetch_blob, store_is_shared
+
+"""
+Content-Addressed Artifact Index
+================================
+轉換產出檔案（TFLite、DLA）的內容定址索引與串流打包工具。
+每個產出檔案以 SHA-256 摘要註冊，設定共用產出儲存 (utils.store) 時於背景寫入儲存；下載網址由摘要組成，
+可安全地長期快取並使用強 ETag；本機找不到的檔案經由 read-through 快取自儲存取得，
+其他節點完成的工作也能下載。多個產出檔案可在不建立暫存檔的情況下即時串流打包為 zip。
+
+Functions
+---------
+register_artifact : 計算檔案摘要並註冊到索引
+resolve_artifact : 由摘要取得檔案路徑
+prune_artifacts : 移除索引中檔案已不存在的項目
+describe_artifacts : 產生前端使用的產出檔案描述（名稱、大小、摘要、下載網址）
+stream_zip : 以串流方式產生 zip 內容
+"""
+
+log = logging.getLogger(__name__)
+
+# digest -> absolute file path, least recently registered or resolved first
+_artifact_index = OrderedDict()
+_index_lock = threading.Lock()
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Older entries are dropped beyond this; resolve_artifact falls back to the blob and artifact stores
+ARTIFACT_INDEX_MAX = 10000
+
+_DIGEST_PATTERN = re.compile(r'[0-9a-f]{64}')
+
+# Uploads to the artifact store run off the response path so the final event is not held back
+_publisher = ThreadPoolExecutor(max_workers=2, thread_name_prefix='artifact-publish')
+
+
+def _publish(path, digest):
+    try:
+        publish_file(path, digest)
+    except Exception as e:
+        log.warning("Could not publish %s to the artifact store: %s", path, e)
+
+
+def register_artifact(path):
+    """
+    註冊產出檔案
+    ==========
+    串流計算檔案的 SHA-256、記錄摘要與路徑的對應；設定 ARTIFACT_STORE 時於背景將檔案寫入產出儲存。
+    寫入完成前其他節點可能暫時無法下載；儲存無法寫入時只記錄警告，本節點仍可提供下載。
+
+    Parameters
+    ----------
+    path : str
+        產出檔案路徑。
+
+    Returns
+    -------
+    str
+        檔案的十六進位 SHA-256 摘要。
+    """
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(STREAM_CHUNK_SIZE), b''):
+            h.update(chunk)
+    digest = h.hexdigest()
+    with _index_lock:
+        _artifact_index[digest] = os.path.abspath(path)
+        _artifact_index.move_to_end(digest)
+        while len(_artifact_index) > ARTIFACT_INDEX_MAX:
+            _artifact_index.popitem(last=False)
+    if store_is_shared():
+        _publisher.submit(contextvars.copy_context().run, _publish, path, digest)
+    return digest
+
+
+def resolve_artifact(digest, name=None, fetch=True):
+    """
+    解析產出檔案摘要
+    ==============
+    由 SHA-256 摘要取得仍存在的檔案路徑。
+
+    Parameters
+    ----------
+    digest : str
+        十六進位 SHA-256 摘要。
+    name : str or None
+        自產出儲存取得時使用的檔名。
+    fetch : bool
+        本機找不到時是否經由 read-through 快取自產出儲存取得。
+
+    Returns
+    -------
+    str or None
+        檔案路徑；原檔案已被清理時改用去重儲存區中的 blob，再改由產出儲存取得，皆不存在時返回 None。
+    """
+    # Digests come from URLs; anything else must not reach the blob or cache paths
+    if not _DIGEST_PATTERN.fullmatch(digest or ''):
+        return None
+    with _index_lock:
+        path = _artifact_index.get(digest)
+        if path:
+            _artifact_index.move_to_end(digest)
+    if path and os.path.exists(path):
+        return path
+    # The workspace may be gone while another workspace still references the blob
+    stored = blob_path(digest)
+    if os.path.exists(stored):
+        return stored
+    if not fetch:
+        return None
+    # Produced on another node, or before this process started
+    try:
+        return fetch_blob(digest, name)
+    except Exception as e:
+        log.warning("Could not fetch %s from the artifact store: %s", digest[:12], e)
+        return None
+
+
+def prune_artifacts():
+    """
+    清理產出索引
+    ==========
+    移除索引中檔案已不存在（例如使用者目錄已過期清理）的項目。
+
+    Returns
+    -------
+    int
+        移除的項目數。
+    """
+    with _index_lock:
+        stale = [digest for digest, path in _artifact_index.items() if not os.path.exists(path)]
+        for digest in stale:
+            del _artifact_index[digest]
+    return len(stale)
+
+
+def describe_artifacts(paths):
+    """
+    產出檔案描述
+    ==========
+    註冊所有產出檔案並產生可直接回傳給前端的描述資訊。
+
+    Parameters
+    ----------
+    paths : dict
+        角色 ("tflite", "vpu", "mdla2", "mdla3") 對應檔案路徑。
+
+    Returns
+    -------
+    dict
+        角色對應 {"name", "size", "digest", "url"}。
+    """
+    described = {}
+    for role, path in paths.items():
+        digest = register_artifact(path)
+        name = os.path.basename(path)
+        described[role] = {
+            'name': name,
+            'size': os.path.getsize(path),
+            'digest': digest,
+            'url': f'/artifacts/{digest}/{name}',
+        }
+    return described
+
+
+class _ChunkBuffer:
+    """zipfile 的僅可寫入輸出目標，寫入內容暫存於記憶體直到被串流取走。"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(files, report=None):
+    """
+    串流 zip 打包
+    ===========
+    將多個檔案逐區塊壓縮並立即輸出，不建立暫存檔，也不將整個檔案讀入記憶體。
+    輸出目標不可 seek，zipfile 會改用 data descriptor 記錄各檔案大小。
+
+    Parameters
+    ----------
+    files : list of tuple
+        (壓縮檔內名稱, 檔案路徑) 列表。
+    report : dict or None
+        若提供，以 compatibility.json 一併打包。
+
+    Yields
+    ------
+    bytes
+        zip 檔案內容片段。
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for arcname, path in files:
+            with open(path, 'rb') as src, zf.open(arcname, 'w', force_zip64=True) as dst:
+                for chunk in iter(lambda: src.read(STREAM_CHUNK_SIZE), b''):
+                    dst.write(chunk)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            data = buffer.drain()
+            if data:
+                yield data
+        if report is not None:
+            zf.writestr('compatibility.json', json.dumps(report, indent=2, ensure_ascii=False))
+    yield buffer.drain()
@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""
+版權所有 © 2025 工業技術研究院 (ITRI) 及貢獻者。
+保留所有權利。
+
+本檔案由 Microsoft 訂閱的 GitHub Copilot AI 助理協助產生與優化，部分內容經人工審閱與修正。
+
+本程式碼僅供學術研究與內部使用，未經授權不得用於商業用途。
+
+重新發佈與使用（無論原始或二進位形式，是否經過修改）僅限於下列條件下：
+
+* 原始碼之再發佈必須保留上述版權聲明、條件列表及下列免責聲明。
+* 二進位形式之再發佈必須於相關文件或其他資料中重現上述版權聲明、條件列表及下列免責聲明。
+* 未經事先書面同意，不得使用工業技術研究院 (ITRI) 或貢獻者之名稱為本軟體衍生產品背書或推廣。
+
+本軟體以「現狀」提供，不附任何明示或暗示之保證，包括但不限於適售性及特定用途之適用性。工業技術研究院 (ITRI) 或貢獻者對於因本軟體使用或無法使用所生之任何直接、間接、附帶、特殊、懲罰性或衍生性損害（包括但不限於替代商品或服務之取得、使用損失、資料遺失、營業中斷等），無論於任何理論下（契約、侵權或其他），即使已被告知可能發生該等損害，亦不負任何責任。
+"""
+
+import os
+import sys
+import uuid
+import errno
+import hashlib
+import argparse
+import threading
+import logging
+
+"""
+Content-Addressed Blob Store
+============================
+使用者工作目錄的去重儲存：轉換完成的檔案（ONNX、saved_model 目錄、TFLite、DLA）
+依 SHA-256 存放於 BLOB_STORE_DIR/<前兩碼>/<摘要>，工作目錄中的檔案改為指向 blob 的硬連結。
+相同內容在所有使用者與重複執行之間只佔用一份磁碟空間。
+
+Reference Counting
+------------------
+blob 的參考數即檔案系統的硬連結數 (st_nlink - 1)，不需另外維護計數表：
+刪除使用者目錄只會移除連結，collect_garbage 僅釋放已無任何工作目錄參考的 blob。
+
+Note
+----
+- BLOB_STORE_DIR 必須與 ./users 位於同一檔案系統，否則無法建立硬連結，此時自動停用去重。
+- 已去重的檔案由多個工作目錄共用，覆寫前必須先以 detach 解除連結，不可原地寫入。
+
+Functions
+---------
+blob_path : 由摘要取得 blob 路徑
+intern_file : 將單一檔案去重為 blob 的硬連結
+intern_paths : 將檔案與目錄（遞迴）去重
+detach : 覆寫前解除檔案與 blob 的連結
+collect_garbage : 釋放已無參考的 blob
+disk_usage : 計算目錄的表面大小與實際佔用（硬連結只計一次）
+"""
+
+log = logging.getLogger(__name__)
+
+BLOB_STORE_DIR = os.environ.get('BLOB_STORE_DIR', './blobs')
+# Small files (scripts, JSON) are not worth a link; only intern files at least this large
+BLOB_MIN_BYTES = int(os.environ.get('BLOB_MIN_BYTES', str(64 * 1024)))
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_store_lock = threading.Lock()
+_dedupe_disabled = False
+
+
+def _file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def blob_path(digest):
+    """
+    blob 路徑
+    ========
+    由 SHA-256 摘要取得 blob 於儲存區中的路徑（以前兩碼分目錄）。
+
+    Parameters
+    ----------
+    digest : str
+        十六進位 SHA-256 摘要。
+
+    Returns
+    -------
+    str
+        blob 檔案路徑（不保證存在）。
+    """
+    return os.path.join(BLOB_STORE_DIR, digest[:2], digest)
+
+
+def intern_file(path):
+    """
+    檔案去重
+    ======
+    計算檔案摘要：blob 不存在時將檔案本身連結進儲存區，
+    已存在時以原子替換將檔案改為指向既有 blob 的硬連結，釋放重複內容。
+
+    Parameters
+    ----------
+    path : str
+        已完成寫入的檔案路徑。
+
+    Returns
+    -------
+    int
+        因此釋放的位元組數（檔案成為新 blob 或無法去重時為 0）。
+    """
+    global _dedupe_disabled
+    if _dedupe_disabled or os.path.islink(path) or not os.path.isfile(path):
+        return 0
+    size = os.path.getsize(path)
+    if size < BLOB_MIN_BYTES:
+        return 0
+    digest = _file_digest(path)
+    target = blob_path(digest)
+    with _store_lock:
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if not os.path.exists(target):
+                os.link(path, target)
+                os.chmod(target, 0o444)
+                return 0
+            if os.path.samefile(path, target):
+                return 0
+            # Only the last link to the old inode frees its blocks
+            released = size if os.stat(path).st_nlink == 1 else 0
+            temp_path = f'{path}.{uuid.uuid4().hex[:8]}.blobtmp'
+            os.link(target, temp_path)
+            os.replace(temp_path, path)
+        except OSError as e:
+            if e.errno in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                _dedupe_disabled = True
+                log.warning("Hard links unavailable (%s); deduplication disabled", e)
+            else:
+                log.warning("Could not intern %s: %s", path, e)
+            return 0
+    return released
+
+
+def intern_paths(paths):
+    """
+    批次去重
+    ======
+    將檔案與目錄（遞迴）中所有完成的檔案去重。
+
+    Parameters
+    ----------
+    paths : list of str
+        檔案或目錄路徑，不存在的路徑會被略過。
+
+    Returns
+    -------
+    tuple of (int, int)
+        (處理的檔案數, 釋放的位元組數)。
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in names)
+        elif os.path.isfile(path):
+            files.append(path)
+    saved = 0
+    for path in dict.fromkeys(files):
+        saved += intern_file(path)
+    return len(files), saved
+
+
+def detach(path):
+    """
+    解除連結
+    ======
+    覆寫既有檔案前呼叫：移除目前的目錄項目，使後續寫入建立新檔案，
+    而不是改寫其他工作目錄共用的 blob 內容。
+
+    Parameters
+    ----------
+    path : str
+        即將被覆寫的檔案路徑。
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def collect_garbage():
+    """
+    釋放無參考的 blob
+    ===============
+    移除硬連結數為 1（僅剩儲存區本身）的 blob。
+
+    Returns
+    -------
+    tuple of (int, int)
+        (釋放的 blob 數, 釋放的位元組數)。
+    """
+    freed, freed_bytes = 0, 0
+    if not os.path.isdir(BLOB_STORE_DIR):
+        return freed, freed_bytes
+    with _store_lock:
+        for root, dirs, names in os.walk(BLOB_STORE_DIR):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                    if st.st_nlink <= 1:
+                        os.remove(path)
+                        freed += 1
+                        freed_bytes += st.st_size
+                except OSError as e:
+                    log.warning("Could not collect %s: %s", path, e)
+    return freed, freed_bytes
+
+
+def disk_usage(*roots):
+    """
+    磁碟使用量
+    ========
+    計算目錄的表面大小（每個路徑各自計算）與實際佔用（相同 inode 只計一次）。
+
+    Parameters
+    ----------
+    *roots : str
+        要統計的目錄。
+
+    Returns
+    -------
+    dict
+        {"files", "apparent_bytes", "actual_bytes"}。
+    """
+    seen = set()
+    files, apparent, actual = 0, 0, 0
+    for root_dir in roots:
+        for root, dirs, names in os.walk(root_dir):
+            for name in names:
+                try:
+                    st = os.lstat(os.path.join(root, name))
+                except OSError:
+                    continue
+                files += 1
+                apparent += st.st_size
+                if (st.st_dev, st.st_ino) not in seen:
+                    seen.add((st.st_dev, st.st_ino))
+                    actual += st.st_size
+    return {'files': files, 'apparent_bytes': apparent, 'actual_bytes': actual}
+
+
+def _format_mb(num_bytes):
+    return f'{num_bytes / (1024 * 1024):.1f} MB'
+
+
+def main(argv=None):
+    """
+    磁碟使用報告
+    ==========
+    python -m utils.blobstore [--dedupe] [--gc] [users_dir]
+    報告使用者目錄與 blob 儲存區的表面大小與實際佔用，可選擇先對既有目錄去重或回收 blob。
+    """
+    parser = argparse.ArgumentParser(prog='python -m utils.blobstore',
+                                     description='Report and reduce disk usage of user workspaces.')
+    parser.add_argument('users_dir', nargs='?', default='./users')
+    parser.add_argument('--dedupe', action='store_true',
+                        help='intern every existing workspace file (run while no conversion is active)')
+    parser.add_argument('--gc', action='store_true', help='free blobs no workspace references')
+    args = parser.parse_args(argv)
+
+    def report(label):
+        # Apparent size is what the workspaces would take without sharing
+        workspaces = disk_usage(args.users_dir)
+        combined = disk_usage(args.users_dir, BLOB_STORE_DIR)
+        print(f"{label:<7} {workspaces['files']} file(s), apparent {_format_mb(workspaces['apparent_bytes'])}, "
+              f"on disk {_format_mb(combined['actual_bytes'])} (workspaces + blob store)")
+
+    report('Before:')
+    if args.dedupe:
+        count, saved = intern_paths([args.users_dir])
+        print(f"Interned {count} file(s), released {_format_mb(saved)}")
+    if args.gc:
+        freed, freed_bytes = collect_garbage()
+        print(f"Collected {freed} blob(s), released {_format_mb(freed_bytes)}")
+    report('After:')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
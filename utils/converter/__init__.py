@@ -16,29 +16,38 @@
 本軟體以「現狀」提供，不附任何明示或暗示之保證，包括但不限於適售性及特定用途之適用性。工業技術研究院 (ITRI) 或貢獻者對於因本軟體使用或無法使用所生之任何直接、間接、附帶、特殊、懲罰性或衍生性損害（包括但不限於替代商品或服務之取得、使用損失、資料遺失、營業中斷等），無論於任何理論下（契約、侵權或其他），即使已被告知可能發生該等損害，亦不負任何責任。
 """
 
-import json
-import os
-from .format import verify_pytorch_format
+from .format import verify_pytorch_format, export_pytorch_shapes, resolve_backend
 from .convert import onnx_to_tflite, tflite_to_vpu, tflite_to_mdla2, tflite_to_mdla3
+from .pipeline import Pipeline, to_sse
+from .stages import export_stages, onnx_stages, direct_stages, sdk_stages, analyze_failures
+from .sdk import resolve_sdks
+from .devices import arch_targets, resolve_targets, resolve_tune
+from .scratch import scratch_workspace
+from .summary import build_final_response, summarize_pipeline, summarize_sweep
 
 """
 PyTorch Model Conversion Pipeline
 =================================
 PyTorch 模型轉換管線核心模組，提供完整的 PyTorch → ONNX → TensorFlow Lite → DLA 轉換流程。
 支援即時進度追蹤、錯誤處理與多重 NPU 目標相容性測試。
+階段排程、快取與平行編譯由 pipeline 引擎處理，本模組僅負責組合階段並轉為 SSE。
 
 Functions
 ---------
 convert_pytorch_to_tflite : 執行完整的 PyTorch 模型轉換管線
+sweep_pytorch_shapes : 對多個輸入形狀執行轉換並產生形狀 × 裝置相容性矩陣
 """
 
 
-def convert_pytorch_to_tflite(user_id, pytorch_code, model_entrypoint, input_shape):
+def convert_pytorch_to_tflite(user_id, pytorch_code, model_entrypoint, input_shape, sdk_versions=None, work_dir=None,
+                              targets=None, tune_profiles=None, tune_objective=None, backend=None, diagnose=False,
+                              partition=False):
     """
     PyTorch Model Conversion Pipeline
     =================================
     將 PyTorch 模型程式碼轉換為 MediaTek NPU 相容的 DLA 格式，支援即時進度更新。
     執行完整的轉換流程：PyTorch → ONNX → TensorFlow Lite → DLA（VPU/MDLA2/MDLA3）。
+    ai-edge-torch 後端直接由模型實例產生 TFLite，失敗時自動改走 ONNX 路徑。
 
     Parameters
     ----------
@@ -50,167 +59,185 @@ def convert_pytorch_to_tflite(user_id, pytorch_code, model_entrypoint, input_sha
         要實例化的模型類別名稱。
     input_shape : str
         輸入張量形狀字串，例如 "(1, 10)" 或 "(1, 3, 224, 224)"。
+    sdk_versions : list of str or None
+        要使用的 NeuronPilot SDK 版本，第一個為主要版本；None 時使用預設 SDK。
+    targets : list of str, str or None
+        要編譯的開發板或架構（例如 ["genio1200"]），None 時編譯全部架構。
+    tune_profiles : list of str, str or None
+        自動調校的 ncc-tflite 參數組合名稱（見 devices.json 的 tune_profiles，"all" 表示全部），None 時不調校。
+    tune_objective : str or None
+        調校目標 ("size"、"compile_time" 或 ncc 成本估計名稱)，None 時使用 TUNE_OBJECTIVE。
+    backend : str or None
+        PyTorch → TFLite 轉換後端 ("onnx"、"ai-edge-torch" 或 "compare")，None 時使用 CONVERSION_BACKEND。
+    diagnose : bool
+        DLA 編譯失敗時是否切分 TFLite 找出該架構無法編譯的運算子（見 diagnose 模組）。
+    partition : bool
+        DLA 編譯失敗時是否分割為該架構可接受的多個 DLA 與 CPU 執行的 TFLite 片段（見 partition 模組）。
+    work_dir : str or None
+        工作目錄（每個工作的獨立目錄），None 時使用 ./users/<user_id>。
 
     Yields
     ------
     str
         Server-sent event 格式化的進度訊息與最終結果，包含轉換狀態、錯誤訊息和相容性測試結果。
     """
-    success = True
-    
-    # Step 1: Clean previous conversion results for this user
-    user_dir = f'./users/{user_id}'
-    if os.path.exists(user_dir):
-        dla_files_removed = 0
-        for root, dirs, files in os.walk(user_dir):
-            for filename_to_remove in files:
-                if filename_to_remove.endswith(('.vpu.dla', '.mdla2.dla', '.mdla3.dla')):
-                    old_dla_path = os.path.join(root, filename_to_remove)
-                    os.remove(old_dla_path)
-                    dla_files_removed += 1
-        if dla_files_removed > 0:
-            yield f'data: {json.dumps({"message": f"🧹 Cleaned {dla_files_removed} previous DLA file(s)"})}\n\n'
-    
-    # Step 2: Initialize conversion process
+    # Resolve the requested NeuronPilot SDK versions (first one is primary) and target archs
     try:
-        yield f'data: {json.dumps({"message": "🚀 PyTorch conversion pipeline started"})}\n\n'
-        yield f'data: {json.dumps({"message": f"📝 Model class: {model_entrypoint}"})}\n\n'
-        yield f'data: {json.dumps({"message": f"📐 Input shape: {input_shape}"})}\n\n'
-    except Exception as e:
-        success = False
-        yield f'data: {json.dumps({"message": f"❌ Initialization failed: {str(e)}", "error": True})}\n\n'
-
-    # Step 3: PyTorch to ONNX conversion
-    yield f'data: {json.dumps({"message": "🔄 Starting PyTorch → ONNX conversion..."})}\n\n'
-    try:
-        onnx_path = verify_pytorch_format(user_id, pytorch_code, model_entrypoint, input_shape)
-        yield f'data: {json.dumps({"message": "✅ ONNX conversion completed"})}\n\n'
+        sdks = resolve_sdks(sdk_versions)
+        archs = resolve_targets(targets)
+        tune = resolve_tune(tune_profiles, tune_objective)
+        backend = resolve_backend(backend)
     except RuntimeError as e:
-        success = False
-        yield f'data: {json.dumps({"message": f"❌ ONNX conversion failed: {str(e)}", "error": True})}\n\n'
+        yield to_sse({"message": str(e), "error": True})
+        yield to_sse(build_final_response({}, False, [], {}))
         return
+    if sdks:
+        yield to_sse({"message": f"🧰 NeuronPilot SDK: {', '.join(sdk['version'] for sdk in sdks)}"})
+    if targets:
+        yield to_sse({"message": f"🎯 Compile targets: {', '.join(arch_targets()[arch]['label'] for arch in archs)}"})
+    if tune:
+        yield to_sse({"message": f"🎛️ Auto-tuning profiles: {', '.join(tune['profiles'])} (objective: {tune['objective']})"})
+
+    # Each job runs in its own fresh work directory, so there are no previous results to clean
+    user_dir = work_dir or f'./users/{user_id}'
+
+    # Step 1: Initialize conversion process
+    yield to_sse({"message": "🚀 PyTorch conversion pipeline started"})
+    yield to_sse({"message": f"📝 Model class: {model_entrypoint}"})
+    yield to_sse({"message": f"📐 Input shape: {input_shape}"})
+    if backend != 'onnx':
+        yield to_sse({"message": f"🔀 Conversion backend: {backend}"})
+
+    # Step 2: Run export → simplify → onnx2tf → validate / DLA stages
+    # Intermediates live in a per-job scratch directory that is removed when the job ends
+    with scratch_workspace() as scratch_dir:
+        initial = {
+            'pytorch_code': pytorch_code,
+            'model_entrypoint': model_entrypoint,
+            'input_shape': input_shape,
+            'work_dir': user_dir,
+            'scratch_dir': scratch_dir,
+        }
+        direct = None
+        if backend == 'ai-edge-torch':
+            # Try the direct route first; DLA stages only follow the route that produced a TFLite
+            direct = Pipeline(direct_stages())
+            for event in direct.run(initial):
+                yield to_sse(event)
+            initial = direct.context
+            if direct.context.get('tflite'):
+                stages = sdk_stages(sdks, archs, tune=tune)
+            else:
+                yield to_sse({"message": "↩️ Falling back to the ONNX conversion route"})
+                stages = export_stages() + onnx_stages() + sdk_stages(sdks, archs, tune=tune)
+        elif backend == 'compare':
+            stages = (export_stages() + onnx_stages() + direct_stages(output='tflite_direct')
+                      + sdk_stages(sdks, archs, tune=tune))
+        else:
+            stages = export_stages() + onnx_stages() + sdk_stages(sdks, archs, tune=tune)
+        pipeline = Pipeline(stages)
+        if direct is not None:
+            pipeline.stats.extend(direct.stats)
+        for event in pipeline.run(initial):
+            yield to_sse(event)
+        if direct is not None:
+            # Report the direct attempt alongside the route that finished the job
+            for attr in ('results', 'errors', 'timings'):
+                getattr(pipeline, attr).update(getattr(direct, attr))
+        for event in analyze_failures(pipeline, sdks, archs, diagnose=diagnose, partition=partition):
+            yield to_sse(event)
+
+        # Step 3: Compatibility summary and final response for frontend dropdown updates
+        for event in summarize_pipeline(pipeline, sdks, archs):
+            yield to_sse(event)
+
+
+def sweep_pytorch_shapes(user_id, pytorch_code, model_entrypoint, input_shapes, sdk_versions=None, work_dir=None,
+                         targets=None, tune_profiles=None, tune_objective=None):
+    """
+    PyTorch 輸入形狀掃描
+    ==================
+    一次請求測試多個輸入形狀（解析度或 batch size）：模型只實例化一次並匯出所有形狀，
+    之後各形狀的 onnx2tf 與各架構 ncc 編譯於同一管線內平行執行。
+
+    Parameters
+    ----------
+    user_id : str
+        使用者會話的唯一識別碼。
+    pytorch_code : str
+        PyTorch 模型類別定義程式碼。
+    model_entrypoint : str
+        要實例化的模型類別名稱。
+    input_shapes : list of str or tuple
+        要掃描的輸入形狀列表。
+    sdk_versions : list of str or None
+        要使用的 NeuronPilot SDK 版本，第一個為主要版本；None 時使用預設 SDK。
+    targets : list of str, str or None
+        要編譯的開發板或架構（例如 ["genio1200"]），None 時編譯全部架構。
+    tune_profiles : list of str, str or None
+        自動調校的 ncc-tflite 參數組合名稱（見 devices.json 的 tune_profiles，"all" 表示全部），None 時不調校。
+    tune_objective : str or None
+        調校目標 ("size"、"compile_time" 或 ncc 成本估計名稱)，None 時使用 TUNE_OBJECTIVE。
+    work_dir : str or None
+        工作目錄，None 時使用 ./users/<user_id>。
 
-    # Step 4: ONNX to TensorFlow Lite conversion
-    yield f'data: {json.dumps({"message": "🔄 Starting ONNX → TensorFlow Lite conversion..."})}\n\n'
+    Yields
+    ------
+    str
+        Server-sent event 格式的進度訊息，最後一個事件包含 sweep 相容性矩陣。
+    """
+    # Resolve the requested NeuronPilot SDK versions (first one is primary) and target archs
     try:
-        tflite_path = onnx_to_tflite(onnx_path)
-        yield f'data: {json.dumps({"message": "✅ TensorFlow Lite conversion completed"})}\n\n'
+        sdks = resolve_sdks(sdk_versions)
+        archs = resolve_targets(targets)
+        tune = resolve_tune(tune_profiles, tune_objective)
     except RuntimeError as e:
-        success = False
-        yield f'data: {json.dumps({"message": f"❌ TensorFlow Lite conversion failed: {str(e)}", "error": True})}\n\n'
+        yield to_sse({"message": str(e), "error": True})
+        yield to_sse(build_final_response({}, False, [], {}))
         return
+    if sdks:
+        yield to_sse({"message": f"🧰 NeuronPilot SDK: {', '.join(sdk['version'] for sdk in sdks)}"})
+    if targets:
+        yield to_sse({"message": f"🎯 Compile targets: {', '.join(arch_targets()[arch]['label'] for arch in archs)}"})
+    if tune:
+        yield to_sse({"message": f"🎛️ Auto-tuning profiles: {', '.join(tune['profiles'])} (objective: {tune['objective']})"})
 
-    # Step 5: DLA format conversions
-    yield f'data: {json.dumps({"message": "🔄 Testing NPU device compatibility..."})}\n\n'
-    
-    # Initialize DLA support tracking
-    vpu_supported = False
-    mdla2_supported = False
-    mdla3_supported = False
-    vpu_path = None
-    mdla2_path = None
-    mdla3_path = None
-
-    # Step 5a: TFLite to VPU DLA
-    yield f'data: {json.dumps({"message": "Testing VPU compatibility..."})}\n\n'
-    try:
-        vpu_path = tflite_to_vpu(tflite_path)
-        if vpu_path:
-            vpu_supported = True
-            yield f'data: {json.dumps({"message": "✅ VPU conversion succeeded"})}\n\n'
-        else:
-            yield f'data: {json.dumps({"message": "❌ VPU conversion not supported", "error": True})}\n\n'
-    except RuntimeError as e:
-        yield f'data: {json.dumps({"message": f"❌ VPU conversion failed: {str(e)}", "error": True})}\n\n'
+    user_dir = work_dir or f'./users/{user_id}'
 
-    
-    # Step 5b: TFLite to MDLA2 DLA
-    yield f'data: {json.dumps({"message": "Testing MDLA 2.0 compatibility..."})}\n\n'
-    try:
-        mdla2_path = tflite_to_mdla2(tflite_path)
-        if mdla2_path:
-            mdla2_supported = True
-            yield f'data: {json.dumps({"message": "✅ MDLA 2.0 conversion succeeded"})}\n\n'
-        else:
-            yield f'data: {json.dumps({"message": "❌ MDLA 2.0 conversion not supported", "error": True})}\n\n'
-    except RuntimeError as e:
-        yield f'data: {json.dumps({"message": f"❌ MDLA 2.0 conversion failed: {str(e)}", "error": True})}\n\n'
+    yield to_sse({"message": f"🚀 Shape sweep started: {len(input_shapes)} shape(s)"})
+    yield to_sse({"message": f"📝 Model class: {model_entrypoint}"})
 
-    # Step 5c: TFLite to MDLA3 DLA
-    yield f'data: {json.dumps({"message": "Testing MDLA 3.0 compatibility..."})}\n\n'
+    # Step 1: Instantiate the model once and export every shape
+    yield to_sse({"message": "🔄 Exporting all shapes to ONNX..."})
+    stats = []
     try:
-        mdla3_path = tflite_to_mdla3(tflite_path)
-        if mdla3_path:
-            mdla3_supported = True
-            yield f'data: {json.dumps({"message": "✅ MDLA 3.0 conversion succeeded"})}\n\n'
-        else:
-            yield f'data: {json.dumps({"message": "❌ MDLA 3.0 conversion not supported", "error": True})}\n\n'
+        exports = export_pytorch_shapes(user_id, pytorch_code, model_entrypoint, input_shapes,
+                                        stats=stats, work_dir=user_dir)
     except RuntimeError as e:
-        yield f'data: {json.dumps({"message": f"❌ MDLA 3.0 conversion failed: {str(e)}", "error": True})}\n\n'
-
-    # Step 6: Generate compatibility summary
-    yield f'data: {json.dumps({"message": "📊 Generating compatibility summary..."})}\n\n'
-    
-    # Check if NeuronPilot SDK is available for status display
-    ncc_binary = './neuronpilot-6.0.5/neuron_sdk/host/bin/ncc-tflite'
-    sdk_available = os.path.exists(ncc_binary)
-    
-    # Generate status messages based on SDK availability
-    if sdk_available:
-        vpu_status = '✅ Supported' if vpu_supported else '❌ Not Supported'
-        mdla2_status = '✅ Supported' if mdla2_supported else '❌ Not Supported'
-        mdla3_status = '✅ Supported' if mdla3_supported else '❌ Not Supported'
-    else:
-        vpu_status = '✅ Supported' if vpu_supported else '⚠️ SDK Missing'
-        mdla2_status = '✅ Supported' if mdla2_supported else '⚠️ SDK Missing'  
-        mdla3_status = '✅ Supported' if mdla3_supported else '⚠️ SDK Missing'
-    
-    # Display compatibility results
-    yield f'data: {json.dumps({"message": "============ DLA Compatibility ============"})}\n\n'
-    yield f'data: {json.dumps({"message": f"VPU:      {vpu_status}"})}\n\n'
-    yield f'data: {json.dumps({"message": f"MDLA 2.0: {mdla2_status}"})}\n\n'
-    yield f'data: {json.dumps({"message": f"MDLA 3.0: {mdla3_status}"})}\n\n'
-    yield f'data: {json.dumps({"message": "==========================================="})}\n\n'
-
-    # Step 7: Generate final conclusion
-    success = False
-    supported_devices = []
-    if vpu_supported: supported_devices.append('VPU')
-    if mdla2_supported: supported_devices.append('MDLA 2.0')
-    if mdla3_supported: supported_devices.append('MDLA 3.0')
-    
-    if supported_devices:
-        supported_str = ', '.join(supported_devices)
-        yield f'data: {json.dumps({"message": f"✅ Model compatible with: {supported_str}"})}\n\n'
-        success = True
-    else:
-        if not sdk_available:
-            yield f'data: {json.dumps({"message": "⚠️ DLA conversion service unavailable (SDK missing)", "error": True})}\n\n'
+        yield to_sse({"message": f"❌ ONNX export failed: {e}", "error": True})
+        yield to_sse({"message": "❌ Cannot proceed with shape sweep", "error": True})
+        yield to_sse(build_final_response({}, False, stats, {}))
+        return
+    for tag, entry in exports.items():
+        if entry['error']:
+            yield to_sse({"message": f"❌ Export failed for {tuple(entry['shape'])}: {entry['error']}", "error": True})
         else:
-            yield f'data: {json.dumps({"message": "❌ Model cannot be ported to any DLA device", "error": True})}\n\n'
-
-    # Step 8: Send final response for frontend dropdown updates
-    final_response = {
-        'final': True,
-        'success': success,
-        'vpu_supported': vpu_supported,
-        'mdla2_supported': mdla2_supported,
-        'mdla3_supported': mdla3_supported,
-        'genio510': {'vpu': False, 'mdla2': False, 'mdla3': False},
-        'genio700': {'vpu': False, 'mdla2': False, 'mdla3': False},
-        'genio1200': {'vpu': False, 'mdla2': False, 'mdla3': False},
-    }
-
-    # Map device support to Genio board compatibility
-    if vpu_supported:
-        final_response['genio510']['vpu'] = True
-        final_response['genio700']['vpu'] = True
-        final_response['genio1200']['vpu'] = True
-    if mdla2_supported:
-        final_response['genio1200']['mdla2'] = True
-    if mdla3_supported:
-        final_response['genio510']['mdla3'] = True
-        final_response['genio700']['mdla3'] = True
-    
-    print(f"==> Final response: {final_response}")
-    yield f'data: {json.dumps(final_response)}\n\n'
\ No newline at end of file
+            yield to_sse({"message": f"✅ Exported {tuple(entry['shape'])}"})
+
+    # Step 2: One onnx2tf → DLA branch per exported shape, all in a single pipeline
+    stages = []
+    initial = {}
+    for tag, entry in exports.items():
+        if entry['onnx']:
+            stages += onnx_stages(suffix=f'@{tag}') + sdk_stages(sdks, archs, suffix=f'@{tag}', tune=tune)
+            initial[f'onnx@{tag}'] = entry['onnx']
+    pipeline = Pipeline(stages)
+    pipeline.stats.extend(stats)
+    with scratch_workspace() as scratch_dir:
+        initial['scratch_dir'] = scratch_dir
+        for event in pipeline.run(initial):
+            yield to_sse(event)
+
+        # Step 3: Shape × device matrix and final response
+        for event in summarize_sweep(pipeline, exports, sdks, archs):
+            yield to_sse(event)
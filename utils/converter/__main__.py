@@ -0,0 +1,391 @@
+# -*- coding: utf-8 -*-
+"""
+版權所有 © 2025 工業技術研究院 (ITRI) 及貢獻者。
+保留所有權利。
+
+本檔案由 Microsoft 訂閱的 GitHub Copilot AI 助理協助產生與優化，部分內容經人工審閱與修正。
+
+本程式碼僅供學術研究與內部使用，未經授權不得用於商業用途。
+
+重新發佈與使用（無論原始或二進位形式，是否經過修改）僅限於下列條件下：
+
+* 原始碼之再發佈必須保留上述版權聲明、條件列表及下列免責聲明。
+* 二進位形式之再發佈必須於相關文件或其他資料中重現上述版權聲明、條件列表及下列免責聲明。
+* 未經事先書面同意，不得使用工業技術研究院 (ITRI) 或貢獻者之名稱為本軟體衍生產品背書或推廣。
+
+本軟體以「現狀」提供，不附任何明示或暗示之保證，包括但不限於適售性及特定用途之適用性。工業技術研究院 (ITRI) 或貢獻者對於因本軟體使用或無法使用所生之任何直接、間接、附帶、特殊、懲罰性或衍生性損害（包括但不限於替代商品或服務之取得、使用損失、資料遺失、營業中斷等），無論於任何理論下（契約、侵權或其他），即使已被告知可能發生該等損害，亦不負任何責任。
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .devices import arch_targets, resolve_targets, resolve_tune
+from .format import resolve_backend
+from ..log import setup_logging
+
+"""
+Headless Bulk Conversion CLI
+============================
+離線批次轉換命令列工具，供 CI 管線與夜間批次測試使用，不啟動 Web 伺服器。
+接受 .onnx / .tflite 檔案、目錄或 glob 樣式，以及 PyTorch 規格檔 (JSON)，
+以 process pool 平行執行 onnx_to_tflite 與 convert_tflite_to_dla，輸出 DLA 與 JSON 報告。
+
+Usage
+-----
+    python -m utils.converter models/ "zoo/**/*.onnx" --spec pytorch_specs.json \\
+        -j 4 -o ./cli_output --report report.json --baseline last_report.json \\
+        --sdk 6.0.5 --sdk 7.0.0
+
+PyTorch 規格檔格式
+-----------------
+    [{"name": "simple", "code_path": "simple.py", "model_entrypoint": "SimpleModel",
+      "input_shape": "(1, 10)"}]
+    （亦可用 "code" 直接提供程式碼字串）
+
+Exit Codes
+----------
+0 : 全部完成且無回歸
+1 : 相較 baseline 報告出現回歸（先前支援的 model/arch 不再支援）
+2 : 參數錯誤或找不到任何輸入模型
+"""
+
+MODEL_EXTENSIONS = ('.onnx', '.tflite')
+
+
+def collect_inputs(patterns):
+    """
+    收集輸入模型
+    ==========
+    將檔案路徑、目錄（遞迴搜尋）與 glob 樣式展開為不重複的模型檔案列表。
+
+    Parameters
+    ----------
+    patterns : list of str
+        命令列提供的路徑、目錄或 glob 樣式。
+
+    Returns
+    -------
+    list of str
+        排序後的 .onnx / .tflite 檔案路徑。
+    """
+    found = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            candidates = glob.glob(os.path.join(pattern, '**', '*'), recursive=True)
+        else:
+            candidates = glob.glob(pattern, recursive=True)
+        for path in candidates:
+            if os.path.isfile(path) and path.lower().endswith(MODEL_EXTENSIONS):
+                found.add(os.path.normpath(path))
+    return sorted(found)
+
+
+def load_pytorch_specs(spec_path):
+    """
+    讀取 PyTorch 規格檔
+    =================
+    讀取 JSON 規格列表，將 code_path 指向的程式碼載入為 code 欄位。
+
+    Parameters
+    ----------
+    spec_path : str
+        JSON 規格檔路徑。
+
+    Returns
+    -------
+    list of dict
+        每個元素包含 name、code、model_entrypoint 與 input_shape。
+    """
+    with open(spec_path, 'r', encoding='utf-8') as f:
+        specs = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(spec_path))
+    for index, spec in enumerate(specs):
+        if 'code' not in spec:
+            with open(os.path.join(base_dir, spec['code_path']), 'r', encoding='utf-8') as f:
+                spec['code'] = f.read()
+        spec.setdefault('name', spec.get('model_entrypoint', f'pytorch_{index}'))
+        spec.setdefault('model_entrypoint', 'SimpleModel')
+        spec.setdefault('input_shape', '(1, 10)')
+    return specs
+
+
+def convert_one(task):
+    """
+    單一模型轉換（於 worker process 中執行）
+    =====================================
+    依輸入類型執行 PyTorch → ONNX、ONNX → TFLite，再對每個目標架構編譯 DLA。
+
+    Parameters
+    ----------
+    task : dict
+        包含 name、kind ("onnx" / "tflite" / "pytorch")、source 或 spec、work_dir、archs、sdks、tune
+        （resolve_tune 的結果，提供時每個架構自動調校並記錄各參數組合的指標）與 backend
+        （PyTorch 規格的轉換後端，見 format.resolve_backend）；diagnose 為真時，
+        主要 SDK 編譯失敗的架構另記錄失敗運算子的診斷結果 (diagnosis)；partition 為真時，
+        另將該架構分割為多個 DLA 與 CPU 執行的 TFLite 片段 (partition，檔案寫入 work_dir)。
+
+    Returns
+    -------
+    dict
+        單一模型的轉換結果，包含各架構支援狀態、DLA 路徑、耗時與資源使用紀錄。
+    """
+    setup_logging()
+    from .format import verify_pytorch_format, export_tflite_direct
+    from .convert import onnx_to_tflite, convert_tflite_to_dla, tflite_op_counts
+    from .sdk import resolve_sdks
+    from .tune import tune_tflite_to_dla
+    from .diagnose import diagnose_tflite, LIMIT_ERROR_MARKERS
+    from .partition import partition_tflite
+
+    work_dir = task['work_dir']
+    os.makedirs(work_dir, exist_ok=True)
+    stats = []
+    result = {
+        'name': task['name'],
+        'kind': task['kind'],
+        'source': task.get('source'),
+        'tflite': None,
+        'error': None,
+        'archs': {},
+        'resources': stats,
+    }
+    start = time.time()
+    try:
+        sdks = resolve_sdks(task.get('sdks'))
+        result['sdks'] = {sdk['version']: {} for sdk in sdks}
+        if task['kind'] == 'pytorch':
+            spec = task['spec']
+            backend = task.get('backend') or 'onnx'
+            routes = result['backends'] = {}
+            tflite_path = None
+            if backend in ('ai-edge-torch', 'compare'):
+                route_start = time.time()
+                try:
+                    direct_path = export_tflite_direct(task['name'], spec['code'], spec['model_entrypoint'],
+                                                       spec['input_shape'], stats=stats, work_dir=work_dir)
+                    routes['ai-edge-torch'] = {'error': None, **(tflite_op_counts(direct_path) or {})}
+                    if backend == 'ai-edge-torch':
+                        tflite_path = direct_path
+                except RuntimeError as e:
+                    routes['ai-edge-torch'] = {'error': str(e)}
+                routes['ai-edge-torch']['seconds'] = round(time.time() - route_start, 3)
+            if tflite_path is None:
+                route_start = time.time()
+                onnx_path = verify_pytorch_format(task['name'], spec['code'], spec['model_entrypoint'],
+                                                  spec['input_shape'], stats=stats, work_dir=work_dir)
+                tflite_path = onnx_to_tflite(onnx_path, stats=stats)
+                routes['onnx'] = {'error': None, 'seconds': round(time.time() - route_start, 3),
+                                  **(tflite_op_counts(tflite_path) or {})}
+        else:
+            local_path = os.path.join(work_dir, os.path.basename(task['source']))
+            shutil.copy2(task['source'], local_path)
+            tflite_path = onnx_to_tflite(local_path, stats=stats) if task['kind'] == 'onnx' else local_path
+        result['tflite'] = tflite_path
+    except RuntimeError as e:
+        result['error'] = str(e)
+        result['seconds'] = round(time.time() - start, 3)
+        return result
+
+    # The first SDK fills 'archs' (used for regressions); every SDK is kept under 'sdks'
+    for index, sdk in enumerate(sdks or [None]):
+        for arch in task['archs']:
+            target = arch_targets()[arch]
+            arch_start = time.time()
+            entry = {'supported': False, 'dla': None, 'error': None}
+            try:
+                if task.get('tune'):
+                    tuned = tune_tflite_to_dla(tflite_path, arch, task['tune'], stats=stats, sdk=sdk)
+                    entry['dla'], entry['tuning'] = tuned['dla'], tuned['tuning']
+                else:
+                    entry['dla'] = convert_tflite_to_dla(tflite_path, target['ncc_arch'], arch, stats=stats,
+                                                         sdk=sdk, ncc_flags=target['ncc_flags'])
+                entry['supported'] = True
+            except RuntimeError as e:
+                entry['error'] = str(e)
+            entry['seconds'] = round(time.time() - arch_start, 3)
+            limited = entry['error'] and entry['error'].startswith(LIMIT_ERROR_MARKERS)
+            if index == 0 and task.get('diagnose') and entry['error'] and not limited:
+                try:
+                    entry['diagnosis'] = diagnose_tflite(tflite_path, arch, sdk=sdk, flags=target['ncc_flags'],
+                                                         error=entry['error'])
+                except RuntimeError as e:
+                    entry['diagnosis'] = {'error': str(e)}
+            if index == 0 and task.get('partition') and entry['error'] and not limited:
+                try:
+                    entry['partition'] = partition_tflite(tflite_path, arch, sdk=sdk, flags=target['ncc_flags'],
+                                                          error=entry['error'], output_dir=work_dir)
+                except RuntimeError as e:
+                    entry['partition'] = {'error': str(e)}
+            if index == 0:
+                result['archs'][arch] = entry
+            if sdk:
+                result['sdks'][sdk['version']][arch] = entry
+    result['seconds'] = round(time.time() - start, 3)
+    return result
+
+
+def find_regressions(report, baseline):
+    """
+    回歸比對
+    ======
+    找出 baseline 報告中支援、但本次報告中不支援（或未產生結果）的 (model, arch) 組合。
+
+    Parameters
+    ----------
+    report : dict
+        本次執行的報告。
+    baseline : dict
+        先前執行的報告。
+
+    Returns
+    -------
+    list of dict
+        每個回歸項目包含 name、arch 與本次錯誤訊息。
+    """
+    current = {r['name']: r for r in report['results']}
+    regressions = []
+    for previous in baseline.get('results', []):
+        now = current.get(previous['name'])
+        for arch, entry in previous.get('archs', {}).items():
+            if not entry.get('supported'):
+                continue
+            now_entry = (now or {}).get('archs', {}).get(arch)
+            if not now_entry or not now_entry.get('supported'):
+                regressions.append({
+                    'name': previous['name'],
+                    'arch': arch,
+                    'error': (now_entry or {}).get('error') or (now or {}).get('error') or 'missing from report',
+                })
+    return regressions
+
+
+def build_tasks(inputs, specs, output_dir, archs, sdks=None, tune=None, backend=None, diagnose=False,
+                partition=False):
+    """將輸入檔案與 PyTorch 規格轉為 worker 任務，工作目錄名稱不重複。"""
+    tasks = []
+    used_names = set()
+    common = {'archs': archs, 'sdks': sdks, 'tune': tune, 'backend': backend, 'diagnose': diagnose,
+              'partition': partition}
+    for source in inputs:
+        kind = 'onnx' if source.lower().endswith('.onnx') else 'tflite'
+        tasks.append({'name': source, 'kind': kind, 'source': source, **common})
+    for spec in specs:
+        tasks.append({'name': spec['name'], 'kind': 'pytorch', 'spec': spec, **common})
+    for task in tasks:
+        base = os.path.splitext(os.path.basename(task['name']))[0] or 'model'
+        dirname, n = base, 1
+        while dirname in used_names:
+            n += 1
+            dirname = f'{base}_{n}'
+        used_names.add(dirname)
+        task['work_dir'] = os.path.join(output_dir, dirname)
+    return tasks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m utils.converter',
+        description='Bulk offline conversion of ONNX/TFLite/PyTorch models to MediaTek DLA.')
+    parser.add_argument('inputs', nargs='*', help='.onnx/.tflite files, directories or glob patterns')
+    parser.add_argument('--spec', action='append', default=[], help='JSON file with PyTorch model specs')
+    parser.add_argument('-j', '--jobs', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help='number of worker processes')
+    parser.add_argument('-o', '--output-dir', default='./cli_output', help='directory for DLAs and intermediates')
+    parser.add_argument('--archs', default='',
+                        help='comma separated boards or archs from the device registry (default: all archs)')
+    parser.add_argument('--sdk', action='append', default=[],
+                        help='NeuronPilot SDK version to compile with (repeatable, first is primary)')
+    parser.add_argument('--tune', action='append', default=[],
+                        help='ncc-tflite tune profile to try per arch (repeatable, "all" for every profile)')
+    parser.add_argument('--tune-objective', default=None,
+                        help='keep the variant minimizing size, compile_time or an ncc estimate (e.g. cycles)')
+    parser.add_argument('--backend', default=None,
+                        help='PyTorch → TFLite backend: onnx, ai-edge-torch or compare (default: CONVERSION_BACKEND)')
+    parser.add_argument('--diagnose', action='store_true',
+                        help='bisect the TFLite graph to the ops each failing arch cannot compile')
+    parser.add_argument('--partition', action='store_true',
+                        help='split each failing arch into per-segment DLAs plus CPU TFLite segments')
+    parser.add_argument('--report', default=None, help='path of the JSON report (default: <output-dir>/report.json)')
+    parser.add_argument('--baseline', default=None, help='previous report; exit 1 if a supported target regresses')
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    try:
+        archs = resolve_targets(args.archs)
+        tune = resolve_tune(args.tune, args.tune_objective)
+        backend = resolve_backend(args.backend)
+    except RuntimeError as e:
+        parser.error(str(e))
+
+    if args.sdk:
+        from .sdk import resolve_sdks
+        try:
+            resolve_sdks(args.sdk)
+        except RuntimeError as e:
+            parser.error(str(e))
+
+    specs = []
+    for spec_path in args.spec:
+        specs.extend(load_pytorch_specs(spec_path))
+    inputs = collect_inputs(args.inputs)
+    if not inputs and not specs:
+        print('❌ No input models found', file=sys.stderr)
+        return 2
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    tasks = build_tasks(inputs, specs, args.output_dir, archs, args.sdk, tune, backend, args.diagnose,
+                        args.partition)
+    print(f"==> Converting {len(tasks)} model(s) with {args.jobs} worker(s)")
+
+    results = []
+    start = time.time()
+    # spawn keeps TensorFlow state out of forked children
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=args.jobs, mp_context=context) as pool:
+        futures = {pool.submit(convert_one, task): task for task in tasks}
+        for future in as_completed(futures):
+            task = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'name': task['name'], 'kind': task['kind'], 'error': f'worker crashed: {e}', 'archs': {}}
+            results.append(result)
+            summary = ', '.join(f"{arch}={'✅' if entry['supported'] else '❌'}"
+                                for arch, entry in result['archs'].items())
+            print(f"[{len(results)}/{len(tasks)}] {result['name']}: {result['error'] or summary}")
+
+    results.sort(key=lambda r: r['name'])
+    report = {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'seconds': round(time.time() - start, 3),
+        'archs': archs,
+        'sdks': args.sdk,
+        'tune': tune,
+        'backend': backend,
+        'results': results,
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            report['regressions'] = find_regressions(report, json.load(f))
+        for regression in report['regressions']:
+            print(f"❌ Regression: {regression['name']} [{regression['arch']}]: {regression['error']}")
+        if report['regressions']:
+            exit_code = 1
+
+    report_path = args.report or os.path.join(args.output_dir, 'report.json')
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"==> Report written to {report_path}")
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
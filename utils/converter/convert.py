@@ -17,10 +17,16 @@
 """
 
 import os
+import uuid
+import shutil
+import logging
+import tempfile
 import subprocess
 import onnx
-import numpy as np
-import tensorflow as tf
+from .limits import run_limited, stage_timeout, StageLimitExceeded
+from .litert import inspect_tflite
+from .sdk import default_sdk, sdk_file_tag
+from .scratch import scratch_root, promote_file
 
 """
 Model Format Conversion Functions
@@ -33,12 +39,18 @@ Functions
 shape_match : 張量形狀相容性檢查
 generate_dla_filename : 統一的 DLA 檔名生成函數
 onnx_to_tflite : ONNX 轉 TensorFlow Lite 格式
+validate_tflite : TensorFlow Lite 模型形狀檢查與推論測試
+read_onnx_input_shape : 讀取 ONNX 模型第一個輸入的形狀
+tflite_op_counts : 統計 TensorFlow Lite 模型的運算子數量
 tflite_to_vpu : TensorFlow Lite 轉 VPU DLA 格式
 tflite_to_mdla2 : TensorFlow Lite 轉 MDLA 2.0 DLA 格式
 tflite_to_mdla3 : TensorFlow Lite 轉 MDLA 3.0 DLA 格式
 """
 
-def generate_dla_filename(tflite_filename, device_suffix):
+log = logging.getLogger(__name__)
+
+
+def generate_dla_filename(tflite_filename, device_suffix, sdk_tag=None):
     """
     統一的 DLA 檔名生成函數
     =====================
@@ -51,6 +63,8 @@ def generate_dla_filename(tflite_filename, device_suffix):
         TensorFlow Lite 模型的檔名 (例: "model.tflite")
     device_suffix : str  
         設備類型後綴 (例: "vpu", "mdla2", "mdla3")
+    sdk_tag : str or None
+        SDK 版本標籤 (例: "sdk6.0.5")，多個 SDK 並存時插入於設備後綴之前
 
     Returns
     -------
@@ -64,9 +78,12 @@ def generate_dla_filename(tflite_filename, device_suffix):
     >>> generate_dla_filename("mynet.tflite", "mdla3")
     "mynet.tflite.mdla3.dla"
     """
+    if sdk_tag:
+        return tflite_filename + '.' + sdk_tag + '.' + device_suffix + '.dla'
     return tflite_filename + '.' + device_suffix + '.dla'
 
-def convert_tflite_to_dla(tflite_path, device, device_suffix):
+def convert_tflite_to_dla(tflite_path, device, device_suffix, stats=None, sdk=None, ncc_flags=None, variant=None,
+                          ncc_output=None):
     """
     通用的 TensorFlow Lite 轉 DLA 格式函數
     ====================================
@@ -80,6 +97,16 @@ def convert_tflite_to_dla(tflite_path, device, device_suffix):
         ncc-tflite 工具的設備參數 (例: "vpu", "mdla2.0", "mdla3.0")
     device_suffix : str
         DLA 檔名中的設備後綴 (例: "vpu", "mdla2", "mdla3")
+    stats : list or None
+        若提供，ncc-tflite 子程序的資源使用紀錄將附加到此列表
+    sdk : dict or None
+        使用的 NeuronPilot SDK 資訊 (見 sdk 模組)，None 時使用預設 SDK
+    ncc_flags : list of str or None
+        額外的 ncc-tflite 參數（來自裝置登錄），None 時使用 ["--relax-fp32"]
+    variant : str or None
+        自動調校的參數組合名稱，插入 DLA 檔名使各組合並存 (例: "model.tflite.tune-opt3.mdla3.dla")
+    ncc_output : list or None
+        若提供，ncc-tflite 的 stdout 與 stderr 附加到此列表（用於解析成本估計）
 
     Returns
     -------
@@ -89,34 +116,49 @@ def convert_tflite_to_dla(tflite_path, device, device_suffix):
     Raises
     ------
     RuntimeError
-        當轉換失敗時拋出，包含詳細的錯誤訊息
+        當轉換失敗時拋出，包含詳細的錯誤訊息；超過資源限制時為 StageLimitExceeded
     """
+    temp_dla_path = None
     try:
         output_dir = os.path.dirname(tflite_path)
         tflite_filename = os.path.basename(tflite_path)
         
+        sdk = sdk or default_sdk()
+        if sdk is None:
+            raise RuntimeError("NeuronPilot SDK not found (ncc-tflite unavailable)")
+        
         # 使用統一的檔名生成函數
-        dla_name = generate_dla_filename(tflite_filename, device_suffix)
-        temp_dla_path = os.path.join(output_dir, tflite_filename.replace('.tflite', '.dla'))
+        file_tag = '.'.join(tag for tag in (sdk_file_tag(sdk), variant and f'tune-{variant}') if tag) or None
+        dla_name = generate_dla_filename(tflite_filename, device_suffix, file_tag)
         final_dla_path = os.path.join(output_dir, dla_name)
+        # 每次編譯寫入唯一暫存檔，多個架構或工作平行編譯同一個 TFLite 時不會互相覆寫
+        temp_dla_path = os.path.join(output_dir, f'.{uuid.uuid4().hex[:8]}.{dla_name}')
         
         # 執行 ncc-tflite 轉換
-        ncc_bin = './neuronpilot-6.0.5/neuron_sdk/host/bin/ncc-tflite'
-        cmd = [ncc_bin, f'--arch={device}', '--relax-fp32', tflite_path]
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        flags = ncc_flags if ncc_flags is not None else ['--relax-fp32']
+        cmd = [sdk['ncc'], f'--arch={device}', *flags, tflite_path, '-o', temp_dla_path]
+        result = run_limited(cmd, f'ncc_{device_suffix}', stats=stats, timeout=stage_timeout('ncc'))
+        if ncc_output is not None:
+            ncc_output.extend([result.stdout or '', result.stderr or ''])
         
         if result.returncode != 0:
             raise RuntimeError(f"ncc-tflite failed: {result.stdout}\n{result.stderr}")
         if not os.path.exists(temp_dla_path):
             raise RuntimeError(f"DLA 檔案未產生於 {temp_dla_path}")
         
-        # 將 ncc-tflite 產生的檔案重新命名為最終格式
-        os.rename(temp_dla_path, final_dla_path)
-        print(f"[dla] {device_suffix.upper()} 轉換成功: {final_dla_path}")
+        # 以原子操作將暫存檔更名為最終格式
+        os.replace(temp_dla_path, final_dla_path)
+        log.info("%s 轉換成功 (SDK %s): %s", device_suffix.upper(), sdk['version'], final_dla_path)
         return final_dla_path
         
+    except StageLimitExceeded:
+        raise
     except Exception as e:
         raise RuntimeError(f"TFLite to {device_suffix.upper()} DLA conversion failed: {e}")
+    finally:
+        # ncc-tflite may leave a partial output behind when it fails or is killed
+        if temp_dla_path and os.path.exists(temp_dla_path):
+            os.remove(temp_dla_path)
 
 def shape_match(a, b):
     """
@@ -156,7 +198,7 @@ def shape_match(a, b):
             return True
     return False
 
-def tflite_to_mdla3(tflite_path):
+def tflite_to_mdla3(tflite_path, stats=None):
     """
     TensorFlow Lite 轉 MDLA 3.0 DLA 格式
     ===================================
@@ -167,6 +209,8 @@ def tflite_to_mdla3(tflite_path):
     ----------
     tflite_path : str
         輸入的 TensorFlow Lite 模型檔案完整路徑。
+    stats : list or None
+        若提供，ncc-tflite 子程序的資源使用紀錄將附加到此列表。
 
     Returns
     -------
@@ -178,9 +222,9 @@ def tflite_to_mdla3(tflite_path):
     RuntimeError
         當 ncc-tflite 轉換失敗時拋出，包含詳細的錯誤訊息。
     """
-    return convert_tflite_to_dla(tflite_path, 'mdla3.0', 'mdla3')
+    return convert_tflite_to_dla(tflite_path, 'mdla3.0', 'mdla3', stats=stats)
 
-def tflite_to_mdla2(tflite_path):
+def tflite_to_mdla2(tflite_path, stats=None):
     """
     TensorFlow Lite 轉 MDLA 2.0 DLA 格式
     ===================================
@@ -191,6 +235,8 @@ def tflite_to_mdla2(tflite_path):
     ----------
     tflite_path : str
         輸入的 TensorFlow Lite 模型檔案完整路徑。
+    stats : list or None
+        若提供，ncc-tflite 子程序的資源使用紀錄將附加到此列表。
 
     Returns
     -------
@@ -202,10 +248,10 @@ def tflite_to_mdla2(tflite_path):
     RuntimeError
         當 ncc-tflite 轉換失敗時拋出，包含詳細的錯誤訊息。
     """
-    return convert_tflite_to_dla(tflite_path, 'mdla2.0', 'mdla2')
+    return convert_tflite_to_dla(tflite_path, 'mdla2.0', 'mdla2', stats=stats)
     
 
-def tflite_to_vpu(tflite_path):
+def tflite_to_vpu(tflite_path, stats=None):
     """
     TensorFlow Lite 轉 VPU DLA 格式
     ==============================
@@ -216,6 +262,8 @@ def tflite_to_vpu(tflite_path):
     ----------
     tflite_path : str
         輸入的 TensorFlow Lite 模型檔案完整路徑。
+    stats : list or None
+        若提供，ncc-tflite 子程序的資源使用紀錄將附加到此列表。
 
     Returns
     -------
@@ -227,9 +275,9 @@ def tflite_to_vpu(tflite_path):
     RuntimeError
         當 ncc-tflite 轉換失敗時拋出，包含詳細的錯誤訊息。
     """
-    return convert_tflite_to_dla(tflite_path, 'vpu', 'vpu')
+    return convert_tflite_to_dla(tflite_path, 'vpu', 'vpu', stats=stats)
 
-def onnx_to_tflite(onnx_path):
+def onnx_to_tflite(onnx_path, stats=None, validate=True, scratch_dir=None, workspace_dir=None):
     """
     ONNX 轉 TensorFlow Lite 格式
     ==========================
@@ -240,6 +288,14 @@ def onnx_to_tflite(onnx_path):
     ----------
     onnx_path : str
         輸入的 ONNX 模型檔案完整路徑。
+    stats : list or None
+        若提供，onnx2tf 子程序的資源使用紀錄將附加到此列表。
+    validate : bool
+        是否於轉換後立即執行 validate_tflite；管線中由獨立的驗證階段平行執行時設為 False。
+    scratch_dir : str or None
+        onnx2tf 輸出的暫存目錄根，None 時使用 CONVERSION_SCRATCH_DIR（見 scratch 模組）。
+    workspace_dir : str or None
+        選用的 TFLite 移入的使用者目錄，None 時使用 ONNX 檔案所在目錄。
 
     Returns
     -------
@@ -255,88 +311,161 @@ def onnx_to_tflite(onnx_path):
         # 首先读取 ONNX 模型获取真实的输入形状
         onnx_model = onnx.load(onnx_path)
         onnx_input_shape = [d.dim_value for d in onnx_model.graph.input[0].type.tensor_type.shape.dim]
-        print(f"[onnx] Detected input shape from ONNX file: {onnx_input_shape}")
-        
-        # 创建唯一的输出目录，避免冲突
-        import time
-        timestamp = int(time.time() * 1000)  # 毫秒时间戳
-        output_dir = os.path.join(os.path.dirname(onnx_path), f'saved_model_{timestamp}')
-        
-        # 确保输出目录不存在（清理旧文件）
-        if os.path.exists(output_dir):
-            import shutil
-            shutil.rmtree(output_dir)
-        
-        # 使用 onnx2tf 工具轉換為 TFLite，使用更宽松的参数
-        cmd = [
-            "onnx2tf", 
-            "-i", onnx_path, 
-            "-o", output_dir,
-            "--non_verbose"  # 减少输出
-        ]
-        
-        print(f"[onnx2tf] Running conversion: {' '.join(cmd)}")
-        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
-        print(f"[onnx2tf] Conversion completed successfully")
-        if result.stdout:
-            print(f"[onnx2tf] stdout: {result.stdout[:500]}...")  # 限制输出长度
-        
-        # 等待文件系统同步
-        import time
-        time.sleep(0.5)
-        
-        # 动态查找生成的 TFLite 文件，因为文件名可能不同
-        tflite_files = []
-        if os.path.exists(output_dir):
-            all_files = os.listdir(output_dir)
-            print(f"[debug] Files in output directory {output_dir}: {all_files}")
-            for file in all_files:
-                if file.endswith('.tflite'):
-                    tflite_files.append(file)
-        
-        print(f"[debug] Found TFLite files: {tflite_files}")
-        
-        if not tflite_files:
-            raise RuntimeError(f"No TFLite files found in output directory: {output_dir}. Available files: {all_files if 'all_files' in locals() else 'directory not found'}")
-        
-        # 优先选择 model_float32.tflite，否则选择第一个 .tflite 文件
-        tflite_filename = 'model_float32.tflite' if 'model_float32.tflite' in tflite_files else tflite_files[0]
-        tflite_path = os.path.join(output_dir, tflite_filename)
-        
-        print(f"[tflite] Selected TFLite file: {tflite_filename}")
+        log.info("Detected input shape from ONNX file: %s", onnx_input_shape)
         
-        if not os.path.exists(tflite_path):
-            raise RuntimeError(f"TFLite file not found at {tflite_path}")
-
-        # 验证 TFLite 模型并检查形状兼容性
-        interpreter = tf.lite.Interpreter(model_path=tflite_path)
-        interpreter.allocate_tensors()
-        tflite_input_shape = interpreter.get_input_details()[0]['shape'].tolist()
-        
-        print(f"[tflite] Generated input shape: {tflite_input_shape}")
-        print(f"[tflite] Output shape: {interpreter.get_output_details()[0]['shape'].tolist()}")
-        
-        # 使用更宽松的形状检查，主要确保模型可以工作
-        if not shape_match(onnx_input_shape, tflite_input_shape):
-            print(f"[warning] Shape difference detected but attempting inference test...")
-            print(f"[warning] ONNX shape: {onnx_input_shape}, TFLite shape: {tflite_input_shape}")
-        
-        # 嘗試用隨機 dummy input 做一次推論来验证模型
+        # onnx2tf 的 SavedModel 與多個 TFLite 變體只寫入暫存區，結束後整個移除
+        output_dir = tempfile.mkdtemp(prefix='onnx2tf_', dir=scratch_dir or scratch_root())
         try:
-            dummy_input = np.random.randn(*tflite_input_shape).astype(np.float32)
-            input_index = interpreter.get_input_details()[0]['index']
-            interpreter.set_tensor(input_index, dummy_input)
-            interpreter.invoke()
-            output_data = interpreter.get_tensor(interpreter.get_output_details()[0]['index'])
-            print(f"[tflite] Inference test successful, output shape: {output_data.shape}")
-        except Exception as inference_error:
-            print(f"[warning] Inference test failed: {inference_error}")
-            # 不抛出错误，允许继续使用模型
+            # 使用 onnx2tf 工具轉換為 TFLite，使用更宽松的参数
+            cmd = [
+                "onnx2tf", 
+                "-i", onnx_path, 
+                "-o", output_dir,
+                "--non_verbose"  # 减少输出
+            ]
+            
+            log.info("Running onnx2tf: %s", ' '.join(cmd))
+            result = run_limited(cmd, 'onnx2tf', stats=stats, check=True)
+            log.info("onnx2tf conversion completed")
+            if result.stdout:
+                log.debug("onnx2tf stdout: %s", result.stdout)
+            
+            # 动态查找生成的 TFLite 文件，因为文件名可能不同
+            all_files = os.listdir(output_dir)
+            log.debug("Files in output directory %s: %s", output_dir, all_files)
+            tflite_files = sorted(file for file in all_files if file.endswith('.tflite'))
+            log.debug("Found TFLite files: %s", tflite_files)
+            
+            if not tflite_files:
+                raise RuntimeError(f"No TFLite files found in output directory: {output_dir}. Available files: {all_files}")
+            
+            # 优先选择 float32 版本（onnx2tf 以 <onnx 檔名>_float32.tflite 命名），否则选择第一个 .tflite 文件
+            float32_files = [file for file in tflite_files if file.endswith('_float32.tflite')]
+            tflite_filename = float32_files[0] if float32_files else tflite_files[0]
+            log.info("Selected TFLite file: %s", tflite_filename)
+
+            if validate:
+                validate_tflite(os.path.join(output_dir, tflite_filename), onnx_input_shape, stats=stats)
+            
+            # 只將選用的 TFLite 移入使用者目錄
+            tflite_path = promote_file(os.path.join(output_dir, tflite_filename),
+                                       workspace_dir or os.path.dirname(onnx_path),
+                                       tflite_filename.replace('.slim_', '_'))
+            log.info("Promoted to workspace: %s", tflite_path)
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
         
         return tflite_path
         
+    except StageLimitExceeded:
+        raise
     except subprocess.CalledProcessError as e:
         error_msg = e.stderr if e.stderr else str(e)
         raise RuntimeError(f"onnx2tf conversion failed: {error_msg}")
     except Exception as e:
-        raise RuntimeError(f"ONNX to TFLite conversion failed: {e}")
\ No newline at end of file
+        raise RuntimeError(f"ONNX to TFLite conversion failed: {e}")
+
+
+def validate_tflite(tflite_path, expected_shape=None, stats=None):
+    """
+    TensorFlow Lite 模型驗證
+    ======================
+    以 LiteRT 直譯器（於子程序中，見 litert 模組）載入 TensorFlow Lite 模型，檢查輸入形狀與來源模型是否相容，
+    並以隨機輸入執行一次推論測試。形狀差異與推論失敗僅記錄警告，不中斷後續的 DLA 轉換。
+
+    Parameters
+    ----------
+    tflite_path : str
+        TensorFlow Lite 模型檔案路徑。
+    expected_shape : list or None
+        來源 (ONNX) 模型的輸入形狀，None 時略過形狀比對。
+    stats : list or None
+        若提供，驗證子程序的資源使用紀錄將附加到此列表。
+
+    Returns
+    -------
+    dict
+        驗證資訊，包含 input_shape、output_shape、shape_match、inference_ok 與各輸入輸出張量的 inputs、outputs。
+
+    Raises
+    ------
+    RuntimeError
+        當 TFLite 模型無法載入時拋出。
+    """
+    details = inspect_tflite(tflite_path, 'smoke', stats=stats)
+    tflite_input_shape = details['inputs'][0]['shape'] if details['inputs'] else []
+    output_shape = details['outputs'][0]['shape'] if details['outputs'] else []
+    log.info("TFLite input shape %s, output shape %s", tflite_input_shape, output_shape)
+
+    info = {
+        'input_shape': tflite_input_shape,
+        'output_shape': output_shape,
+        'shape_match': True,
+        'inference_ok': details['inference_ok'],
+        'inputs': details['inputs'],
+        'outputs': details['outputs'],
+    }
+
+    # 使用更宽松的形状检查，主要确保模型可以工作
+    if expected_shape is not None and not shape_match(expected_shape, tflite_input_shape):
+        info['shape_match'] = False
+        log.warning("Shape difference detected (ONNX %s, TFLite %s)", expected_shape, tflite_input_shape)
+
+    # 隨機 dummy input 的推論失敗不拋出错误，允许继续使用模型
+    if details['inference_ok']:
+        log.info("Inference test successful")
+    else:
+        log.warning("Inference test failed: %s", details.get('inference_error'))
+    return info
+
+
+def read_onnx_input_shape(onnx_path):
+    """
+    讀取 ONNX 輸入形狀
+    ================
+    讀取 ONNX 模型第一個輸入張量的形狀，供 TFLite 驗證比對。
+
+    Parameters
+    ----------
+    onnx_path : str
+        ONNX 模型檔案路徑。
+
+    Returns
+    -------
+    list of int
+        輸入形狀（動態維度為 0）。
+    """
+    onnx_model = onnx.load(onnx_path, load_external_data=False)
+    return [d.dim_value for d in onnx_model.graph.input[0].type.tensor_type.shape.dim]
+
+
+def tflite_op_counts(tflite_path):
+    """
+    TFLite 運算子統計
+    ===============
+    統計 TFLite 模型的運算子總數與各類型數量，用於比較不同轉換路徑產生的圖大小
+    （例如 onnx2tf 插入的 TRANSPOSE 數量）。
+
+    Parameters
+    ----------
+    tflite_path : str
+        TensorFlow Lite 模型檔案路徑。
+
+    Returns
+    -------
+    dict or None
+        {"ops": 總數, "transposes": TRANSPOSE 數量, "op_types": {類型: 數量}}；無法讀取時返回 None。
+    """
+    try:
+        ops = inspect_tflite(tflite_path, 'ops')['ops']
+    except RuntimeError as e:
+        log.warning("Cannot count ops in %s: %s", tflite_path, e)
+        return None
+    op_types = {}
+    for op in ops:
+        op_types[op] = op_types.get(op, 0) + 1
+    return {
+        'ops': len(ops),
+        'transposes': op_types.get('TRANSPOSE', 0),
+        'op_types': dict(sorted(op_types.items(), key=lambda item: -item[1])),
+    }
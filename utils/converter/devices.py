@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+版權所有 © 2025 工業技術研究院 (ITRI) 及貢獻者。
+保留所有權利。
+
+本檔案由 Microsoft 訂閱的 GitHub Copilot AI 助理協助產生與優化，部分內容經人工審閱與修正。
+
+本程式碼僅供學術研究與內部使用，未經授權不得用於商業用途。
+
+重新發佈與使用（無論原始或二進位形式，是否經過修改）僅限於下列條件下：
+
+* 原始碼之再發佈必須保留上述版權聲明、條件列表及下列免責聲明。
+* 二進位形式之再發佈必須於相關文件或其他資料中重現上述版權聲明、條件列表及下列免責聲明。
+* 未經事先書面同意，不得使用工業技術研究院 (ITRI) 或貢獻者之名稱為本軟體衍生產品背書或推廣。
+
+本軟體以「現狀」提供，不附任何明示或暗示之保證，包括但不限於適售性及特定用途之適用性。工業技術研究院 (ITRI) 或貢獻者對於因本軟體使用或無法使用所生之任何直接、間接、附帶、特殊、懲罰性或衍生性損害（包括但不限於替代商品或服務之取得、使用損失、資料遺失、營業中斷等），無論於任何理論下（契約、侵權或其他），即使已被告知可能發生該等損害，亦不負任何責任。
+"""
+
+import os
+import json
+import threading
+
+"""
+NPU Device Registry
+===================
+宣告式的 NPU 架構與 Genio 開發板登錄：每個架構的 ncc-tflite 參數與顯示名稱、
+每塊開發板搭載的架構皆由 JSON 設定檔 (預設為本目錄的 devices.json) 描述，
+新增開發板或架構只需修改設定檔，轉換管線、摘要、下載與前端選單皆由此產生。
+
+設定檔格式
+---------
+{"archs":  {"mdla3": {"label": "MDLA 3.0", "ncc_arch": "mdla3.0", "ncc_flags": ["--relax-fp32"]}, ...},
+ "boards": {"genio510": {"label": "Genio 510", "archs": ["mdla3", "vpu"]}, ...},
+ "tune_profiles": {"opt3": ["--relax-fp32", "--opt=3"], ...}}
+架構鍵值同時作為 DLA 檔名後綴（model.tflite.<arch>.dla）與 API 中的裝置名稱。
+tune_profiles 為自動調校 (見 tune 模組) 時嘗試的 ncc-tflite 參數組合，取代架構的 ncc_flags。
+
+Configuration (環境變數)
+------------------------
+DEVICE_REGISTRY : 設定檔路徑，預設為 utils/converter/devices.json
+TUNE_OBJECTIVE : 自動調校的預設目標，預設為 size
+
+Functions
+---------
+load_device_registry : 讀取並驗證設定檔（行程內快取）
+arch_targets : 架構鍵值對應架構設定
+board_archs : 開發板鍵值對應搭載的架構
+dla_suffixes : 所有 DLA 檔名後綴
+tune_profiles : 自動調校的參數組合
+resolve_targets : 將請求的開發板或架構解析為要編譯的架構列表
+resolve_tune : 將請求的調校參數組合與目標解析為調校設定
+"""
+
+DEVICE_REGISTRY = os.environ.get('DEVICE_REGISTRY', os.path.join(os.path.dirname(__file__), 'devices.json'))
+
+TUNE_OBJECTIVE = os.environ.get('TUNE_OBJECTIVE', 'size')
+
+DEFAULT_NCC_FLAGS = ['--relax-fp32']
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def load_device_registry(path=None, refresh=False):
+    """
+    讀取裝置登錄
+    ==========
+    讀取設定檔並檢查開發板引用的架構皆已定義，結果於行程內快取。
+
+    Parameters
+    ----------
+    path : str or None
+        設定檔路徑，None 時使用 DEVICE_REGISTRY。
+    refresh : bool
+        是否忽略快取重新讀取。
+
+    Returns
+    -------
+    dict
+        {"archs": {...}, "boards": {...}, "tune_profiles": {...}}。
+
+    Raises
+    ------
+    RuntimeError
+        設定檔無法讀取或開發板引用未定義的架構時拋出。
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is not None and not refresh and path is None:
+            return _registry
+        registry_path = path or DEVICE_REGISTRY
+        try:
+            with open(registry_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            raise RuntimeError(f"❌ Cannot load device registry {registry_path}: {e}")
+
+        archs = {}
+        for arch, spec in data.get('archs', {}).items():
+            archs[arch] = {
+                'label': spec.get('label', arch),
+                'ncc_arch': spec.get('ncc_arch', arch),
+                'ncc_flags': list(spec.get('ncc_flags', DEFAULT_NCC_FLAGS)),
+            }
+        boards = {}
+        for board, spec in data.get('boards', {}).items():
+            unknown = [arch for arch in spec.get('archs', []) if arch not in archs]
+            if unknown:
+                raise RuntimeError(f"❌ Board {board} references undefined arch(s): {', '.join(unknown)}")
+            boards[board] = {'label': spec.get('label', board), 'archs': list(spec.get('archs', []))}
+
+        profiles = {name: list(flags) for name, flags in data.get('tune_profiles', {}).items()}
+
+        registry = {'archs': archs, 'boards': boards, 'tune_profiles': profiles}
+        if path is None:
+            _registry = registry
+        return registry
+
+
+def arch_targets():
+    """架構鍵值對應 {"label", "ncc_arch", "ncc_flags"}，依設定檔順序。"""
+    return load_device_registry()['archs']
+
+
+def board_archs():
+    """開發板鍵值對應搭載的架構鍵值列表。"""
+    return {board: spec['archs'] for board, spec in load_device_registry()['boards'].items()}
+
+
+def dla_suffixes():
+    """所有架構的 DLA 檔名後綴，例如 (".vpu.dla", ".mdla2.dla", ".mdla3.dla")。"""
+    return tuple(f'.{arch}.dla' for arch in arch_targets())
+
+
+def tune_profiles():
+    """自動調校的參數組合名稱對應 ncc-tflite 參數列表，依設定檔順序。"""
+    return load_device_registry()['tune_profiles']
+
+
+def resolve_targets(targets=None):
+    """
+    解析編譯目標
+    ==========
+    將請求指定的開發板與架構名稱（可混用）展開為要編譯的架構列表，未選取的架構完全不編譯。
+
+    Parameters
+    ----------
+    targets : list of str, str or None
+        開發板或架構鍵值（可為逗號分隔字串），例如 ["genio1200"] 或 "mdla3,vpu"；
+        None 或空白時編譯所有架構。
+
+    Returns
+    -------
+    list of str
+        依設定檔順序排列的架構鍵值。
+
+    Raises
+    ------
+    RuntimeError
+        指定未知的開發板或架構時拋出。
+    """
+    if isinstance(targets, str):
+        targets = [t.strip() for t in targets.split(',')]
+    targets = [t for t in (targets or []) if t]
+    archs = arch_targets()
+    if not targets:
+        return list(archs)
+    boards = board_archs()
+    unknown = [t for t in targets if t not in archs and t not in boards]
+    if unknown:
+        raise RuntimeError(f"❌ Unknown target(s): {', '.join(unknown)} "
+                           f"(boards: {', '.join(boards)}; archs: {', '.join(archs)})")
+    selected = set()
+    for target in targets:
+        selected.update(boards.get(target, [target]))
+    return [arch for arch in archs if arch in selected]
+
+
+def resolve_tune(profiles=None, objective=None):
+    """
+    解析調校設定
+    ==========
+    將請求的參數組合名稱與目標轉為 tune_tflite_to_dla 使用的設定。
+
+    Parameters
+    ----------
+    profiles : list of str, str or None
+        參數組合名稱（可為逗號分隔字串），"all" 或 "*" 表示全部；None 或空白時不調校。
+    objective : str or None
+        調校目標，None 時使用 TUNE_OBJECTIVE。
+
+    Returns
+    -------
+    dict or None
+        {"profiles": [...], "objective": str}；不調校時返回 None。
+
+    Raises
+    ------
+    RuntimeError
+        指定未定義的參數組合時拋出。
+    """
+    if isinstance(profiles, str):
+        profiles = [p.strip() for p in profiles.split(',')]
+    profiles = [p for p in (profiles or []) if p]
+    if not profiles:
+        return None
+    available = tune_profiles()
+    if any(p in ('all', '*') for p in profiles):
+        profiles = list(available)
+    unknown = [p for p in profiles if p not in available]
+    if unknown:
+        raise RuntimeError(f"❌ Unknown tune profile(s): {', '.join(unknown)} (available: {', '.join(available)})")
+    return {'profiles': profiles, 'objective': (objective or TUNE_OBJECTIVE).strip().lower()}
@@ -0,0 +1,788 @@
+# -*- coding: utf-8 -*-
+"""
+版權所有 © 2025 工業技術研究院 (ITRI) 及貢獻者。
+保留所有權利。
+
+本檔案由 Microsoft 訂閱的 GitHub Copilot AI 助理協助產生與優化，部分內容經人工審閱與修正。
+
+本程式碼僅供學術研究與內部使用，未經授權不得用於商業用途。
+
+重新發佈與使用（無論原始或二進位形式，是否經過修改）僅限於下列條件下：
+
+* 原始碼之再發佈必須保留上述版權聲明、條件列表及下列免責聲明。
+* 二進位形式之再發佈必須於相關文件或其他資料中重現上述版權聲明、條件列表及下列免責聲明。
+* 未經事先書面同意，不得使用工業技術研究院 (ITRI) 或貢獻者之名稱為本軟體衍生產品背書或推廣。
+
+本軟體以「現狀」提供，不附任何明示或暗示之保證，包括但不限於適售性及特定用途之適用性。工業技術研究院 (ITRI) 或貢獻者對於因本軟體使用或無法使用所生之任何直接、間接、附帶、特殊、懲罰性或衍生性損害（包括但不限於替代商品或服務之取得、使用損失、資料遺失、營業中斷等），無論於任何理論下（契約、侵權或其他），即使已被告知可能發生該等損害，亦不負任何責任。
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from .convert import convert_tflite_to_dla
+from .limits import run_limited, StageLimitExceeded
+from .sdk import default_sdk
+from .devices import arch_targets
+from .scratch import scratch_root
+from ..store import get_store, store_is_shared
+
+"""
+Failing-Op Diagnosis
+====================
+ncc-tflite 拒絕模型時找出造成失敗的最小運算子集合：將 TFLite 依執行順序切成連續的子圖，
+各子圖獨立編譯（平行執行），對仍失敗的子圖繼續切分，直到剩下單一運算子，
+或某段子圖整體失敗而其任何切片皆可編譯（僅在組合時失敗）。
+
+每段子圖的編譯結果以 (子圖簽章, SDK 版本, 架構, ncc-tflite 參數) 為鍵快取並寫入 DIAGNOSE_CACHE_PATH；
+子圖簽章只包含運算子類型、參數、張量形狀/型別與連接方式（不含權重內容），
+因此不同使用者模型中的相同層樣式只需診斷一次。設定共用產出儲存 (ARTIFACT_STORE) 時，
+快取另與儲存中的 diagnose/segments.json 合併，所有節點共用診斷結果。
+
+flatbuffer 的解析與切分在資源限制的子程序中執行（階段 tflite_graph，見 limits 模組），
+本行程只保存不含權重的圖結構描述，不載入 TensorFlow；每輪切分的所有子圖由同一個子程序切出。
+
+Configuration (環境變數)
+------------------------
+DIAGNOSE_MAX_PARALLEL : 同時編譯的子圖數上限，也是每輪切分的份數，預設 4
+DIAGNOSE_MAX_COMPILES : 單次診斷的編譯次數上限（不含快取命中），超過時回報尚未縮小的子圖，預設 128
+DIAGNOSE_CACHE_PATH : 子圖編譯結果快取檔路徑，預設 ./diagnose_cache.json（版本不符 SEGMENT_CACHE_VERSION 的項目載入時捨棄）
+DIAGNOSE_CACHE_MAX : 快取保留的項目數上限（超過時移除最舊的項目），預設 20000
+
+Functions
+---------
+read_tflite_graph : 於子程序中讀取 TFLite 主圖的運算子與張量描述
+tflite_graph_ops : 列出 TFLite 主圖的運算子與其輸入/輸出張量
+segment_io : 計算連續運算子片段的輸入與輸出張量
+extract_tflite_ops : 於子程序中將連續的運算子切出為獨立的 TFLite 模型
+compile_segments : 批次切出並平行編譯子圖（結果以子圖簽章快取）
+flush_segment_cache : 將子圖編譯結果快取寫入檔案
+bisect_failures : 切分搜尋已知失敗子圖中的最小失敗運算子集合
+diagnose_tflite : 找出 ncc-tflite 無法編譯的最小運算子集合
+format_diagnosis : 產生診斷結果訊息
+"""
+
+log = logging.getLogger(__name__)
+
+DIAGNOSE_MAX_PARALLEL = int(os.environ.get('DIAGNOSE_MAX_PARALLEL', '4'))
+DIAGNOSE_MAX_COMPILES = int(os.environ.get('DIAGNOSE_MAX_COMPILES', '128'))
+DIAGNOSE_CACHE_PATH = os.environ.get('DIAGNOSE_CACHE_PATH', './diagnose_cache.json')
+DIAGNOSE_CACHE_MAX = int(os.environ.get('DIAGNOSE_CACHE_MAX', '20000'))
+
+# Object key of the copy shared through the artifact store
+SHARED_CACHE_KEY = 'diagnose/segments.json'
+
+# Bumped when cached verdicts can no longer be trusted; entries from other versions are dropped on load
+# (version 1 recorded every compile as failed while convert_tflite_to_dla's logger was shadowed)
+SEGMENT_CACHE_VERSION = 2
+
+# Constant tensors up to this size (shape vectors, axes, paddings) are part of an op's signature
+SIGNATURE_CONST_BYTES = 256
+
+# Errors caused by resource limits say nothing about operator support
+LIMIT_ERROR_MARKERS = ('⏱️', '💾')
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+# Runs as `python -c _GRAPH_SCRIPT describe <path> <const bytes>` or `... extract <path> <requests.json>`
+# and prints one JSON line; it must not import this package
+_GRAPH_SCRIPT = r"""
+import sys, json, copy
+from tensorflow.lite.python import schema_py_generated as schema_fb
+from tensorflow.lite.tools import flatbuffer_utils
+
+mode, path, arg = sys.argv[1:4]
+model = flatbuffer_utils.read_model(path)
+graph = model.subgraphs[0]
+
+def text(value):
+    return value.decode('utf-8', 'replace') if isinstance(value, bytes) else value
+
+def ints(values):
+    return [int(v) for v in (values if values is not None else [])]
+
+def is_constant(tensor):
+    buffer = model.buffers[tensor.buffer] if 0 < tensor.buffer < len(model.buffers) else None
+    # Models over 2 GB keep buffer contents outside the flatbuffer (offset/size)
+    return buffer is not None and ((buffer.data is not None and len(buffer.data) > 0)
+                                   or bool(getattr(buffer, 'offset', 0)))
+
+def describe(const_bytes):
+    op_names = {v: k for k, v in vars(schema_fb.BuiltinOperator).items() if not k.startswith('_')}
+    type_names = {v: k for k, v in vars(schema_fb.TensorType).items() if not k.startswith('_')}
+    tensors = []
+    for tensor in graph.tensors or []:
+        info = {'name': text(tensor.name), 'shape': ints(tensor.shape), 'type': int(tensor.type),
+                'dtype': type_names.get(tensor.type, str(tensor.type)).lower(),
+                'quantized': tensor.quantization is not None and tensor.quantization.scale is not None}
+        if is_constant(tensor):
+            data = model.buffers[tensor.buffer].data
+            data = bytes(data if data is not None else b'')
+            # Small constants (shape vectors, axes, paddings) are part of an op's signature
+            info['const'] = (data if len(data) <= const_bytes else str(len(data)).encode('utf-8')).hex()
+        tensors.append(info)
+    ops = []
+    for op in graph.operators or []:
+        code = model.operatorCodes[op.opcodeIndex]
+        builtin = max(code.builtinCode or 0, code.deprecatedBuiltinCode or 0)
+        name = op_names.get(builtin, str(builtin))
+        if name == 'CUSTOM' and code.customCode:
+            name = 'CUSTOM:' + text(code.customCode)
+        options = '' if op.builtinOptions is None else repr(sorted(
+            (key, repr(value)) for key, value in vars(op.builtinOptions).items()))
+        key = (f"{builtin}|{code.customCode}|{code.version}|{op.builtinOptionsType}|{options}"
+               f"|{bytes(op.customOptions or b'')!r}")
+        ops.append({'op': name, 'key': key, 'inputs': ints(op.inputs), 'outputs': ints(op.outputs),
+                    'intermediates': ints(op.intermediates)})
+    return {'tensors': tensors, 'ops': ops, 'inputs': ints(graph.inputs), 'outputs': ints(graph.outputs)}
+
+def extract(indices, tensors, inputs, outputs, output_path):
+    ops = [graph.operators[i] for i in indices]
+    # Graphs with control flow reference other subgraphs by index; keep those (and every buffer) intact
+    prune = len(model.subgraphs) == 1
+    buffers = [schema_fb.BufferT()] if prune else model.buffers
+    tensor_map, new_tensors = {}, []
+    for t in tensors:
+        tensor = copy.copy(graph.tensors[t])
+        if prune:
+            if is_constant(tensor):
+                buffers.append(model.buffers[tensor.buffer])
+                tensor.buffer = len(buffers) - 1
+            else:
+                tensor.buffer = 0
+        tensor_map[t] = len(new_tensors)
+        new_tensors.append(tensor)
+    code_map, codes, new_ops = {}, [], []
+    for op in ops:
+        op = copy.copy(op)
+        if op.opcodeIndex not in code_map:
+            code_map[op.opcodeIndex] = len(codes)
+            codes.append(model.operatorCodes[op.opcodeIndex])
+        op.opcodeIndex = code_map[op.opcodeIndex]
+        op.inputs = [tensor_map[t] if t >= 0 else -1 for t in ints(op.inputs)]
+        op.outputs = [tensor_map[t] if t >= 0 else -1 for t in ints(op.outputs)]
+        if op.intermediates is not None:
+            op.intermediates = [tensor_map[t] for t in ints(op.intermediates) if t >= 0]
+        new_ops.append(op)
+    if not prune:
+        # Other subgraphs index the original operator code table
+        codes = list(model.operatorCodes)
+        for op, original in zip(new_ops, ops):
+            op.opcodeIndex = original.opcodeIndex
+    subgraph = schema_fb.SubGraphT()
+    subgraph.tensors = new_tensors
+    subgraph.inputs = [tensor_map[t] for t in inputs]
+    subgraph.outputs = [tensor_map[t] for t in outputs]
+    subgraph.operators = new_ops
+    subgraph.name = graph.name
+    segment = schema_fb.ModelT()
+    segment.version = model.version
+    segment.description = model.description
+    segment.operatorCodes = codes
+    segment.subgraphs = [subgraph] + ([] if prune else list(model.subgraphs[1:]))
+    segment.buffers = buffers
+    flatbuffer_utils.write_model(segment, output_path)
+
+if mode == 'describe':
+    result = describe(int(arg))
+else:
+    with open(arg, 'r', encoding='utf-8') as f:
+        requests = json.load(f)
+    result = []
+    for request in requests:
+        try:
+            extract(request['ops'], request['tensors'], request['inputs'], request['outputs'], request['path'])
+            result.append({'path': request['path']})
+        except Exception as e:
+            result.append({'error': f'{type(e).__name__}: {e}'})
+print(json.dumps(result))
+"""
+
+
+def _run_graph_script(mode, tflite_path, arg, stats=None):
+    """於資源限制的子程序中執行 _GRAPH_SCRIPT 並解析其 JSON 輸出。"""
+    try:
+        result = run_limited([sys.executable, '-c', _GRAPH_SCRIPT, mode, tflite_path, str(arg)], 'tflite_graph',
+                             stats=stats)
+    except OSError as e:
+        raise RuntimeError(f"TFLite graph tool could not start: {e}")
+    if result.returncode != 0:
+        lines = (result.stderr or '').strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else f'exit code {result.returncode}')
+    try:
+        return json.loads(result.stdout.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        raise RuntimeError(f"TFLite graph tool returned no result for {tflite_path}")
+
+
+def read_tflite_graph(tflite_path, stats=None):
+    """
+    讀取 TFLite 圖結構
+    ===============
+    於子程序中解析 flatbuffer，返回主圖 (subgraph 0) 的運算子與張量描述（不含權重內容），
+    診斷與分割的簽章、子圖輸入輸出皆由此計算，本行程不載入 TensorFlow。
+
+    Parameters
+    ----------
+    tflite_path : str
+        TensorFlow Lite 模型路徑。
+    stats : list or None
+        若提供，解析子程序的資源使用紀錄將附加到此列表。
+
+    Returns
+    -------
+    dict
+        {"path", "tensors", "ops", "inputs", "outputs"}；張量為 {"name", "shape", "type", "dtype", "quantized"[, "const"]}，
+        運算子為 {"op", "key", "inputs", "outputs", "intermediates"}（張量索引）。
+
+    Raises
+    ------
+    RuntimeError
+        模型無法解析時拋出。
+    """
+    graph = _run_graph_script('describe', tflite_path, SIGNATURE_CONST_BYTES, stats)
+    return dict(graph, path=tflite_path)
+
+
+def _tensor_info(graph, t):
+    tensor = graph['tensors'][t]
+    info = {'name': tensor['name'], 'shape': tensor['shape'], 'dtype': tensor['dtype']}
+    if 'const' in tensor:
+        info['const'] = True
+    return info
+
+
+def tflite_graph_ops(graph):
+    """
+    TFLite 運算子列表
+    ===============
+    依執行順序列出主圖 (subgraph 0) 的運算子，作為診斷結果中的位置資訊。
+
+    Parameters
+    ----------
+    graph : dict
+        read_tflite_graph 讀取的圖結構。
+
+    Returns
+    -------
+    list of dict
+        {"index", "op", "inputs", "outputs"}；張量資訊為 {"name", "shape", "dtype"[, "const"]}。
+    """
+    return [{
+        'index': index,
+        'op': op['op'],
+        'inputs': [_tensor_info(graph, t) for t in op['inputs'] if t >= 0],
+        'outputs': [_tensor_info(graph, t) for t in op['outputs'] if t >= 0],
+    } for index, op in enumerate(graph['ops'])]
+
+
+def _segment_signature(graph, indices):
+    """連續運算子的簽章：類型、版本、參數、張量形狀/型別、小型常數內容與內部連接方式。"""
+    local = {}
+    h = hashlib.sha256()
+    for index in indices:
+        op = graph['ops'][index]
+        h.update(f"op|{op['key']}".encode('utf-8'))
+        for role, tensors in (('in', op['inputs']), ('out', op['outputs'])):
+            for t in tensors:
+                if t < 0:
+                    h.update(f'{role}|none'.encode('utf-8'))
+                    continue
+                tensor = graph['tensors'][t]
+                h.update(f"{role}|{tensor['shape']}|{tensor['type']}|{tensor['quantized']}".encode('utf-8'))
+                if 'const' in tensor:
+                    h.update(b'const|' + bytes.fromhex(tensor['const']))
+                else:
+                    # Wiring inside the segment, independent of where the segment sits in the model
+                    h.update(f'wire|{local.setdefault(t, len(local))}'.encode('utf-8'))
+    return h.hexdigest()
+
+
+def segment_io(graph, indices):
+    """
+    子圖輸入輸出
+    ==========
+    片段外產生的非常數張量為輸入；片段內產生且被片段外使用（或為模型輸出）的張量為輸出，
+    沒有這類張量時使用最後一個運算子的輸出。
+
+    Parameters
+    ----------
+    graph : dict
+        read_tflite_graph 讀取的圖結構。
+    indices : list of int
+        依執行順序的連續運算子索引。
+
+    Returns
+    -------
+    tuple
+        (tensors, inputs, outputs)：片段用到的所有張量、輸入與輸出，皆為主圖的張量索引。
+    """
+    selected = set(indices)
+    ops = [graph['ops'][i] for i in indices]
+    produced = {t for op in ops for t in op['outputs'] if t >= 0}
+    consumed = {t for op in ops for t in op['inputs'] if t >= 0}
+    used_outside = {t for i, op in enumerate(graph['ops']) if i not in selected for t in op['inputs']}
+    used_outside.update(graph['outputs'])
+
+    tensors = []
+    for op in ops:
+        for t in op['inputs'] + op['outputs'] + op['intermediates']:
+            if t >= 0 and t not in tensors:
+                tensors.append(t)
+    inputs = [t for t in tensors if t in consumed and t not in produced and 'const' not in graph['tensors'][t]]
+    outputs = [t for t in tensors if t in produced and t in used_outside]
+    if not outputs:
+        outputs = [t for t in ops[-1]['outputs'] if t >= 0]
+    return tensors, inputs, outputs
+
+
+def extract_tflite_ops(graph, segments, work_dir, stats=None):
+    """
+    切出子圖
+    ======
+    將主圖中連續的運算子切出為獨立模型：片段外產生的非常數張量成為子圖輸入，
+    片段內產生且被片段外使用（或為模型輸出）的張量成為子圖輸出；只保留用到的常數 buffer。
+    同一批片段於單一子程序中切出，模型只解析一次。
+
+    Parameters
+    ----------
+    graph : dict
+        read_tflite_graph 讀取的圖結構。
+    segments : list of tuple
+        (indices, output_path, allow_constant)：連續運算子索引、子圖 TFLite 的輸出路徑，
+        以及片段沒有任何非常數輸入時是否仍寫出子圖（分割時的 CPU 片段需要）。
+    work_dir : str
+        切分請求檔的暫存目錄。
+    stats : list or None
+        若提供，切分子程序的資源使用紀錄將附加到此列表。
+
+    Returns
+    -------
+    list of dict
+        依 segments 順序，每項為 {"path"}；片段沒有任何非常數輸入（僅為常數運算，轉換時會被折疊）
+        且未允許時 path 為 None，切分失敗時為 {"error"}。
+
+    Raises
+    ------
+    StageLimitExceeded
+        切分子程序超過資源限制時拋出。
+    """
+    results = [None] * len(segments)
+    requests = []
+    for position, (indices, output_path, allow_constant) in enumerate(segments):
+        tensors, inputs, outputs = segment_io(graph, indices)
+        if not inputs and not allow_constant:
+            results[position] = {'path': None}
+            continue
+        requests.append((position, {'ops': list(indices), 'tensors': tensors, 'inputs': inputs, 'outputs': outputs,
+                                    'path': output_path}))
+    if not requests:
+        return results
+    fd, request_path = tempfile.mkstemp(prefix='extract_', suffix='.json', dir=work_dir)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump([request for _, request in requests], f)
+        try:
+            extracted = _run_graph_script('extract', graph['path'], request_path, stats)
+        except StageLimitExceeded:
+            raise
+        except RuntimeError as e:
+            extracted = [{'error': str(e)}] * len(requests)
+    finally:
+        os.remove(request_path)
+    for (position, _), item in zip(requests, extracted):
+        results[position] = item
+    return results
+
+
+def _merge_shared(cache):
+    """併入共用儲存中較新的項目（其他節點的診斷結果）。"""
+    if not store_is_shared():
+        return
+    try:
+        shared = get_store().get_json(SHARED_CACHE_KEY) or {}
+    except Exception as e:
+        log.warning("Cannot read shared diagnosis cache: %s", e)
+        return
+    for key, entry in shared.items():
+        if entry.get('version') != SEGMENT_CACHE_VERSION:
+            continue
+        if entry.get('updated', 0) > cache.get(key, {}).get('updated', 0):
+            cache[key] = entry
+
+
+def _load_cache():
+    """讀取子圖編譯結果快取（行程內快取，呼叫端需持有 _cache_lock）。"""
+    global _cache
+    if _cache is None:
+        try:
+            with open(DIAGNOSE_CACHE_PATH, 'r', encoding='utf-8') as f:
+                _cache = {key: entry for key, entry in json.load(f).items()
+                          if entry.get('version') == SEGMENT_CACHE_VERSION}
+        except (OSError, ValueError, AttributeError):
+            _cache = {}
+        _merge_shared(_cache)
+    return _cache
+
+
+def _save_cache(cache):
+    """併入其他節點的新項目並移除超出上限的最舊項目後以暫存檔原子寫入（呼叫端需持有 _cache_lock）。"""
+    _merge_shared(cache)
+    if len(cache) > DIAGNOSE_CACHE_MAX:
+        for key in sorted(cache, key=lambda k: cache[k].get('updated', 0))[:len(cache) - DIAGNOSE_CACHE_MAX]:
+            del cache[key]
+    directory = os.path.dirname(os.path.abspath(DIAGNOSE_CACHE_PATH))
+    os.makedirs(directory, exist_ok=True)
+    temp_path = f'{DIAGNOSE_CACHE_PATH}.{os.getpid()}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=1)
+    os.replace(temp_path, DIAGNOSE_CACHE_PATH)
+    if store_is_shared():
+        try:
+            get_store().put_json(SHARED_CACHE_KEY, cache)
+        except Exception as e:
+            log.warning("Cannot save shared diagnosis cache: %s", e)
+
+
+def _error_excerpt(error, limit=400):
+    """ncc-tflite 錯誤訊息的最後幾行（去除轉換函數加上的前綴）。"""
+    text = str(error).split('ncc-tflite failed:', 1)[-1]
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    excerpt = ' | '.join(lines[-4:])
+    return excerpt[-limit:]
+
+
+def _compile_extracted(item, arch, sdk, flags, signature, key, output_path):
+    """編譯已切出的子圖並寫入快取；切分失敗或只含常數運算的片段不編譯。"""
+    outputs = {'tflite': None, 'dla': None}
+    if 'error' in item:
+        # Segments the flatbuffer tools cannot cut are treated as failing so the search keeps narrowing
+        return dict(outputs, ok=False, error=f"segment extraction failed: {item['error']}", signature=signature,
+                    cached=False)
+    path = item['path']
+    if path is None:
+        return dict(outputs, ok=True, error=None, signature=signature, cached=False, constant=True)
+    try:
+        dla = convert_tflite_to_dla(path, arch_targets()[arch]['ncc_arch'], arch, sdk=sdk, ncc_flags=flags)
+        result = {'ok': True, 'error': None}
+        if output_path is not None:
+            outputs = {'tflite': path, 'dla': dla}
+    except StageLimitExceeded as e:
+        # Not a verdict on the ops; report it without caching
+        return dict(outputs, ok=False, error=str(e), signature=signature, cached=False)
+    except RuntimeError as e:
+        result = {'ok': False, 'error': _error_excerpt(e)}
+    with _cache_lock:
+        _load_cache()[key] = dict(result, updated=time.time(), version=SEGMENT_CACHE_VERSION)
+    return dict(result, signature=signature, cached=False, **outputs)
+
+
+def compile_segments(pool, graph, pieces, arch, sdk, flags, work_dir, output_paths=None):
+    """
+    編譯子圖
+    ======
+    批次切出並平行編譯子圖，結果以子圖簽章快取。只需判斷可否編譯時 (output_paths 為 None)，
+    已快取的簽章直接返回先前的結果且不保留檔案；需要產出檔案時只略過已知失敗的簽章。
+    未命中快取的子圖於單一子程序中切出，再以 pool 同時編譯。
+
+    Parameters
+    ----------
+    pool : ThreadPoolExecutor
+        編譯子圖的執行緒池。
+    graph : dict
+        read_tflite_graph 讀取的圖結構。
+    pieces : list of list of int
+        依執行順序的連續運算子索引。
+    arch : str
+        架構鍵值。
+    sdk : dict
+        使用的 NeuronPilot SDK 資訊。
+    flags : list of str
+        ncc-tflite 參數。
+    work_dir : str
+        暫存目錄（未保留的子圖寫入此處並於編譯後移除）。
+    output_paths : list of str or None
+        依 pieces 順序保留子圖 TFLite 的路徑，DLA 產生於其旁。
+
+    Returns
+    -------
+    list of dict
+        依 pieces 順序，每項為 {"ok", "error", "signature", "cached"}；保留檔案時另含 "tflite" 與 "dla"
+        （失敗時為 None），只含常數運算的片段另含 "constant": True。
+    """
+    results = [None] * len(pieces)
+    pending = []
+    for position, piece in enumerate(pieces):
+        signature = _segment_signature(graph, piece)
+        key = hashlib.sha256(f"{signature}|{sdk['version']}|{arch}|{' '.join(flags)}".encode('utf-8')).hexdigest()
+        output_path = output_paths[position] if output_paths else None
+        with _cache_lock:
+            cached = _load_cache().get(key)
+        if cached is not None and (output_path is None or not cached['ok']):
+            results[position] = dict(cached, signature=signature, cached=True, tflite=None, dla=None)
+        else:
+            pending.append((position, piece, signature, key, output_path))
+    if not pending:
+        return results
+
+    segment_dir = tempfile.mkdtemp(prefix='segments_', dir=work_dir)
+    try:
+        try:
+            extracted = extract_tflite_ops(graph, [
+                (piece, output_path or os.path.join(segment_dir, f'segment{position}.tflite'), False)
+                for position, piece, _, _, output_path in pending], segment_dir)
+        except StageLimitExceeded as e:
+            extracted = [{'error': str(e)}] * len(pending)
+        # Each segment compiles in a copy of this context so its logs keep the job and stage
+        futures = [pool.submit(contextvars.copy_context().run, _compile_extracted, item, arch, sdk, flags, signature,
+                               key, output_path)
+                   for (_, _, signature, key, output_path), item in zip(pending, extracted)]
+        for (position, *_), future in zip(pending, futures):
+            results[position] = future.result()
+    finally:
+        shutil.rmtree(segment_dir, ignore_errors=True)
+    return results
+
+
+def flush_segment_cache():
+    """將子圖編譯結果快取寫入 DIAGNOSE_CACHE_PATH。"""
+    with _cache_lock:
+        try:
+            _save_cache(_load_cache())
+        except OSError as e:
+            log.warning("Cannot save diagnosis cache: %s", e)
+
+
+def _split(indices, parts):
+    size, extra = divmod(len(indices), parts)
+    pieces, start = [], 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        pieces.append(indices[start:end])
+        start = end
+    return [piece for piece in pieces if piece]
+
+
+def bisect_failures(pool, graph, segment, arch, sdk, flags, error, work_dir, counts):
+    """
+    切分搜尋失敗運算子
+    ================
+    對已知編譯失敗的連續子圖，每輪切成 DIAGNOSE_MAX_PARALLEL 份並以 pool 同時編譯，失敗的切片進入下一輪；
+    單一運算子失敗即為結果。子圖失敗而所有切片皆成功（僅在組合時失敗）時，以遞減的步長同時嘗試
+    移除前端與後端的運算子，移除後仍失敗即保留較小的範圍。
+
+    Parameters
+    ----------
+    pool : ThreadPoolExecutor
+        編譯子圖的執行緒池。
+    graph : dict
+        read_tflite_graph 讀取的圖結構。
+    segment : list of int
+        已知失敗的連續運算子索引（不重新編譯）。
+    arch, sdk, flags :
+        架構鍵值、SDK 資訊與 ncc-tflite 參數。
+    error : str or None
+        segment 的編譯錯誤，作為無法再切分時的錯誤訊息。
+    work_dir : str
+        子圖暫存目錄。
+    counts : dict
+        {"compiles", "cached"} 計數，於原處累加；compiles 達 DIAGNOSE_MAX_COMPILES 時停止。
+
+    Returns
+    -------
+    tuple
+        (failing, truncated)：failing 每項為 {"indices", "error", "combined"[, "unresolved"]}，
+        truncated 表示達到編譯上限時仍有未縮小的子圖。
+    """
+    parallel = max(2, DIAGNOSE_MAX_PARALLEL)
+    errors = {tuple(segment): _error_excerpt(error or 'ncc-tflite failed')}
+    candidates = [list(segment)]
+    failing = []
+    truncated = False
+
+    def compile_batch(batch):
+        """平行編譯一批子圖並記錄失敗切片的錯誤；超過編譯上限時返回 None。"""
+        if counts['compiles'] + len(batch) > DIAGNOSE_MAX_COMPILES:
+            return None
+        results = {tuple(piece): result
+                   for piece, result in zip(batch, compile_segments(pool, graph, batch, arch, sdk, flags, work_dir))}
+        for piece, result in results.items():
+            counts['cached' if result['cached'] else 'compiles'] += 1
+            if not result['ok']:
+                errors[piece] = result['error']
+        return {piece: result['ok'] for piece, result in results.items()}
+
+    def trim(window):
+        """縮小僅在組合時失敗的範圍，返回 (範圍, 是否因編譯上限中止)。"""
+        step = len(window) // 2
+        while step >= 1 and len(window) > 2:
+            step = min(step, len(window) - 1)
+            front, back = window[step:], window[:-step]
+            ok = compile_batch([front, back])
+            if ok is None:
+                return window, True
+            if not ok[tuple(front)]:
+                window = front
+            elif not ok[tuple(back)]:
+                window = back
+            else:
+                step //= 2
+        return window, False
+
+    while candidates:
+        for piece in [c for c in candidates if len(c) == 1]:
+            failing.append({'indices': piece, 'error': errors[tuple(piece)], 'combined': False})
+        splits = [(window, _split(window, min(parallel, len(window)))) for window in candidates if len(window) > 1]
+        batch = [piece for _, pieces in splits for piece in pieces]
+        if not batch:
+            break
+        ok = compile_batch(batch)
+        if ok is None:
+            truncated = True
+            for window, _ in splits:
+                failing.append({'indices': window, 'error': errors[tuple(window)], 'combined': False,
+                                'unresolved': True})
+            break
+        candidates = []
+        for window, pieces in splits:
+            failed = [piece for piece in pieces if not ok[tuple(piece)]]
+            if failed:
+                candidates += failed
+                continue
+            # Every slice compiles on its own: the ops only fail together
+            narrowed, stopped = trim(window)
+            truncated = truncated or stopped
+            failing.append({'indices': narrowed, 'error': errors[tuple(narrowed)], 'combined': True})
+        log.info("%s diagnosis round: %d segment(s) compiled, %d still failing", arch, len(batch), len(candidates))
+    return failing, truncated
+
+
+def diagnose_tflite(tflite_path, arch, sdk=None, flags=None, error=None, work_dir=None):
+    """
+    失敗運算子診斷
+    ============
+    以平行編譯的切分搜尋 (bisect_failures) 找出 ncc-tflite 無法編譯的最小運算子集合，
+    完整模型視為已知失敗，不重新編譯。
+
+    Parameters
+    ----------
+    tflite_path : str
+        ncc-tflite 編譯失敗的 TensorFlow Lite 模型路徑。
+    arch : str
+        架構鍵值（見裝置登錄）。
+    sdk : dict or None
+        使用的 NeuronPilot SDK 資訊，None 時使用預設 SDK。
+    flags : list of str or None
+        ncc-tflite 參數，None 時使用架構的 ncc_flags。
+    error : str or None
+        完整模型的編譯錯誤，作為無法再切分時的錯誤訊息。
+    work_dir : str or None
+        子圖檔案的暫存目錄根，None 時使用 CONVERSION_SCRATCH_DIR。
+
+    Returns
+    -------
+    dict
+        {"arch", "ops", "compiles", "cached", "seconds", "truncated", "failing", "op_types"}；
+        failing 每項為 {"ops": [運算子位置資訊], "error", "signature", "combined"}，
+        combined 表示該集合僅在組合時失敗；truncated 表示達到編譯上限時仍有未縮小的子圖。
+
+    Raises
+    ------
+    RuntimeError
+        SDK 不存在或模型無法解析時拋出。
+    """
+    sdk = sdk or default_sdk()
+    if sdk is None:
+        raise RuntimeError("NeuronPilot SDK not found (ncc-tflite unavailable)")
+    flags = flags if flags is not None else arch_targets()[arch]['ncc_flags']
+    try:
+        graph = read_tflite_graph(tflite_path)
+    except RuntimeError as e:
+        raise RuntimeError(f"Cannot parse TFLite graph for diagnosis: {e}")
+    ops = tflite_graph_ops(graph)
+    if not ops:
+        raise RuntimeError("TFLite graph has no operators to diagnose")
+
+    start = time.time()
+    counts = {'compiles': 0, 'cached': 0}
+    temp_dir = tempfile.mkdtemp(prefix='diagnose_', dir=work_dir or scratch_root())
+    try:
+        with ThreadPoolExecutor(max_workers=max(2, DIAGNOSE_MAX_PARALLEL)) as pool:
+            failing, truncated = bisect_failures(pool, graph, list(range(len(ops))), arch, sdk, flags, error,
+                                                 temp_dir, counts)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        flush_segment_cache()
+
+    op_types = {}
+    for item in failing:
+        item['ops'] = [ops[i] for i in item.pop('indices')]
+        item['signature'] = _segment_signature(graph, [op['index'] for op in item['ops']])[:12]
+        for op in item['ops']:
+            op_types[op['op']] = op_types.get(op['op'], 0) + 1
+    failing.sort(key=lambda item: item['ops'][0]['index'])
+    diagnosis = {
+        'arch': arch,
+        'ops': len(ops),
+        'compiles': counts['compiles'],
+        'cached': counts['cached'],
+        'seconds': round(time.time() - start, 3),
+        'truncated': truncated,
+        'failing': failing,
+        'op_types': dict(sorted(op_types.items(), key=lambda item: -item[1])),
+    }
+    log.info("%s diagnosis: %d failing set(s) in %d op(s), %d compile(s), %d cached", arch, len(failing), len(ops),
+             counts['compiles'], counts['cached'])
+    return diagnosis
+
+
+def _format_op(op):
+    shapes = ', '.join('x'.join(str(d) for d in tensor['shape']) or 'scalar'
+                       for tensor in op['inputs'] if not tensor.get('const'))
+    location = op['outputs'][0]['name'] if op['outputs'] else ''
+    return f"#{op['index']} {op['op']} [{shapes}] {location}".rstrip()
+
+
+def format_diagnosis(arch, diagnosis):
+    """
+    診斷結果訊息
+    ==========
+    產生單一架構失敗運算子的訊息行：運算子索引、類型、非常數輸入形狀、輸出張量名稱（位置）與錯誤摘要。
+
+    Parameters
+    ----------
+    arch : str
+        架構鍵值。
+    diagnosis : dict
+        diagnose_tflite 的結果。
+
+    Returns
+    -------
+    list of str
+        訊息行。
+    """
+    label = arch_targets()[arch]['label'] if arch in arch_targets() else arch
+    lines = [f"🔬 {label} failing-op diagnosis: {len(diagnosis['failing'])} failing set(s) in {diagnosis['ops']} op(s) "
+             f"({diagnosis['compiles']} compile(s), {diagnosis['cached']} cached, {diagnosis['seconds']:.1f}s)"]
+    for item in diagnosis['failing']:
+        if len(item['ops']) == 1:
+            lines.append(f"   ❌ {_format_op(item['ops'][0])}")
+        else:
+            first, last = item['ops'][0]['index'], item['ops'][-1]['index']
+            kind = 'not narrowed further' if item.get('unresolved') else 'fail only together'
+            lines.append(f"   ❌ #{first}-#{last} ({len(item['ops'])} ops, {kind}): "
+                         + ', '.join(op['op'] for op in item['ops'][:6]) + (' ...' if len(item['ops']) > 6 else ''))
+        if item['error']:
+            lines.append(f"      ↳ {item['error'][:200]}")
+    if diagnosis['truncated']:
+        lines.append(f"   ⚠️ Stopped after {DIAGNOSE_MAX_COMPILES} compiles (DIAGNOSE_MAX_COMPILES)")
+    return lines
@@ -18,20 +18,110 @@
 
 import os
 import sys
-import subprocess
+import ast
+import json
+import logging
+from .limits import run_limited, StageLimitExceeded
+from ..blobstore import detach
+from ..log import payload_digest
 
 """
 PyTorch Model Format Verification
 =================================
 PyTorch 模型格式驗證模組，提供程式碼語法檢查、模型建立測試與 ONNX 匯出功能。
 確保使用者提供的 PyTorch 程式碼可正確執行並成功轉換為 ONNX 格式。
+另提供不經 ONNX 與 onnx2tf、以 ai-edge-torch 直接由模型實例產生 TFLite 的轉換後端。
+
+Configuration (環境變數)
+------------------------
+CONVERSION_BACKEND : 預設的 PyTorch 轉換後端，預設 onnx
+    - onnx : torch.onnx.export → onnxslim → onnx2tf
+    - ai-edge-torch : ai-edge-torch 直接轉換，失敗時自動改用 onnx 路徑
+    - compare : 兩條路徑皆執行並比較耗時與運算子數量（DLA 由 onnx 路徑編譯）
 
 Functions
 ---------
+resolve_backend : 解析請求的轉換後端
 verify_pytorch_format : PyTorch 模型格式驗證與 ONNX 匯出
+export_tflite_direct : 以 ai-edge-torch 直接將 PyTorch 模型轉為 TFLite
+export_pytorch_shapes : 單次實例化模型並匯出多個輸入形狀的 ONNX（形狀掃描）
+parse_input_shape : 解析並驗證使用者提供的輸入形狀
+check_onnx_io : 比對 ONNX 輸入形狀並以 onnxruntime 進行推論測試
+shape_tag : 將輸入形狀轉為檔名安全的標籤
 """
 
-def verify_pytorch_format(user_id, pytorch_code, model_entrypoint, input_shape):
+log = logging.getLogger(__name__)
+
+CONVERSION_BACKEND = os.environ.get('CONVERSION_BACKEND', 'onnx')
+
+BACKENDS = ('onnx', 'ai-edge-torch', 'compare')
+
+# Accepted spellings for the direct backend
+_BACKEND_ALIASES = {'direct': 'ai-edge-torch', 'ai_edge_torch': 'ai-edge-torch', 'litert': 'ai-edge-torch'}
+
+
+def resolve_backend(backend=None):
+    """
+    解析轉換後端
+    ==========
+    將請求的後端名稱正規化，None 或空白時使用 CONVERSION_BACKEND。
+
+    Parameters
+    ----------
+    backend : str or None
+        "onnx"、"ai-edge-torch"（別名 "direct"）或 "compare"。
+
+    Returns
+    -------
+    str
+        正規化的後端名稱。
+
+    Raises
+    ------
+    RuntimeError
+        指定未知的後端時拋出。
+    """
+    name = (backend or CONVERSION_BACKEND).strip().lower()
+    name = _BACKEND_ALIASES.get(name, name)
+    if name not in BACKENDS:
+        raise RuntimeError(f"❌ Unknown conversion backend: {backend} (available: {', '.join(BACKENDS)})")
+    return name
+
+
+def parse_input_shape(input_shape):
+    """
+    輸入形狀解析
+    ==========
+    以 ast.literal_eval 解析使用者提供的形狀字串（只接受字面值，不執行任何程式碼），
+    並驗證結果為正整數組成的 tuple 或 list。
+
+    Parameters
+    ----------
+    input_shape : str, tuple or list
+        輸入張量形狀，例如 "(1, 3, 224, 224)"。
+
+    Returns
+    -------
+    tuple of int
+        驗證後的形狀。
+
+    Raises
+    ------
+    RuntimeError
+        字串不是字面值或形狀含非正整數的維度時拋出。
+    """
+    try:
+        shape = ast.literal_eval(input_shape.strip()) if isinstance(input_shape, str) else input_shape
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        shape = None
+    if (not isinstance(shape, (tuple, list)) or not shape
+            or not all(isinstance(d, int) and not isinstance(d, bool) and d > 0 for d in shape)):
+        raise RuntimeError(f"❌ Invalid input shape {input_shape!r}: "
+                           f"expected positive integers such as (1, 3, 224, 224)")
+    return tuple(shape)
+
+
+def verify_pytorch_format(user_id, pytorch_code, model_entrypoint, input_shape, stats=None, work_dir=None):
     """
     PyTorch 模型格式驗證與 ONNX 匯出
     ==============================
@@ -48,6 +138,10 @@ def verify_pytorch_format(user_id, pytorch_code, model_entrypoint, input_shape):
         要實例化的模型類別名稱，該類別必須在 pytorch_code 中定義。
     input_shape : str or tuple
         輸入張量形狀，字串格式如 "(1, 3, 224, 224)" 或直接傳入 tuple。
+    stats : list or None
+        若提供，語法檢查與匯出子程序的資源使用紀錄將附加到此列表。
+    work_dir : str or None
+        匯出檔案的工作目錄，None 時使用 ./users/<user_id>。
 
     Returns
     -------
@@ -58,52 +152,238 @@ def verify_pytorch_format(user_id, pytorch_code, model_entrypoint, input_shape):
     ------
     RuntimeError
         當程式碼為空、語法錯誤、模型建立失敗、ONNX 匯出失敗或形狀不符時拋出。
+    StageLimitExceeded
+        當子程序超過逾時、CPU 或記憶體限制時拋出。
     """
     if not pytorch_code.strip():
         raise RuntimeError('❌ PyTorch 程式碼為空')
+    # The shape is interpolated into export.py, so only a validated literal may reach it
+    shape = parse_input_shape(input_shape)
     try:
         # 1. 驗證語法與 import
-        result = subprocess.run([
-            sys.executable, '-c', pytorch_code
-        ], capture_output=True, text=True)
+        result = run_limited([sys.executable, '-c', pytorch_code], 'pytorch_check', stats=stats)
         if result.returncode != 0:
             raise RuntimeError(f"PyTorch code import failed: {result.stderr}\n{result.stdout}")
 
         # 2. 自動補上模型建立、dummy input、ONNX匯出，並存成.py
-        user_dir = os.path.join('.', 'users', str(user_id))
+        user_dir = work_dir or os.path.join('.', 'users', str(user_id))
         os.makedirs(user_dir, exist_ok=True)
         onnx_path = os.path.join(user_dir, 'model.onnx')
-        full_code = pytorch_code.rstrip() + f"\nmodel = {model_entrypoint}()\nmodel.eval()\ndummy_input = torch.randn{input_shape}\ntorch.onnx.export(model, dummy_input, r'{onnx_path}', opset_version=11)\n"
+        # A previous model.onnx may be a hard link shared with other workspaces
+        detach(onnx_path)
+        full_code = pytorch_code.rstrip() + f"\nmodel = {model_entrypoint}()\nmodel.eval()\ndummy_input = torch.randn{shape}\ntorch.onnx.export(model, dummy_input, r'{onnx_path}', opset_version=11)\n"
         export_path = os.path.join(user_dir, 'export.py')
         with open(export_path, 'w', encoding='utf-8') as f:
             f.write(full_code)
-        print("\n===== [export.py generated for user_id: {}] =====".format(user_id))
-        print(full_code)
-        print("===== [end of export.py] =====\n")
-        result2 = subprocess.run([sys.executable, export_path], capture_output=True, text=True)
+        # Source code is logged by digest; the full script only at DEBUG
+        log.info("Generated export.py %s", payload_digest(full_code))
+        log.debug("export.py:\n%s", full_code)
+        result2 = run_limited([sys.executable, export_path], 'pytorch_export', stats=stats)
         if result2.returncode != 0:
             raise RuntimeError(f"export.py failed: {result2.stderr}\n{result2.stdout}")
         # 3. 先比對 onnx 檔案的 input/output shape，再用 onnxruntime forward
-        try:
-            import onnx
-            import onnxruntime as ort
-            import numpy as np
-            shape = eval(input_shape) if isinstance(input_shape, str) else input_shape
-            onnx_model = onnx.load(onnx_path)
-            input_tensors = onnx_model.graph.input
-            output_tensors = onnx_model.graph.output
-            # 只檢查第一個 input/output
-            onnx_input_shape = [d.dim_value for d in input_tensors[0].type.tensor_type.shape.dim]
-            if tuple(onnx_input_shape) != tuple(shape):
-                raise RuntimeError(f"ONNX input shape {onnx_input_shape} != 指定 shape {shape}")
-            print(f"[onnx] input shape: {onnx_input_shape}, output shape: {[d.dim_value for d in output_tensors[0].type.tensor_type.shape.dim]}")
-            dummy_input = np.random.randn(*shape).astype(np.float32)
-            sess = ort.InferenceSession(onnx_path, providers=['CPUExecutionProvider'])
-            input_name = sess.get_inputs()[0].name
-            output = sess.run(None, {input_name: dummy_input})
-            print(f"[onnxruntime] forward success, output shape: {[o.shape for o in output]}")
-        except Exception as e:
-            raise RuntimeError(f"ONNX 檔案 I/O 檢查或推論測試失敗: {e}")
+        check_onnx_io(onnx_path, shape)
         return onnx_path
+    except StageLimitExceeded:
+        raise
+    except Exception as e:
+        raise RuntimeError(f"PyTorch code import or export failed: {e}")
+
+
+def export_tflite_direct(user_id, pytorch_code, model_entrypoint, input_shape, stats=None, work_dir=None):
+    """
+    PyTorch 直接轉換 TFLite
+    =====================
+    於子程序中以 ai-edge-torch (torch.export → TFLite) 將 model_entrypoint 的實例直接轉為 TFLite，
+    不經 ONNX 與 onnx2tf。未安裝 ai-edge-torch 或模型含不支援的運算時拋出錯誤，由呼叫端改用 ONNX 路徑。
+
+    Parameters
+    ----------
+    user_id : str
+        使用者會話的唯一識別碼。
+    pytorch_code : str
+        PyTorch 模型類別定義程式碼。
+    model_entrypoint : str
+        要實例化的模型類別名稱。
+    input_shape : str or tuple
+        輸入張量形狀。
+    stats : list or None
+        若提供，轉換子程序的資源使用紀錄將附加到此列表。
+    work_dir : str or None
+        輸出目錄，None 時使用 ./users/<user_id>。
+
+    Returns
+    -------
+    str
+        產生的 TFLite 檔案路徑 (model_direct.tflite)。
+
+    Raises
+    ------
+    RuntimeError
+        當程式碼為空、輸入形狀無效、未安裝 ai-edge-torch 或轉換失敗時拋出。
+    StageLimitExceeded
+        當子程序超過逾時、CPU 或記憶體限制時拋出。
+    """
+    if not pytorch_code.strip():
+        raise RuntimeError('❌ PyTorch 程式碼為空')
+    shape = list(parse_input_shape(input_shape))
+
+    user_dir = work_dir or os.path.join('.', 'users', str(user_id))
+    os.makedirs(user_dir, exist_ok=True)
+    tflite_path = os.path.join(user_dir, 'model_direct.tflite')
+    detach(tflite_path)
+    full_code = pytorch_code.rstrip() + f"""
+try:
+    import ai_edge_torch
+except ImportError:
+    raise SystemExit('ai-edge-torch is not installed (pip install ai-edge-torch)')
+model = {model_entrypoint}()
+model.eval()
+edge_model = ai_edge_torch.convert(model, (torch.randn(*{shape}),))
+edge_model.export(r'{tflite_path}')
+"""
+    export_path = os.path.join(user_dir, 'export_direct.py')
+    with open(export_path, 'w', encoding='utf-8') as f:
+        f.write(full_code)
+    log.info("Generated export_direct.py %s", payload_digest(full_code))
+    log.debug("export_direct.py:\n%s", full_code)
+    result = run_limited([sys.executable, export_path], 'direct_export', stats=stats)
+    if result.returncode != 0 or not os.path.exists(tflite_path):
+        # Keep only the tail; torch.export tracebacks are long
+        raise RuntimeError(f"ai-edge-torch conversion failed: {(result.stderr or result.stdout)[-2000:]}")
+    return tflite_path
+
+
+def shape_tag(shape):
+    """將輸入形狀轉為檔名安全的標籤，例如 (1, 3, 224, 224) -> "1x3x224x224"。"""
+    return 'x'.join(str(d) for d in parse_input_shape(shape))
+
+
+def check_onnx_io(onnx_path, input_shape):
+    """
+    ONNX 輸入輸出檢查
+    ===============
+    比對 ONNX 第一個輸入的形狀是否與指定形狀相同，並以 onnxruntime 執行一次推論。
+
+    Parameters
+    ----------
+    onnx_path : str
+        ONNX 模型檔案路徑。
+    input_shape : str or tuple
+        指定的輸入形狀。
+
+    Raises
+    ------
+    RuntimeError
+        形狀不符或推論失敗時拋出。
+    """
+    try:
+        import onnx
+        import onnxruntime as ort
+        import numpy as np
+        shape = parse_input_shape(input_shape)
+        onnx_model = onnx.load(onnx_path)
+        input_tensors = onnx_model.graph.input
+        output_tensors = onnx_model.graph.output
+        # 只檢查第一個 input/output
+        onnx_input_shape = [d.dim_value for d in input_tensors[0].type.tensor_type.shape.dim]
+        if tuple(onnx_input_shape) != tuple(shape):
+            raise RuntimeError(f"ONNX input shape {onnx_input_shape} != 指定 shape {shape}")
+        log.info("ONNX input shape: %s, output shape: %s", onnx_input_shape,
+                 [d.dim_value for d in output_tensors[0].type.tensor_type.shape.dim])
+        dummy_input = np.random.randn(*shape).astype(np.float32)
+        sess = ort.InferenceSession(onnx_path, providers=['CPUExecutionProvider'])
+        input_name = sess.get_inputs()[0].name
+        output = sess.run(None, {input_name: dummy_input})
+        log.info("onnxruntime forward success, output shape: %s", [o.shape for o in output])
     except Exception as e:
-        raise RuntimeError(f"PyTorch code import or export failed: {e}")
\ No newline at end of file
+        raise RuntimeError(f"ONNX 檔案 I/O 檢查或推論測試失敗: {e}")
+
+
+def export_pytorch_shapes(user_id, pytorch_code, model_entrypoint, input_shapes, stats=None, work_dir=None):
+    """
+    多輸入形狀 ONNX 匯出
+    ==================
+    於單一子程序中只載入 torch 並實例化模型一次，依序以每個輸入形狀匯出 ONNX。
+    單一形狀匯出失敗不影響其他形狀，失敗原因記錄於結果中。
+
+    Parameters
+    ----------
+    user_id : str
+        使用者會話的唯一識別碼，用於建立專屬工作目錄。
+    pytorch_code : str
+        PyTorch 模型類別定義程式碼。
+    model_entrypoint : str
+        要實例化的模型類別名稱。
+    input_shapes : list of str or tuple
+        要掃描的輸入形狀列表，例如 ["(1, 3, 224, 224)", "(4, 3, 224, 224)"]。
+    stats : list or None
+        若提供，語法檢查與匯出子程序的資源使用紀錄將附加到此列表。
+    work_dir : str or None
+        匯出檔案的工作目錄，None 時使用 ./users/<user_id>。
+
+    Returns
+    -------
+    dict
+        形狀標籤對應 {"shape": list, "onnx": 路徑或 None, "error": 錯誤訊息或 None}，順序與輸入相同。
+
+    Raises
+    ------
+    RuntimeError
+        當程式碼為空、語法錯誤、形狀格式錯誤或模型無法實例化時拋出。
+    StageLimitExceeded
+        當子程序超過逾時、CPU 或記憶體限制時拋出。
+    """
+    if not pytorch_code.strip():
+        raise RuntimeError('❌ PyTorch 程式碼為空')
+    shapes = {}
+    for input_shape in input_shapes:
+        shape = parse_input_shape(input_shape)
+        shapes[shape_tag(shape)] = list(shape)
+
+    result = run_limited([sys.executable, '-c', pytorch_code], 'pytorch_check', stats=stats)
+    if result.returncode != 0:
+        raise RuntimeError(f"PyTorch code import failed: {result.stderr}\n{result.stdout}")
+
+    user_dir = work_dir or os.path.join('.', 'users', str(user_id))
+    os.makedirs(user_dir, exist_ok=True)
+    exports = {tag: {'shape': shape, 'onnx': os.path.abspath(os.path.join(user_dir, f'model_{tag}.onnx'))}
+               for tag, shape in shapes.items()}
+    results_path = os.path.join(user_dir, 'export_sweep.json')
+    for entry in exports.values():
+        detach(entry['onnx'])
+    full_code = pytorch_code.rstrip() + f"""
+import json as _json
+model = {model_entrypoint}()
+model.eval()
+_results = {{}}
+for _tag, _spec in {json.dumps(exports)}.items():
+    try:
+        torch.onnx.export(model, torch.randn(*_spec['shape']), _spec['onnx'], opset_version=11)
+        _results[_tag] = None
+    except Exception as _e:
+        _results[_tag] = repr(_e)
+with open(r'{os.path.abspath(results_path)}', 'w') as _f:
+    _json.dump(_results, _f)
+"""
+    export_path = os.path.join(user_dir, 'export_sweep.py')
+    with open(export_path, 'w', encoding='utf-8') as f:
+        f.write(full_code)
+    log.info("Generated export_sweep.py %s", payload_digest(full_code))
+    log.debug("export_sweep.py:\n%s", full_code)
+    result2 = run_limited([sys.executable, export_path], 'pytorch_export', stats=stats)
+    if result2.returncode != 0 or not os.path.exists(results_path):
+        raise RuntimeError(f"export_sweep.py failed: {result2.stderr}\n{result2.stdout}")
+    with open(results_path, 'r', encoding='utf-8') as f:
+        errors = json.load(f)
+
+    for tag, entry in exports.items():
+        entry['error'] = errors.get(tag)
+        if entry['error'] is None:
+            try:
+                check_onnx_io(entry['onnx'], entry['shape'])
+            except RuntimeError as e:
+                entry['error'] = str(e)
+        if entry['error'] is not None:
+            entry['onnx'] = None
+    return exports
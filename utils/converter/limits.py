@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""
+版權所有 © 2025 工業技術研究院 (ITRI) 及貢獻者。
+保留所有權利。
+
+本檔案由 Microsoft 訂閱的 GitHub Copilot AI 助理協助產生與優化，部分內容經人工審閱與修正。
+
+本程式碼僅供學術研究與內部使用，未經授權不得用於商業用途。
+
+重新發佈與使用（無論原始或二進位形式，是否經過修改）僅限於下列條件下：
+
+* 原始碼之再發佈必須保留上述版權聲明、條件列表及下列免責聲明。
+* 二進位形式之再發佈必須於相關文件或其他資料中重現上述版權聲明、條件列表及下列免責聲明。
+* 未經事先書面同意，不得使用工業技術研究院 (ITRI) 或貢獻者之名稱為本軟體衍生產品背書或推廣。
+
+本軟體以「現狀」提供，不附任何明示或暗示之保證，包括但不限於適售性及特定用途之適用性。工業技術研究院 (ITRI) 或貢獻者對於因本軟體使用或無法使用所生之任何直接、間接、附帶、特殊、懲罰性或衍生性損害（包括但不限於替代商品或服務之取得、使用損失、資料遺失、營業中斷等），無論於任何理論下（契約、侵權或其他），即使已被告知可能發生該等損害，亦不負任何責任。
+"""
+
+import os
+import signal
+import resource
+import subprocess
+import threading
+import time
+import uuid
+import logging
+
+"""
+Conversion Subprocess Resource Limits
+=====================================
+轉換子程序的資源限制工具，為 PyTorch 匯出、onnx2tf 與 ncc-tflite 等外部程序
+套用牆鐘逾時、RLIMIT_CPU 與 cgroup v2 記憶體限制，並透過 wait4 的 rusage
+記錄每個階段的峰值 RSS 與 CPU 時間；使用 cgroup 時另記錄 memory.peak。
+限制於子程序 exec 前在子程序內套用（preexec_fn 只呼叫 setrlimit 與寫入 cgroup.procs，
+不取用任何鎖），子程序與其子孫自第一個指令起即受限制；未設定任何限制時不使用 preexec_fn。
+記憶體上限優先以 cgroup memory.max 實施；未設定 JOB_CGROUP_PARENT 或無法建立 cgroup 時
+退回 RLIMIT_AS。RLIMIT_AS 限制的是虛擬位址空間，TensorFlow 與 onnx2tf 會預留遠大於實際用量的
+位址空間，此時 JOB_MEMORY_LIMIT_MB 需相應放寬，否則這些階段會直接失敗。
+資源紀錄含開始時間，供 utils.memory 計算平行階段的工作峰值記憶體。
+
+Configuration (環境變數)
+------------------------
+STAGE_TIMEOUT_<STAGE> : 各階段牆鐘逾時秒數，例如 STAGE_TIMEOUT_ONNX2TF=1800
+JOB_MEMORY_LIMIT_MB   : 每個子程序的記憶體上限 (MB，cgroup memory.max，無 cgroup 時為 RLIMIT_AS)，0 表示不限制
+JOB_CPU_LIMIT_SECONDS : 每個子程序的 CPU 時間上限 (秒)，0 表示不限制
+JOB_CGROUP_PARENT     : 已委派的 cgroup v2 目錄，設定時記憶體上限以 memory.max 實施
+
+Functions
+---------
+stage_timeout : 取得指定階段的逾時設定
+run_limited : 在資源限制下執行子程序並記錄資源使用量
+format_usage : 將資源使用紀錄格式化為進度訊息
+"""
+
+log = logging.getLogger(__name__)
+
+# Default wall-clock timeouts (seconds) per conversion stage
+DEFAULT_STAGE_TIMEOUTS = {
+    'pytorch_check': 120,
+    'pytorch_export': 600,
+    'direct_export': 1800,
+    'onnx2tf': 1800,
+    'ncc': 600,
+    'litert': 120,
+    'tflite_graph': 300,
+}
+
+JOB_MEMORY_LIMIT_MB = int(os.environ.get('JOB_MEMORY_LIMIT_MB', '0'))
+JOB_CPU_LIMIT_SECONDS = int(os.environ.get('JOB_CPU_LIMIT_SECONDS', '0'))
+JOB_CGROUP_PARENT = os.environ.get('JOB_CGROUP_PARENT', '')
+
+# Markers printed by Python / C++ runtimes when an allocation fails
+_MEMORY_ERROR_MARKERS = ('MemoryError', 'std::bad_alloc', 'Cannot allocate memory', 'out of memory')
+
+
+class StageLimitExceeded(RuntimeError):
+    """
+    階段資源限制超出例外
+    ==================
+    子程序超過牆鐘逾時、CPU 時間或記憶體上限時拋出。
+    繼承 RuntimeError，既有的轉換錯誤處理流程可直接回報給前端。
+    """
+
+
+def stage_timeout(stage):
+    """
+    取得階段逾時設定
+    ==============
+    優先讀取環境變數 STAGE_TIMEOUT_<STAGE>，否則使用預設值。
+
+    Parameters
+    ----------
+    stage : str
+        階段名稱，例如 "onnx2tf"、"ncc"。
+
+    Returns
+    -------
+    float or None
+        逾時秒數，0 或未設定預設值時返回 None（不限制）。
+    """
+    value = os.environ.get(f'STAGE_TIMEOUT_{stage.upper()}')
+    seconds = float(value) if value else DEFAULT_STAGE_TIMEOUTS.get(stage, 0)
+    return seconds or None
+
+
+def _create_cgroup(stage):
+    """建立單次階段使用的 cgroup v2 子目錄，未設定或無權限時返回 None。"""
+    if not JOB_CGROUP_PARENT:
+        return None
+    cgroup_dir = os.path.join(JOB_CGROUP_PARENT, f'{stage}-{uuid.uuid4().hex[:8]}')
+    try:
+        os.makedirs(cgroup_dir)
+        if JOB_MEMORY_LIMIT_MB:
+            with open(os.path.join(cgroup_dir, 'memory.max'), 'w') as f:
+                f.write(str(JOB_MEMORY_LIMIT_MB * 1024 * 1024))
+            with open(os.path.join(cgroup_dir, 'memory.swap.max'), 'w') as f:
+                f.write('0')
+        return cgroup_dir
+    except OSError as e:
+        log.warning("cgroup unavailable (%s), falling back to RLIMIT_AS", e)
+        return None
+
+
+def _read_cgroup_stat(cgroup_dir, name, key=None):
+    """讀取 cgroup 統計檔案，例如 memory.peak 或 memory.events 中的 oom_kill。"""
+    try:
+        with open(os.path.join(cgroup_dir, name)) as f:
+            if key is None:
+                return int(f.read().strip())
+            for line in f:
+                field, value = line.split()
+                if field == key:
+                    return int(value)
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def _child_limits(cgroup_dir):
+    """
+    產生在子程序 exec 前執行的限制函式，無任何限制時返回 None。
+
+    函式在 fork 後的子程序內執行，只使用系統呼叫（不取得鎖、不寫入日誌），
+    多執行緒的父程序呼叫時也不會因 fork 時被持有的鎖而卡住。
+    """
+    procs_path = os.path.join(cgroup_dir, 'cgroup.procs') if cgroup_dir else None
+    address_limit = JOB_MEMORY_LIMIT_MB * 1024 * 1024 if JOB_MEMORY_LIMIT_MB and not cgroup_dir else 0
+    if not (procs_path or JOB_CPU_LIMIT_SECONDS or address_limit):
+        return None
+
+    def apply():
+        if procs_path:
+            # Writing 0 moves the writing process itself; children forked later inherit the cgroup
+            fd = os.open(procs_path, os.O_WRONLY)
+            try:
+                os.write(fd, b'0')
+            finally:
+                os.close(fd)
+        if JOB_CPU_LIMIT_SECONDS:
+            # Soft limit delivers SIGXCPU, hard limit follows with SIGKILL
+            resource.setrlimit(resource.RLIMIT_CPU, (JOB_CPU_LIMIT_SECONDS, JOB_CPU_LIMIT_SECONDS + 5))
+        if address_limit:
+            resource.setrlimit(resource.RLIMIT_AS, (address_limit, address_limit))
+
+    return apply
+
+
+def run_limited(cmd, stage, stats=None, check=False, timeout=None):
+    """
+    資源限制下執行子程序
+    ==================
+    以獨立 process group 啟動子程序並套用逾時與資源限制，結束時以 wait4
+    取得該子程序（含其已回收子孫）的 rusage，記錄峰值 RSS 與 CPU 時間。
+    CPU 與記憶體限制在子程序 exec 前套用；無法加入 cgroup 時子程序不會啟動。
+
+    Parameters
+    ----------
+    cmd : list of str
+        要執行的命令列。
+    stage : str
+        階段名稱，用於逾時設定與資源紀錄。
+    stats : list or None
+        若提供，將本階段的資源使用紀錄 (dict) 附加到此列表。
+    check : bool
+        為 True 時，非零結束碼會拋出 subprocess.CalledProcessError。
+    timeout : float or None
+        覆寫階段逾時秒數，None 時使用 stage_timeout(stage)。
+
+    Returns
+    -------
+    subprocess.CompletedProcess
+        包含 returncode、stdout 與 stderr（文字模式）。
+
+    Raises
+    ------
+    StageLimitExceeded
+        超過牆鐘逾時、CPU 時間或記憶體上限時拋出。
+    subprocess.CalledProcessError
+        check=True 且子程序以非零結束碼結束時拋出。
+    """
+    timeout = timeout if timeout is not None else stage_timeout(stage)
+    cgroup_dir = _create_cgroup(stage)
+    start = time.time()
+
+    try:
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            start_new_session=True,
+            preexec_fn=_child_limits(cgroup_dir),
+        )
+    except (OSError, subprocess.SubprocessError):
+        if cgroup_dir:
+            os.rmdir(cgroup_dir)
+        raise
+
+    # Drain pipes in background threads so wait4 can reap the child directly
+    output = {'stdout': '', 'stderr': ''}
+
+    def drain(name, pipe):
+        output[name] = pipe.read()
+        pipe.close()
+
+    readers = [
+        threading.Thread(target=drain, args=('stdout', proc.stdout), daemon=True),
+        threading.Thread(target=drain, args=('stderr', proc.stderr), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+
+    timed_out = threading.Event()
+
+    def kill_group():
+        timed_out.set()
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    timer = threading.Timer(timeout, kill_group) if timeout else None
+    if timer:
+        timer.daemon = True
+        timer.start()
+    try:
+        _, status, rusage = os.wait4(proc.pid, 0)
+    finally:
+        if timer:
+            timer.cancel()
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    for reader in readers:
+        reader.join(timeout=5)
+
+    # ru_maxrss is reported in kilobytes on Linux
+    max_rss_mb = rusage.ru_maxrss / 1024
+    cgroup_peak_mb = None
+    oom_killed = False
+    if cgroup_dir:
+        # memory.peak covers the whole process tree (rusage only reports the largest single process)
+        cgroup_peak_mb = _read_cgroup_stat(cgroup_dir, 'memory.peak') / (1024 * 1024)
+        max_rss_mb = max(max_rss_mb, cgroup_peak_mb)
+        oom_killed = _read_cgroup_stat(cgroup_dir, 'memory.events', 'oom_kill') > 0
+        try:
+            os.rmdir(cgroup_dir)
+        except OSError:
+            pass
+
+    usage = {
+        'stage': stage,
+        'started_at': round(start, 3),
+        'wall_seconds': round(time.time() - start, 3),
+        'cpu_seconds': round(rusage.ru_utime + rusage.ru_stime, 3),
+        'max_rss_mb': round(max_rss_mb, 1),
+        'returncode': proc.returncode,
+    }
+    if cgroup_peak_mb is not None:
+        usage['cgroup_peak_mb'] = round(cgroup_peak_mb, 1)
+    if stats is not None:
+        stats.append(usage)
+
+    stdout, stderr = output['stdout'], output['stderr']
+    if timed_out.is_set():
+        raise StageLimitExceeded(f"⏱️ {stage} exceeded wall-clock limit of {timeout:g}s")
+    if proc.returncode == -signal.SIGXCPU or (
+            JOB_CPU_LIMIT_SECONDS and proc.returncode == -signal.SIGKILL
+            and usage['cpu_seconds'] >= JOB_CPU_LIMIT_SECONDS):
+        raise StageLimitExceeded(f"⏱️ {stage} exceeded CPU time limit of {JOB_CPU_LIMIT_SECONDS}s")
+    if proc.returncode != 0 and (oom_killed or (JOB_MEMORY_LIMIT_MB
+                                                and any(m in stderr for m in _MEMORY_ERROR_MARKERS))):
+        raise StageLimitExceeded(f"💾 {stage} exceeded memory limit of {JOB_MEMORY_LIMIT_MB} MB")
+    if check and proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, output=stdout, stderr=stderr)
+    return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+
+
+def format_usage(usage):
+    """
+    資源使用紀錄格式化
+    ================
+    將 run_limited 的資源紀錄轉為單行進度訊息。
+
+    Parameters
+    ----------
+    usage : dict
+        run_limited 產生的資源紀錄。
+
+    Returns
+    -------
+    str
+        例如 "📈 onnx2tf: 12.3s wall, 40.1s CPU, peak RSS 1520.0 MB"。
+    """
+    return (f"📈 {usage['stage']}: {usage['wall_seconds']:.1f}s wall, "
+            f"{usage['cpu_seconds']:.1f}s CPU, peak RSS {usage['max_rss_mb']:.1f} MB")
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+版權所有 © 2025 工業技術研究院 (ITRI) 及貢獻者。
+保留所有權利。
+
+本檔案由 Microsoft 訂閱的 GitHub Copilot AI 助理協助產生與優化，部分內容經人工審閱與修正。
+
+本程式碼僅供學術研究與內部使用，未經授權不得用於商業用途。
+
+重新發佈與使用（無論原始或二進位形式，是否經過修改）僅限於下列條件下：
+
+* 原始碼之再發佈必須保留上述版權聲明、條件列表及下列免責聲明。
+* 二進位形式之再發佈必須於相關文件或其他資料中重現上述版權聲明、條件列表及下列免責聲明。
+* 未經事先書面同意，不得使用工業技術研究院 (ITRI) 或貢獻者之名稱為本軟體衍生產品背書或推廣。
+
+本軟體以「現狀」提供，不附任何明示或暗示之保證，包括但不限於適售性及特定用途之適用性。工業技術研究院 (ITRI) 或貢獻者對於因本軟體使用或無法使用所生之任何直接、間接、附帶、特殊、懲罰性或衍生性損害（包括但不限於替代商品或服務之取得、使用損失、資料遺失、營業中斷等），無論於任何理論下（契約、侵權或其他），即使已被告知可能發生該等損害，亦不負任何責任。
+"""
+
+import sys
+import json
+import logging
+from .limits import run_limited, StageLimitExceeded
+
+"""
+LiteRT Model Inspection
+=======================
+以輕量的 ai_edge_litert 直譯器檢查 TFLite 模型：讀取輸入輸出張量資訊、統計運算子，
+或以隨機輸入執行一次推論測試。檢查在獨立的子程序中執行（經 limits.run_limited 套用逾時與資源限制），
+Web 程序不需載入 TensorFlow，直譯器崩潰也只會使該次檢查失敗。
+
+直譯器以檔案路徑建立，模型以 mmap 對映而非讀入記憶體；只需張量資訊或運算子時不配置張量。
+未安裝 ai_edge_litert 時子程序退回使用 tf.lite.Interpreter。
+
+Configuration (環境變數)
+------------------------
+STAGE_TIMEOUT_LITERT : 單次檢查的牆鐘逾時秒數（見 limits 模組），預設 120
+
+Functions
+---------
+is_tflite_file : 以檔案標頭快速判斷是否為 TFLite flatbuffer
+inspect_tflite : 於子程序中檢查 TFLite 模型
+"""
+
+log = logging.getLogger(__name__)
+
+# FlatBuffer file identifier of the TFLite schema, stored right after the root table offset
+TFLITE_FILE_IDENTIFIER = b'TFL3'
+
+# Runs as `python -c _INSPECT_SCRIPT <mode> <path>` and prints one JSON object; it must not import this package
+_INSPECT_SCRIPT = r'''
+import sys, json
+try:
+    from ai_edge_litert.interpreter import Interpreter
+except ImportError:
+    from tensorflow.lite.python.interpreter import Interpreter
+
+mode, path = sys.argv[1], sys.argv[2]
+# model_path lets the runtime mmap the flatbuffer instead of copying it into a Python bytes object
+interpreter = Interpreter(model_path=path)
+
+def describe(details):
+    return [{'name': d['name'], 'shape': d['shape'].tolist(), 'shape_signature': d['shape_signature'].tolist(),
+             'dtype': d['dtype'].__name__} for d in details]
+
+# Tensor details come from the model itself; no tensor is allocated until the smoke test
+result = {'inputs': describe(interpreter.get_input_details()), 'outputs': describe(interpreter.get_output_details())}
+if mode == 'ops':
+    result['ops'] = [op['op_name'] for op in interpreter._get_ops_details()]
+elif mode == 'smoke':
+    import numpy as np
+    try:
+        interpreter.allocate_tensors()
+        for d in interpreter.get_input_details():
+            if np.issubdtype(d['dtype'], np.floating):
+                data = np.random.randn(*d['shape']).astype(d['dtype'])
+            else:
+                data = np.zeros(d['shape'], dtype=d['dtype'])
+            interpreter.set_tensor(d['index'], data)
+        interpreter.invoke()
+        result['inference_ok'] = True
+    except Exception as e:
+        result['inference_ok'] = False
+        result['inference_error'] = str(e)
+print(json.dumps(result))
+'''
+
+
+def is_tflite_file(path):
+    """
+    TFLite 檔案標頭檢查
+    =================
+    只讀取前 8 個位元組，確認 flatbuffer 檔案識別碼為 "TFL3"；不啟動子程序，用於在編譯前快速拒絕錯誤的上傳檔案。
+
+    Parameters
+    ----------
+    path : str
+        模型檔案路徑。
+
+    Returns
+    -------
+    bool
+        檔案可讀且識別碼相符時為 True。
+    """
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(8)
+    except OSError:
+        return False
+    return len(header) == 8 and header[4:8] == TFLITE_FILE_IDENTIFIER
+
+
+def inspect_tflite(tflite_path, mode='io', stats=None):
+    """
+    TFLite 模型檢查
+    =============
+    於子程序中以 LiteRT 直譯器載入模型並返回張量資訊。
+
+    Parameters
+    ----------
+    tflite_path : str
+        TensorFlow Lite 模型檔案路徑。
+    mode : str
+        "io" 只讀取輸入輸出張量資訊（不配置張量）；"ops" 另列出運算子；
+        "smoke" 另配置張量並以隨機輸入執行一次推論。
+    stats : list or None
+        若提供，檢查子程序的資源使用紀錄將附加到此列表。
+
+    Returns
+    -------
+    dict
+        {"inputs": [...], "outputs": [...]}，每個張量為 {"name", "shape", "shape_signature", "dtype"}；
+        "ops" 模式另含 "ops"（運算子名稱列表，依執行順序），
+        "smoke" 模式另含 "inference_ok" 與失敗時的 "inference_error"。
+
+    Raises
+    ------
+    RuntimeError
+        模型無法載入、檢查子程序失敗或超過資源限制時拋出。
+    """
+    try:
+        result = run_limited([sys.executable, '-c', _INSPECT_SCRIPT, mode, tflite_path], 'litert', stats=stats)
+    except StageLimitExceeded:
+        raise
+    except OSError as e:
+        raise RuntimeError(f"TFLite inspection could not start: {e}")
+    if result.returncode != 0:
+        lines = (result.stderr or '').strip().splitlines()
+        raise RuntimeError(f"TFLite model load failed: {lines[-1] if lines else f'exit code {result.returncode}'}")
+    try:
+        return json.loads(result.stdout.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        raise RuntimeError(f"TFLite inspection returned no result for {tflite_path}")
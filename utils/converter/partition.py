@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+"""
+版權所有 © 2025 工業技術研究院 (ITRI) 及貢獻者。
+保留所有權利。
+
+本檔案由 Microsoft 訂閱的 GitHub Copilot AI 助理協助產生與優化，部分內容經人工審閱與修正。
+
+本程式碼僅供學術研究與內部使用，未經授權不得用於商業用途。
+
+重新發佈與使用（無論原始或二進位形式，是否經過修改）僅限於下列條件下：
+
+* 原始碼之再發佈必須保留上述版權聲明、條件列表及下列免責聲明。
+* 二進位形式之再發佈必須於相關文件或其他資料中重現上述版權聲明、條件列表及下列免責聲明。
+* 未經事先書面同意，不得使用工業技術研究院 (ITRI) 或貢獻者之名稱為本軟體衍生產品背書或推廣。
+
+本軟體以「現狀」提供，不附任何明示或暗示之保證，包括但不限於適售性及特定用途之適用性。工業技術研究院 (ITRI) 或貢獻者對於因本軟體使用或無法使用所生之任何直接、間接、附帶、特殊、懲罰性或衍生性損害（包括但不限於替代商品或服務之取得、使用損失、資料遺失、營業中斷等），無論於任何理論下（契約、侵權或其他），即使已被告知可能發生該等損害，亦不負任何責任。
+"""
+
+import os
+import json
+import time
+import shutil
+import tempfile
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from .sdk import default_sdk
+from .devices import arch_targets
+from .scratch import scratch_root
+from .diagnose import (read_tflite_graph, tflite_graph_ops, segment_io, extract_tflite_ops, compile_segments,
+                       bisect_failures, flush_segment_cache, DIAGNOSE_MAX_PARALLEL)
+
+"""
+Hybrid NPU/CPU Partitioning
+===========================
+架構無法編譯整個模型時（例如偵測模型最後的 NMS），將 TFLite 依執行順序分割為 NPU 可接受的最大連續子圖
+（各自編譯為 DLA）與其間在 CPU 執行的 TFLite 片段，並以 manifest 描述各片段的執行順序與張量連接。
+
+流程：完整模型視為已知失敗，以 diagnose.bisect_failures 找出失敗的運算子並改由 CPU 執行；
+其餘的連續範圍平行編譯為 DLA，仍失敗的範圍再次切分搜尋，直到所有 NPU 範圍皆編譯成功。
+子圖的編譯結果沿用診斷的簽章快取 (DIAGNOSE_CACHE_PATH)。
+
+Manifest
+--------
+{"model", "arch", "sdk", "inputs", "outputs", "flops": {"total", "npu", "npu_ratio"},
+ "segments": [{"index", "device": "npu" / "cpu", "file", "ops": [首, 尾], "op_types", "inputs", "outputs", "flops"}]}
+片段依序執行；inputs / outputs 為原模型的張量名稱，前一片段（或模型輸入）產生的同名張量即為下一片段的輸入。
+FLOPs 依運算子形狀估計（卷積、全連接與矩陣乘法計入乘加，其他運算子以輸出元素數計）。
+
+Configuration (環境變數)
+------------------------
+PARTITION_MAX_ROUNDS : 重新切分仍失敗 NPU 範圍的輪數上限，超過時剩餘範圍改由 CPU 執行，預設 8
+PARTITION_MIN_NPU_SHARE : FLOPs 佔比低於此值的 NPU 範圍併入相鄰的 CPU 片段，預設 0.01
+（同時編譯的子圖數與編譯次數上限沿用 DIAGNOSE_MAX_PARALLEL、DIAGNOSE_MAX_COMPILES）
+
+Functions
+---------
+op_flops : 估計單一運算子的 FLOPs
+partition_tflite : 分割模型並編譯各 NPU 片段
+format_partition : 產生分割結果訊息
+"""
+
+log = logging.getLogger(__name__)
+
+PARTITION_MAX_ROUNDS = int(os.environ.get('PARTITION_MAX_ROUNDS', '8'))
+PARTITION_MIN_NPU_SHARE = float(os.environ.get('PARTITION_MIN_NPU_SHARE', '0.01'))
+
+
+def _elements(shape):
+    total = 1
+    for dim in shape:
+        # Dynamic dimensions count as 1
+        total *= max(int(dim), 1)
+    return total
+
+
+def op_flops(op):
+    """
+    運算子 FLOPs 估計
+    ===============
+    依 tflite_graph_ops 的運算子資訊估計浮點運算數：卷積、全連接與矩陣乘法為 2 × 乘加數，
+    其他運算子以輸出元素數計。
+
+    Parameters
+    ----------
+    op : dict
+        tflite_graph_ops 的運算子項目。
+
+    Returns
+    -------
+    int
+        估計的 FLOPs。
+    """
+    out_elements = _elements(op['outputs'][0]['shape']) if op['outputs'] else 0
+    inputs = op['inputs']
+    weights = [tensor['shape'] for tensor in inputs if tensor.get('const')]
+    name = op['op']
+    if name in ('CONV_2D', 'CONV_3D') and weights:
+        # Filter [out, (d,) h, w, in]
+        return 2 * out_elements * _elements(weights[0][1:])
+    if name == 'DEPTHWISE_CONV_2D' and weights:
+        # Filter [1, h, w, out]
+        return 2 * out_elements * _elements(weights[0][1:-1])
+    if name == 'FULLY_CONNECTED' and weights:
+        return 2 * out_elements * max(int(weights[0][-1]), 1)
+    if name == 'TRANSPOSE_CONV' and len(inputs) >= 3:
+        # Inputs: output_shape, filter [out, h, w, in], data
+        return 2 * _elements(inputs[2]['shape']) * _elements(inputs[1]['shape'][:3])
+    if name == 'BATCH_MATMUL' and inputs and inputs[0]['shape']:
+        return 2 * out_elements * max(int(inputs[0]['shape'][-1]), 1)
+    return out_elements
+
+
+def _runs(count, cpu):
+    """不在 CPU 集合中的最大連續運算子範圍。"""
+    runs, current = [], []
+    for index in range(count):
+        if index in cpu:
+            if current:
+                runs.append(current)
+            current = []
+        else:
+            current.append(index)
+    if current:
+        runs.append(current)
+    return runs
+
+
+def _segment_name(stem, arch, run, device='npu'):
+    suffix = '.cpu' if device == 'cpu' else ''
+    return f'{stem}.{arch}.ops{run[0]:04d}-{run[-1]:04d}{suffix}.tflite'
+
+
+def partition_tflite(tflite_path, arch, sdk=None, flags=None, error=None, work_dir=None, output_dir=None):
+    """
+    NPU/CPU 混合分割
+    ==============
+    找出架構可接受的最大連續子圖並平行編譯為 DLA，無法編譯的運算子組成 CPU 執行的 TFLite 片段，
+    最後寫出描述片段連接方式的 manifest。
+
+    失敗的運算子集合中，單一運算子直接改由 CPU 執行；僅在組合時失敗的範圍將最後一個運算子改由 CPU 執行，
+    其餘運算子留在 NPU 範圍中重新編譯；達到編譯上限仍未縮小的範圍整段改由 CPU 執行。
+
+    Parameters
+    ----------
+    tflite_path : str
+        ncc-tflite 編譯失敗的 TensorFlow Lite 模型路徑。
+    arch : str
+        架構鍵值（見裝置登錄）。
+    sdk : dict or None
+        使用的 NeuronPilot SDK 資訊，None 時使用預設 SDK。
+    flags : list of str or None
+        ncc-tflite 參數，None 時使用架構的 ncc_flags。
+    error : str or None
+        完整模型的編譯錯誤。
+    work_dir : str or None
+        子圖檔案的暫存目錄根，None 時使用 CONVERSION_SCRATCH_DIR。
+    output_dir : str or None
+        片段 DLA、TFLite 與 manifest 的輸出目錄，None 時為 TFLite 所在目錄。
+
+    Returns
+    -------
+    dict
+        manifest 內容，另含 "manifest_path"、"files"（片段角色對應檔案路徑）、"compiles"、"cached"、
+        "seconds" 與 "truncated"。
+
+    Raises
+    ------
+    RuntimeError
+        SDK 不存在或模型無法解析時拋出。
+    """
+    sdk = sdk or default_sdk()
+    if sdk is None:
+        raise RuntimeError("NeuronPilot SDK not found (ncc-tflite unavailable)")
+    flags = flags if flags is not None else arch_targets()[arch]['ncc_flags']
+    try:
+        graph = read_tflite_graph(tflite_path)
+    except RuntimeError as e:
+        raise RuntimeError(f"Cannot parse TFLite graph for partitioning: {e}")
+    ops = tflite_graph_ops(graph)
+    if not ops:
+        raise RuntimeError("TFLite graph has no operators to partition")
+
+    start = time.time()
+    output_dir = output_dir or os.path.dirname(tflite_path)
+    os.makedirs(output_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(tflite_path))[0]
+    counts = {'compiles': 0, 'cached': 0}
+    cpu = set()
+    compiled = {}
+    truncated = False
+    # The whole model is known to fail; start from its failing ops
+    failing_runs = [(list(range(len(ops))), error)]
+    temp_dir = tempfile.mkdtemp(prefix='partition_', dir=work_dir or scratch_root())
+    try:
+        with ThreadPoolExecutor(max_workers=max(2, DIAGNOSE_MAX_PARALLEL)) as pool:
+            for round_index in range(PARTITION_MAX_ROUNDS):
+                for run, run_error in failing_runs:
+                    failing, stopped = bisect_failures(pool, graph, run, arch, sdk, flags, run_error, temp_dir, counts)
+                    truncated = truncated or stopped
+                    for item in failing:
+                        if item.get('unresolved') or not item['combined']:
+                            cpu.update(item['indices'])
+                        else:
+                            cpu.add(item['indices'][-1])
+                # Compile every NPU run that is not already a DLA, all in parallel
+                pending = [run for run in _runs(len(ops), cpu) if tuple(run) not in compiled]
+                paths = [os.path.join(output_dir, _segment_name(stem, arch, run)) for run in pending]
+                results = compile_segments(pool, graph, pending, arch, sdk, flags, temp_dir, paths)
+                failing_runs = []
+                for run, result in zip(pending, results):
+                    counts['cached' if result['cached'] else 'compiles'] += 1
+                    if result['ok']:
+                        compiled[tuple(run)] = result
+                        continue
+                    if result.get('tflite') and os.path.exists(result['tflite']):
+                        os.remove(result['tflite'])
+                    failing_runs.append((run, result['error']))
+                log.info("%s partition round %d: %d NPU run(s) compiled, %d failing, %d op(s) on CPU", arch,
+                         round_index + 1, len(pending) - len(failing_runs), len(failing_runs), len(cpu))
+                if not failing_runs:
+                    break
+            else:
+                truncated = True
+                for run, _ in failing_runs:
+                    cpu.update(run)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        flush_segment_cache()
+
+    # NPU runs that only hold constant ops produce no DLA; they run on the CPU with their neighbours
+    # as do runs too small to be worth the NPU <-> CPU hand-off
+    total_flops = sum(op_flops(op) for op in ops) or 1
+    npu = {}
+    for run, result in compiled.items():
+        if not result.get('dla'):
+            continue
+        if sum(op_flops(ops[i]) for i in run) / total_flops < PARTITION_MIN_NPU_SHARE:
+            for path in (result['dla'], result.get('tflite')):
+                if path and os.path.exists(path):
+                    os.remove(path)
+            continue
+        npu.update({index: run for index in run})
+
+    def tensor_names(indices):
+        return [graph['tensors'][t]['name'] for t in indices]
+
+    runs = []
+    index = 0
+    while index < len(ops):
+        if index in npu:
+            run = list(npu[index])
+            result = compiled[tuple(run)]
+            # The DLA is what ships; the segment TFLite only fed ncc-tflite
+            if result.get('tflite') and os.path.exists(result['tflite']):
+                os.remove(result['tflite'])
+            runs.append(('npu', run, result['dla']))
+        else:
+            run = [index]
+            while run[-1] + 1 < len(ops) and run[-1] + 1 not in npu:
+                run.append(run[-1] + 1)
+            runs.append(('cpu', run, os.path.join(output_dir, _segment_name(stem, arch, run, 'cpu'))))
+        index = run[-1] + 1
+    # All CPU segments are cut by one subprocess
+    cpu_runs = [(run, path, True) for device, run, path in runs if device == 'cpu']
+    for item in extract_tflite_ops(graph, cpu_runs, output_dir):
+        if 'error' in item:
+            raise RuntimeError(f"Cannot extract CPU segment: {item['error']}")
+
+    segments = []
+    files = {}
+    for device, run, path in runs:
+        _, inputs, outputs = segment_io(graph, run)
+        op_types = {}
+        for i in run:
+            op_types[ops[i]['op']] = op_types.get(ops[i]['op'], 0) + 1
+        segments.append({
+            'index': len(segments),
+            'device': device,
+            'file': os.path.basename(path),
+            'ops': [run[0], run[-1]],
+            'op_types': op_types,
+            'inputs': tensor_names(inputs),
+            'outputs': tensor_names(outputs),
+            'flops': sum(op_flops(ops[i]) for i in run),
+        })
+        files[f'{arch}.part{len(segments) - 1:02d}'] = path
+
+    total_flops = sum(segment['flops'] for segment in segments)
+    npu_flops = sum(segment['flops'] for segment in segments if segment['device'] == 'npu')
+    manifest = {
+        'model': os.path.basename(tflite_path),
+        'arch': arch,
+        'sdk': sdk['version'],
+        'flags': flags,
+        'inputs': tensor_names(graph['inputs']),
+        'outputs': tensor_names(graph['outputs']),
+        'flops': {
+            'total': total_flops,
+            'npu': npu_flops,
+            'npu_ratio': round(npu_flops / total_flops, 4) if total_flops else 0.0,
+        },
+        'segments': segments,
+    }
+    manifest_path = os.path.join(output_dir, f'{stem}.{arch}.partitions.json')
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    files[f'{arch}.manifest'] = manifest_path
+    log.info("%s partitioned into %d segment(s), %.1f%% of FLOPs on NPU", arch, len(segments),
+             manifest['flops']['npu_ratio'] * 100)
+    return dict(manifest, manifest_path=manifest_path, files=files, compiles=counts['compiles'],
+                cached=counts['cached'], seconds=round(time.time() - start, 3), truncated=truncated)
+
+
+def format_partition(arch, partition):
+    """
+    分割結果訊息
+    ==========
+    產生單一架構的片段列表：裝置、運算子範圍、主要運算子類型與 FLOPs 佔比。
+
+    Parameters
+    ----------
+    arch : str
+        架構鍵值。
+    partition : dict
+        partition_tflite 的結果。
+
+    Returns
+    -------
+    list of str
+        訊息行。
+    """
+    label = arch_targets()[arch]['label'] if arch in arch_targets() else arch
+    segments = partition['segments']
+    npu_count = sum(1 for segment in segments if segment['device'] == 'npu')
+    total = partition['flops']['total'] or 1
+    lines = [f"🧩 {label} hybrid partition: {partition['flops']['npu_ratio']:.1%} of FLOPs on NPU "
+             f"({npu_count} DLA + {len(segments) - npu_count} CPU segment(s), {partition['compiles']} compile(s), "
+             f"{partition['cached']} cached, {partition['seconds']:.1f}s)"]
+    for segment in segments:
+        mark = '🟢 NPU' if segment['device'] == 'npu' else '🟠 CPU'
+        first, last = segment['ops']
+        types = ', '.join(list(segment['op_types'])[:4]) + (' ...' if len(segment['op_types']) > 4 else '')
+        share = segment['flops'] / total
+        lines.append(f"   {mark} #{first}-#{last} ({last - first + 1} ops, {share:.1%} FLOPs): {types}")
+    if partition['truncated']:
+        lines.append("   ⚠️ Compile budget reached; remaining ranges run on the CPU")
+    return lines
@@ -0,0 +1,407 @@
+# -*- coding: utf-8 -*-
+"""
+版權所有 © 2025 工業技術研究院 (ITRI) 及貢獻者。
+保留所有權利。
+
+本檔案由 Microsoft 訂閱的 GitHub Copilot AI 助理協助產生與優化，部分內容經人工審閱與修正。
+
+本程式碼僅供學術研究與內部使用，未經授權不得用於商業用途。
+
+重新發佈與使用（無論原始或二進位形式，是否經過修改）僅限於下列條件下：
+
+* 原始碼之再發佈必須保留上述版權聲明、條件列表及下列免責聲明。
+* 二進位形式之再發佈必須於相關文件或其他資料中重現上述版權聲明、條件列表及下列免責聲明。
+* 未經事先書面同意，不得使用工業技術研究院 (ITRI) 或貢獻者之名稱為本軟體衍生產品背書或推廣。
+
+本軟體以「現狀」提供，不附任何明示或暗示之保證，包括但不限於適售性及特定用途之適用性。工業技術研究院 (ITRI) 或貢獻者對於因本軟體使用或無法使用所生之任何直接、間接、附帶、特殊、懲罰性或衍生性損害（包括但不限於替代商品或服務之取得、使用損失、資料遺失、營業中斷等），無論於任何理論下（契約、侵權或其他），即使已被告知可能發生該等損害，亦不負任何責任。
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from ..log import log_context
+from ..store import get_store, store_is_shared, publish_file, fetch_blob
+
+"""
+Stage-Graph Pipeline Engine
+===========================
+轉換管線引擎：每個階段 (Stage) 宣告其輸入與輸出名稱，引擎依資料相依性自動決定執行順序，
+相依條件滿足的階段平行執行，輸出已快取的階段直接略過，並產生結構化事件供 SSE 轉接器使用。
+
+Event Format
+------------
+每個事件為 dict，包含 message（前端顯示文字）以及：
+- stage : 階段名稱
+- status : "started" / "done" / "cached" / "failed" / "skipped"
+- seconds : 階段耗時（done 事件）
+- error : 錯誤訊息（failed 事件）
+
+Classes
+-------
+Stage : 管線階段定義
+StageCache : 以輸入內容雜湊為鍵的階段輸出快取
+Pipeline : 階段圖執行引擎
+
+Functions
+---------
+to_sse : 將結構化事件轉為 SSE 字串
+"""
+
+log = logging.getLogger(__name__)
+
+PIPELINE_MAX_WORKERS = int(os.environ.get('PIPELINE_MAX_WORKERS', '4'))
+
+# Uploads of shared cache entries run off the pipeline loop
+_shared_writer = ThreadPoolExecutor(max_workers=2, thread_name_prefix='stage-cache')
+
+# (path, inode, mtime_ns, size) -> content SHA-256, so unchanged inputs are hashed once across stages and jobs
+_file_digests = OrderedDict()
+_file_digests_lock = threading.Lock()
+FILE_DIGEST_CACHE_MAX = 4096
+
+
+def to_sse(event):
+    """
+    SSE 轉接器
+    ========
+    將管線的結構化事件轉為 Server-sent event 字串。
+
+    Parameters
+    ----------
+    event : dict
+        管線事件。
+
+    Returns
+    -------
+    str
+        'data: {...}\\n\\n' 格式的字串。
+    """
+    return f'data: {json.dumps(event)}\n\n'
+
+
+class Stage:
+    """
+    管線階段
+    ======
+    以輸入與輸出名稱宣告資料相依性的轉換步驟。
+
+    Parameters
+    ----------
+    name : str
+        階段名稱，於同一管線內唯一。
+    func : callable
+        以輸入名稱為關鍵字參數呼叫，另傳入 stats（資源使用紀錄列表）。
+        單一輸出時可直接返回值，多個輸出時返回以輸出名稱為鍵的 dict。
+    inputs : list of str
+        所需的輸入名稱。
+    outputs : list of str
+        產生的輸出名稱。
+    start : str or None
+        開始時的進度訊息。
+    done : str or None
+        成功時的進度訊息，可使用輸出名稱作為格式化欄位。
+    failed : str or None
+        失敗時的進度訊息，可使用 {error} 欄位。
+    cacheable : bool
+        是否可快取（輸出須為檔案路徑或可序列化的值）。
+    key_inputs : list of str or None
+        組成快取鍵的輸入名稱，None 時使用全部輸入（例如排除工作目錄以跨使用者共用）。
+    cache_salt : str
+        額外加入快取鍵的字串，用於區分不影響輸入但影響輸出的設定（例如 SDK 版本）。
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=(), start=None, done=None, failed=None, cacheable=True,
+                 key_inputs=None, cache_salt=''):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.start = start
+        self.done = done
+        self.failed = failed or f'❌ {name} failed: {{error}}'
+        self.cacheable = cacheable
+        self.key_inputs = list(key_inputs) if key_inputs is not None else self.inputs
+        self.cache_salt = cache_salt
+
+    def __call__(self, context, stats):
+        kwargs = {name: context[name] for name in self.inputs}
+        value = self.func(stats=stats, **kwargs)
+        if len(self.outputs) == 1 and not isinstance(value, dict):
+            return {self.outputs[0]: value}
+        return dict(value or {})
+
+
+def _hash_file(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _file_fingerprint(path):
+    """檔案內容 SHA-256，以 (路徑, inode, 修改時間, 大小) 記憶，檔案未變更時不重新讀取。"""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_ino, st.st_mtime_ns, st.st_size)
+    with _file_digests_lock:
+        digest = _file_digests.get(memo_key)
+        if digest is not None:
+            _file_digests.move_to_end(memo_key)
+            return digest
+    digest = _hash_file(path)
+    with _file_digests_lock:
+        _file_digests[memo_key] = digest
+        while len(_file_digests) > FILE_DIGEST_CACHE_MAX:
+            _file_digests.popitem(last=False)
+    return digest
+
+
+def _value_fingerprint(value):
+    """輸入值的指紋：既有檔案使用內容 SHA-256（見 _file_fingerprint），其他值使用 repr。"""
+    if isinstance(value, str) and os.path.isfile(value):
+        return 'file:' + _file_fingerprint(value)
+    return 'value:' + repr(value)
+
+
+class StageCache:
+    """
+    階段輸出快取
+    ==========
+    以 (階段名稱, 輸入內容指紋) 為鍵保存成功階段的輸出；
+    輸出檔案被清理（例如使用者目錄過期）後，快取項目自動失效。
+    設定共用產出儲存 (ARTIFACT_STORE，見 utils.store) 時，項目另於背景寫入 <namespace>/<鍵值>.json：
+    檔案輸出以內容摘要上傳，其他節點（或重新啟動後）未命中行程內快取時由儲存取回。
+
+    Parameters
+    ----------
+    namespace : str or None
+        儲存中的快取名稱，None 時只使用行程內快取。
+    """
+
+    def __init__(self, namespace=None):
+        self.namespace = namespace
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def key(self, stage, context):
+        h = hashlib.sha256(stage.name.encode('utf-8'))
+        h.update(stage.cache_salt.encode('utf-8'))
+        for name in stage.key_inputs:
+            h.update(name.encode('utf-8'))
+            h.update(_value_fingerprint(context[name]).encode('utf-8'))
+        return h.hexdigest()
+
+    def lookup(self, key):
+        with self._lock:
+            outputs = self._entries.get(key)
+        if outputs is None:
+            return self._load_shared(key)
+        for value in outputs.values():
+            if isinstance(value, str) and os.sep in value and not os.path.exists(value):
+                with self._lock:
+                    self._entries.pop(key, None)
+                return self._load_shared(key)
+        return outputs
+
+    def store(self, key, outputs):
+        with self._lock:
+            self._entries[key] = dict(outputs)
+        if self.namespace and store_is_shared():
+            _shared_writer.submit(contextvars.copy_context().run, self._save_shared, key, dict(outputs))
+
+    def _load_shared(self, key):
+        if not (self.namespace and store_is_shared()):
+            return None
+        try:
+            entry = get_store().get_json(f'{self.namespace}/{key}.json')
+            if not entry:
+                return None
+            outputs = {}
+            for name, item in entry.items():
+                if 'blob' in item:
+                    outputs[name] = fetch_blob(item['blob'], item['name'])
+                    if outputs[name] is None:
+                        return None
+                else:
+                    outputs[name] = item['value']
+        except Exception as e:
+            log.warning("Could not read shared cache entry %s/%s: %s", self.namespace, key[:12], e)
+            return None
+        with self._lock:
+            self._entries[key] = outputs
+        return dict(outputs)
+
+    def _save_shared(self, key, outputs):
+        entry = {}
+        try:
+            for name, value in outputs.items():
+                if isinstance(value, str) and os.path.isfile(value):
+                    entry[name] = {'blob': publish_file(value), 'name': os.path.basename(value)}
+                elif isinstance(value, str) and os.sep in value:
+                    # Directories and vanished files cannot be shared
+                    return
+                else:
+                    json.dumps(value)
+                    entry[name] = {'value': value}
+            get_store().put_json(f'{self.namespace}/{key}.json', entry)
+        except TypeError:
+            return
+        except Exception as e:
+            log.warning("Could not write shared cache entry %s/%s: %s", self.namespace, key[:12], e)
+
+
+# Process-wide cache shared by every job
+DEFAULT_CACHE = StageCache('stages')
+
+
+class Pipeline:
+    """
+    階段圖執行引擎
+    ============
+    依輸入/輸出名稱建立相依關係，所有輸入就緒的階段立即提交到執行緒池平行執行。
+    階段失敗時，依賴其輸出的下游階段會標記為 skipped，其餘分支繼續執行。
+
+    Parameters
+    ----------
+    stages : list of Stage
+        管線階段。
+    cache : StageCache or None
+        階段輸出快取，None 時停用快取。
+    max_workers : int
+        同時執行的階段數上限。
+
+    Attributes
+    ----------
+    context : dict
+        初始輸入與所有成功階段的輸出。
+    stats : list of dict
+        各階段子程序的資源使用紀錄。
+    results : dict
+        階段名稱對應狀態 ("done" / "cached" / "failed" / "skipped")。
+    errors : dict
+        失敗階段名稱對應錯誤訊息。
+    timings : dict
+        成功階段名稱對應耗時秒數。
+    """
+
+    def __init__(self, stages, cache=DEFAULT_CACHE, max_workers=PIPELINE_MAX_WORKERS):
+        names = [stage.name for stage in stages]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate stage names in pipeline: {names}")
+        producers = {}
+        for stage in stages:
+            for output in stage.outputs:
+                if output in producers:
+                    raise ValueError(f"Output '{output}' produced by both {producers[output]} and {stage.name}")
+                producers[output] = stage.name
+        self.stages = list(stages)
+        self.cache = cache
+        self.max_workers = max_workers
+        self.context = {}
+        self.stats = []
+        self.results = {}
+        self.errors = {}
+        self.timings = {}
+
+    def _event(self, stage, status, message, **extra):
+        event = {'message': message, 'stage': stage.name, 'status': status}
+        event.update(extra)
+        if status == 'failed':
+            event['error'] = True
+        return event
+
+    def _run_stage(self, stage, context):
+        start = time.time()
+        with log_context(stage=stage.name):
+            outputs = stage(context, self.stats)
+        missing = [name for name in stage.outputs if name not in outputs]
+        if missing:
+            raise RuntimeError(f"stage did not produce {missing}")
+        return outputs, time.time() - start
+
+    def run(self, initial):
+        """
+        執行管線
+        ======
+        依相依關係排程並執行所有階段，逐步產生結構化事件。
+
+        Parameters
+        ----------
+        initial : dict
+            初始輸入（例如 onnx 路徑、程式碼、工作目錄）。
+
+        Yields
+        ------
+        dict
+            階段事件。
+        """
+        self.context = dict(initial)
+        pending = list(self.stages)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                progressed = False
+                producible = {out for stage in pending for out in stage.outputs}
+                producible |= {out for stage in running.values() for out in stage.outputs}
+                for stage in list(pending):
+                    missing = [name for name in stage.inputs if name not in self.context]
+                    if any(name not in producible for name in missing):
+                        # An upstream stage failed, this branch cannot run
+                        progressed = True
+                        pending.remove(stage)
+                        self.results[stage.name] = 'skipped'
+                        yield self._event(stage, 'skipped', f'⏭️ Skipped {stage.name} (missing {", ".join(missing)})')
+                        continue
+                    if missing:
+                        continue
+                    progressed = True
+                    pending.remove(stage)
+                    key = self.cache.key(stage, self.context) if (self.cache and stage.cacheable) else None
+                    cached = self.cache.lookup(key) if key else None
+                    if cached is not None:
+                        self.context.update(cached)
+                        self.results[stage.name] = 'cached'
+                        message = stage.done.format(**self.context) if stage.done else f'✅ {stage.name} completed'
+                        yield self._event(stage, 'cached', f'⚡ {message} (cached)')
+                        continue
+                    if stage.start:
+                        yield self._event(stage, 'started', stage.start)
+                    # Run in a copy of the caller's context so stage logs keep the job id
+                    future = pool.submit(contextvars.copy_context().run, self._run_stage, stage, dict(self.context))
+                    future.cache_key = key
+                    running[future] = stage
+
+                if not running:
+                    if not progressed:
+                        # Remaining stages wait on each other (dependency cycle)
+                        for stage in pending:
+                            self.results[stage.name] = 'skipped'
+                            yield self._event(stage, 'skipped', f'⏭️ Skipped {stage.name} (unresolvable inputs)')
+                        pending = []
+                    # Newly cached outputs may have unblocked more stages
+                    continue
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage = running.pop(future)
+                    try:
+                        outputs, seconds = future.result()
+                    except Exception as e:
+                        self.results[stage.name] = 'failed'
+                        self.errors[stage.name] = str(e)
+                        yield self._event(stage, 'failed', stage.failed.format(error=e))
+                        continue
+                    self.context.update(outputs)
+                    self.results[stage.name] = 'done'
+                    self.timings[stage.name] = round(seconds, 3)
+                    if future.cache_key:
+                        self.cache.store(future.cache_key, outputs)
+                    message = stage.done.format(**self.context) if stage.done else f'✅ {stage.name} completed'
+                    yield self._event(stage, 'done', message, seconds=round(seconds, 3))
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+版權所有 © 2025 工業技術研究院 (ITRI) 及貢獻者。
+保留所有權利。
+
+本檔案由 Microsoft 訂閱的 GitHub Copilot AI 助理協助產生與優化，部分內容經人工審閱與修正。
+
+本程式碼僅供學術研究與內部使用，未經授權不得用於商業用途。
+
+重新發佈與使用（無論原始或二進位形式，是否經過修改）僅限於下列條件下：
+
+* 原始碼之再發佈必須保留上述版權聲明、條件列表及下列免責聲明。
+* 二進位形式之再發佈必須於相關文件或其他資料中重現上述版權聲明、條件列表及下列免責聲明。
+* 未經事先書面同意，不得使用工業技術研究院 (ITRI) 或貢獻者之名稱為本軟體衍生產品背書或推廣。
+
+本軟體以「現狀」提供，不附任何明示或暗示之保證，包括但不限於適售性及特定用途之適用性。工業技術研究院 (ITRI) 或貢獻者對於因本軟體使用或無法使用所生之任何直接、間接、附帶、特殊、懲罰性或衍生性損害（包括但不限於替代商品或服務之取得、使用損失、資料遺失、營業中斷等），無論於任何理論下（契約、侵權或其他），即使已被告知可能發生該等損害，亦不負任何責任。
+"""
+
+import os
+import uuid
+import shutil
+import hashlib
+import tempfile
+import logging
+from contextlib import contextmanager
+
+"""
+Conversion Scratch Workspace
+============================
+轉換中間產物的暫存工作區：onnx2tf 的 SavedModel 目錄、簡化後的 ONNX 等只在轉換期間需要的檔案
+寫入本機快速路徑（tmpfs 或本機磁碟），而非網路掛載的使用者目錄；
+只有最終選用的 TFLite（以及之後編譯的 DLA）會移入使用者目錄，工作結束時整個暫存區即被移除。
+
+Configuration (環境變數)
+------------------------
+CONVERSION_SCRATCH_DIR : 暫存工作區根目錄，例如 /dev/shm（需確保 tmpfs 容量足夠），
+                         預設為系統暫存目錄 (tempfile.gettempdir())
+
+Functions
+---------
+scratch_root : 取得暫存工作區根目錄
+scratch_workspace : 建立工作專屬暫存目錄，離開時移除
+promote_file : 將暫存檔案以原子操作移入使用者目錄
+"""
+
+log = logging.getLogger(__name__)
+
+SCRATCH_ROOT = os.environ.get('CONVERSION_SCRATCH_DIR', '')
+
+PROMOTE_CHUNK_SIZE = 1024 * 1024
+
+
+def scratch_root():
+    """
+    暫存工作區根目錄
+    ==============
+    取得 CONVERSION_SCRATCH_DIR，未設定或無法寫入時使用系統暫存目錄。
+
+    Returns
+    -------
+    str
+        可寫入的暫存根目錄。
+    """
+    if SCRATCH_ROOT:
+        try:
+            os.makedirs(SCRATCH_ROOT, exist_ok=True)
+            if os.access(SCRATCH_ROOT, os.W_OK):
+                return SCRATCH_ROOT
+        except OSError as e:
+            log.warning("%s unusable (%s), falling back to %s", SCRATCH_ROOT, e, tempfile.gettempdir())
+    return tempfile.gettempdir()
+
+
+@contextmanager
+def scratch_workspace(prefix='job_'):
+    """
+    工作暫存目錄
+    ==========
+    於暫存根目錄下建立唯一目錄，區塊結束（含例外與產生器關閉）時整個移除。
+
+    Parameters
+    ----------
+    prefix : str
+        目錄名稱前綴。
+
+    Yields
+    ------
+    str
+        暫存目錄路徑。
+    """
+    path = tempfile.mkdtemp(prefix=prefix, dir=scratch_root())
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def promote_file(src, dest_dir, name=None):
+    """
+    移入使用者目錄
+    ============
+    將暫存區中的檔案移入使用者目錄：目標子目錄以內容摘要命名，
+    同時進行的不同轉換不會互相覆寫，相同內容則直接沿用。
+    先寫入暫存名稱再以 os.replace 原子替換，不會改寫既有（可能為共用硬連結的）檔案。
+
+    Parameters
+    ----------
+    src : str
+        暫存區中的檔案路徑。
+    dest_dir : str
+        使用者目錄。
+    name : str or None
+        目標檔名，None 時沿用原檔名。
+
+    Returns
+    -------
+    str
+        使用者目錄中的檔案路徑 (<dest_dir>/tflite_<摘要前 12 碼>/<name>)。
+    """
+    h = hashlib.sha256()
+    with open(src, 'rb') as f:
+        for chunk in iter(lambda: f.read(PROMOTE_CHUNK_SIZE), b''):
+            h.update(chunk)
+    target_dir = os.path.join(dest_dir, f'tflite_{h.hexdigest()[:12]}')
+    os.makedirs(target_dir, exist_ok=True)
+    target = os.path.join(target_dir, name or os.path.basename(src))
+    if os.path.exists(target):
+        return target
+    temp_path = os.path.join(target_dir, f'.{uuid.uuid4().hex[:8]}.promote')
+    # shutil.move copies across filesystems (tmpfs -> volume) and renames otherwise
+    shutil.move(src, temp_path)
+    os.replace(temp_path, target)
+    return target
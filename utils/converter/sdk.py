@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+版權所有 © 2025 工業技術研究院 (ITRI) 及貢獻者。
+保留所有權利。
+
+本檔案由 Microsoft 訂閱的 GitHub Copilot AI 助理協助產生與優化，部分內容經人工審閱與修正。
+
+本程式碼僅供學術研究與內部使用，未經授權不得用於商業用途。
+
+重新發佈與使用（無論原始或二進位形式，是否經過修改）僅限於下列條件下：
+
+* 原始碼之再發佈必須保留上述版權聲明、條件列表及下列免責聲明。
+* 二進位形式之再發佈必須於相關文件或其他資料中重現上述版權聲明、條件列表及下列免責聲明。
+* 未經事先書面同意，不得使用工業技術研究院 (ITRI) 或貢獻者之名稱為本軟體衍生產品背書或推廣。
+
+本軟體以「現狀」提供，不附任何明示或暗示之保證，包括但不限於適售性及特定用途之適用性。工業技術研究院 (ITRI) 或貢獻者對於因本軟體使用或無法使用所生之任何直接、間接、附帶、特殊、懲罰性或衍生性損害（包括但不限於替代商品或服務之取得、使用損失、資料遺失、營業中斷等），無論於任何理論下（契約、侵權或其他），即使已被告知可能發生該等損害，亦不負任何責任。
+"""
+
+import os
+import re
+import glob
+import subprocess
+import threading
+import logging
+from .devices import arch_targets
+
+"""
+NeuronPilot SDK Registry
+========================
+NeuronPilot SDK 版本登錄：啟動時掃描已安裝的 SDK 目錄（neuronpilot-<version>），
+對每個 SDK 的 ncc-tflite 執行一次 --version 與 --help 探測，記錄版本與支援的架構，
+之後每個請求直接查表，不再重複檢查檔案或執行探測。
+
+Configuration (環境變數)
+------------------------
+NEURONPILOT_SDK_ROOT    : SDK 目錄所在的根目錄，預設為目前目錄
+NEURONPILOT_DEFAULT_SDK : 未指定 SDK 時使用的版本，預設為已安裝的最新版本
+
+SDK 資訊格式
+-----------
+{"version": "6.0.5", "path": SDK 目錄, "ncc": ncc-tflite 路徑,
+ "reported_version": --version 輸出的版本字串, "devices": ["vpu", "mdla2.0", "mdla3.0"]}
+
+Functions
+---------
+load_sdk_registry : 掃描並探測已安裝的 SDK（僅執行一次）
+list_sdks : 列出已安裝的 SDK
+default_sdk : 取得預設 SDK
+resolve_sdks : 將請求指定的版本列表解析為 SDK 資訊
+sdk_file_tag : 安裝多個 SDK 時加入 DLA 檔名的版本標籤
+"""
+
+log = logging.getLogger(__name__)
+
+SDK_ROOT = os.environ.get('NEURONPILOT_SDK_ROOT', '.')
+DEFAULT_SDK_VERSION = os.environ.get('NEURONPILOT_DEFAULT_SDK', '')
+NCC_RELATIVE_PATH = os.path.join('neuron_sdk', 'host', 'bin', 'ncc-tflite')
+SDK_PROBE_TIMEOUT = 30
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def _version_key(version):
+    """版本字串排序鍵，例如 "6.0.5" -> (6, 0, 5)。"""
+    return tuple(int(part) for part in re.findall(r'\d+', version))
+
+
+def _probe_sdk(ncc_bin):
+    """執行 ncc-tflite --version 與 --help，返回 (版本字串, 支援的裝置列表)。"""
+    result = subprocess.run([ncc_bin, '--version'], capture_output=True, text=True, timeout=SDK_PROBE_TIMEOUT)
+    output = (result.stdout or '') + (result.stderr or '')
+    match = re.search(r'\d+(\.\d+)+', output)
+    reported_version = match.group(0) if match else output.strip()[:80]
+
+    help_result = subprocess.run([ncc_bin, '--help'], capture_output=True, text=True, timeout=SDK_PROBE_TIMEOUT)
+    help_text = (help_result.stdout or '') + (help_result.stderr or '')
+    # ncc-tflite --arch values this platform knows how to compile for (device registry)
+    known_devices = [spec['ncc_arch'] for spec in arch_targets().values()]
+    devices = [device for device in known_devices if device in help_text]
+    # Older releases do not list targets in --help; assume every known target
+    return reported_version, devices or known_devices
+
+
+def load_sdk_registry(root=None, refresh=False):
+    """
+    載入 SDK 登錄
+    ===========
+    掃描 root 下的 neuronpilot-<version> 目錄並探測每個 ncc-tflite，結果於行程內快取。
+
+    Parameters
+    ----------
+    root : str or None
+        SDK 目錄所在的根目錄，None 時使用 NEURONPILOT_SDK_ROOT。
+    refresh : bool
+        是否忽略快取重新掃描。
+
+    Returns
+    -------
+    dict
+        版本對應 SDK 資訊，依版本由舊到新排序。
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is not None and not refresh:
+            return _registry
+        found = {}
+        for sdk_dir in glob.glob(os.path.join(root or SDK_ROOT, 'neuronpilot-*')):
+            ncc_bin = os.path.join(sdk_dir, NCC_RELATIVE_PATH)
+            if not os.path.isdir(sdk_dir) or not os.path.isfile(ncc_bin):
+                continue
+            version = os.path.basename(sdk_dir)[len('neuronpilot-'):]
+            try:
+                reported_version, devices = _probe_sdk(ncc_bin)
+            except (OSError, subprocess.SubprocessError) as e:
+                log.warning("Skipping %s: ncc-tflite probe failed: %s", sdk_dir, e)
+                continue
+            found[version] = {
+                'version': version,
+                'path': sdk_dir,
+                'ncc': ncc_bin,
+                'reported_version': reported_version,
+                'devices': devices,
+            }
+            log.info("Found NeuronPilot %s (ncc-tflite %s, targets: %s)", version, reported_version, ', '.join(devices))
+        _registry = dict(sorted(found.items(), key=lambda item: _version_key(item[0])))
+        if not _registry:
+            log.warning("No NeuronPilot SDK found under %s", os.path.abspath(root or SDK_ROOT))
+        return _registry
+
+
+def list_sdks():
+    """列出已安裝的 SDK 資訊（由舊到新）。"""
+    return list(load_sdk_registry().values())
+
+
+def default_sdk():
+    """
+    預設 SDK
+    =======
+    取得 NEURONPILOT_DEFAULT_SDK 指定的版本，未設定或未安裝時使用最新版本。
+
+    Returns
+    -------
+    dict or None
+        SDK 資訊；未安裝任何 SDK 時返回 None。
+    """
+    registry = load_sdk_registry()
+    if DEFAULT_SDK_VERSION in registry:
+        return registry[DEFAULT_SDK_VERSION]
+    if not registry:
+        return None
+    return list(registry.values())[-1]
+
+
+def resolve_sdks(versions=None):
+    """
+    解析請求指定的 SDK
+    ================
+    將版本列表轉為 SDK 資訊，第一個為主要 SDK（決定下拉選單與預設下載）。
+
+    Parameters
+    ----------
+    versions : list of str, str or None
+        指定的 SDK 版本（可為逗號分隔字串），None 或空白時使用預設 SDK。
+
+    Returns
+    -------
+    list of dict
+        SDK 資訊列表；未安裝任何 SDK 時返回空列表。
+
+    Raises
+    ------
+    RuntimeError
+        指定的版本未安裝時拋出。
+    """
+    if isinstance(versions, str):
+        versions = [v.strip() for v in versions.split(',')]
+    versions = [v for v in (versions or []) if v]
+    if not versions:
+        sdk = default_sdk()
+        return [sdk] if sdk else []
+    registry = load_sdk_registry()
+    unknown = [v for v in versions if v not in registry]
+    if unknown:
+        raise RuntimeError(f"❌ Unknown NeuronPilot SDK version(s): {', '.join(unknown)} "
+                           f"(installed: {', '.join(registry) or 'none'})")
+    return [registry[v] for v in dict.fromkeys(versions)]
+
+
+def sdk_file_tag(sdk):
+    """
+    DLA 檔名版本標籤
+    ==============
+    安裝多個 SDK 時，各版本的 DLA 需以不同檔名並存；只有一個 SDK 時維持原檔名。
+
+    Parameters
+    ----------
+    sdk : dict or None
+        SDK 資訊。
+
+    Returns
+    -------
+    str or None
+        例如 "sdk6.0.5"；不需要標籤時返回 None。
+    """
+    if sdk is None or len(load_sdk_registry()) < 2:
+        return None
+    return f"sdk{sdk['version']}"
@@ -0,0 +1,480 @@
+# -*- coding: utf-8 -*-
+"""
+版權所有 © 2025 工業技術研究院 (ITRI) 及貢獻者。
+保留所有權利。
+
+本檔案由 Microsoft 訂閱的 GitHub Copilot AI 助理協助產生與優化，部分內容經人工審閱與修正。
+
+本程式碼僅供學術研究與內部使用，未經授權不得用於商業用途。
+
+重新發佈與使用（無論原始或二進位形式，是否經過修改）僅限於下列條件下：
+
+* 原始碼之再發佈必須保留上述版權聲明、條件列表及下列免責聲明。
+* 二進位形式之再發佈必須於相關文件或其他資料中重現上述版權聲明、條件列表及下列免責聲明。
+* 未經事先書面同意，不得使用工業技術研究院 (ITRI) 或貢獻者之名稱為本軟體衍生產品背書或推廣。
+
+本軟體以「現狀」提供，不附任何明示或暗示之保證，包括但不限於適售性及特定用途之適用性。工業技術研究院 (ITRI) 或貢獻者對於因本軟體使用或無法使用所生之任何直接、間接、附帶、特殊、懲罰性或衍生性損害（包括但不限於替代商品或服務之取得、使用損失、資料遺失、營業中斷等），無論於任何理論下（契約、侵權或其他），即使已被告知可能發生該等損害，亦不負任何責任。
+"""
+
+import os
+import logging
+from .format import verify_pytorch_format, export_tflite_direct, parse_input_shape
+from .convert import onnx_to_tflite, convert_tflite_to_dla, validate_tflite, read_onnx_input_shape
+from .limits import run_limited
+from .sdk import resolve_sdks
+from ..blobstore import detach
+from .devices import arch_targets
+from .tune import tune_tflite_to_dla
+from .diagnose import diagnose_tflite, LIMIT_ERROR_MARKERS
+from .partition import partition_tflite
+from .pipeline import Stage, Pipeline
+
+"""
+Conversion Pipeline Stages
+==========================
+PyTorch 與上傳檔案兩條轉換路徑共用的管線階段定義。
+每個階段宣告輸入與輸出名稱，由 Pipeline 引擎決定執行順序與平行度：
+
+    export (pytorch) → onnx → simplify → onnx_slim → onnx2tf → tflite ─┬→ validate
+                                                                         └→ dla_vpu / dla_mdla2 / dla_mdla3
+
+ai-edge-torch 後端以 direct 階段直接由 PyTorch 程式碼產生 tflite（不經 ONNX）：
+
+    direct (pytorch) → tflite ─┬→ validate_direct
+                               └→ dla_vpu / dla_mdla2 / dla_mdla3
+
+上傳的 TFLite 直接作為 tflite 輸入，validate 階段同樣與 DLA 編譯平行執行。
+
+自動調校時每個 DLA 階段以多組 ncc-tflite 參數編譯並保留最佳變體，另輸出 tune_<arch> 指標報告。
+
+啟用診斷或分割時，主要 SDK 編譯失敗的架構於管線結束後另以 diagnose_<arch> 階段找出失敗的運算子
+（輸出 diagnosis_<arch>），或以 partition_<arch> 階段分割為多個 DLA 與 CPU 片段（輸出 partition_<arch>）。
+
+形狀掃描時每個輸入形狀使用一組加上 "@<shape>" 後綴的分支，所有分支於同一管線內平行執行。
+
+Functions
+---------
+simplify_onnx : 以 onnxslim 簡化 ONNX 模型（失敗時沿用原模型）
+export_stages : PyTorch → ONNX 匯出階段
+onnx_stages : ONNX 簡化、onnx2tf 與 TFLite 驗證階段
+tflite_stages : 上傳 TFLite 的驗證階段
+direct_stages : ai-edge-torch 直接轉換 TFLite 與驗證階段
+tuned_dla : 自動調校編譯並對應階段輸出
+dla_stages : 各 NPU 架構的 DLA 編譯階段
+sdk_stages : 一或多個 SDK 版本的 DLA 編譯階段
+diagnose_stages : 失敗架構的運算子診斷階段
+partition_stages : 失敗架構的 NPU/CPU 混合分割階段
+analyze_failures : 對管線中編譯失敗的架構執行診斷與分割
+"""
+
+log = logging.getLogger(__name__)
+
+
+def simplify_onnx(onnx, stats=None, scratch_dir=None):
+    """
+    ONNX 模型簡化
+    ===========
+    以 onnxslim 進行常數折疊與冗餘節點移除，減少 onnx2tf 產生的多餘運算。
+    簡化失敗時不中斷管線，直接沿用原始模型。
+
+    Parameters
+    ----------
+    onnx : str
+        ONNX 模型檔案路徑。
+    stats : list or None
+        若提供，onnxslim 子程序的資源使用紀錄將附加到此列表。
+    scratch_dir : str or None
+        簡化後模型的輸出目錄（工作暫存區），None 時輸出於原模型旁。
+
+    Returns
+    -------
+    str
+        簡化後（或原始）的 ONNX 模型路徑。
+    """
+    slim_name = os.path.splitext(os.path.basename(onnx))[0] + '.slim.onnx'
+    slim_path = os.path.join(scratch_dir or os.path.dirname(onnx), slim_name)
+    detach(slim_path)
+    try:
+        run_limited(['onnxslim', onnx, slim_path], 'simplify', stats=stats, check=True)
+    except Exception as e:
+        log.warning("onnxslim simplification skipped: %s", e)
+        return onnx
+    return slim_path if os.path.exists(slim_path) else onnx
+
+
+def export_stages():
+    """
+    PyTorch 匯出階段
+    ==============
+    初始輸入需包含 pytorch_code、model_entrypoint、input_shape 與 work_dir。
+
+    Returns
+    -------
+    list of Stage
+        產生 onnx 輸出的匯出階段。
+    """
+    return [
+        Stage(
+            'export',
+            lambda pytorch_code, model_entrypoint, input_shape, work_dir, stats: verify_pytorch_format(
+                os.path.basename(os.path.normpath(work_dir)), pytorch_code, model_entrypoint, input_shape,
+                stats=stats, work_dir=work_dir),
+            inputs=['pytorch_code', 'model_entrypoint', 'input_shape', 'work_dir'],
+            outputs=['onnx'],
+            key_inputs=['pytorch_code', 'model_entrypoint', 'input_shape'],
+            start='🔄 Starting PyTorch → ONNX conversion...',
+            done='✅ ONNX conversion completed',
+            failed='❌ ONNX conversion failed: {error}',
+        ),
+    ]
+
+
+def onnx_stages(suffix=''):
+    """
+    ONNX → TFLite 階段
+    ================
+    初始輸入或上游階段需提供 onnx 與 scratch_dir（工作暫存區）。驗證階段與 DLA 編譯階段可平行執行。
+    簡化後的 ONNX 與 onnx2tf 輸出只寫入暫存區，只有選用的 TFLite 移入 onnx 所在的使用者目錄。
+
+    Parameters
+    ----------
+    suffix : str
+        附加在階段與資料名稱後的後綴（例如形狀掃描時的 "@1x3x224x224"），
+        使同一管線內可包含多組獨立的轉換分支。
+
+    Returns
+    -------
+    list of Stage
+        simplify、onnx2tf 與 validate 階段。
+    """
+    onnx, onnx_slim, tflite = f'onnx{suffix}', f'onnx_slim{suffix}', f'tflite{suffix}'
+    where = f" [{suffix.lstrip('@')}]" if suffix else ''
+    return [
+        Stage(
+            f'simplify{suffix}',
+            lambda stats, **kw: simplify_onnx(kw[onnx], stats=stats, scratch_dir=kw['scratch_dir']),
+            inputs=[onnx, 'scratch_dir'],
+            outputs=[onnx_slim],
+            key_inputs=[onnx],
+            start=f'🧹 Simplifying ONNX graph{where}...',
+            done=f'✅ ONNX graph simplified{where}',
+        ),
+        Stage(
+            f'onnx2tf{suffix}',
+            lambda stats, **kw: onnx_to_tflite(kw[onnx_slim], stats=stats, validate=False,
+                                               scratch_dir=kw['scratch_dir'], workspace_dir=os.path.dirname(kw[onnx])),
+            inputs=[onnx_slim, onnx, 'scratch_dir'],
+            outputs=[tflite],
+            key_inputs=[onnx_slim],
+            start=f'🔄 Starting ONNX → TensorFlow Lite conversion{where}...',
+            done=f'✅ TensorFlow Lite conversion completed{where}',
+            failed=f'❌ TensorFlow Lite conversion failed{where}: {{error}}',
+        ),
+        Stage(
+            f'validate{suffix}',
+            lambda stats, **kw: validate_tflite(kw[tflite], read_onnx_input_shape(kw[onnx]), stats=stats),
+            inputs=[tflite, onnx],
+            outputs=[f'tflite_info{suffix}'],
+            start=f'🔍 Validating TensorFlow Lite model{where}...',
+            done=f'✅ TensorFlow Lite model validated{where}',
+            failed=f'⚠️ TensorFlow Lite validation failed{where}: {{error}}',
+        ),
+    ]
+
+
+def tflite_stages():
+    """
+    上傳 TFLite 驗證階段
+    =================
+    初始輸入需包含 tflite；驗證與 DLA 編譯平行執行，載入失敗時回報警告而不中斷編譯。
+
+    Returns
+    -------
+    list of Stage
+        validate 階段（輸出 tflite_info）。
+    """
+    return [
+        Stage(
+            'validate',
+            lambda stats, tflite: validate_tflite(tflite, stats=stats),
+            inputs=['tflite'],
+            outputs=['tflite_info'],
+            start='🔍 Validating TensorFlow Lite model...',
+            done='✅ TensorFlow Lite model validated',
+            failed='⚠️ TensorFlow Lite validation failed: {error}',
+        ),
+    ]
+
+
+def direct_stages(output='tflite'):
+    """
+    PyTorch → TFLite 直接轉換階段
+    ==========================
+    初始輸入需包含 pytorch_code、model_entrypoint、input_shape 與 work_dir。
+
+    Parameters
+    ----------
+    output : str
+        TFLite 的輸出名稱；"tflite" 時下游 DLA 階段直接使用，比較模式下使用 "tflite_direct"
+        與 onnx 路徑的輸出並存。
+
+    Returns
+    -------
+    list of Stage
+        direct 與 validate_direct 階段。
+    """
+    def validate(stats, input_shape, **kw):
+        return validate_tflite(kw[output], list(parse_input_shape(input_shape)), stats=stats)
+
+    return [
+        Stage(
+            'direct',
+            lambda pytorch_code, model_entrypoint, input_shape, work_dir, stats: export_tflite_direct(
+                os.path.basename(os.path.normpath(work_dir)), pytorch_code, model_entrypoint, input_shape,
+                stats=stats, work_dir=work_dir),
+            inputs=['pytorch_code', 'model_entrypoint', 'input_shape', 'work_dir'],
+            outputs=[output],
+            key_inputs=['pytorch_code', 'model_entrypoint', 'input_shape'],
+            start='🔄 Starting PyTorch → TensorFlow Lite conversion (ai-edge-torch)...',
+            done='✅ ai-edge-torch conversion completed',
+            failed='⚠️ ai-edge-torch conversion failed: {error}',
+        ),
+        Stage(
+            'validate_direct',
+            validate,
+            inputs=[output, 'input_shape'],
+            outputs=['tflite_info_direct'],
+            start='🔍 Validating ai-edge-torch TensorFlow Lite model...',
+            done='✅ ai-edge-torch TensorFlow Lite model validated',
+            failed='⚠️ ai-edge-torch TensorFlow Lite validation failed: {error}',
+        ),
+    ]
+
+
+def tuned_dla(tflite_path, arch, tune, output, report, stats=None, sdk=None):
+    """自動調校編譯並將結果對應到階段輸出名稱 {output: DLA 路徑, report: 調校指標}。"""
+    result = tune_tflite_to_dla(tflite_path, arch, tune, stats=stats, sdk=sdk)
+    return {output: result['dla'], report: result['tuning']}
+
+
+def dla_stages(archs=None, suffix='', sdk=None, primary=True, tune=None):
+    """
+    DLA 編譯階段
+    ==========
+    每個目標架構一個階段，皆只依賴 tflite，因此會平行編譯；
+    架構的 ncc-tflite 參數與顯示名稱來自裝置登錄 (devices.json)。
+
+    Parameters
+    ----------
+    archs : list of str or None
+        目標架構鍵值（見 resolve_targets），None 時編譯全部；未選取的架構不建立階段。
+    suffix : str
+        附加在階段與資料名稱後的後綴，與 onnx_stages 的 suffix 對應。
+    sdk : dict or None
+        使用的 NeuronPilot SDK 資訊，None 時使用預設 SDK。
+    primary : bool
+        是否為主要 SDK；主要 SDK 輸出 dla_<arch>，其他 SDK 輸出 dla_<arch>#<version>。
+    tune : dict or None
+        resolve_tune 的結果；提供時改為自動調校，並額外輸出 tune_<arch>（同樣套用後綴）。
+
+    Returns
+    -------
+    list of Stage
+        輸出 dla_<arch> 的編譯階段；SDK 不支援的架構不建立階段。
+    """
+    tflite = f'tflite{suffix}'
+    where = f" [{suffix.lstrip('@')}]" if suffix else ''
+    version = sdk['version'] if sdk else ''
+    sdk_label = f' (SDK {version})' if sdk and not primary else ''
+    targets = arch_targets()
+    stages = []
+    for arch in (archs or targets):
+        device, label, flags = targets[arch]['ncc_arch'], targets[arch]['label'], targets[arch]['ncc_flags']
+        if sdk and device not in sdk['devices']:
+            continue
+        output = f'dla_{arch}{suffix}' if primary else f'dla_{arch}#{version}{suffix}'
+        if tune:
+            report = 'tune_' + output[len('dla_'):]
+            stages.append(Stage(
+                output,
+                lambda stats, arch=arch, output=output, report=report, **kw: tuned_dla(
+                    kw[tflite], arch, tune, output, report, stats=stats, sdk=sdk),
+                inputs=[tflite],
+                outputs=[output, report],
+                # Each profile variant is cached on its own by the tune module
+                cacheable=False,
+                start=f"Auto-tuning {label} over {len(tune['profiles'])} profile(s){sdk_label}{where}...",
+                done=f'✅ {label} conversion succeeded{sdk_label}{where}',
+                failed=f'❌ {label} conversion failed{sdk_label}{where}: {{error}}',
+            ))
+            continue
+        stages.append(Stage(
+            output,
+            lambda stats, device=device, arch=arch, flags=flags, **kw: convert_tflite_to_dla(
+                kw[tflite], device, arch, stats=stats, sdk=sdk, ncc_flags=flags),
+            inputs=[tflite],
+            outputs=[output],
+            cache_salt=f"{version}|{' '.join(flags)}",
+            start=f'Testing {label} compatibility{sdk_label}{where}...',
+            done=f'✅ {label} conversion succeeded{sdk_label}{where}',
+            failed=f'❌ {label} conversion failed{sdk_label}{where}: {{error}}',
+        ))
+    return stages
+
+
+def sdk_stages(sdks=None, archs=None, suffix='', tune=None):
+    """
+    多 SDK DLA 編譯階段
+    =================
+    為每個指定的 SDK 版本建立 DLA 編譯階段，所有 SDK 與架構的編譯平行執行；
+    第一個 SDK 為主要 SDK，其結果決定下拉選單與預設下載。
+
+    Parameters
+    ----------
+    sdks : list of dict or None
+        resolve_sdks 的結果，None 時使用預設 SDK。
+    archs : list of str or None
+        目標架構鍵值，None 時編譯全部。
+    suffix : str
+        附加在階段與資料名稱後的後綴。
+    tune : dict or None
+        resolve_tune 的結果，None 時不調校。
+
+    Returns
+    -------
+    list of Stage
+        所有 SDK 的編譯階段。
+    """
+    sdks = sdks if sdks is not None else resolve_sdks()
+    if not sdks:
+        return dla_stages(archs, suffix, tune=tune)
+    stages = []
+    for index, sdk in enumerate(sdks):
+        stages += dla_stages(archs, suffix, sdk=sdk, primary=index == 0, tune=tune)
+    return stages
+
+
+def diagnose_stages(archs, sdk=None, errors=None):
+    """
+    運算子診斷階段
+    ============
+    每個編譯失敗的架構一個階段，皆只依賴 tflite 與 scratch_dir，因此各架構的診斷平行執行。
+
+    Parameters
+    ----------
+    archs : list of str
+        要診斷的架構鍵值。
+    sdk : dict or None
+        編譯失敗的 NeuronPilot SDK 資訊，None 時使用預設 SDK。
+    errors : dict or None
+        架構鍵值對應完整模型的編譯錯誤。
+
+    Returns
+    -------
+    list of Stage
+        輸出 diagnosis_<arch> 的診斷階段。
+    """
+    targets = arch_targets()
+    errors = errors or {}
+    return [
+        Stage(
+            f'diagnose_{arch}',
+            lambda stats, tflite, scratch_dir, arch=arch: diagnose_tflite(
+                tflite, arch, sdk=sdk, flags=targets[arch]['ncc_flags'], error=errors.get(arch), work_dir=scratch_dir),
+            inputs=['tflite', 'scratch_dir'],
+            outputs=[f'diagnosis_{arch}'],
+            # Segment results are cached by signature inside the diagnose module
+            cacheable=False,
+            start=f"🔬 Diagnosing failing {targets[arch]['label']} ops...",
+            done=f"✅ {targets[arch]['label']} diagnosis completed",
+            failed=f"⚠️ {targets[arch]['label']} diagnosis failed: {{error}}",
+        )
+        for arch in archs
+    ]
+
+
+def partition_stages(archs, sdk=None, errors=None):
+    """
+    混合分割階段
+    ==========
+    每個編譯失敗的架構一個階段，片段 DLA、CPU TFLite 與 manifest 寫入工作目錄。
+
+    Parameters
+    ----------
+    archs : list of str
+        要分割的架構鍵值。
+    sdk : dict or None
+        編譯失敗的 NeuronPilot SDK 資訊，None 時使用預設 SDK。
+    errors : dict or None
+        架構鍵值對應完整模型的編譯錯誤。
+
+    Returns
+    -------
+    list of Stage
+        輸出 partition_<arch> 的分割階段。
+    """
+    targets = arch_targets()
+    errors = errors or {}
+    return [
+        Stage(
+            f'partition_{arch}',
+            lambda stats, tflite, scratch_dir, work_dir, arch=arch: partition_tflite(
+                tflite, arch, sdk=sdk, flags=targets[arch]['ncc_flags'], error=errors.get(arch), work_dir=scratch_dir,
+                output_dir=work_dir),
+            inputs=['tflite', 'scratch_dir', 'work_dir'],
+            outputs=[f'partition_{arch}'],
+            # Outputs are per-job files; segment verdicts are cached by the diagnose module
+            cacheable=False,
+            start=f"🧩 Partitioning the model between {targets[arch]['label']} and CPU...",
+            done=f"✅ {targets[arch]['label']} partitioning completed",
+            failed=f"⚠️ {targets[arch]['label']} partitioning failed: {{error}}",
+        )
+        for arch in archs
+    ]
+
+
+def analyze_failures(pipeline, sdks=None, archs=None, diagnose=False, partition=False):
+    """
+    分析編譯失敗的架構
+    ================
+    找出管線中主要 SDK 編譯失敗（非資源限制造成）的架構，以後續管線執行診斷與（或）混合分割，
+    結果併入原管線供 summarize_pipeline 輸出。兩者的子圖編譯結果共用同一快取。
+
+    Parameters
+    ----------
+    pipeline : Pipeline
+        已執行完畢的轉換管線。
+    sdks : list of dict or None
+        本次使用的 SDK 資訊，只處理第一個（主要）SDK。
+    archs : list of str or None
+        本次選取編譯的架構，None 表示全部。
+    diagnose : bool
+        是否找出失敗的運算子。
+    partition : bool
+        是否分割為多個 DLA 與 CPU 片段。
+
+    Yields
+    ------
+    dict
+        後續階段事件；沒有需要處理的架構時不產生事件。
+    """
+    errors = {}
+    for arch in (archs or arch_targets()):
+        error = pipeline.errors.get(f'dla_{arch}')
+        if pipeline.results.get(f'dla_{arch}') == 'failed' and not str(error).startswith(LIMIT_ERROR_MARKERS):
+            errors[arch] = error
+    if not errors or not pipeline.context.get('tflite') or not (diagnose or partition):
+        return
+    sdk = sdks[0] if sdks else None
+    stages = []
+    if diagnose:
+        stages += diagnose_stages(list(errors), sdk=sdk, errors=errors)
+    if partition:
+        stages += partition_stages(list(errors), sdk=sdk, errors=errors)
+    followup = Pipeline(stages)
+    yield from followup.run(pipeline.context)
+    for name, value in followup.context.items():
+        if name.startswith(('diagnosis_', 'partition_')):
+            pipeline.context[name] = value
+    for attr in ('results', 'errors', 'timings'):
+        getattr(pipeline, attr).update(getattr(followup, attr))
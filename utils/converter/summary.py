@@ -0,0 +1,507 @@
+# -*- coding: utf-8 -*-
+"""
+版權所有 © 2025 工業技術研究院 (ITRI) 及貢獻者。
+保留所有權利。
+
+本檔案由 Microsoft 訂閱的 GitHub Copilot AI 助理協助產生與優化，部分內容經人工審閱與修正。
+
+本程式碼僅供學術研究與內部使用，未經授權不得用於商業用途。
+
+重新發佈與使用（無論原始或二進位形式，是否經過修改）僅限於下列條件下：
+
+* 原始碼之再發佈必須保留上述版權聲明、條件列表及下列免責聲明。
+* 二進位形式之再發佈必須於相關文件或其他資料中重現上述版權聲明、條件列表及下列免責聲明。
+* 未經事先書面同意，不得使用工業技術研究院 (ITRI) 或貢獻者之名稱為本軟體衍生產品背書或推廣。
+
+本軟體以「現狀」提供，不附任何明示或暗示之保證，包括但不限於適售性及特定用途之適用性。工業技術研究院 (ITRI) 或貢獻者對於因本軟體使用或無法使用所生之任何直接、間接、附帶、特殊、懲罰性或衍生性損害（包括但不限於替代商品或服務之取得、使用損失、資料遺失、營業中斷等），無論於任何理論下（契約、侵權或其他），即使已被告知可能發生該等損害，亦不負任何責任。
+"""
+
+import os
+import logging
+from .devices import arch_targets, board_archs
+from .limits import format_usage
+from .sdk import list_sdks
+from .tune import format_tuning
+from .convert import tflite_op_counts
+from .diagnose import format_diagnosis
+from .partition import format_partition
+
+"""
+DLA Compatibility Summary
+=========================
+轉換管線結束後的相容性摘要，PyTorch 與上傳檔案兩條路徑共用。
+產生相容性表格、資源使用訊息、結論，以及前端下拉選單使用的最終回應（含 Genio 開發板對應）。
+
+Functions
+---------
+build_final_response : 建立最終回應 (final=True)
+summarize_pipeline : 由管線執行結果產生摘要事件與最終回應
+summarize_sweep : 由形狀掃描管線結果產生形狀 × 裝置相容性矩陣
+sdk_results : 依 SDK 版本整理各架構的編譯結果
+tuning_results : 收集自動調校的各變體指標
+diagnosis_results : 收集編譯失敗架構的運算子診斷結果
+partition_results : 收集編譯失敗架構的 NPU/CPU 混合分割結果
+backend_results : 比較 PyTorch → TFLite 各轉換路徑的耗時與運算子數量
+completed_files : 列出管線已完成、位於使用者目錄中的檔案（供去重儲存）
+"""
+
+log = logging.getLogger(__name__)
+
+
+def build_final_response(supported, success, resource_stats, artifacts, archs=None):
+    """
+    建立最終回應
+    ==========
+    產生前端更新下拉選單所需的最終事件，包含各架構支援狀態與 Genio 開發板對應（來自裝置登錄）。
+
+    Parameters
+    ----------
+    supported : dict
+        架構鍵值對應是否支援。
+    success : bool
+        是否至少支援一種裝置。
+    resource_stats : list of dict
+        各階段資源使用紀錄。
+    artifacts : dict
+        角色 ("tflite"、架構鍵值) 對應產出檔案路徑，由工作層轉換為下載資訊。
+    archs : list of str or None
+        本次選取編譯的架構，None 表示全部。
+
+    Returns
+    -------
+    dict
+        最終事件內容。
+    """
+    final_response = {
+        'final': True,
+        'success': success,
+        'resources': resource_stats,
+        'artifacts': artifacts,
+    }
+    targets = arch_targets()
+    for arch in targets:
+        final_response[f'{arch}_supported'] = bool(supported.get(arch))
+    final_response['targets'] = list(archs or targets)
+
+    # Map device support to Genio board compatibility
+    boards = board_archs()
+    for board, archs_on_board in boards.items():
+        final_response[board] = {arch: arch in archs_on_board and bool(supported.get(arch)) for arch in targets}
+    final_response['boards'] = list(boards)
+    return final_response
+
+
+def completed_files(pipeline):
+    """
+    已完成的工作檔案
+    ==============
+    列出管線成功產生、位於使用者目錄中的檔案路徑（不含工作暫存區中的中間產物）；
+    只包含已完成的階段輸出，可安全地去重為共用的硬連結。
+
+    Parameters
+    ----------
+    pipeline : Pipeline
+        已執行完畢的轉換管線。
+
+    Returns
+    -------
+    list of str
+        檔案路徑。
+    """
+    scratch_dir = pipeline.context.get('scratch_dir')
+    paths = []
+    for name, value in pipeline.context.items():
+        if not isinstance(value, str) or not os.path.isfile(value):
+            continue
+        if scratch_dir and os.path.abspath(value).startswith(os.path.abspath(scratch_dir) + os.sep):
+            continue
+        paths.append(value)
+    return list(dict.fromkeys(paths))
+
+
+def sdk_results(pipeline, sdks, suffix='', archs=None):
+    """
+    各 SDK 編譯結果
+    =============
+    依 SDK 版本整理各架構的編譯結果，供跨版本比較與回歸追蹤。
+
+    Parameters
+    ----------
+    pipeline : Pipeline
+        已執行完畢的轉換管線。
+    sdks : list of dict
+        本次使用的 SDK 資訊，第一個為主要 SDK。
+    suffix : str
+        分支後綴（形狀掃描時為 "@<shape>"）。
+    archs : list of str or None
+        本次選取編譯的架構，None 表示全部。
+
+    Returns
+    -------
+    dict
+        SDK 版本對應 {arch: {"supported", "seconds", "error"}}。
+    """
+    results = {}
+    for index, sdk in enumerate(sdks):
+        per_arch = {}
+        for arch in (archs or arch_targets()):
+            name = f'dla_{arch}{suffix}' if index == 0 else f"dla_{arch}#{sdk['version']}{suffix}"
+            per_arch[arch] = {
+                'supported': bool(pipeline.context.get(name)),
+                'seconds': pipeline.timings.get(name),
+                'error': pipeline.errors.get(name),
+            }
+        results[sdk['version']] = per_arch
+    return results
+
+
+def tuning_results(pipeline):
+    """
+    自動調校結果
+    ==========
+    收集管線中所有 tune_<arch>[#<version>][@<shape>] 輸出，供最終回應與相容性報告使用。
+
+    Parameters
+    ----------
+    pipeline : Pipeline
+        已執行完畢的轉換管線。
+
+    Returns
+    -------
+    dict
+        "<arch>[#<version>][@<shape>]" 對應 {"objective", "best", "variants"}；未調校時為空 dict。
+    """
+    return {name[len('tune_'):]: value for name, value in pipeline.context.items()
+            if name.startswith('tune_') and isinstance(value, dict)}
+
+
+def diagnosis_results(pipeline):
+    """
+    運算子診斷結果
+    ============
+    收集管線中所有 diagnosis_<arch> 輸出（見 stages.diagnose_failures）。
+
+    Parameters
+    ----------
+    pipeline : Pipeline
+        已執行完畢的轉換管線。
+
+    Returns
+    -------
+    dict
+        架構鍵值對應 diagnose_tflite 的結果；未診斷時為空 dict。
+    """
+    return {name[len('diagnosis_'):]: value for name, value in pipeline.context.items()
+            if name.startswith('diagnosis_') and isinstance(value, dict)}
+
+
+def partition_results(pipeline):
+    """
+    混合分割結果
+    ==========
+    收集管線中所有 partition_<arch> 輸出（見 stages.analyze_failures）。
+
+    Parameters
+    ----------
+    pipeline : Pipeline
+        已執行完畢的轉換管線。
+
+    Returns
+    -------
+    dict
+        架構鍵值對應 partition_tflite 的結果；未分割時為空 dict。
+    """
+    return {name[len('partition_'):]: value for name, value in pipeline.context.items()
+            if name.startswith('partition_') and isinstance(value, dict)}
+
+
+# Stages that make up each PyTorch → TFLite route
+BACKEND_ROUTES = {
+    'onnx': ('export', 'simplify', 'onnx2tf'),
+    'ai-edge-torch': ('direct',),
+}
+
+
+def backend_results(pipeline):
+    """
+    轉換路徑比較
+    ==========
+    對管線中執行過的每條 PyTorch → TFLite 路徑（onnx / ai-edge-torch）整理狀態、
+    轉換耗時（各階段耗時總和，快取命中計為 0）與產生的 TFLite 運算子數量。
+
+    Parameters
+    ----------
+    pipeline : Pipeline
+        已執行完畢的轉換管線。
+
+    Returns
+    -------
+    dict
+        路徑名稱對應 {"status", "seconds", "ops", "transposes", "error"}；非 PyTorch 管線時為空 dict。
+    """
+    results = {}
+    context = pipeline.context
+    for route, stage_names in BACKEND_ROUTES.items():
+        statuses = [pipeline.results.get(name) for name in stage_names]
+        if statuses[0] is None:
+            continue
+        failed = next((name for name, status in zip(stage_names, statuses) if status in ('failed', 'skipped')), None)
+        status = 'failed' if failed else ('cached' if all(s == 'cached' for s in statuses) else 'done')
+        if failed:
+            tflite = None
+        elif route == 'onnx':
+            tflite = context.get('tflite')
+        else:
+            tflite = context.get('tflite_direct') or context.get('tflite')
+        counts = tflite_op_counts(tflite) if tflite else None
+        results[route] = {
+            'status': status,
+            'seconds': round(sum(pipeline.timings.get(name, 0) for name in stage_names), 3),
+            'ops': counts['ops'] if counts else None,
+            'transposes': counts['transposes'] if counts else None,
+            'error': pipeline.errors.get(failed) if failed else None,
+        }
+    return results
+
+
+def summarize_pipeline(pipeline, sdks=None, archs=None):
+    """
+    管線結果摘要
+    ==========
+    依管線執行結果產生相容性表格、資源使用、結論訊息與最終回應。
+    TFLite 未產生時直接回報無法進行 DLA 轉換。
+
+    Parameters
+    ----------
+    pipeline : Pipeline
+        已執行完畢的轉換管線。
+    sdks : list of dict or None
+        本次使用的 SDK 資訊；多於一個時額外輸出各 SDK 的比較表。
+    archs : list of str or None
+        本次選取編譯的架構，None 表示全部；未選取的架構顯示為略過。
+
+    Yields
+    ------
+    dict
+        摘要事件，最後一個為 final=True 的最終回應。
+    """
+    sdks = sdks or []
+    targets = arch_targets()
+    archs = list(archs or targets)
+    context = pipeline.context
+    tflite_path = context.get('tflite')
+    if not tflite_path:
+        yield {"message": "❌ Cannot proceed with DLA conversion", "error": True}
+        yield build_final_response({}, False, pipeline.stats, {}, archs)
+        return
+
+    yield {"message": "📊 Generating compatibility summary..."}
+    dla_paths = {arch: context.get(f'dla_{arch}') for arch in archs}
+    supported = {arch: bool(path) for arch, path in dla_paths.items()}
+
+    # SDK availability comes from the registry probed at startup
+    sdk_available = bool(list_sdks())
+    missing_status = '❌ Not Supported' if sdk_available else '⚠️ SDK Missing'
+
+    # Archs that only run as NPU/CPU partitions
+    partitions = {arch: value for arch, value in partition_results(pipeline).items()
+                  if any(segment['device'] == 'npu' for segment in value['segments'])}
+
+    # Display compatibility results
+    yield {"message": "============ DLA Compatibility ============"}
+    for arch, spec in targets.items():
+        if arch not in supported:
+            status = '⏭️ Not selected'
+        elif arch in partitions:
+            status = f"⚠️ Partial ({partitions[arch]['flops']['npu_ratio']:.0%} FLOPs on NPU)"
+        else:
+            status = '✅ Supported' if supported[arch] else missing_status
+        yield {"message": f"{spec['label'] + ':':<10}{status}"}
+    yield {"message": "==========================================="}
+
+    # Compare targets across SDK releases
+    by_sdk = sdk_results(pipeline, sdks, archs=archs) if sdks else {}
+    if len(by_sdk) > 1:
+        yield {"message": "============ SDK Comparison ============"}
+        yield {"message": f"{'SDK':<10}" + ''.join(f"{targets[arch]['label']:<12}" for arch in archs)}
+        for version, per_arch in by_sdk.items():
+            cells = ''.join(f"{'✅' if per_arch[arch]['supported'] else '❌':<12}" for arch in archs)
+            yield {"message": f"{version:<10}{cells}"}
+        yield {"message": "========================================"}
+
+    # Per-profile metrics of auto-tuned targets (primary SDK)
+    tuning = tuning_results(pipeline)
+    for arch in archs:
+        if arch in tuning:
+            for line in format_tuning(arch, tuning[arch]):
+                yield {"message": line}
+
+    # Smallest op sets each failing arch cannot compile
+    diagnosis = diagnosis_results(pipeline)
+    for arch in archs:
+        if arch in diagnosis:
+            for line in format_diagnosis(arch, diagnosis[arch]):
+                yield {"message": line}
+
+    # Multi-DLA layouts of archs that reject part of the graph
+    for arch in archs:
+        if arch in partitions:
+            for line in format_partition(arch, partitions[arch]):
+                yield {"message": line}
+
+    # Conversion time and graph size of each PyTorch → TFLite route that ran
+    backends = backend_results(pipeline)
+    if backends:
+        yield {"message": "========== Conversion Backends =========="}
+        yield {"message": f"{'Route':<15}{'Status':<10}{'Seconds':>9}{'Ops':>7}{'Transposes':>12}"}
+        for route, result in backends.items():
+            mark = '❌' if result['status'] == 'failed' else ('⚡' if result['status'] == 'cached' else '✅')
+            ops = '-' if result['ops'] is None else result['ops']
+            transposes = '-' if result['transposes'] is None else result['transposes']
+            yield {"message": f"{route:<15}{mark:<10}{result['seconds']:>9.1f}{ops:>7}{transposes:>12}"}
+        yield {"message": "========================================="}
+
+    # Report per-stage peak RSS and CPU time recorded via rusage
+    for usage in pipeline.stats:
+        yield {"message": format_usage(usage)}
+
+    # Generate final conclusion
+    supported_devices = [targets[arch]['label'] for arch in archs if supported[arch]]
+    partial_devices = [f"{targets[arch]['label']} ({partitions[arch]['flops']['npu_ratio']:.0%} FLOPs on NPU)"
+                       for arch in archs if arch in partitions]
+    if supported_devices:
+        yield {"message": f"✅ Model compatible with: {', '.join(supported_devices)}"}
+    if partial_devices:
+        yield {"message": f"⚠️ Model partially compatible (DLA + CPU segments) with: {', '.join(partial_devices)}"}
+    if not supported_devices and not partial_devices:
+        if not sdk_available:
+            yield {"message": "⚠️ DLA conversion service unavailable (SDK missing)", "error": True}
+        else:
+            yield {"message": "❌ Model cannot be ported to any DLA device", "error": True}
+
+    artifacts = {'tflite': tflite_path}
+    artifacts.update({arch: path for arch, path in dla_paths.items() if path})
+    for partition in partitions.values():
+        artifacts.update(partition['files'])
+    for sdk in sdks[1:]:
+        for arch in archs:
+            path = context.get(f"dla_{arch}#{sdk['version']}")
+            if path:
+                artifacts[f"{arch}#{sdk['version']}"] = path
+    final_response = build_final_response(supported, bool(supported_devices), pipeline.stats, artifacts, archs)
+    final_response['stage_seconds'] = pipeline.timings
+    final_response['sdk'] = sdks[0]['version'] if sdks else None
+    final_response['sdk_results'] = by_sdk
+    final_response['tuning'] = tuning
+    final_response['backends'] = backends
+    final_response['diagnosis'] = diagnosis
+    final_response['partitions'] = {arch: {k: v for k, v in partition.items() if k not in ('files', 'manifest_path')}
+                                    for arch, partition in partitions.items()}
+    final_response['workspace_files'] = completed_files(pipeline)
+    log.info("Final response: success=%s, supported=%s", final_response['success'],
+             [arch for arch in archs if supported[arch]])
+    log.debug("Final response payload: %s", final_response)
+    yield final_response
+
+
+def summarize_sweep(pipeline, exports, sdks=None, archs=None):
+    """
+    形狀掃描摘要
+    ==========
+    依形狀掃描管線結果產生形狀 × 裝置相容性矩陣，每格包含是否支援、編譯耗時與 DLA 大小。
+
+    Parameters
+    ----------
+    pipeline : Pipeline
+        已執行完畢、各分支以 "@<shape>" 為後綴的轉換管線。
+    exports : dict
+        export_pytorch_shapes 的結果，形狀標籤對應 {"shape", "onnx", "error"}。
+    sdks : list of dict or None
+        本次使用的 SDK 資訊；每列另附各 SDK 的編譯結果。
+    archs : list of str or None
+        本次選取編譯的架構，None 表示全部；矩陣只包含選取的架構。
+
+    Yields
+    ------
+    dict
+        摘要事件，最後一個為 final=True 的最終回應（含 sweep 矩陣）。
+    """
+    sdks = sdks or []
+    targets = arch_targets()
+    archs = list(archs or targets)
+    context = pipeline.context
+    rows = []
+    artifacts = {}
+    supported = {arch: False for arch in archs}
+    for tag, entry in exports.items():
+        tflite_path = context.get(f'tflite@{tag}')
+        row = {
+            'shape': entry['shape'],
+            'tag': tag,
+            'error': entry.get('error') or pipeline.errors.get(f'onnx2tf@{tag}'),
+            'tflite_size': os.path.getsize(tflite_path) if tflite_path else None,
+            'cells': {},
+        }
+        if tflite_path:
+            artifacts[f'tflite@{tag}'] = tflite_path
+        for arch in archs:
+            stage_name = f'dla_{arch}@{tag}'
+            dla_path = context.get(f'dla_{arch}@{tag}')
+            row['cells'][arch] = {
+                'supported': bool(dla_path),
+                'status': pipeline.results.get(stage_name, 'skipped'),
+                'seconds': pipeline.timings.get(stage_name),
+                'dla_size': os.path.getsize(dla_path) if dla_path else None,
+                'error': pipeline.errors.get(stage_name),
+                'tune_best': (context.get(f'tune_{arch}@{tag}') or {}).get('best'),
+            }
+            if dla_path:
+                supported[arch] = True
+                artifacts[f'{arch}@{tag}'] = dla_path
+        if len(sdks) > 1:
+            row['sdk_results'] = sdk_results(pipeline, sdks, f'@{tag}', archs)
+            for sdk in sdks[1:]:
+                for arch in archs:
+                    path = context.get(f"dla_{arch}#{sdk['version']}@{tag}")
+                    if path:
+                        artifacts[f"{arch}#{sdk['version']}@{tag}"] = path
+        rows.append(row)
+
+    # Display the shape × device matrix
+    labels = [targets[arch]['label'] for arch in archs]
+    width = max([len('Shape')] + [len(str(tuple(row['shape']))) for row in rows])
+    yield {"message": "============ Shape Sweep Compatibility ============"}
+    yield {"message": f"{'Shape':<{width}}  " + '  '.join(f'{label:<16}' for label in labels)}
+    for row in rows:
+        cells = []
+        for arch in archs:
+            cell = row['cells'][arch]
+            if cell['supported']:
+                seconds = f"{cell['seconds']:.1f}s" if cell['seconds'] is not None else 'cached'
+                text = f"✅ {seconds} {cell['dla_size'] / 1024:.0f}KB"
+            else:
+                text = '❌' if cell['status'] == 'failed' else '⏭️'
+            cells.append(f'{text:<16}')
+        yield {"message": f"{str(tuple(row['shape'])):<{width}}  " + '  '.join(cells)}
+        if row['error']:
+            yield {"message": f"   ↳ {row['error'][:200]}", "error": True}
+    yield {"message": "==================================================="}
+
+    for usage in pipeline.stats:
+        yield {"message": format_usage(usage)}
+
+    supported_devices = [targets[arch]['label'] for arch in archs if supported[arch]]
+    if supported_devices:
+        yield {"message": f"✅ At least one shape compatible with: {', '.join(supported_devices)}"}
+    else:
+        yield {"message": "❌ No swept shape can be ported to any DLA device", "error": True}
+
+    final_response = build_final_response(supported, bool(supported_devices), pipeline.stats, artifacts, archs)
+    final_response['sweep'] = {'archs': archs, 'rows': rows}
+    final_response['sdk'] = sdks[0]['version'] if sdks else None
+    final_response['stage_seconds'] = pipeline.timings
+    final_response['tuning'] = tuning_results(pipeline)
+    final_response['workspace_files'] = completed_files(pipeline)
+    log.info("Final sweep response: success=%s", final_response['success'])
+    log.debug("Final sweep response payload: %s", final_response)
+    yield final_response
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+版權所有 © 2025 工業技術研究院 (ITRI) 及貢獻者。
+保留所有權利。
+
+本檔案由 Microsoft 訂閱的 GitHub Copilot AI 助理協助產生與優化，部分內容經人工審閱與修正。
+
+本程式碼僅供學術研究與內部使用，未經授權不得用於商業用途。
+
+重新發佈與使用（無論原始或二進位形式，是否經過修改）僅限於下列條件下：
+
+* 原始碼之再發佈必須保留上述版權聲明、條件列表及下列免責聲明。
+* 二進位形式之再發佈必須於相關文件或其他資料中重現上述版權聲明、條件列表及下列免責聲明。
+* 未經事先書面同意，不得使用工業技術研究院 (ITRI) 或貢獻者之名稱為本軟體衍生產品背書或推廣。
+
+本軟體以「現狀」提供，不附任何明示或暗示之保證，包括但不限於適售性及特定用途之適用性。工業技術研究院 (ITRI) 或貢獻者對於因本軟體使用或無法使用所生之任何直接、間接、附帶、特殊、懲罰性或衍生性損害（包括但不限於替代商品或服務之取得、使用損失、資料遺失、營業中斷等），無論於任何理論下（契約、侵權或其他），即使已被告知可能發生該等損害，亦不負任何責任。
+"""
+
+import os
+import re
+import time
+import shutil
+import hashlib
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from .convert import convert_tflite_to_dla, generate_dla_filename
+from .sdk import default_sdk, sdk_file_tag
+from .devices import arch_targets, tune_profiles
+from .pipeline import StageCache
+
+"""
+ncc-tflite Auto-Tuning
+======================
+對每個架構以多組 ncc-tflite 參數組合 (裝置登錄的 tune_profiles) 平行編譯，記錄編譯時間、
+DLA 大小與 ncc-tflite 輸出的成本估計，依指定目標保留最佳變體作為該架構的 DLA。
+每個變體的結果以 (模型內容雜湊, SDK, 架構, 參數組合) 為鍵快取，重複調校時只編譯新的組合。
+
+Objectives
+----------
+size : DLA 檔案最小（預設）
+compile_time : 編譯時間最短
+<估計名稱> : ncc-tflite 輸出中名稱包含該字串的成本估計最小，例如 "cycles"、"latency"、"dram"；
+             未輸出該估計的變體排在最後
+
+調校設定由 devices.resolve_tune 解析（預設目標為 TUNE_OBJECTIVE 環境變數，預設 size）。
+
+Configuration (環境變數)
+------------------------
+TUNE_MAX_PARALLEL : 每個架構同時編譯的變體數上限，預設為 4
+
+Functions
+---------
+parse_ncc_estimates : 解析 ncc-tflite 輸出中的成本估計
+tune_tflite_to_dla : 以多組參數編譯並選出最佳變體
+format_tuning : 產生調校結果表格訊息
+"""
+
+log = logging.getLogger(__name__)
+
+TUNE_MAX_PARALLEL = int(os.environ.get('TUNE_MAX_PARALLEL', '4'))
+
+# "Estimated DRAM bandwidth: 12.5 MB" / "Total cycles = 123456"
+_ESTIMATE_PATTERN = re.compile(
+    r'^\s*([A-Za-z][\w ()/-]*?(?:cycles?|latency|time|bandwidth|memory|dram|sram|macs?)[\w ()/-]*?)'
+    r'[ \t]*[:=][ \t]*([\d.]+)[ \t]*([A-Za-z%]*)', re.IGNORECASE | re.MULTILINE)
+
+# Variant results shared by every job: key -> {"dla": path, "metrics": {...}}
+_VARIANT_CACHE = StageCache('tune')
+
+
+def parse_ncc_estimates(text):
+    """
+    解析成本估計
+    ==========
+    從 ncc-tflite 輸出中擷取 "<名稱>: <數值> [單位]" 形式、名稱含 cycles/latency/bandwidth/memory 等字樣的估計值。
+
+    Parameters
+    ----------
+    text : str
+        ncc-tflite 的 stdout 與 stderr。
+
+    Returns
+    -------
+    dict
+        正規化名稱（小寫、底線分隔，含單位）對應數值。
+    """
+    estimates = {}
+    for name, value, unit in _ESTIMATE_PATTERN.findall(text or ''):
+        key = re.sub(r'[^a-z0-9]+', '_', f'{name} {unit}'.lower()).strip('_')
+        try:
+            estimates[key] = float(value)
+        except ValueError:
+            continue
+    return estimates
+
+
+def _file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _objective_value(metrics, objective):
+    """變體在目標下的排序值，越小越好；無法評估時返回 None。"""
+    if objective == 'size':
+        return metrics.get('dla_bytes')
+    if objective == 'compile_time':
+        return metrics.get('compile_seconds')
+    matches = [value for key, value in metrics.get('estimates', {}).items() if objective in key]
+    return min(matches) if matches else None
+
+
+def _compile_variant(tflite_path, model_hash, arch, profile, flags, sdk, stats):
+    """編譯單一參數組合，已快取的組合直接返回先前的結果。"""
+    target = arch_targets()[arch]
+    version = sdk['version'] if sdk else ''
+    key = hashlib.sha256(f"{model_hash}|{version}|{arch}|{profile}|{' '.join(flags)}".encode('utf-8')).hexdigest()
+    cached = _VARIANT_CACHE.lookup(key)
+    if cached is not None:
+        return dict(cached['metrics'], dla=cached['dla'], cached=True)
+
+    ncc_output = []
+    start = time.time()
+    metrics = {'profile': profile, 'flags': flags}
+    try:
+        dla_path = convert_tflite_to_dla(tflite_path, target['ncc_arch'], arch, stats=stats, sdk=sdk,
+                                         ncc_flags=flags, variant=profile, ncc_output=ncc_output)
+    except RuntimeError as e:
+        # Includes StageLimitExceeded: a profile that times out simply loses
+        return dict(metrics, dla=None, error=str(e), compile_seconds=round(time.time() - start, 3))
+    metrics.update({
+        'compile_seconds': round(time.time() - start, 3),
+        'dla_bytes': os.path.getsize(dla_path),
+        'estimates': parse_ncc_estimates('\n'.join(ncc_output)),
+    })
+    _VARIANT_CACHE.store(key, {'dla': dla_path, 'metrics': metrics})
+    return dict(metrics, dla=dla_path, cached=False)
+
+
+def tune_tflite_to_dla(tflite_path, arch, tune, stats=None, sdk=None):
+    """
+    自動調校 DLA 編譯
+    ===============
+    以每組參數平行編譯同一個 TFLite，依目標選出最佳變體，並將其連結為該架構的標準 DLA 檔名
+    （model.tflite.<arch>.dla），下載與下拉選單沿用原本的流程。
+
+    Parameters
+    ----------
+    tflite_path : str
+        TensorFlow Lite 模型路徑。
+    arch : str
+        架構鍵值（見裝置登錄）。
+    tune : dict
+        devices.resolve_tune 的結果。
+    stats : list or None
+        若提供，ncc-tflite 子程序的資源使用紀錄將附加到此列表。
+    sdk : dict or None
+        使用的 NeuronPilot SDK 資訊。
+
+    Returns
+    -------
+    dict
+        {"dla": 最佳變體的標準 DLA 路徑, "tuning": {"objective", "best", "variants": [...]}}；
+        variants 包含每個組合的 flags、compile_seconds、dla_bytes、estimates、cached 或 error。
+
+    Raises
+    ------
+    RuntimeError
+        所有參數組合皆編譯失敗時拋出。
+    """
+    sdk = sdk or default_sdk()
+    profiles = tune_profiles()
+    objective = tune['objective']
+    model_hash = _file_digest(tflite_path)
+    with ThreadPoolExecutor(max_workers=max(1, min(TUNE_MAX_PARALLEL, len(tune['profiles'])))) as pool:
+        # Each variant runs in a copy of this context so its logs keep the job and stage
+        futures = [pool.submit(contextvars.copy_context().run, _compile_variant, tflite_path, model_hash, arch, name,
+                               profiles[name], sdk, stats)
+                   for name in tune['profiles']]
+        variants = [future.result() for future in futures]
+
+    succeeded = [v for v in variants if v.get('dla')]
+    if not succeeded:
+        errors = '; '.join(f"{v['profile']}: {v['error']}" for v in variants)
+        raise RuntimeError(f"all tune profiles failed ({errors})")
+
+    # Variants without the objective metric rank after those that report it
+    def rank(variant):
+        value = _objective_value(variant, objective)
+        return (value is None, value if value is not None else 0, tune['profiles'].index(variant['profile']))
+
+    best = min(succeeded, key=rank)
+    best_path = best['dla']
+    for variant in variants:
+        variant['objective_value'] = _objective_value(variant, objective) if variant.get('dla') else None
+        variant['dla'] = os.path.basename(variant['dla']) if variant.get('dla') else None
+
+    # Link the winner (possibly cached from another job) under the standard DLA name next to the TFLite
+    dla_name = generate_dla_filename(os.path.basename(tflite_path), arch, sdk_file_tag(sdk))
+    dla_path = os.path.join(os.path.dirname(tflite_path), dla_name)
+    if os.path.exists(dla_path):
+        os.remove(dla_path)
+    try:
+        os.link(best_path, dla_path)
+    except OSError:
+        shutil.copy2(best_path, dla_path)
+    log.info("%s best profile '%s' by %s: %s", arch.upper(), best['profile'], objective, dla_path)
+    return {'dla': dla_path, 'tuning': {'objective': objective, 'best': best['profile'], 'variants': variants}}
+
+
+def format_tuning(arch, tuning):
+    """
+    調校結果表格
+    ==========
+    產生單一架構各參數組合的指標表格訊息。
+
+    Parameters
+    ----------
+    arch : str
+        架構鍵值。
+    tuning : dict
+        tune_tflite_to_dla 回傳的 tuning。
+
+    Returns
+    -------
+    list of str
+        表格訊息行。
+    """
+    label = arch_targets()[arch]['label'] if arch in arch_targets() else arch
+    lines = [f"🎛️ {label} auto-tune (objective: {tuning['objective']})"]
+    for variant in tuning['variants']:
+        marker = '⭐' if variant['profile'] == tuning['best'] else '  '
+        if variant.get('error'):
+            lines.append(f"{marker} {variant['profile']:<12}❌ {variant['error'][:80]}")
+            continue
+        size_kb = variant['dla_bytes'] / 1024
+        estimate = variant.get('objective_value') if tuning['objective'] not in ('size', 'compile_time') else None
+        extra = f", {tuning['objective']} {estimate:g}" if estimate is not None else ''
+        cached = ' (cached)' if variant.get('cached') else ''
+        lines.append(f"{marker} {variant['profile']:<12}{size_kb:>9.1f} KB, {variant['compile_seconds']:.1f}s{extra}{cached}")
+    return lines
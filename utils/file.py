@@ -16,12 +16,14 @@
 本軟體以「現狀」提供，不附任何明示或暗示之保證，包括但不限於適售性及特定用途之適用性。工業技術研究院 (ITRI) 或貢獻者對於因本軟體使用或無法使用所生之任何直接、間接、附帶、特殊、懲罰性或衍生性損害（包括但不限於替代商品或服務之取得、使用損失、資料遺失、營業中斷等），無論於任何理論下（契約、侵權或其他），即使已被告知可能發生該等損害，亦不負任何責任。
 """
 
-import datetime
-import random
 import os
-import json
-import shutil
-from .converter import onnx_to_tflite, tflite_to_vpu, tflite_to_mdla2, tflite_to_mdla3
+from .converter.pipeline import Pipeline, to_sse
+from .converter.stages import onnx_stages, tflite_stages, sdk_stages, analyze_failures
+from .converter.summary import build_final_response, summarize_pipeline
+from .converter.sdk import resolve_sdks
+from .converter.devices import arch_targets, resolve_targets, resolve_tune
+from .converter.scratch import scratch_workspace
+from .converter.litert import is_tflite_file
 
 """
 File Verification and Conversion Utilities
@@ -35,7 +37,9 @@ verify_uploaded_file : 驗證上傳的模型檔案並執行 DLA 轉換管線
 """
 
 
-def verify_uploaded_file(filename, save_path, user_id):
+def verify_uploaded_file(filename, save_path, user_id, sdk_versions=None, targets=None, tune_profiles=None,
+                         tune_objective=None, diagnose=False,
+                         partition=False):
     """
     檔案上傳驗證與轉換管線
     =====================
@@ -50,6 +54,18 @@ def verify_uploaded_file(filename, save_path, user_id):
         檔案儲存的完整路徑。
     user_id : str
         使用者會話的唯一識別碼，用於檔案管理與追蹤。
+    sdk_versions : list of str or None
+        要使用的 NeuronPilot SDK 版本，第一個為主要版本；None 時使用預設 SDK。
+    targets : list of str, str or None
+        要編譯的開發板或架構（例如 ["genio1200"]），None 時編譯全部架構。
+    tune_profiles : list of str, str or None
+        自動調校的 ncc-tflite 參數組合名稱（見 devices.json 的 tune_profiles，"all" 表示全部），None 時不調校。
+    tune_objective : str or None
+        調校目標 ("size"、"compile_time" 或 ncc 成本估計名稱)，None 時使用 TUNE_OBJECTIVE。
+    diagnose : bool
+        DLA 編譯失敗時是否切分 TFLite 找出該架構無法編譯的運算子。
+    partition : bool
+        DLA 編譯失敗時是否分割為該架構可接受的多個 DLA 與 CPU 執行的 TFLite 片段。
 
     Yields
     ------
@@ -65,148 +81,54 @@ def verify_uploaded_file(filename, save_path, user_id):
     file_extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
     
     if file_extension not in allowed_extensions:
-        yield f'data: {json.dumps({"message": f"❌ Only .onnx or .tflite files supported (received: .{file_extension})", "error": True, "final": True})}\n\n'
+        yield to_sse({"message": f"❌ Only .onnx or .tflite files supported (received: .{file_extension})", "error": True, "final": True})
         return
     
-    yield f'data: {json.dumps({"message": f"📁 File uploaded: {filename}"})}\n\n'
+    yield to_sse({"message": f"📁 File uploaded: {filename}"})
     
-    # Initialize conversion variables
-    tflite_path = None
-    vpu_supported = False
-    mdla2_supported = False  
-    mdla3_supported = False
-    vpu_path = None
-    mdla2_path = None
-    mdla3_path = None
-    success = False
-    
-    # Step 1: Convert to TensorFlow Lite format if needed
-    if file_extension == "onnx":
-        yield f'data: {json.dumps({"message": "🔄 Starting ONNX to TFLite conversion..."})}\n\n'
-        try:
-            yield f'data: {json.dumps({"message": f"📂 Processing ONNX file: {save_path}"})}\n\n'
-            tflite_path = onnx_to_tflite(save_path)
-            yield f'data: {json.dumps({"message": f"✅ ONNX conversion completed: {tflite_path}"})}\n\n'
-        except RuntimeError as e:
-            yield f'data: {json.dumps({"message": f"❌ ONNX conversion failed: {str(e)}", "error": True})}\n\n'
-            # Early exit on conversion failure
-            yield f'data: {json.dumps({"message": "❌ Cannot proceed with DLA conversion", "error": True, "final": True})}\n\n'
-            return
-    elif file_extension == "tflite":
-        yield f'data: {json.dumps({"message": "📝 TFLite file detected, skipping ONNX conversion"})}\n\n'
-        tflite_path = save_path
-    
-    # Validate TFLite file path
-    if not tflite_path:
-        yield f'data: {json.dumps({"message": "❌ Failed to obtain TFLite file path", "error": True, "final": True})}\n\n'
-        return
-    
-    print(f"==> TFLite file ready for DLA conversion: {tflite_path}")
-    
-    # Step 2: Test DLA conversions
-    yield f'data: {json.dumps({"message": "🔄 Starting DLA compatibility tests..."})}\n\n'
-    
-    # Step 2a: TFLite to VPU DLA
-    yield f'data: {json.dumps({"message": "Testing VPU compatibility..."})}\n\n'
-    try:
-        vpu_path = tflite_to_vpu(tflite_path)
-        if vpu_path:
-            vpu_supported = True
-            yield f'data: {json.dumps({"message": "✅ VPU conversion succeeded"})}\n\n'
-        else:
-            yield f'data: {json.dumps({"message": "❌ VPU conversion not supported", "error": True})}\n\n'
-    except RuntimeError as e:
-        yield f'data: {json.dumps({"message": f"❌ VPU conversion failed: {str(e)}", "error": True})}\n\n'
-    
-    # Step 2b: TFLite to MDLA2 DLA  
-    yield f'data: {json.dumps({"message": "Testing MDLA 2.0 compatibility..."})}\n\n'
-    try:
-        mdla2_path = tflite_to_mdla2(tflite_path)
-        if mdla2_path:
-            mdla2_supported = True
-            yield f'data: {json.dumps({"message": "✅ MDLA 2.0 conversion succeeded"})}\n\n'
-        else:
-            yield f'data: {json.dumps({"message": "❌ MDLA 2.0 conversion not supported", "error": True})}\n\n'
-    except RuntimeError as e:
-        yield f'data: {json.dumps({"message": f"❌ MDLA 2.0 conversion failed: {str(e)}", "error": True})}\n\n'
-
-    # Step 2c: TFLite to MDLA3 DLA
-    yield f'data: {json.dumps({"message": "Testing MDLA 3.0 compatibility..."})}\n\n'
+    # Resolve the requested NeuronPilot SDK versions (first one is primary) and target archs
     try:
-        mdla3_path = tflite_to_mdla3(tflite_path)
-        if mdla3_path:
-            mdla3_supported = True
-            yield f'data: {json.dumps({"message": "✅ MDLA 3.0 conversion succeeded"})}\n\n'
-        else:
-            yield f'data: {json.dumps({"message": "❌ MDLA 3.0 conversion not supported", "error": True})}\n\n'
+        sdks = resolve_sdks(sdk_versions)
+        archs = resolve_targets(targets)
+        tune = resolve_tune(tune_profiles, tune_objective)
     except RuntimeError as e:
-        yield f'data: {json.dumps({"message": f"❌ MDLA 3.0 conversion failed: {str(e)}", "error": True})}\n\n'
-
-    # Step 3: Generate compatibility summary
-    yield f'data: {json.dumps({"message": "📊 Generating compatibility summary..."})}\n\n'
-    
-    # Check if NeuronPilot SDK is available for status display
-    ncc_binary = './neuronpilot-6.0.5/neuron_sdk/host/bin/ncc-tflite'
-    sdk_available = os.path.exists(ncc_binary)
+        yield to_sse({"message": str(e), "error": True})
+        yield to_sse(build_final_response({}, False, [], {}))
+        return
+    if sdks:
+        yield to_sse({"message": f"🧰 NeuronPilot SDK: {', '.join(sdk['version'] for sdk in sdks)}"})
+    if targets:
+        yield to_sse({"message": f"🎯 Compile targets: {', '.join(arch_targets()[arch]['label'] for arch in archs)}"})
+    if tune:
+        yield to_sse({"message": f"🎛️ Auto-tuning profiles: {', '.join(tune['profiles'])} (objective: {tune['objective']})"})
     
-    # Generate status messages based on SDK availability
-    if sdk_available:
-        vpu_status = '✅ Supported' if vpu_supported else '❌ Not Supported'
-        mdla2_status = '✅ Supported' if mdla2_supported else '❌ Not Supported'
-        mdla3_status = '✅ Supported' if mdla3_supported else '❌ Not Supported'
-    else:
-        vpu_status = '✅ Supported' if vpu_supported else '⚠️ SDK Missing'
-        mdla2_status = '✅ Supported' if mdla2_supported else '⚠️ SDK Missing'
-        mdla3_status = '✅ Supported' if mdla3_supported else '⚠️ SDK Missing'
-
-    # Display compatibility results
-    yield f'data: {json.dumps({"message": "============ DLA Compatibility ============"})}\n\n'
-    yield f'data: {json.dumps({"message": f"VPU:      {vpu_status}"})}\n\n'
-    yield f'data: {json.dumps({"message": f"MDLA 2.0: {mdla2_status}"})}\n\n'
-    yield f'data: {json.dumps({"message": f"MDLA 3.0: {mdla3_status}"})}\n\n'
-    yield f'data: {json.dumps({"message": "==========================================="})}\n\n'
-
-    # Step 4: Generate final conclusion
-    success = False
-    if not any([vpu_supported, mdla2_supported, mdla3_supported]):
-        if not sdk_available:
-            yield f'data: {json.dumps({"message": "⚠️ DLA conversion service unavailable (SDK missing)", "error": True})}\n\n'
-        else:
-            yield f'data: {json.dumps({"message": "❌ Model cannot be ported to any DLA device", "error": True})}\n\n'
+    # Step 1: Build the stage graph for the uploaded format
+    if file_extension == "onnx":
+        yield to_sse({"message": f"📂 Processing ONNX file: {save_path}"})
+        pipeline = Pipeline(onnx_stages() + sdk_stages(sdks, archs, tune=tune))
+        initial = {'onnx': save_path}
     else:
-        # List supported devices
-        supported_devices = []
-        if vpu_supported: supported_devices.append('VPU')
-        if mdla2_supported: supported_devices.append('MDLA 2.0')
-        if mdla3_supported: supported_devices.append('MDLA 3.0')
-        
-        if supported_devices:
-            supported_str = ', '.join(supported_devices)
-            yield f'data: {json.dumps({"message": f"✅ Model compatible with: {supported_str}"})}\n\n'
-            success = True
-
-    # Step 5: Send final response for frontend dropdown updates
-    final_response = {
-        'final': True,
-        'success': success,
-        'vpu_supported': vpu_supported,
-        'mdla2_supported': mdla2_supported,
-        'mdla3_supported': mdla3_supported,
-        'genio510': {'vpu': False, 'mdla2': False, 'mdla3': False},
-        'genio700': {'vpu': False, 'mdla2': False, 'mdla3': False},
-        'genio1200': {'vpu': False, 'mdla2': False, 'mdla3': False},
-    }
-
-    # Map device support to Genio board compatibility
-    if vpu_supported:
-        final_response['genio510']['vpu'] = True
-        final_response['genio700']['vpu'] = True  
-        final_response['genio1200']['vpu'] = True
-    if mdla2_supported:
-        final_response['genio1200']['mdla2'] = True
-    if mdla3_supported:
-        final_response['genio510']['mdla3'] = True
-        final_response['genio700']['mdla3'] = True
+        # Reject files that are not TFLite flatbuffers before ncc-tflite sees them
+        if not is_tflite_file(save_path):
+            yield to_sse({"message": "❌ Uploaded file is not a valid TFLite model (missing TFL3 identifier)",
+                          "error": True})
+            yield to_sse(build_final_response({}, False, [], {}))
+            return
+        yield to_sse({"message": "📝 TFLite file detected, skipping ONNX conversion"})
+        pipeline = Pipeline(tflite_stages() + sdk_stages(sdks, archs, tune=tune))
+        initial = {'tflite': save_path}
     
-    print(f"==> Final response: {final_response}")
-    yield f'data: {json.dumps(final_response)}\n\n'
\ No newline at end of file
+    # Step 2: Run conversion and DLA compatibility stages in a per-job scratch directory
+    yield to_sse({"message": "🔄 Starting DLA compatibility tests..."})
+    with scratch_workspace() as scratch_dir:
+        initial['scratch_dir'] = scratch_dir
+        # Per-job outputs that are not stage-cached (e.g. partition segments) go next to the upload
+        initial['work_dir'] = os.path.dirname(save_path)
+        for event in pipeline.run(initial):
+            yield to_sse(event)
+        for event in analyze_failures(pipeline, sdks, archs, diagnose=diagnose, partition=partition):
+            yield to_sse(event)
+        
+        # Step 3: Compatibility summary and final response for frontend dropdown updates
+        for event in summarize_pipeline(pipeline, sdks, archs):
+            yield to_sse(event)
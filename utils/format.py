@@ -20,6 +20,7 @@ import tempfile
 import importlib.util
 import sys
 import os
+import uuid
 
 """
 PyTorch Code Format Verification Utilities
@@ -54,15 +55,19 @@ def verify_pytorch_format(pytorch_code):
     RuntimeError
         當程式碼語法錯誤或 import 失敗時拋出，包含詳細的錯誤訊息。
     """
+    # Each verification gets its own module name so concurrent jobs never share a namespace
+    module_name = f'user_model_{uuid.uuid4().hex}'
     with tempfile.TemporaryDirectory() as tmpdir:
-        file_path = os.path.join(tmpdir, 'user_model.py')
+        file_path = os.path.join(tmpdir, f'{module_name}.py')
         with open(file_path, 'w', encoding='utf-8') as f:
             f.write(pytorch_code)
-        spec = importlib.util.spec_from_file_location('user_model', file_path)
+        spec = importlib.util.spec_from_file_location(module_name, file_path)
         user_module = importlib.util.module_from_spec(spec)
-        sys.modules['user_model'] = user_module
+        sys.modules[module_name] = user_module
         try:
             spec.loader.exec_module(user_module)
         except Exception as e:
             raise RuntimeError(f"PyTorch code import failed: {e}")
+        finally:
+            sys.modules.pop(module_name, None)
     return True
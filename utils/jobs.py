@@ -0,0 +1,507 @@
+# -*- coding: utf-8 -*-
+"""
+版權所有 © 2025 工業技術研究院 (ITRI) 及貢獻者。
+保留所有權利。
+
+本檔案由 Microsoft 訂閱的 GitHub Copilot AI 助理協助產生與優化，部分內容經人工審閱與修正。
+
+本程式碼僅供學術研究與內部使用，未經授權不得用於商業用途。
+
+重新發佈與使用（無論原始或二進位形式，是否經過修改）僅限於下列條件下：
+
+* 原始碼之再發佈必須保留上述版權聲明、條件列表及下列免責聲明。
+* 二進位形式之再發佈必須於相關文件或其他資料中重現上述版權聲明、條件列表及下列免責聲明。
+* 未經事先書面同意，不得使用工業技術研究院 (ITRI) 或貢獻者之名稱為本軟體衍生產品背書或推廣。
+
+本軟體以「現狀」提供，不附任何明示或暗示之保證，包括但不限於適售性及特定用途之適用性。工業技術研究院 (ITRI) 或貢獻者對於因本軟體使用或無法使用所生之任何直接、間接、附帶、特殊、懲罰性或衍生性損害（包括但不限於替代商品或服務之取得、使用損失、資料遺失、營業中斷等），無論於任何理論下（契約、侵權或其他），即使已被告知可能發生該等損害，亦不負任何責任。
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+import threading
+from .artifacts import describe_artifacts
+from .blobstore import intern_paths
+from .scheduler import get_scheduler
+from .memory import estimate_job_memory, record_job_memory
+from .workqueue import CONVERSION_QUEUE
+from .converter.devices import dla_suffixes
+from .log import bind_context
+from .store import get_store
+
+"""
+Conversion Job Registry
+=======================
+轉換工作管理模組，將轉換管線放到背景執行緒中執行並保存事件紀錄。
+相同輸入與選項的請求（內容雜湊相同）會合併為同一個進行中的工作（single-flight），
+後到的請求直接附加到既有工作的事件串流，完成後將產出檔案連結到各自的使用者目錄。
+每個工作於使用者目錄下擁有獨立的工作目錄 (<user_dir>/jobs/<job_id>)，
+同一使用者（例如多個瀏覽器分頁）的工作可同時執行而不會互相覆寫檔案。
+新工作經由公平排程器 (utils.scheduler) 取得執行槽，等待期間持續回報佇列位置與預估等待時間；
+排程時附上依模型歷史峰值或檔案大小估計的記憶體 (utils.memory)，完成後記錄實際峰值並回報於最終事件。
+完成的工作另將產出清單與相容性報告寫入產出儲存 (utils.store)，其他 Web 副本也能提供該工作的下載。
+
+Functions
+---------
+job_key : 由輸入內容與選項計算工作鍵值
+file_digest : 串流計算檔案的 SHA-256
+job_workspace : 取得工作在使用者目錄下的獨立工作目錄
+submit_job : 提交工作，若已有相同工作進行中則附加
+get_job : 由工作識別碼取得工作（含已完成、尚未過期的工作）
+job_artifacts : 由工作識別碼取得產出清單與報告（含其他節點完成的工作）
+"""
+
+log = logging.getLogger(__name__)
+
+DLA_SUFFIXES = dla_suffixes()
+
+# Per-job workspaces live under <user_dir>/jobs/<job_id>
+JOBS_SUBDIR = 'jobs'
+
+# Finished jobs stay addressable (downloads, bundles, replay) for the session lifetime
+JOB_RETENTION_SECONDS = 24 * 60 * 60
+
+# Idle streams send an SSE comment at this interval so proxies keep the connection open
+HEARTBEAT_SECONDS = 15
+
+# Reconnection delay hint sent to EventSource clients (milliseconds)
+SSE_RETRY_MS = 3000
+
+# Queued jobs re-check their position (and emit an update if it changed) at this interval
+QUEUE_UPDATE_SECONDS = 5
+
+_JOB_ID_PATTERN = re.compile(r'[0-9a-f]{12}')
+
+# In-flight jobs keyed by content hash, all retained jobs keyed by job id
+_inflight_jobs = {}
+_jobs_by_id = {}
+_registry_lock = threading.Lock()
+
+
+def job_key(kind, *parts):
+    """
+    工作鍵值計算
+    ==========
+    將工作類型與所有影響輸出的輸入（程式碼、形狀、檔案雜湊等）合併計算 SHA-256。
+
+    Parameters
+    ----------
+    kind : str
+        工作類型，例如 "pytorch"、"upload"。
+    *parts : str
+        影響轉換結果的輸入內容與選項。
+
+    Returns
+    -------
+    str
+        十六進位的 SHA-256 鍵值。
+    """
+    h = hashlib.sha256(kind.encode('utf-8'))
+    for part in parts:
+        data = str(part).encode('utf-8')
+        h.update(len(data).to_bytes(8, 'big'))
+        h.update(data)
+    return h.hexdigest()
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """
+    檔案 SHA-256 計算
+    ===============
+    以固定大小區塊串流讀取，避免將大型模型檔案整個載入記憶體。
+
+    Parameters
+    ----------
+    path : str
+        檔案路徑。
+    chunk_size : int
+        每次讀取的位元組數。
+
+    Returns
+    -------
+    str
+        十六進位的 SHA-256 摘要。
+    """
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def job_workspace(user_dir, job_id):
+    """
+    工作目錄
+    ======
+    取得工作在使用者目錄下的獨立工作目錄，所有輸入、中間檔案與產出皆置於其中。
+
+    Parameters
+    ----------
+    user_dir : str
+        使用者目錄。
+    job_id : str
+        工作識別碼。
+
+    Returns
+    -------
+    str
+        工作目錄路徑 (<user_dir>/jobs/<job_id>)。
+    """
+    return os.path.join(user_dir, JOBS_SUBDIR, job_id)
+
+
+class Job:
+    """
+    轉換工作
+    ======
+    在背景執行緒中消費轉換管線產生的 SSE 事件，保存事件紀錄並通知所有訂閱者。
+    用戶端中斷連線不會中止工作，其他相同請求仍可取得完整結果。
+
+    Attributes
+    ----------
+    job_id : str
+        工作識別碼。
+    key : str
+        工作內容雜湊鍵值。
+    user_dir : str
+        提交工作的使用者目錄（第一個提交者）。
+    work_dir : str
+        工作專屬的工作目錄 (<user_dir>/jobs/<job_id>)。
+    user : str
+        排程使用的使用者識別碼。
+    cost : float
+        排程成本，0 表示不需排隊（例如回放已完成的結果）。
+    model_hash : str or None
+        模型雜湊，作為峰值記憶體歷史紀錄的鍵值。
+    memory_estimate : tuple of (float, str)
+        分派前的記憶體估計 (MB, 來源)。
+    events : list of dict
+        依序保存的事件紀錄，事件序號為索引加一（即 SSE 的 id）。
+    result : dict or None
+        最終事件（final=True）的內容。
+    artifact_paths : dict
+        角色 ("tflite", "vpu", "mdla2", "mdla3") 對應的產出檔案路徑。
+    """
+
+    def __init__(self, key, user_dir, pipeline_factory, user=None, cost=1, model_hash=None, model_bytes=None):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.user_dir = user_dir
+        self.user = user or os.path.basename(os.path.normpath(user_dir))
+        self.cost = cost
+        self.model_hash = model_hash
+        self.memory_estimate = estimate_job_memory(model_hash, model_bytes)
+        self.work_dir = job_workspace(user_dir, self.job_id)
+        os.makedirs(self.work_dir, exist_ok=True)
+        # Session expiry looks at the user directory's mtime; new jobs keep it alive
+        os.utime(user_dir)
+        self.events = []
+        self.result = None
+        self.artifact_paths = {}
+        self.done = False
+        self.started_at = time.time()
+        self.finished_at = None
+        self._pipeline = pipeline_factory(self.work_dir)
+        self._cond = threading.Condition()
+
+    def start(self):
+        # First event tells clients which job to resume after a dropped connection
+        self._publish({"message": f"🆔 Conversion job {self.job_id}", "job_id": self.job_id})
+        thread = threading.Thread(target=self._run, name=f'job-{self.job_id}', daemon=True)
+        thread.start()
+
+    def _publish(self, payload):
+        with self._cond:
+            self.events.append(payload)
+            if payload.get('final'):
+                self.result = payload
+            self._cond.notify_all()
+
+    def _finalize(self, payload):
+        """將管線回報的產出檔案路徑替換為內容定址的下載資訊，並將完成的檔案去重。"""
+        paths = payload.pop('artifacts', None) or {}
+        self.artifact_paths = {role: path for role, path in paths.items() if path and os.path.exists(path)}
+        # Cached stages may return DLAs from another job's directory; keep a copy under our own
+        for role, src in list(self.artifact_paths.items()):
+            if not src.endswith(DLA_SUFFIXES):
+                continue
+            if not os.path.relpath(src, self.work_dir).startswith('..'):
+                continue
+            dst = os.path.join(self.work_dir, os.path.basename(src))
+            os.makedirs(self.work_dir, exist_ok=True)
+            if os.path.exists(dst):
+                os.remove(dst)
+            try:
+                os.link(src, dst)
+            except OSError:
+                shutil.copy2(src, dst)
+            self.artifact_paths[role] = dst
+        # Completed files become hard links into the content-addressed blob store
+        workspace_files = payload.pop('workspace_files', None) or []
+        count, saved = intern_paths(workspace_files + list(self.artifact_paths.values()))
+        if count:
+            log.info("Interned %d file(s), released %.1f MB", count, saved / (1024 * 1024))
+        # Peak memory feeds the admission estimate of the next run of this model
+        payload['memory'] = record_job_memory(self.model_hash, payload.get('resources') or [], self.memory_estimate)
+        if payload['memory']['stages']:
+            self._publish({"message": f"💾 Peak memory {payload['memory']['peak_mb']:.0f} MB "
+                                      f"(estimated {self.memory_estimate[0]:.0f} MB from {self.memory_estimate[1]})"})
+        payload['job_id'] = self.job_id
+        payload['artifacts'] = describe_artifacts(self.artifact_paths)
+        payload['bundle_url'] = f'/jobs/{self.job_id}/bundle.zip' if self.artifact_paths else None
+        # Replicas that did not run this job serve its downloads from the stored manifest
+        try:
+            get_store().put_json(_manifest_key(self.job_id), {'artifacts': payload['artifacts'],
+                                                              'report': _job_report(payload)})
+        except Exception as e:
+            log.warning("Could not store the artifact manifest of job %s: %s", self.job_id, e)
+        return payload
+
+    def _wait_for_slot(self, scheduler, ticket):
+        """等待排程器分派執行槽，位置或預估時間改變時發布佇列事件。"""
+        last = None
+        while True:
+            position, eta = scheduler.position(ticket)
+            if not position:
+                break
+            if (position, eta, ticket.memory_blocked) != last:
+                last = (position, eta, ticket.memory_blocked)
+                message = f"⏳ Queued: position {position}, estimated wait ~{eta}s"
+                if ticket.memory_blocked:
+                    message += f" (waiting for ~{ticket.memory_mb:.0f} MB of free memory)"
+                self._publish({"message": message, "queue_position": position, "estimated_wait_seconds": eta,
+                               "memory_blocked": ticket.memory_blocked})
+            scheduler.wait(ticket, timeout=QUEUE_UPDATE_SECONDS)
+        if last is not None:
+            waited = ticket.dispatched_at - ticket.enqueued_at
+            self._publish({"message": f"▶️ Starting after {waited:.0f}s in queue", "queue_position": 0})
+
+    def _run(self):
+        # Everything logged from this thread (scheduler, pipeline, converters) carries the job id
+        bind_context(job_id=self.job_id, user_id=self.user)
+        scheduler = get_scheduler() if self.cost else None
+        ticket = None
+        try:
+            if scheduler is not None:
+                # Remote workers convert on their own hosts, so local memory does not gate them
+                memory_mb = 0 if CONVERSION_QUEUE else self.memory_estimate[0]
+                ticket = scheduler.submit(self.job_id, self.user, self.cost, memory_mb)
+                self._wait_for_slot(scheduler, ticket)
+            for chunk in self._pipeline:
+                # Pipelines yield pre-formatted 'data: {...}\n\n' strings
+                for line in chunk.splitlines():
+                    if line.startswith('data: '):
+                        payload = json.loads(line[6:])
+                        if payload.get('final'):
+                            payload = self._finalize(payload)
+                        self._publish(payload)
+        except Exception as e:
+            log.exception("Conversion job failed")
+            self._publish({"message": f"❌ Conversion job failed: {e}", "error": True, "final": True})
+        finally:
+            if ticket is not None:
+                scheduler.release(ticket)
+            if self.result is None:
+                self._publish({"message": "❌ Conversion ended without a result", "error": True, "final": True})
+            with _registry_lock:
+                if _inflight_jobs.get(self.key) is self:
+                    del _inflight_jobs[self.key]
+            with self._cond:
+                self.done = True
+                self.finished_at = time.time()
+                self._cond.notify_all()
+
+    def share_with(self, user_dir):
+        """
+        分享產出檔案
+        ==========
+        將工作產生的 DLA 以硬連結（跨裝置時改為複製）放入另一位使用者目錄下
+        同一工作識別碼的工作目錄，使其可透過既有的下載流程取得自己的一份。
+
+        Parameters
+        ----------
+        user_dir : str
+            目標使用者目錄。
+
+        Returns
+        -------
+        int
+            分享的檔案數量。
+        """
+        shared = 0
+        target_dir = job_workspace(user_dir, self.job_id)
+        for role, src in self.artifact_paths.items():
+            if not src.endswith(DLA_SUFFIXES):
+                continue
+            rel_path = os.path.relpath(src, self.work_dir)
+            if rel_path.startswith('..'):
+                rel_path = os.path.basename(src)
+            dst = os.path.join(target_dir, rel_path)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            if os.path.exists(dst):
+                os.remove(dst)
+            try:
+                os.link(src, dst)
+            except OSError:
+                shutil.copy2(src, dst)
+            shared += 1
+        return shared
+
+    def stream(self, user_dir=None, last_event_id=None):
+        """
+        事件串流
+        ======
+        從 last_event_id 之後開始重送事件紀錄，接著輸出即時事件直到工作結束；
+        每個事件附帶序號 (SSE id)，用戶端斷線後可以 Last-Event-ID 續接。
+        若 user_dir 與提交者的使用者目錄不同（附加的請求），會在最終事件前分享產出檔案。
+
+        Parameters
+        ----------
+        user_dir : str or None
+            訂閱者的使用者目錄。
+        last_event_id : int or None
+            用戶端最後收到的事件序號，None 表示從頭開始。
+
+        Yields
+        ------
+        str
+            Server-sent event 格式化的事件字串。
+        """
+        index = max(0, min(int(last_event_id or 0), len(self.events)))
+        yield f'retry: {SSE_RETRY_MS}\n\n'
+        while True:
+            with self._cond:
+                if index >= len(self.events) and not self.done:
+                    self._cond.wait(timeout=HEARTBEAT_SECONDS)
+                pending = self.events[index:]
+                start = index
+                index += len(pending)
+                finished = self.done and index >= len(self.events)
+            if not pending and not finished:
+                yield ': keep-alive\n\n'
+                continue
+            for seq, payload in enumerate(pending, start=start + 1):
+                if payload.get('final') and user_dir and os.path.abspath(user_dir) != os.path.abspath(self.user_dir):
+                    shared = self.share_with(user_dir)
+                    yield f'data: {json.dumps({"message": f"🔗 Linked {shared} shared artifact(s) into your workspace"})}\n\n'
+                yield f'id: {seq}\ndata: {json.dumps(payload)}\n\n'
+            if finished:
+                return
+
+
+def submit_job(key, user_dir, pipeline_factory, user=None, cost=1, model_hash=None, model_bytes=None):
+    """
+    提交轉換工作
+    ==========
+    若相同鍵值的工作正在進行，附加到該工作；否則於使用者目錄下建立獨立工作目錄並於背景執行新工作。
+
+    Parameters
+    ----------
+    key : str
+        由 job_key 計算的內容雜湊鍵值。
+    user_dir : str
+        提交者的使用者目錄。
+    pipeline_factory : callable
+        以工作目錄為參數的函數，返回產生 SSE 字串的轉換管線 generator。
+    user : str or None
+        排程使用的使用者識別碼，None 時使用使用者目錄名稱。
+    cost : float
+        排程成本（一般轉換為 1，形狀掃描為形狀數），0 表示不需排隊。
+    model_hash : str or None
+        模型雜湊（上傳檔案內容或 PyTorch 程式碼與形狀），用於記憶體估計與歷史紀錄。
+    model_bytes : int or None
+        模型檔案大小，無歷史紀錄時用於估計記憶體。
+
+    Returns
+    -------
+    tuple of (Job, bool)
+        工作物件，以及是否為新建立的工作（False 表示附加到既有工作）。
+    """
+    with _registry_lock:
+        _prune_expired_jobs()
+        job = _inflight_jobs.get(key)
+        if job is not None:
+            log.info("Attaching to in-flight job %s (key %s)", job.job_id, key[:12])
+            return job, False
+        os.makedirs(user_dir, exist_ok=True)
+        job = Job(key, user_dir, pipeline_factory, user=user, cost=cost, model_hash=model_hash,
+                  model_bytes=model_bytes)
+        _inflight_jobs[key] = job
+        _jobs_by_id[job.job_id] = job
+    job.start()
+    log.info("Started job %s (key %s)", job.job_id, key[:12])
+    return job, True
+
+
+def _prune_expired_jobs():
+    """移除超過保留時間的已完成工作（呼叫端需持有 _registry_lock）。"""
+    now = time.time()
+    for job_id, job in list(_jobs_by_id.items()):
+        if job.done and now - job.finished_at > JOB_RETENTION_SECONDS:
+            del _jobs_by_id[job_id]
+
+
+def get_job(job_id):
+    """
+    取得工作
+    ======
+    由工作識別碼取得進行中或已完成（尚未過期）的工作。
+
+    Parameters
+    ----------
+    job_id : str
+        工作識別碼。
+
+    Returns
+    -------
+    Job or None
+        找不到或已過期時返回 None。
+    """
+    with _registry_lock:
+        return _jobs_by_id.get(job_id)
+
+
+def _manifest_key(job_id):
+    return f'jobs/{job_id}.json'
+
+
+def _job_report(result):
+    """最終事件中除訊息外的內容，作為 bundle 中的 compatibility.json。"""
+    return {k: v for k, v in result.items() if k not in ('final', 'message')}
+
+
+def job_artifacts(job_id):
+    """
+    工作產出清單
+    ==========
+    取得已完成工作的產出檔案描述與相容性報告；本行程找不到該工作時（由其他 Web 副本執行或已過期）
+    改讀取產出儲存中的清單。
+
+    Parameters
+    ----------
+    job_id : str
+        工作識別碼。
+
+    Returns
+    -------
+    dict or None
+        {"artifacts": {角色: {"name", "size", "digest", "url"}}, "report": dict}；
+        工作不存在或尚未完成時返回 None。
+    """
+    job = get_job(job_id)
+    if job is not None:
+        if not job.done or job.result is None:
+            return None
+        return {'artifacts': job.result.get('artifacts') or {}, 'report': _job_report(job.result)}
+    if not _JOB_ID_PATTERN.fullmatch(job_id or ''):
+        return None
+    try:
+        return get_store().get_json(_manifest_key(job_id))
+    except Exception as e:
+        log.warning("Could not read the artifact manifest of job %s: %s", job_id, e)
+        return None
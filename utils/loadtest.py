@@ -0,0 +1,466 @@
+# -*- coding: utf-8 -*-
+"""
+版權所有 © 2025 工業技術研究院 (ITRI) 及貢獻者。
+保留所有權利。
+
+本檔案由 Microsoft 訂閱的 GitHub Copilot AI 助理協助產生與優化，部分內容經人工審閱與修正。
+
+本程式碼僅供學術研究與內部使用，未經授權不得用於商業用途。
+
+重新發佈與使用（無論原始或二進位形式，是否經過修改）僅限於下列條件下：
+
+* 原始碼之再發佈必須保留上述版權聲明、條件列表及下列免責聲明。
+* 二進位形式之再發佈必須於相關文件或其他資料中重現上述版權聲明、條件列表及下列免責聲明。
+* 未經事先書面同意，不得使用工業技術研究院 (ITRI) 或貢獻者之名稱為本軟體衍生產品背書或推廣。
+
+本軟體以「現狀」提供，不附任何明示或暗示之保證，包括但不限於適售性及特定用途之適用性。工業技術研究院 (ITRI) 或貢獻者對於因本軟體使用或無法使用所生之任何直接、間接、附帶、特殊、懲罰性或衍生性損害（包括但不限於替代商品或服務之取得、使用損失、資料遺失、營業中斷等），無論於任何理論下（契約、侵權或其他），即使已被告知可能發生該等損害，亦不負任何責任。
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import argparse
+import threading
+import urllib.error
+import urllib.request
+
+"""
+SSE Load-Testing Harness
+========================
+模擬 N 個虛擬使用者（各自的 X-User-ID）同時呼叫 /verify_model、/upload_and_verify 與 /download_dla，
+逐行解析 SSE 串流，記錄第一個事件、各管線階段與最終結果的延遲，輸出吞吐量與 p50/p95/p99 的 JSON 報告。
+搭配 stub-sdk 子命令產生的假 ncc-tflite，可在沒有 NeuronPilot SDK 的主機上量測伺服器與排程的改動。
+
+Usage
+-----
+python -m utils.loadtest stub-sdk ./stub_sdk --ncc-seconds 0.5
+NEURONPILOT_SDK_ROOT=./stub_sdk python app.py
+python -m utils.loadtest run --url http://127.0.0.1:5000 --users 16 --duration 120 \\
+    --mix verify=3,upload=1,download=1 --upload-file model.tflite --output loadtest.json
+
+Functions
+---------
+write_stub_sdk : 產生假的 NeuronPilot SDK（ncc-tflite 只等待並寫出假 DLA）
+percentiles : 計算 p50/p95/p99
+run_load_test : 執行負載測試並返回報告
+"""
+
+STUB_SDK_VERSION = '0.0.0'
+
+# Default PyTorch payload: the editor's example model
+DEFAULT_CODE_PATH = os.path.join(os.path.dirname(__file__), '..', 'model_zoo', 'editor_default.py')
+
+# Seconds a virtual user waits when the chosen action cannot run yet (e.g. download before any result)
+RETRY_DELAY_SECONDS = 0.2
+
+_STUB_NCC = '''#!{python}
+# Stub ncc-tflite for load testing: sleeps, then writes a fake DLA
+import os, sys, time
+args = sys.argv[1:]
+if '--version' in args:
+    print('ncc-tflite version {version}-stub')
+    sys.exit(0)
+if '--help' in args:
+    print('--arch=<{archs}>')
+    sys.exit(0)
+time.sleep(float(os.environ.get('NCC_STUB_SECONDS', '{seconds}')))
+if float(os.environ.get('NCC_STUB_FAIL_RATE', '{fail_rate}')) > __import__('random').random():
+    print('ERROR: stub failure', file=sys.stderr)
+    sys.exit(1)
+output = args[args.index('-o') + 1]
+source = [a for a in args if a.endswith('.tflite')][0]
+with open(output, 'wb') as f:
+    f.write(os.urandom(max(1024, os.path.getsize(source) // 2)))
+print('Estimated total cycles: %d' % (os.path.getsize(source) * 3))
+'''
+
+
+def write_stub_sdk(root, ncc_seconds=0.5, fail_rate=0.0):
+    """
+    產生假 SDK
+    ========
+    於 root/neuronpilot-0.0.0 下建立與 sdk 模組相同目錄結構的假 ncc-tflite，
+    將 NEURONPILOT_SDK_ROOT 指向 root 即可在沒有 SDK 的主機上執行完整管線。
+
+    Parameters
+    ----------
+    root : str
+        SDK 根目錄。
+    ncc_seconds : float
+        每次編譯的等待秒數（執行時可用 NCC_STUB_SECONDS 覆寫）。
+    fail_rate : float
+        編譯失敗的機率（執行時可用 NCC_STUB_FAIL_RATE 覆寫）。
+
+    Returns
+    -------
+    str
+        假 ncc-tflite 的路徑。
+    """
+    from .converter.sdk import NCC_RELATIVE_PATH
+    from .converter.devices import arch_targets
+
+    ncc_path = os.path.join(root, f'neuronpilot-{STUB_SDK_VERSION}', NCC_RELATIVE_PATH)
+    os.makedirs(os.path.dirname(ncc_path), exist_ok=True)
+    archs = '|'.join(spec['ncc_arch'] for spec in arch_targets().values())
+    with open(ncc_path, 'w', encoding='utf-8') as f:
+        f.write(_STUB_NCC.format(python=sys.executable, version=STUB_SDK_VERSION, archs=archs,
+                                 seconds=ncc_seconds, fail_rate=fail_rate))
+    os.chmod(ncc_path, 0o755)
+    return ncc_path
+
+
+def percentiles(values):
+    """
+    延遲百分位數
+    ==========
+    以最近秩法計算 p50/p95/p99，另附 count、mean 與 max。
+
+    Parameters
+    ----------
+    values : list of float
+        延遲秒數。
+
+    Returns
+    -------
+    dict
+        {"count", "mean", "p50", "p95", "p99", "max"}；空列表時數值為 None。
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return {'count': 0, 'mean': None, 'p50': None, 'p95': None, 'p99': None, 'max': None}
+
+    def rank(p):
+        return round(ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)], 3)
+
+    return {
+        'count': len(ordered),
+        'mean': round(sum(ordered) / len(ordered), 3),
+        'p50': rank(50),
+        'p95': rank(95),
+        'p99': rank(99),
+        'max': round(ordered[-1], 3),
+    }
+
+
+def _multipart(fields, file_field, filename, data):
+    """組成 multipart/form-data 本體，返回 (content_type, body)。"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+                 f'Content-Type: application/octet-stream\r\n\r\n'.encode() + data + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return f'multipart/form-data; boundary={boundary}', b''.join(parts)
+
+
+def _consume_sse(response, start, timeout):
+    """
+    逐行讀取 SSE 串流並記錄時間點。
+
+    Returns
+    -------
+    dict
+        {"first_event", "final", "events", "stages": {stage: seconds}, "success", "job_id", "error"}。
+    """
+    record = {'first_event': None, 'final': None, 'events': 0, 'stages': {}, 'success': False,
+              'job_id': None, 'error': None}
+    started = {}
+    for raw in response:
+        now = time.time() - start
+        if now > timeout:
+            record['error'] = 'timeout'
+            break
+        line = raw.decode('utf-8', errors='replace').rstrip('\r\n')
+        if not line.startswith('data: '):
+            continue
+        try:
+            event = json.loads(line[6:])
+        except ValueError:
+            continue
+        record['events'] += 1
+        if record['first_event'] is None:
+            record['first_event'] = now
+        record['job_id'] = event.get('job_id') or record['job_id']
+        stage, status = event.get('stage'), event.get('status')
+        if stage and status == 'started':
+            started[stage] = now
+        elif stage and status in ('done', 'cached'):
+            # Prefer the server-side stage time; fall back to the wall time between events
+            record['stages'][stage] = event.get('seconds', now - started.get(stage, now))
+        if event.get('final'):
+            record['final'] = now
+            record['success'] = bool(event.get('success'))
+            break
+    if record['final'] is None and record['error'] is None:
+        record['error'] = 'stream ended without a final event'
+    return record
+
+
+class _VirtualUser:
+    """單一虛擬使用者：固定的 X-User-ID，記住最近一次成功工作的 job_id 供下載使用。"""
+
+    def __init__(self, base_url, code, entrypoint, input_shape, upload, unique, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.user_id = f'loadtest-{uuid.uuid4().hex[:8]}'
+        self.code = code
+        self.entrypoint = entrypoint
+        self.input_shape = input_shape
+        self.upload = upload
+        self.unique = unique
+        self.timeout = timeout
+        self.last_job = None
+        self.last_targets = []
+
+    def _request(self, path, body, content_type):
+        return urllib.request.Request(self.base_url + path, data=body, method='POST', headers={
+            'Content-Type': content_type, 'X-User-ID': self.user_id})
+
+    def _stream(self, request):
+        start = time.time()
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                record = _consume_sse(response, start, self.timeout)
+                record['status'] = response.status
+        except urllib.error.HTTPError as e:
+            record = {'status': e.code, 'error': f'HTTP {e.code}', 'success': False, 'stages': {}}
+        except (OSError, urllib.error.URLError) as e:
+            record = {'status': None, 'error': str(e), 'success': False, 'stages': {}}
+        record['latency'] = time.time() - start
+        if record.get('success') and record.get('job_id'):
+            self.last_job = record['job_id']
+        return record
+
+    def verify(self):
+        # A unique comment defeats job coalescing and the stage cache so every request does real work
+        code = self.code + (f'\n# loadtest {uuid.uuid4().hex}\n' if self.unique else '')
+        body = json.dumps({'pytorch_code': code, 'model_entrypoint': self.entrypoint,
+                           'input_shape': self.input_shape}).encode()
+        return self._stream(self._request('/verify_model', body, 'application/json'))
+
+    def upload_and_verify(self):
+        # Model files are sent as-is, so repeated uploads share the stage cache
+        filename, data = self.upload
+        content_type, body = _multipart({'action': 'upload_and_verify'}, 'upload_pretrained_file', filename, data)
+        return self._stream(self._request('/upload_and_verify', body, content_type))
+
+    def download(self, device):
+        start = time.time()
+        body = json.dumps({'device': device, 'job_id': self.last_job}).encode()
+        record = {'status': None, 'error': None, 'success': False, 'bytes': 0}
+        try:
+            with urllib.request.urlopen(self._request('/download_dla', body, 'application/json'),
+                                        timeout=self.timeout) as response:
+                first = response.read(1)
+                record['first_event'] = time.time() - start
+                record['bytes'] = len(first) + len(response.read())
+                record['status'] = response.status
+                record['success'] = True
+        except urllib.error.HTTPError as e:
+            record['status'], record['error'] = e.code, f'HTTP {e.code}'
+        except (OSError, urllib.error.URLError) as e:
+            record['error'] = str(e)
+        record['latency'] = time.time() - start
+        return record
+
+
+def run_load_test(base_url, users, duration=None, iterations=None, mix=None, upload_file=None, code=None,
+                  entrypoint='SimpleModel', input_shape='(1, 10)', device='mdla3', unique=True, timeout=900,
+                  ramp_up=0.0, seed=None):
+    """
+    執行負載測試
+    ==========
+    啟動 users 個虛擬使用者執行緒，每個依 mix 權重隨機選擇動作，直到 duration 秒或每人 iterations 次。
+    下載動作使用該使用者最近一次成功工作的 job_id，尚無結果時改為送出轉換。
+
+    Parameters
+    ----------
+    base_url : str
+        伺服器位址，例如 "http://127.0.0.1:5000"。
+    users : int
+        虛擬使用者數。
+    duration : float or None
+        測試秒數（開始新請求的截止時間，進行中的請求會完成）。
+    iterations : int or None
+        每個使用者的請求數；與 duration 皆為 None 時每人 1 次。
+    mix : dict or None
+        動作權重 {"verify", "upload", "download"}，預設 {"verify": 1}。
+    upload_file : str or None
+        上傳動作使用的 .onnx / .tflite 檔案；未提供時略過上傳動作。
+    code : str or None
+        /verify_model 的 PyTorch 程式碼，預設為 model_zoo/editor_default.py。
+    entrypoint, input_shape : str
+        /verify_model 的模型類別與輸入形狀。
+    device : str
+        下載的架構鍵值。
+    unique : bool
+        每個 /verify_model 請求加入唯一註解，避免單一工作合併與階段快取（上傳檔案原樣送出）。
+    timeout : float
+        單一請求的逾時秒數。
+    ramp_up : float
+        虛擬使用者平均分散啟動的秒數。
+    seed : int or None
+        動作選擇的亂數種子。
+
+    Returns
+    -------
+    dict
+        JSON 報告：設定、總請求數、吞吐量與各動作的延遲百分位數。
+    """
+    mix = dict(mix or {'verify': 1})
+    upload = None
+    if mix.get('upload'):
+        if upload_file:
+            with open(upload_file, 'rb') as f:
+                upload = (os.path.basename(upload_file), f.read())
+        else:
+            print('[loadtest] No --upload-file given; skipping upload traffic')
+            mix.pop('upload')
+    actions = [name for name, weight in mix.items() if weight > 0]
+    weights = [mix[name] for name in actions]
+    if not actions:
+        raise RuntimeError('❌ Load mix has no runnable actions')
+    if code is None:
+        with open(DEFAULT_CODE_PATH, 'r', encoding='utf-8') as f:
+            code = f.read()
+    if duration is None and iterations is None:
+        iterations = 1
+
+    records = []
+    records_lock = threading.Lock()
+    rng = random.Random(seed)
+    start = time.time()
+    deadline = start + duration if duration else None
+
+    def user_loop(index, user_seed):
+        time.sleep(ramp_up * index / max(users, 1))
+        user = _VirtualUser(base_url, code, entrypoint, input_shape, upload, unique, timeout)
+        choose = random.Random(user_seed)
+        done = 0
+        while (iterations is None or done < iterations) and (deadline is None or time.time() < deadline):
+            action = choose.choices(actions, weights)[0]
+            if action == 'download' and user.last_job is None:
+                action = 'upload' if upload and 'verify' not in actions else 'verify'
+            issued = time.time() - start
+            if action == 'verify':
+                record = user.verify()
+            elif action == 'upload':
+                record = user.upload_and_verify()
+            else:
+                record = user.download(device)
+            record.update({'action': action, 'user': user.user_id, 'issued_at': round(issued, 3)})
+            with records_lock:
+                records.append(record)
+            done += 1
+            if record.get('error'):
+                time.sleep(RETRY_DELAY_SECONDS)
+
+    threads = [threading.Thread(target=user_loop, args=(i, rng.random()), name=f'vu-{i}', daemon=True)
+               for i in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+
+    by_action = {}
+    for action in actions:
+        subset = [r for r in records if r['action'] == action]
+        if not subset:
+            continue
+        stage_names = sorted({name for r in subset for name in r.get('stages', {})})
+        by_action[action] = {
+            'requests': len(subset),
+            'succeeded': sum(1 for r in subset if r.get('success')),
+            'errors': sum(1 for r in subset if r.get('error')),
+            'error_samples': sorted({r['error'] for r in subset if r.get('error')})[:5],
+            'first_event': percentiles([r['first_event'] for r in subset if r.get('first_event') is not None]),
+            'final': percentiles([r['final'] for r in subset if r.get('final') is not None]),
+            'latency': percentiles([r['latency'] for r in subset]),
+            'stages': {name: percentiles([r['stages'][name] for r in subset if name in r.get('stages', {})])
+                       for name in stage_names},
+        }
+    return {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': {'url': base_url, 'users': users, 'duration': duration, 'iterations': iterations,
+                   'mix': mix, 'unique': unique, 'ramp_up': ramp_up, 'device': device},
+        'seconds': round(elapsed, 3),
+        'requests': len(records),
+        'succeeded': sum(1 for r in records if r.get('success')),
+        'throughput_rps': round(len(records) / elapsed, 3) if elapsed else None,
+        'latency': percentiles([r['latency'] for r in records]),
+        'actions': by_action,
+    }
+
+
+def _parse_mix(text):
+    """將 "verify=3,upload=1,download=1" 解析為權重 dict。"""
+    mix = {}
+    for part in filter(None, (p.strip() for p in text.split(','))):
+        name, _, weight = part.partition('=')
+        if name not in ('verify', 'upload', 'download'):
+            raise argparse.ArgumentTypeError(f'unknown action {name!r} (verify, upload, download)')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m utils.loadtest',
+                                     description='Load-test the SSE conversion endpoints with virtual users.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    stub = commands.add_parser('stub-sdk', help='write a stub NeuronPilot SDK for NEURONPILOT_SDK_ROOT')
+    stub.add_argument('root', help='directory to use as NEURONPILOT_SDK_ROOT')
+    stub.add_argument('--ncc-seconds', type=float, default=0.5, help='simulated compile time per DLA')
+    stub.add_argument('--fail-rate', type=float, default=0.0, help='probability that a compile fails')
+
+    run = commands.add_parser('run', help='run virtual users against a server')
+    run.add_argument('--url', default='http://127.0.0.1:5000')
+    run.add_argument('--users', type=int, default=8, help='concurrent virtual users')
+    run.add_argument('--duration', type=float, default=None, help='seconds to keep issuing requests')
+    run.add_argument('--iterations', type=int, default=None, help='requests per user (default 1 without --duration)')
+    run.add_argument('--ramp-up', type=float, default=0.0, help='seconds over which users start')
+    run.add_argument('--mix', type=_parse_mix, default={'verify': 1}, help='action weights, e.g. verify=3,upload=1,download=1')
+    run.add_argument('--upload-file', default=None, help='.onnx/.tflite used by upload traffic')
+    run.add_argument('--code', default=None, help='PyTorch file for /verify_model (default: model_zoo/editor_default.py)')
+    run.add_argument('--entrypoint', default='SimpleModel')
+    run.add_argument('--input-shape', default='(1, 10)')
+    run.add_argument('--device', default='mdla3', help='arch key for /download_dla')
+    run.add_argument('--no-unique', action='store_true', help='send identical payloads (measures job coalescing)')
+    run.add_argument('--timeout', type=float, default=900, help='per-request timeout in seconds')
+    run.add_argument('--seed', type=int, default=None)
+    run.add_argument('--output', default=None, help='write the JSON report here (default: stdout)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'stub-sdk':
+        path = write_stub_sdk(args.root, args.ncc_seconds, args.fail_rate)
+        print(f"[loadtest] Stub ncc-tflite written to {path}")
+        print(f"[loadtest] Start the server with NEURONPILOT_SDK_ROOT={os.path.abspath(args.root)}")
+        return 0
+
+    code = None
+    if args.code:
+        with open(args.code, 'r', encoding='utf-8') as f:
+            code = f.read()
+    print(f"[loadtest] {args.users} virtual user(s) against {args.url} (mix {args.mix})")
+    report = run_load_test(args.url, args.users, duration=args.duration, iterations=args.iterations, mix=args.mix,
+                           upload_file=args.upload_file, code=code, entrypoint=args.entrypoint,
+                           input_shape=args.input_shape, device=args.device, unique=not args.no_unique,
+                           timeout=args.timeout, ramp_up=args.ramp_up, seed=args.seed)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"[loadtest] {report['requests']} request(s), {report['throughput_rps']} req/s, "
+              f"p95 {report['latency']['p95']}s → {args.output}")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+版權所有 © 2025 工業技術研究院 (ITRI) 及貢獻者。
+保留所有權利。
+
+本檔案由 Microsoft 訂閱的 GitHub Copilot AI 助理協助產生與優化，部分內容經人工審閱與修正。
+
+本程式碼僅供學術研究與內部使用，未經授權不得用於商業用途。
+
+重新發佈與使用（無論原始或二進位形式，是否經過修改）僅限於下列條件下：
+
+* 原始碼之再發佈必須保留上述版權聲明、條件列表及下列免責聲明。
+* 二進位形式之再發佈必須於相關文件或其他資料中重現上述版權聲明、條件列表及下列免責聲明。
+* 未經事先書面同意，不得使用工業技術研究院 (ITRI) 或貢獻者之名稱為本軟體衍生產品背書或推廣。
+
+本軟體以「現狀」提供，不附任何明示或暗示之保證，包括但不限於適售性及特定用途之適用性。工業技術研究院 (ITRI) 或貢獻者對於因本軟體使用或無法使用所生之任何直接、間接、附帶、特殊、懲罰性或衍生性損害（包括但不限於替代商品或服務之取得、使用損失、資料遺失、營業中斷等），無論於任何理論下（契約、侵權或其他），即使已被告知可能發生該等損害，亦不負任何責任。
+"""
+
+import os
+import sys
+import copy
+import json
+import time
+import queue
+import atexit
+import hashlib
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+
+"""
+Structured Logging
+==================
+非阻塞的結構化日誌：請求處理與轉換執行緒只把紀錄放入記憶體佇列，由背景執行緒寫出到 stdout，
+避免大量工作同時執行時同步的 stdout 寫入拖慢請求處理。每筆紀錄自動附上目前的工作、使用者與階段
+（以 contextvars 傳遞，跨執行緒池時以 copy_context 帶入），不同工作交錯的輸出可依欄位區分。
+
+Configuration (環境變數)
+------------------------
+LOG_LEVEL      : 日誌層級 (DEBUG / INFO / WARNING / ERROR)，預設 INFO
+LOG_FORMAT     : json（每行一個 JSON 物件，預設）或 text
+LOG_QUEUE_SIZE : 待寫出紀錄的佇列上限，滿時丟棄新紀錄並計數，預設 10000
+
+JSON 欄位
+--------
+{"ts", "level", "logger", "message", "job_id", "user_id", "stage", ...extra={"fields": {...}} 的欄位}
+
+Functions
+---------
+setup_logging : 設定根日誌器使用佇列與背景寫出執行緒（可重複呼叫）
+log_context : 於 with 區塊內設定工作、使用者或階段欄位
+bind_context : 設定目前執行緒（context）的欄位，不自動還原
+payload_digest : 以雜湊與長度描述大型內容（例如原始碼）
+render_log_metrics : Prometheus 格式的日誌指標
+"""
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json').lower()
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+
+CONTEXT_FIELDS = ('job_id', 'user_id', 'stage')
+
+_context = {name: contextvars.ContextVar(f'log_{name}', default=None) for name in CONTEXT_FIELDS}
+
+_listener = None
+_setup_lock = threading.Lock()
+_dropped = 0
+
+
+class _ContextFilter(logging.Filter):
+    """於產生紀錄的執行緒讀取 contextvars，寫入紀錄屬性。"""
+
+    def filter(self, record):
+        for name, var in _context.items():
+            if getattr(record, name, None) is None:
+                setattr(record, name, var.get())
+        return True
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """佇列已滿時丟棄紀錄而不阻塞呼叫端；格式化留給背景寫出執行緒。"""
+
+    def prepare(self, record):
+        # The stock prepare formats here and clears exc_info; keep both for the listener's formatter
+        return copy.copy(record)
+
+    def enqueue(self, record):
+        global _dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """每筆紀錄輸出一行 JSON。"""
+
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for name in CONTEXT_FIELDS:
+            value = getattr(record, name, None)
+            if value is not None:
+                entry[name] = value
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """人類可讀的單行格式，只列出有值的工作欄位。"""
+
+    def format(self, record):
+        context = ' '.join(f'{name}={getattr(record, name)}' for name in CONTEXT_FIELDS
+                           if getattr(record, name, None) is not None)
+        line = f"{self.formatTime(record, '%H:%M:%S')} {record.levelname:<7} [{record.name}] "
+        line += f'({context}) ' if context else ''
+        line += record.getMessage()
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+def setup_logging(level=None, fmt=None, stream=None):
+    """
+    設定日誌
+    ======
+    將根日誌器的輸出改為「佇列 → 背景寫出執行緒 → stream」，已設定時直接返回。
+    行程結束時自動停止背景執行緒並寫出剩餘紀錄。
+
+    Parameters
+    ----------
+    level : str or None
+        日誌層級，None 時使用 LOG_LEVEL。
+    fmt : str or None
+        "json" 或 "text"，None 時使用 LOG_FORMAT。
+    stream : file or None
+        輸出串流，None 時使用 sys.stdout。
+
+    Returns
+    -------
+    QueueListener
+        背景寫出執行緒。
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return _listener
+        handler = logging.StreamHandler(stream or sys.stdout)
+        handler.setFormatter(TextFormatter() if (fmt or LOG_FORMAT) == 'text' else JsonFormatter())
+        records = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        queue_handler = _DroppingQueueHandler(records)
+        queue_handler.addFilter(_ContextFilter())
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(queue_handler)
+        root.setLevel(level or LOG_LEVEL)
+
+        _listener = QueueListener(records, handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+        return _listener
+
+
+@contextmanager
+def log_context(**fields):
+    """
+    日誌欄位區塊
+    ==========
+    於 with 區塊內設定 job_id、user_id 或 stage，離開時還原。
+
+    Parameters
+    ----------
+    **fields
+        CONTEXT_FIELDS 中的欄位。
+    """
+    tokens = [(_context[name], _context[name].set(value)) for name, value in fields.items()]
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def bind_context(**fields):
+    """設定目前 context 的日誌欄位（例如工作執行緒開始時），不自動還原。"""
+    for name, value in fields.items():
+        _context[name].set(value)
+
+
+def payload_digest(text):
+    """以 "sha256:<前 12 碼> (<位元組數> bytes)" 描述大型內容，INFO 層級不輸出內容本身。"""
+    data = text.encode('utf-8') if isinstance(text, str) else (text or b'')
+    return f'sha256:{hashlib.sha256(data).hexdigest()[:12]} ({len(data)} bytes)'
+
+
+def render_log_metrics():
+    """
+    日誌指標輸出
+    ==========
+    以 Prometheus 文字格式輸出待寫出的紀錄數與因佇列已滿而丟棄的紀錄數。
+
+    Returns
+    -------
+    str
+        Prometheus 文字格式的指標。
+    """
+    depth = _listener.queue.qsize() if _listener is not None else 0
+    lines = [
+        '# HELP log_queue_depth Log records waiting for the writer thread.',
+        '# TYPE log_queue_depth gauge',
+        f'log_queue_depth {depth}',
+        '# HELP log_dropped_total Log records dropped because the queue was full.',
+        '# TYPE log_dropped_total counter',
+        f'log_dropped_total {_dropped}',
+    ]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+版權所有 © 2025 工業技術研究院 (ITRI) 及貢獻者。
+保留所有權利。
+
+本檔案由 Microsoft 訂閱的 GitHub Copilot AI 助理協助產生與優化，部分內容經人工審閱與修正。
+
+本程式碼僅供學術研究與內部使用，未經授權不得用於商業用途。
+
+重新發佈與使用（無論原始或二進位形式，是否經過修改）僅限於下列條件下：
+
+* 原始碼之再發佈必須保留上述版權聲明、條件列表及下列免責聲明。
+* 二進位形式之再發佈必須於相關文件或其他資料中重現上述版權聲明、條件列表及下列免責聲明。
+* 未經事先書面同意，不得使用工業技術研究院 (ITRI) 或貢獻者之名稱為本軟體衍生產品背書或推廣。
+
+本軟體以「現狀」提供，不附任何明示或暗示之保證，包括但不限於適售性及特定用途之適用性。工業技術研究院 (ITRI) 或貢獻者對於因本軟體使用或無法使用所生之任何直接、間接、附帶、特殊、懲罰性或衍生性損害（包括但不限於替代商品或服務之取得、使用損失、資料遺失、營業中斷等），無論於任何理論下（契約、侵權或其他），即使已被告知可能發生該等損害，亦不負任何責任。
+"""
+
+import os
+import json
+import time
+import threading
+import logging
+
+"""
+Memory Accounting & Admission Estimates
+=======================================
+轉換工作的記憶體帳目：依各階段子程序的峰值 RSS（wait4 rusage 與 cgroup memory.peak）
+計算工作的峰值記憶體（平行執行的階段會相加），並以模型雜湊為鍵保存歷史紀錄。
+排程器 (utils.scheduler) 依歷史紀錄或模型檔案大小估計新工作所需記憶體，
+只在可用記憶體足夠時才分派，避免同時執行多個大型轉換導致容器被 OOM 終止。
+
+Configuration (環境變數)
+------------------------
+MEMORY_HISTORY_PATH    : 峰值記憶體歷史紀錄檔，預設 ./memory_history.json
+JOB_MEMORY_BUDGET_MB   : 轉換工作可使用的記憶體總量 (MB)，0 表示自動偵測（cgroup memory.max 或 MemTotal）
+MEMORY_HEADROOM_MB     : 保留給 Web 服務本身的記憶體 (MB)，預設 512
+DEFAULT_JOB_MEMORY_MB  : 無歷史紀錄時的基本估計 (MB)，預設 2048（TensorFlow 與 onnx2tf 的固定成本）
+MODEL_MEMORY_FACTOR    : 每 MB 模型檔案額外估計的記憶體 (MB)，預設 8
+MEMORY_ESTIMATE_MARGIN : 歷史峰值的安全係數，預設 1.2
+
+Functions
+---------
+memory_budget_mb : 轉換工作可使用的記憶體總量
+available_memory_mb : 目前可用的記憶體
+job_peak_mb : 由資源紀錄計算工作峰值記憶體
+estimate_job_memory : 估計工作所需記憶體
+record_job_memory : 記錄工作峰值記憶體並產生最終回應的 memory 欄位
+render_memory_metrics : 以 Prometheus 文字格式輸出記憶體指標
+"""
+
+log = logging.getLogger(__name__)
+
+MEMORY_HISTORY_PATH = os.environ.get('MEMORY_HISTORY_PATH', './memory_history.json')
+JOB_MEMORY_BUDGET_MB = float(os.environ.get('JOB_MEMORY_BUDGET_MB', '0'))
+MEMORY_HEADROOM_MB = float(os.environ.get('MEMORY_HEADROOM_MB', '512'))
+DEFAULT_JOB_MEMORY_MB = float(os.environ.get('DEFAULT_JOB_MEMORY_MB', '2048'))
+MODEL_MEMORY_FACTOR = float(os.environ.get('MODEL_MEMORY_FACTOR', '8'))
+MEMORY_ESTIMATE_MARGIN = float(os.environ.get('MEMORY_ESTIMATE_MARGIN', '1.2'))
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+
+# Job peak memory histogram buckets (MB)
+PEAK_BUCKETS = (256, 512, 1024, 2048, 4096, 8192, 16384)
+
+_history = None
+_history_lock = threading.Lock()
+_peak_counts = [0] * len(PEAK_BUCKETS)
+_peak_sum = 0.0
+_peak_count = 0
+
+
+def _read_int(path):
+    """讀取單一整數的系統檔案（例如 memory.max），不存在或為 "max" 時返回 None。"""
+    try:
+        with open(path) as f:
+            value = f.read().strip()
+        return int(value) if value.isdigit() else None
+    except OSError:
+        return None
+
+
+def _meminfo():
+    """讀取 /proc/meminfo，返回欄位名稱對應 MB。"""
+    info = {}
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                field, rest = line.split(':', 1)
+                info[field] = int(rest.split()[0]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return info
+
+
+def memory_budget_mb():
+    """
+    記憶體預算
+    ========
+    轉換工作可使用的記憶體總量：JOB_MEMORY_BUDGET_MB，或容器的 cgroup memory.max
+    （未限制時為主機 MemTotal）扣除 MEMORY_HEADROOM_MB。
+
+    Returns
+    -------
+    float
+        可分配給轉換工作的記憶體 (MB)。
+    """
+    if JOB_MEMORY_BUDGET_MB:
+        return JOB_MEMORY_BUDGET_MB
+    limit = _read_int(os.path.join(CGROUP_ROOT, 'memory.max'))
+    total = limit / (1024 * 1024) if limit else _meminfo().get('MemTotal', 0)
+    return max(total - MEMORY_HEADROOM_MB, 0)
+
+
+def available_memory_mb():
+    """
+    可用記憶體
+    ========
+    目前可用的記憶體：容器受 cgroup 限制時為 memory.max - memory.current，
+    否則為 /proc/meminfo 的 MemAvailable，皆扣除 MEMORY_HEADROOM_MB。
+
+    Returns
+    -------
+    float or None
+        可用記憶體 (MB)，無法讀取時返回 None。
+    """
+    limit = _read_int(os.path.join(CGROUP_ROOT, 'memory.max'))
+    current = _read_int(os.path.join(CGROUP_ROOT, 'memory.current'))
+    if limit and current is not None:
+        available = (limit - current) / (1024 * 1024)
+    else:
+        available = _meminfo().get('MemAvailable')
+        if available is None:
+            return None
+    return max(available - MEMORY_HEADROOM_MB, 0)
+
+
+def job_peak_mb(stats):
+    """
+    工作峰值記憶體
+    ============
+    依各階段的開始時間與耗時找出同時執行的階段，峰值為任一時刻執行中階段峰值 RSS 的總和
+    （保守估計：假設平行階段同時達到各自的峰值）。
+
+    Parameters
+    ----------
+    stats : list of dict
+        run_limited 產生的資源紀錄（含 started_at、wall_seconds 與 max_rss_mb）。
+
+    Returns
+    -------
+    float
+        工作峰值記憶體 (MB)。
+    """
+    events = []
+    # Records without timing information are treated as running alone
+    peak = max([usage['max_rss_mb'] for usage in stats if usage.get('started_at') is None] or [0.0])
+    for usage in stats:
+        if usage.get('started_at') is not None:
+            events.append((usage['started_at'], 0, usage['max_rss_mb']))
+            events.append((usage['started_at'] + usage['wall_seconds'], 1, -usage['max_rss_mb']))
+    current = 0.0
+    # Starts sort before ends at the same instant so back-to-back stages count as overlapping
+    for _, _, delta in sorted(events):
+        current += delta
+        peak = max(peak, current)
+    return round(peak, 1)
+
+
+def _load_history():
+    """讀取歷史紀錄（行程內快取，呼叫端需持有 _history_lock）。"""
+    global _history
+    if _history is None:
+        try:
+            with open(MEMORY_HISTORY_PATH, 'r', encoding='utf-8') as f:
+                _history = json.load(f)
+        except (OSError, ValueError):
+            _history = {}
+    return _history
+
+
+def _save_history(history):
+    """以暫存檔原子寫入歷史紀錄（呼叫端需持有 _history_lock）。"""
+    directory = os.path.dirname(os.path.abspath(MEMORY_HISTORY_PATH))
+    os.makedirs(directory, exist_ok=True)
+    temp_path = f'{MEMORY_HISTORY_PATH}.{os.getpid()}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=1)
+    os.replace(temp_path, MEMORY_HISTORY_PATH)
+
+
+def estimate_job_memory(model_hash=None, model_bytes=None):
+    """
+    估計工作記憶體
+    ============
+    優先使用同一模型先前的峰值（乘以 MEMORY_ESTIMATE_MARGIN），
+    否則以 DEFAULT_JOB_MEMORY_MB 加上模型大小 × MODEL_MEMORY_FACTOR 估計。
+
+    Parameters
+    ----------
+    model_hash : str or None
+        模型雜湊（上傳檔案的內容雜湊，或 PyTorch 程式碼與形狀的雜湊）。
+    model_bytes : int or None
+        模型檔案大小，未知時為 None。
+
+    Returns
+    -------
+    tuple of (float, str)
+        (估計記憶體 MB, 來源 "history" / "model_size" / "default")。
+    """
+    if model_hash:
+        with _history_lock:
+            entry = _load_history().get(model_hash)
+        if entry:
+            return round(entry['peak_mb'] * MEMORY_ESTIMATE_MARGIN, 1), 'history'
+    if model_bytes:
+        return round(DEFAULT_JOB_MEMORY_MB + MODEL_MEMORY_FACTOR * model_bytes / (1024 * 1024), 1), 'model_size'
+    return DEFAULT_JOB_MEMORY_MB, 'default'
+
+
+def record_job_memory(model_hash, stats, estimate=None):
+    """
+    記錄工作記憶體
+    ============
+    計算工作峰值與各階段峰值，更新模型的歷史紀錄與峰值分佈指標。
+
+    Parameters
+    ----------
+    model_hash : str or None
+        模型雜湊，None 時只計算不保存。
+    stats : list of dict
+        run_limited 產生的資源紀錄。
+    estimate : tuple of (float, str) or None
+        分派前的估計 (estimate_job_memory 的結果)。
+
+    Returns
+    -------
+    dict
+        {"peak_mb", "stages": {階段: 峰值 MB}, "estimated_mb", "estimate_source"}。
+    """
+    global _peak_sum, _peak_count
+    peak = job_peak_mb(stats)
+    stages = {}
+    for usage in stats:
+        stages[usage['stage']] = max(stages.get(usage['stage'], 0), usage['max_rss_mb'])
+    summary = {
+        'peak_mb': peak,
+        'stages': stages,
+        'estimated_mb': estimate[0] if estimate else None,
+        'estimate_source': estimate[1] if estimate else None,
+    }
+    if not stats:
+        return summary
+    with _history_lock:
+        _peak_sum += peak
+        _peak_count += 1
+        for i, bound in enumerate(PEAK_BUCKETS):
+            if peak <= bound:
+                _peak_counts[i] += 1
+        if model_hash:
+            history = _load_history()
+            previous = history.get(model_hash, {})
+            history[model_hash] = {
+                # Keep the worst observed peak; memory use of a model rarely shrinks
+                'peak_mb': max(peak, previous.get('peak_mb', 0)),
+                'stages': {name: max(mb, previous.get('stages', {}).get(name, 0)) for name, mb in stages.items()},
+                'runs': previous.get('runs', 0) + 1,
+                'updated': time.time(),
+            }
+            try:
+                _save_history(history)
+            except OSError as e:
+                log.warning("Cannot save memory history: %s", e)
+    return summary
+
+
+def render_memory_metrics():
+    """
+    記憶體指標輸出
+    ============
+    以 Prometheus 文字格式輸出記憶體預算、可用記憶體、工作峰值分佈與歷史紀錄數量。
+
+    Returns
+    -------
+    str
+        Prometheus 文字格式的指標。
+    """
+    available = available_memory_mb()
+    with _history_lock:
+        models = len(_load_history())
+        counts, peak_sum, peak_count = list(_peak_counts), _peak_sum, _peak_count
+    lines = [
+        '# HELP memory_budget_mb Memory available to conversion jobs.',
+        '# TYPE memory_budget_mb gauge',
+        f'memory_budget_mb {memory_budget_mb():.1f}',
+    ]
+    if available is not None:
+        lines += [
+            '# HELP memory_available_mb Memory currently free for new conversion jobs.',
+            '# TYPE memory_available_mb gauge',
+            f'memory_available_mb {available:.1f}',
+        ]
+    lines += [
+        '# HELP memory_history_models Models with a recorded peak memory.',
+        '# TYPE memory_history_models gauge',
+        f'memory_history_models {models}',
+        '# HELP conversion_job_peak_memory_mb Peak memory of finished conversion jobs.',
+        '# TYPE conversion_job_peak_memory_mb histogram',
+    ]
+    for bound, count in zip(PEAK_BUCKETS, counts):
+        lines.append(f'conversion_job_peak_memory_mb_bucket{{le="{bound}"}} {count}')
+    lines.append(f'conversion_job_peak_memory_mb_bucket{{le="+Inf"}} {peak_count}')
+    lines.append(f'conversion_job_peak_memory_mb_sum {peak_sum:.1f}')
+    lines.append(f'conversion_job_peak_memory_mb_count {peak_count}')
+    return '\n'.join(lines) + '\n'
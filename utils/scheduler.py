@@ -0,0 +1,436 @@
+# -*- coding: utf-8 -*-
+"""
+版權所有 © 2025 工業技術研究院 (ITRI) 及貢獻者。
+保留所有權利。
+
+本檔案由 Microsoft 訂閱的 GitHub Copilot AI 助理協助產生與優化，部分內容經人工審閱與修正。
+
+本程式碼僅供學術研究與內部使用，未經授權不得用於商業用途。
+
+重新發佈與使用（無論原始或二進位形式，是否經過修改）僅限於下列條件下：
+
+* 原始碼之再發佈必須保留上述版權聲明、條件列表及下列免責聲明。
+* 二進位形式之再發佈必須於相關文件或其他資料中重現上述版權聲明、條件列表及下列免責聲明。
+* 未經事先書面同意，不得使用工業技術研究院 (ITRI) 或貢獻者之名稱為本軟體衍生產品背書或推廣。
+
+本軟體以「現狀」提供，不附任何明示或暗示之保證，包括但不限於適售性及特定用途之適用性。工業技術研究院 (ITRI) 或貢獻者對於因本軟體使用或無法使用所生之任何直接、間接、附帶、特殊、懲罰性或衍生性損害（包括但不限於替代商品或服務之取得、使用損失、資料遺失、營業中斷等），無論於任何理論下（契約、侵權或其他），即使已被告知可能發生該等損害，亦不負任何責任。
+"""
+
+import os
+import time
+import itertools
+import threading
+import logging
+from collections import deque
+from .memory import memory_budget_mb, available_memory_mb
+
+"""
+Fair-Share Job Scheduler
+========================
+轉換工作的公平排程器：限制同時執行的工作數，並以加權公平佇列（start-time fair queuing）
+在使用者之間分配執行槽。每個工作依成本（例如形狀掃描的形狀數）與使用者權重推進該使用者的虛擬時間，
+大量提交的使用者只會排在自己的工作之後，不會餓死其他使用者；每位使用者另有同時執行的工作數上限。
+每個工作另帶有記憶體估計 (utils.memory)：只有在記憶體預算扣除執行中工作的保留量、且實際可用記憶體
+都足夠時才分派；輪到的工作記憶體不足時會等待（不讓較小的工作插隊），沒有工作執行時一律分派。
+
+Configuration (環境變數)
+------------------------
+MAX_CONCURRENT_JOBS  : 全域同時執行的工作數，預設 4
+MAX_JOBS_PER_USER    : 每位使用者同時執行的工作數上限，預設 2
+USER_WEIGHTS         : 使用者權重，例如 "alice=2,ci-bot=0.5"，未列出者為 1
+DEFAULT_JOB_SECONDS  : 尚無歷史資料時，每單位成本的預估執行秒數，預設 60
+
+Functions
+---------
+FairScheduler : 加權公平排程器
+get_scheduler : 取得行程內共用的排程器
+render_metrics : 以 Prometheus 文字格式輸出排程指標
+"""
+
+log = logging.getLogger(__name__)
+
+MAX_CONCURRENT_JOBS = int(os.environ.get('MAX_CONCURRENT_JOBS', '4'))
+MAX_JOBS_PER_USER = int(os.environ.get('MAX_JOBS_PER_USER', '2'))
+USER_WEIGHTS = os.environ.get('USER_WEIGHTS', '')
+DEFAULT_JOB_SECONDS = float(os.environ.get('DEFAULT_JOB_SECONDS', '60'))
+
+# Queue wait histogram buckets (seconds)
+WAIT_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800)
+
+# Smoothing factor for the seconds-per-cost-unit moving average
+DURATION_EMA_ALPHA = 0.2
+
+RECENT_DECISIONS = 100
+
+
+def _parse_weights(spec):
+    """解析 "user=weight,..." 格式的權重設定。"""
+    weights = {}
+    for item in spec.split(','):
+        if '=' not in item:
+            continue
+        user, value = item.split('=', 1)
+        try:
+            weights[user.strip()] = max(float(value), 0.01)
+        except ValueError:
+            log.warning("Ignoring invalid weight: %s", item)
+    return weights
+
+
+class Ticket:
+    """
+    排程票據
+    ======
+    單一工作在排程器中的狀態。
+
+    Attributes
+    ----------
+    job_id : str
+        工作識別碼。
+    user : str
+        使用者識別碼。
+    cost : float
+        工作成本（一般轉換為 1，形狀掃描為形狀數）。
+    start_tag : float
+        虛擬開始時間，數值越小越先執行。
+    enqueued_at : float
+        進入佇列的時間。
+    dispatched_at : float or None
+        取得執行槽的時間。
+    memory_mb : float
+        估計所需記憶體 (MB)，0 表示不納入記憶體控管。
+    memory_blocked : bool
+        是否因記憶體不足而等待。
+    cap_deferred : bool
+        是否曾因使用者達到同時執行上限而被略過（每張票據只計入一次指標）。
+    """
+
+    def __init__(self, job_id, user, cost, start_tag, seq, memory_mb=0):
+        self.job_id = job_id
+        self.user = user
+        self.cost = cost
+        self.start_tag = start_tag
+        self.seq = seq
+        self.memory_mb = memory_mb
+        self.memory_blocked = False
+        self.cap_deferred = False
+        self.enqueued_at = time.time()
+        self.dispatched_at = None
+
+    def sort_key(self):
+        return (self.start_tag, self.seq)
+
+
+class FairScheduler:
+    """
+    加權公平排程器
+    ============
+    以虛擬時間實作 start-time fair queuing：
+    使用者 u 提交成本 c 的工作時，開始標籤 = max(全域虛擬時間, u 的上一個結束標籤)，
+    結束標籤 = 開始標籤 + c / weight(u)。有空閒執行槽時，從未達使用者上限的票據中
+    選出開始標籤最小者執行。
+
+    Parameters
+    ----------
+    max_concurrent : int
+        全域同時執行的工作數。
+    max_per_user : int
+        每位使用者同時執行的工作數上限。
+    weights : dict or None
+        使用者權重，未列出者為 1。
+    memory_budget : float or None
+        分配給轉換工作的記憶體 (MB)，None 時使用 memory_budget_mb()，0 表示停用記憶體控管。
+    """
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT_JOBS, max_per_user=MAX_JOBS_PER_USER, weights=None,
+                 memory_budget=None):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_per_user = max(1, max_per_user)
+        self.weights = weights if weights is not None else _parse_weights(USER_WEIGHTS)
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._last_finish = {}
+        self._waiting = []
+        self._running = {}
+        self._seconds_per_cost = DEFAULT_JOB_SECONDS
+        self.memory_budget = memory_budget if memory_budget is not None else memory_budget_mb()
+        # Metrics
+        self.dispatched_total = 0
+        self.completed_total = 0
+        self.cap_deferrals_total = 0
+        self.memory_deferrals_total = 0
+        self.wait_sum = 0.0
+        self.wait_count = 0
+        self.wait_buckets = [0] * len(WAIT_BUCKETS)
+        self.recent_decisions = deque(maxlen=RECENT_DECISIONS)
+
+    def weight(self, user):
+        return self.weights.get(user, 1.0)
+
+    def submit(self, job_id, user, cost=1, memory_mb=0):
+        """
+        提交工作
+        ======
+        計算虛擬開始標籤並放入佇列，若有空閒執行槽會立即分派。
+
+        Parameters
+        ----------
+        job_id : str
+            工作識別碼。
+        user : str
+            使用者識別碼。
+        cost : float
+            工作成本。
+        memory_mb : float
+            估計所需記憶體 (MB)，0 表示不納入記憶體控管。
+
+        Returns
+        -------
+        Ticket
+            排程票據，以 wait 等待分派、完成後以 release 釋放。
+        """
+        with self._cond:
+            # Users idle for a while restart at the current virtual time instead of banking credit
+            start_tag = max(self._virtual_time, self._last_finish.get(user, 0.0))
+            self._last_finish[user] = start_tag + cost / self.weight(user)
+            ticket = Ticket(job_id, user, cost, start_tag, next(self._seq), memory_mb)
+            self._waiting.append(ticket)
+            self._dispatch()
+            return ticket
+
+    def _running_for(self, user):
+        return sum(1 for ticket in self._running.values() if ticket.user == user)
+
+    def reserved_memory(self):
+        """執行中工作保留的記憶體總量 (MB)（呼叫端需持有 _cond）。"""
+        return sum(ticket.memory_mb for ticket in self._running.values())
+
+    def _memory_fits(self, ticket):
+        """記憶體預算與實際可用記憶體是否足以啟動此工作（呼叫端需持有 _cond）。"""
+        if not self.memory_budget or not ticket.memory_mb or not self._running:
+            # Nothing running: always admit so oversized jobs cannot wait forever
+            return True
+        if self.reserved_memory() + ticket.memory_mb > self.memory_budget:
+            return False
+        available = available_memory_mb()
+        return available is None or ticket.memory_mb <= available
+
+    def _dispatch(self):
+        """分派空閒執行槽（呼叫端需持有 _cond）。"""
+        while len(self._running) < self.max_concurrent and self._waiting:
+            ordered = sorted(self._waiting, key=Ticket.sort_key)
+            chosen = None
+            for ticket in ordered:
+                if self._running_for(ticket.user) < self.max_per_user:
+                    chosen = ticket
+                    break
+                if not ticket.cap_deferred:
+                    ticket.cap_deferred = True
+                    self.cap_deferrals_total += 1
+            if chosen is None:
+                return
+            if not self._memory_fits(chosen):
+                # Hold the slot for the next-in-line job instead of letting smaller ones jump ahead
+                if not chosen.memory_blocked:
+                    chosen.memory_blocked = True
+                    self.memory_deferrals_total += 1
+                return
+            chosen.memory_blocked = False
+            self._waiting.remove(chosen)
+            chosen.dispatched_at = time.time()
+            self._running[chosen.job_id] = chosen
+            self._virtual_time = max(self._virtual_time, chosen.start_tag)
+            self._record_dispatch(chosen)
+            self._cond.notify_all()
+
+    def _record_dispatch(self, ticket):
+        waited = ticket.dispatched_at - ticket.enqueued_at
+        self.dispatched_total += 1
+        self.wait_sum += waited
+        self.wait_count += 1
+        for i, bound in enumerate(WAIT_BUCKETS):
+            if waited <= bound:
+                self.wait_buckets[i] += 1
+        self.recent_decisions.append({
+            'job_id': ticket.job_id,
+            'user': ticket.user,
+            'cost': ticket.cost,
+            'memory_mb': ticket.memory_mb,
+            'start_tag': round(ticket.start_tag, 3),
+            'waited_seconds': round(waited, 3),
+            'queued_behind': len(self._waiting),
+            'at': ticket.dispatched_at,
+        })
+        log.info("Dispatched job %s (user %s, cost %s, ~%.0f MB, waited %.1fs, %d still queued)", ticket.job_id,
+                 ticket.user, ticket.cost, ticket.memory_mb, waited, len(self._waiting))
+
+    def position(self, ticket):
+        """
+        佇列位置
+        ======
+        取得票據在等待佇列中的位置與預估等待秒數。
+
+        Parameters
+        ----------
+        ticket : Ticket
+            排程票據。
+
+        Returns
+        -------
+        tuple of (int, int)
+            (位置（1 為下一個）, 預估等待秒數)；已分派時為 (0, 0)。
+        """
+        with self._cond:
+            if ticket.dispatched_at is not None:
+                return 0, 0
+            ordered = sorted(self._waiting, key=Ticket.sort_key)
+            ahead = ordered[:ordered.index(ticket)]
+            # Work ahead of us plus what is still running, drained by all slots in parallel
+            pending_cost = sum(t.cost for t in ahead)
+            now = time.time()
+            running_left = sum(max(t.cost * self._seconds_per_cost - (now - t.dispatched_at), 0)
+                               for t in self._running.values())
+            estimate = (pending_cost * self._seconds_per_cost + running_left) / self.max_concurrent
+            return len(ahead) + 1, int(round(estimate))
+
+    def wait(self, ticket, timeout=None):
+        """等待票據被分派，返回是否已取得執行槽（逾時前重新檢查可用記憶體）。"""
+        with self._cond:
+            if ticket.dispatched_at is None:
+                # Free memory changes without scheduler events; re-evaluate on every poll
+                self._dispatch()
+            if ticket.dispatched_at is None:
+                self._cond.wait(timeout=timeout)
+            return ticket.dispatched_at is not None
+
+    def release(self, ticket):
+        """
+        釋放執行槽
+        ========
+        工作結束（或在分派前放棄）時呼叫，更新執行時間估計並分派下一個工作。
+
+        Parameters
+        ----------
+        ticket : Ticket
+            排程票據。
+        """
+        with self._cond:
+            if ticket in self._waiting:
+                self._waiting.remove(ticket)
+            elif self._running.pop(ticket.job_id, None) is not None:
+                self.completed_total += 1
+                elapsed = time.time() - ticket.dispatched_at
+                if ticket.cost > 0:
+                    sample = elapsed / ticket.cost
+                    self._seconds_per_cost += DURATION_EMA_ALPHA * (sample - self._seconds_per_cost)
+            self._dispatch()
+            self._cond.notify_all()
+
+    def snapshot(self):
+        """
+        排程狀態
+        ======
+        返回目前佇列、執行中工作與累計指標。
+
+        Returns
+        -------
+        dict
+            排程器狀態與指標。
+        """
+        with self._cond:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'max_per_user': self.max_per_user,
+                'running': len(self._running),
+                'queued': len(self._waiting),
+                'queued_users': len({t.user for t in self._waiting}),
+                'virtual_time': self._virtual_time,
+                'seconds_per_cost': self._seconds_per_cost,
+                'dispatched_total': self.dispatched_total,
+                'completed_total': self.completed_total,
+                'cap_deferrals_total': self.cap_deferrals_total,
+                'memory_budget_mb': self.memory_budget,
+                'memory_reserved_mb': self.reserved_memory(),
+                'memory_blocked': sum(1 for t in self._waiting if t.memory_blocked),
+                'memory_deferrals_total': self.memory_deferrals_total,
+                'wait_sum': self.wait_sum,
+                'wait_count': self.wait_count,
+                'wait_buckets': list(zip(WAIT_BUCKETS, self.wait_buckets)),
+                'recent_decisions': list(self.recent_decisions),
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """取得行程內共用的排程器（首次呼叫時依環境變數建立）。"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = FairScheduler()
+        return _scheduler
+
+
+def render_metrics(scheduler=None):
+    """
+    排程指標輸出
+    ==========
+    將排程器狀態轉為 Prometheus 文字格式 (text/plain; version=0.0.4)。
+
+    Parameters
+    ----------
+    scheduler : FairScheduler or None
+        排程器，None 時使用共用排程器。
+
+    Returns
+    -------
+    str
+        Prometheus 文字格式的指標。
+    """
+    snap = (scheduler or get_scheduler()).snapshot()
+    lines = [
+        '# HELP scheduler_running_jobs Conversion jobs currently holding an execution slot.',
+        '# TYPE scheduler_running_jobs gauge',
+        f"scheduler_running_jobs {snap['running']}",
+        '# HELP scheduler_queued_jobs Conversion jobs waiting for an execution slot.',
+        '# TYPE scheduler_queued_jobs gauge',
+        f"scheduler_queued_jobs {snap['queued']}",
+        '# HELP scheduler_queued_users Distinct users with queued jobs.',
+        '# TYPE scheduler_queued_users gauge',
+        f"scheduler_queued_users {snap['queued_users']}",
+        '# HELP scheduler_slots Configured global execution slots.',
+        '# TYPE scheduler_slots gauge',
+        f"scheduler_slots {snap['max_concurrent']}",
+        '# HELP scheduler_seconds_per_cost Moving average of job seconds per cost unit.',
+        '# TYPE scheduler_seconds_per_cost gauge',
+        f"scheduler_seconds_per_cost {snap['seconds_per_cost']:.3f}",
+        '# HELP scheduler_dispatched_total Jobs dispatched to an execution slot.',
+        '# TYPE scheduler_dispatched_total counter',
+        f"scheduler_dispatched_total {snap['dispatched_total']}",
+        '# HELP scheduler_completed_total Jobs that released their execution slot.',
+        '# TYPE scheduler_completed_total counter',
+        f"scheduler_completed_total {snap['completed_total']}",
+        '# HELP scheduler_cap_deferrals_total Jobs held back at least once by their user concurrency cap.',
+        '# TYPE scheduler_cap_deferrals_total counter',
+        f"scheduler_cap_deferrals_total {snap['cap_deferrals_total']}",
+        '# HELP scheduler_memory_reserved_mb Estimated memory reserved by running jobs.',
+        '# TYPE scheduler_memory_reserved_mb gauge',
+        f"scheduler_memory_reserved_mb {snap['memory_reserved_mb']:.1f}",
+        '# HELP scheduler_memory_blocked_jobs Queued jobs waiting for enough free memory.',
+        '# TYPE scheduler_memory_blocked_jobs gauge',
+        f"scheduler_memory_blocked_jobs {snap['memory_blocked']}",
+        '# HELP scheduler_memory_deferrals_total Times the next job was held back because memory was short.',
+        '# TYPE scheduler_memory_deferrals_total counter',
+        f"scheduler_memory_deferrals_total {snap['memory_deferrals_total']}",
+        '# HELP scheduler_queue_wait_seconds Time jobs spent queued before dispatch.',
+        '# TYPE scheduler_queue_wait_seconds histogram',
+    ]
+    for bound, count in snap['wait_buckets']:
+        lines.append(f'scheduler_queue_wait_seconds_bucket{{le="{bound}"}} {count}')
+    lines.append(f'scheduler_queue_wait_seconds_bucket{{le="+Inf"}} {snap["wait_count"]}')
+    lines.append(f"scheduler_queue_wait_seconds_sum {snap['wait_sum']:.3f}")
+    lines.append(f"scheduler_queue_wait_seconds_count {snap['wait_count']}")
+    return '\n'.join(lines) + '\n'
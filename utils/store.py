@@ -0,0 +1,499 @@
+# -*- coding: utf-8 -*-
+"""
+版權所有 © 2025 工業技術研究院 (ITRI) 及貢獻者。
+保留所有權利。
+
+本檔案由 Microsoft 訂閱的 GitHub Copilot AI 助理協助產生與優化，部分內容經人工審閱與修正。
+
+本程式碼僅供學術研究與內部使用，未經授權不得用於商業用途。
+
+重新發佈與使用（無論原始或二進位形式，是否經過修改）僅限於下列條件下：
+
+* 原始碼之再發佈必須保留上述版權聲明、條件列表及下列免責聲明。
+* 二進位形式之再發佈必須於相關文件或其他資料中重現上述版權聲明、條件列表及下列免責聲明。
+* 未經事先書面同意，不得使用工業技術研究院 (ITRI) 或貢獻者之名稱為本軟體衍生產品背書或推廣。
+
+本軟體以「現狀」提供，不附任何明示或暗示之保證，包括但不限於適售性及特定用途之適用性。工業技術研究院 (ITRI) 或貢獻者對於因本軟體使用或無法使用所生之任何直接、間接、附帶、特殊、懲罰性或衍生性損害（包括但不限於替代商品或服務之取得、使用損失、資料遺失、營業中斷等），無論於任何理論下（契約、侵權或其他），即使已被告知可能發生該等損害，亦不負任何責任。
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+import logging
+
+"""
+Shared Artifact Store
+=====================
+產出檔案與轉換快取的儲存抽象層：內容定址的產出檔案（TFLite、DLA、ONNX）、工作的產出清單與
+階段輸出快取皆經由此介面存取。多個 Web 副本與工作節點設定相同的 ARTIFACT_STORE 後，
+任一副本都能提供其他節點完成的工作下載，並共用轉換快取。
+遠端後端前方有本機的 read-through 快取：相同物件在每個節點只下載一次，超過容量時移除最久未使用的物件。
+
+Backends
+--------
+file:///path/to/store : 本機或共用檔案系統（以複製寫入，不與工作目錄或去重儲存共用 inode）
+s3://bucket/prefix    : S3 相容物件儲存（AWS S3、MinIO 等，需安裝 boto3 套件），
+                        大型檔案以分段上傳串流寫入，下載可改以預簽網址直接由物件儲存提供
+
+Object Keys
+-----------
+blobs/<前兩碼>/<SHA-256> : 產出檔案內容
+jobs/<job_id>.json       : 工作的產出清單與相容性報告
+<快取名稱>/<鍵值>.json    : 轉換快取項目（檔案輸出以摘要與檔名記錄，見 pipeline.StageCache）
+
+Configuration (環境變數)
+------------------------
+ARTIFACT_STORE           : 共用儲存位址；未設定時使用本機的 file://./artifact_store，且轉換快取不寫入儲存
+ARTIFACT_STORE_ENDPOINT  : S3 相容服務端點，例如 http://minio:9000（AWS S3 不需設定）
+ARTIFACT_STORE_REGION    : S3 區域（選填）；帳號金鑰使用 boto3 的標準設定，例如 AWS_ACCESS_KEY_ID
+ARTIFACT_STORE_RETENTION_HOURS : file 後端物件的保留時數，預設 24（S3 請以 bucket lifecycle 規則設定）
+ARTIFACT_CACHE_DIR       : 本機 read-through 快取目錄，預設 ./artifact_cache
+ARTIFACT_CACHE_MAX_MB    : 本機快取容量上限 (MB)，預設 4096
+ARTIFACT_MULTIPART_MB    : 超過此大小的檔案以分段上傳，同時為每段大小，預設 16
+ARTIFACT_PRESIGN_SECONDS : 大於 0 時，不在本機的產出檔案以有效期為此秒數的預簽網址重導向下載，預設 0
+
+Functions
+---------
+LocalStore : 檔案系統儲存
+S3Store : S3 相容物件儲存
+get_store : 依 ARTIFACT_STORE 取得儲存（行程內共用）
+store_is_shared : 是否設定了跨節點共用的儲存
+blob_key : 由摘要取得產出檔案內容的物件鍵值
+publish_file : 將檔案以內容摘要寫入儲存
+fetch_blob : 經由本機 read-through 快取取得產出檔案
+presigned_blob_url : 產生產出檔案的預簽下載網址
+"""
+
+log = logging.getLogger(__name__)
+
+ARTIFACT_STORE = os.environ.get('ARTIFACT_STORE', '')
+ARTIFACT_STORE_ENDPOINT = os.environ.get('ARTIFACT_STORE_ENDPOINT', '')
+ARTIFACT_STORE_REGION = os.environ.get('ARTIFACT_STORE_REGION', '')
+ARTIFACT_STORE_RETENTION_HOURS = float(os.environ.get('ARTIFACT_STORE_RETENTION_HOURS', '24'))
+ARTIFACT_CACHE_DIR = os.environ.get('ARTIFACT_CACHE_DIR', './artifact_cache')
+ARTIFACT_CACHE_MAX_MB = int(os.environ.get('ARTIFACT_CACHE_MAX_MB', '4096'))
+ARTIFACT_MULTIPART_MB = int(os.environ.get('ARTIFACT_MULTIPART_MB', '16'))
+ARTIFACT_PRESIGN_SECONDS = int(os.environ.get('ARTIFACT_PRESIGN_SECONDS', '0'))
+
+DEFAULT_ARTIFACT_STORE = 'file://./artifact_store'
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# The file backend sweeps expired objects at most this often
+PURGE_INTERVAL_SECONDS = 60 * 60
+
+
+def _file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _copy_atomic(src, dst):
+    """以暫存檔複製並原子地建立 dst。"""
+    os.makedirs(os.path.dirname(os.path.abspath(dst)), exist_ok=True)
+    temp_path = f'{dst}.{uuid.uuid4().hex[:8]}.part'
+    shutil.copyfile(src, temp_path)
+    os.replace(temp_path, dst)
+    return dst
+
+
+def _link_or_copy(src, dst):
+    """以硬連結（跨檔案系統時改為複製）原子地建立 dst。"""
+    os.makedirs(os.path.dirname(os.path.abspath(dst)), exist_ok=True)
+    temp_path = f'{dst}.{uuid.uuid4().hex[:8]}.part'
+    try:
+        os.link(src, temp_path)
+    except OSError:
+        shutil.copyfile(src, temp_path)
+    os.replace(temp_path, dst)
+    return dst
+
+
+class LocalStore:
+    """
+    檔案系統儲存
+    ==========
+    物件以鍵值作為相對路徑存放於根目錄下；寫入以暫存檔與 os.replace 完成，讀取端不會看到寫到一半的檔案。
+    檔案一律複製而不建立硬連結：去重儲存以硬連結數作為參考數 (utils.blobstore)，
+    儲存中的連結會讓工作目錄過期後的 blob 無法釋放。
+    根目錄位於共用檔案系統（例如 NFS）時即可跨節點共用。
+
+    Parameters
+    ----------
+    root : str
+        儲存根目錄。
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._last_purge = 0
+
+    def _path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    def size(self, key):
+        try:
+            return os.path.getsize(self._path(key))
+        except OSError:
+            return None
+
+    def touch(self, key):
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass
+
+    def local_path(self, key):
+        """物件在本機的路徑（不存在時為 None），read-through 快取可直接連結而不需下載。"""
+        path = self._path(key)
+        return path if os.path.isfile(path) else None
+
+    def put_file(self, key, path):
+        _copy_atomic(path, self._path(key))
+
+    def get_file(self, key, dest_path):
+        path = self.local_path(key)
+        return _copy_atomic(path, dest_path) if path else None
+
+    def put_json(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.{uuid.uuid4().hex[:8]}.part'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    def get_json(self, key):
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def presigned_url(self, key, filename=None, expires=None):
+        return None
+
+    def purge(self, older_than=None):
+        """移除超過保留時間未寫入或使用的物件，返回移除數量（每小時至多執行一次）。"""
+        now = time.time()
+        if now - self._last_purge < PURGE_INTERVAL_SECONDS or not os.path.isdir(self.root):
+            return 0
+        self._last_purge = now
+        cutoff = now - (older_than if older_than is not None else ARTIFACT_STORE_RETENTION_HOURS * 3600)
+        removed = 0
+        for root, dirs, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except OSError as e:
+                    log.warning("Could not purge %s: %s", path, e)
+        return removed
+
+
+class S3Store:
+    """
+    S3 相容物件儲存
+    =============
+    以 boto3 存取 AWS S3 或 MinIO 等相容服務。檔案以 upload_file / download_file 傳輸，
+    超過 ARTIFACT_MULTIPART_MB 時自動以分段上傳與平行分段下載串流處理，不將整個檔案讀入記憶體。
+    需要 boto3 套件 (pip install boto3)。
+
+    Parameters
+    ----------
+    url : str
+        儲存位址，例如 s3://neuronpilot-artifacts/prod。
+    """
+
+    def __init__(self, url):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+            from botocore.exceptions import ClientError
+        except ImportError:
+            raise RuntimeError("❌ ARTIFACT_STORE uses S3 but the 'boto3' package is not installed")
+        self.bucket, _, prefix = url[len('s3://'):].partition('/')
+        self.prefix = prefix.strip('/')
+        self.client = boto3.client('s3', endpoint_url=ARTIFACT_STORE_ENDPOINT or None,
+                                   region_name=ARTIFACT_STORE_REGION or None)
+        part_size = ARTIFACT_MULTIPART_MB * 1024 * 1024
+        self.transfer = TransferConfig(multipart_threshold=part_size, multipart_chunksize=part_size)
+        self._client_error = ClientError
+
+    def _key(self, key):
+        return f'{self.prefix}/{key}' if self.prefix else key
+
+    def _missing(self, error):
+        return error.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound')
+
+    def size(self, key):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._key(key))['ContentLength']
+        except self._client_error as e:
+            if self._missing(e):
+                return None
+            raise
+
+    def touch(self, key):
+        # Object expiry is left to bucket lifecycle rules
+        pass
+
+    def local_path(self, key):
+        return None
+
+    def put_file(self, key, path):
+        self.client.upload_file(path, self.bucket, self._key(key), Config=self.transfer)
+
+    def get_file(self, key, dest_path):
+        os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+        temp_path = f'{dest_path}.{uuid.uuid4().hex[:8]}.part'
+        try:
+            self.client.download_file(self.bucket, self._key(key), temp_path, Config=self.transfer)
+        except self._client_error as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            if self._missing(e):
+                return None
+            raise
+        os.replace(temp_path, dest_path)
+        return dest_path
+
+    def put_json(self, key, value):
+        self.client.put_object(Bucket=self.bucket, Key=self._key(key), ContentType='application/json',
+                               Body=json.dumps(value, ensure_ascii=False).encode('utf-8'))
+
+    def get_json(self, key):
+        try:
+            body = self.client.get_object(Bucket=self.bucket, Key=self._key(key))['Body']
+        except self._client_error as e:
+            if self._missing(e):
+                return None
+            raise
+        try:
+            return json.loads(body.read())
+        except ValueError:
+            return None
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def presigned_url(self, key, filename=None, expires=None):
+        params = {'Bucket': self.bucket, 'Key': self._key(key)}
+        if filename:
+            params['ResponseContentDisposition'] = f'attachment; filename="{filename}"'
+        return self.client.generate_presigned_url('get_object', Params=params,
+                                                  ExpiresIn=expires or ARTIFACT_PRESIGN_SECONDS or 3600)
+
+    def purge(self, older_than=None):
+        return 0
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store(url=None):
+    """
+    取得產出儲存
+    ==========
+    依位址建立儲存後端（行程內共用）；未設定 ARTIFACT_STORE 時使用本機的 file://./artifact_store。
+
+    Parameters
+    ----------
+    url : str or None
+        儲存位址，None 時使用 ARTIFACT_STORE。
+
+    Returns
+    -------
+    LocalStore or S3Store
+
+    Raises
+    ------
+    RuntimeError
+        位址格式不支援或缺少 boto3 時拋出。
+    """
+    global _store
+    if url:
+        return _create_store(url)
+    with _store_lock:
+        if _store is None:
+            _store = _create_store(ARTIFACT_STORE or DEFAULT_ARTIFACT_STORE)
+        return _store
+
+
+def _create_store(url):
+    if url.startswith('file://'):
+        return LocalStore(url[len('file://'):])
+    if url.startswith('s3://'):
+        return S3Store(url)
+    raise RuntimeError(f"❌ Unsupported ARTIFACT_STORE: {url} (use file:///path or s3://bucket/prefix)")
+
+
+def store_is_shared():
+    """設定 ARTIFACT_STORE 時為 True：產出檔案可跨節點取得，轉換快取也寫入儲存。"""
+    return bool(ARTIFACT_STORE)
+
+
+def blob_key(digest):
+    """產出檔案內容的物件鍵值 blobs/<前兩碼>/<摘要>。"""
+    return f'blobs/{digest[:2]}/{digest}'
+
+
+def publish_file(path, digest=None, store=None):
+    """
+    寫入產出檔案
+    ==========
+    以內容摘要為鍵將檔案寫入儲存；相同內容已存在時不重複上傳，只更新保留時間。
+
+    Parameters
+    ----------
+    path : str
+        檔案路徑。
+    digest : str or None
+        已計算的 SHA-256 摘要，None 時由檔案計算。
+    store : LocalStore, S3Store or None
+        目標儲存，None 時使用 get_store()。
+
+    Returns
+    -------
+    str
+        檔案的十六進位 SHA-256 摘要。
+    """
+    store = store or get_store()
+    digest = digest or _file_digest(path)
+    key = blob_key(digest)
+    if store.size(key) is None:
+        store.put_file(key, path)
+    else:
+        store.touch(key)
+    return digest
+
+
+# Concurrent fetches of the same blob wait for a single download
+_fetch_locks = {}
+_fetch_locks_lock = threading.Lock()
+
+
+def _fetch_lock(digest):
+    with _fetch_locks_lock:
+        return _fetch_locks.setdefault(digest, threading.Lock())
+
+
+def fetch_blob(digest, name=None, dest_dir=None, store=None):
+    """
+    取得產出檔案
+    ==========
+    經由本機 read-through 快取 (ARTIFACT_CACHE_DIR/<前兩碼>/<摘要>/<檔名>) 取得內容物件：
+    快取命中時直接返回，否則由儲存下載（file 後端以複製取得）後加入快取並移除超出容量的最舊物件。
+    快取中的檔案不與儲存或去重儲存共用 inode，不影響 blob 的參考數。
+
+    Parameters
+    ----------
+    digest : str
+        十六進位 SHA-256 摘要。
+    name : str or None
+        返回檔案使用的檔名（例如 DLA 檔名），None 時使用摘要。
+    dest_dir : str or None
+        若提供，另於此目錄以硬連結（或複製）建立同名檔案並返回該路徑（例如工作目錄）。
+    store : LocalStore, S3Store or None
+        來源儲存，None 時使用 get_store()。
+
+    Returns
+    -------
+    str or None
+        本機檔案路徑；儲存中不存在時返回 None。
+    """
+    store = store or get_store()
+    name = os.path.basename(name) if name else digest
+    entry_dir = os.path.join(ARTIFACT_CACHE_DIR, digest[:2], digest)
+    path = os.path.join(entry_dir, name)
+    with _fetch_lock(digest):
+        if os.path.isfile(path):
+            os.utime(entry_dir)
+        else:
+            # Another name of the same content is already cached; link it instead of downloading again
+            cached = [entry for entry in os.listdir(entry_dir)
+                      if not entry.endswith('.part')] if os.path.isdir(entry_dir) else []
+            if cached:
+                _link_or_copy(os.path.join(entry_dir, cached[0]), path)
+            elif store.get_file(blob_key(digest), path) is None:
+                return None
+            else:
+                log.info("Fetched blob %s (%.1f MB) into the artifact cache", digest[:12],
+                         os.path.getsize(path) / (1024 * 1024))
+            _evict_cache(keep=entry_dir)
+    if dest_dir:
+        return _link_or_copy(path, os.path.join(dest_dir, name))
+    return path
+
+
+def _evict_cache(keep=None):
+    """快取超過 ARTIFACT_CACHE_MAX_MB 時，依最近使用時間由舊到新移除整個摘要目錄。"""
+    entries = []
+    total = 0
+    for prefix in os.listdir(ARTIFACT_CACHE_DIR):
+        prefix_dir = os.path.join(ARTIFACT_CACHE_DIR, prefix)
+        if not os.path.isdir(prefix_dir):
+            continue
+        for digest in os.listdir(prefix_dir):
+            entry_dir = os.path.join(prefix_dir, digest)
+            try:
+                # Every name in a digest directory links the same content
+                size = max((os.path.getsize(os.path.join(entry_dir, name)) for name in os.listdir(entry_dir)),
+                           default=0)
+                entries.append((os.path.getmtime(entry_dir), entry_dir, size))
+            except OSError:
+                continue
+            total += size
+    limit = ARTIFACT_CACHE_MAX_MB * 1024 * 1024
+    for _, entry_dir, size in sorted(entries):
+        if total <= limit:
+            break
+        if entry_dir == keep:
+            continue
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        total -= size
+
+
+def presigned_blob_url(digest, name=None, store=None):
+    """
+    預簽下載網址
+    ==========
+    ARTIFACT_PRESIGN_SECONDS 大於 0 且後端支援時，產生直接由物件儲存下載的網址。
+
+    Parameters
+    ----------
+    digest : str
+        十六進位 SHA-256 摘要。
+    name : str or None
+        下載時使用的檔名。
+    store : LocalStore, S3Store or None
+        來源儲存，None 時使用 get_store()。
+
+    Returns
+    -------
+    str or None
+        預簽網址；未啟用、後端不支援或物件不存在時返回 None。
+    """
+    if ARTIFACT_PRESIGN_SECONDS <= 0:
+        return None
+    store = store or get_store()
+    key = blob_key(digest)
+    if store.size(key) is None:
+        return None
+    return store.presigned_url(key, filename=name, expires=ARTIFACT_PRESIGN_SECONDS)
@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+"""
+版權所有 © 2025 工業技術研究院 (ITRI) 及貢獻者。
+保留所有權利。
+
+本檔案由 Microsoft 訂閱的 GitHub Copilot AI 助理協助產生與優化，部分內容經人工審閱與修正。
+
+本程式碼僅供學術研究與內部使用，未經授權不得用於商業用途。
+
+重新發佈與使用（無論原始或二進位形式，是否經過修改）僅限於下列條件下：
+
+* 原始碼之再發佈必須保留上述版權聲明、條件列表及下列免責聲明。
+* 二進位形式之再發佈必須於相關文件或其他資料中重現上述版權聲明、條件列表及下列免責聲明。
+* 未經事先書面同意，不得使用工業技術研究院 (ITRI) 或貢獻者之名稱為本軟體衍生產品背書或推廣。
+
+本軟體以「現狀」提供，不附任何明示或暗示之保證，包括但不限於適售性及特定用途之適用性。工業技術研究院 (ITRI) 或貢獻者對於因本軟體使用或無法使用所生之任何直接、間接、附帶、特殊、懲罰性或衍生性損害（包括但不限於替代商品或服務之取得、使用損失、資料遺失、營業中斷等），無論於任何理論下（契約、侵權或其他），即使已被告知可能發生該等損害，亦不負任何責任。
+"""
+
+import os
+import uuid
+import zlib
+import shutil
+import hashlib
+import zipfile
+
+"""
+Compressed Upload Decoding
+==========================
+壓縮上傳的串流解壓縮：.onnx.gz / .tflite.gz / .onnx.zst / .tflite.zst 於 multipart 解析時
+逐塊解壓縮寫入使用者目錄（不先暫存壓縮檔），zip 壓縮包（例如含外部權重資料的 ONNX）
+於接收完成後解壓縮到獨立目錄。解壓縮後的總大小受 MAX_UPLOAD_MB 限制，超過時立即中止，避免解壓縮炸彈。
+
+Configuration (環境變數)
+------------------------
+MAX_UPLOAD_MB       : 解壓縮後的上傳大小上限 (MB)，預設 4096
+MAX_BUNDLE_MEMBERS  : zip 壓縮包的檔案數上限，預設 64
+
+.zst 需要另外安裝 zstandard 套件 (pip install zstandard)。
+
+Classes
+-------
+UploadTooLarge : 解壓縮後超過大小上限
+UploadStream : 供 multipart 解析器寫入的串流解壓縮檔案物件
+
+Functions
+---------
+split_compression : 由檔名判斷壓縮格式與模型檔名
+open_upload_stream : 為壓縮上傳建立串流解壓縮檔案物件
+finish_upload : 完成上傳（zip 解壓縮）並返回暫存的模型資訊
+"""
+
+MAX_UPLOAD_MB = int(os.environ.get('MAX_UPLOAD_MB', '4096'))
+MAX_BUNDLE_MEMBERS = int(os.environ.get('MAX_BUNDLE_MEMBERS', '64'))
+
+MODEL_EXTENSIONS = ('.onnx', '.tflite')
+
+# Upper bound on decompressed bytes produced per zlib call
+_INFLATE_CHUNK = 1024 * 1024
+
+
+class UploadTooLarge(RuntimeError):
+    """解壓縮後的上傳超過 MAX_UPLOAD_MB。"""
+
+
+def split_compression(filename):
+    """
+    判斷壓縮格式
+    ==========
+    由檔名後綴判斷壓縮格式，例如 "model.onnx.gz" → ("model.onnx", "gz")、
+    "bundle.zip" → ("bundle.zip", "zip")、"model.tflite" → ("model.tflite", None)。
+
+    Parameters
+    ----------
+    filename : str
+        上傳檔名。
+
+    Returns
+    -------
+    tuple of (str, str or None)
+        (解壓縮後的檔名, 壓縮格式 "gz" / "zst" / "zip" 或 None)。
+    """
+    lower = filename.lower()
+    if lower.endswith('.zip'):
+        return filename, 'zip'
+    for codec in ('gz', 'zst'):
+        if lower.endswith(f'.{codec}'):
+            return filename[:-len(codec) - 1], codec
+    return filename, None
+
+
+class _LimitedWriter:
+    """寫入目的檔案並累計大小與 SHA-256，超過上限時拋出 UploadTooLarge。"""
+
+    def __init__(self, path, limit):
+        self.path = path
+        self.limit = limit
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+        self._file = open(path, 'wb')
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.limit:
+            raise UploadTooLarge(f"❌ Upload exceeds {self.limit // (1024 * 1024)} MB after decompression")
+        self.sha256.update(data)
+        self._file.write(data)
+        return len(data)
+
+    def close(self):
+        self._file.close()
+
+
+class UploadStream:
+    """
+    串流解壓縮檔案物件
+    ================
+    multipart 解析器逐塊呼叫 write()，壓縮資料即時解壓縮寫入目的檔案；
+    解析完成時 seek() 結束解壓縮。zip 壓縮包原樣寫入，於 finish_upload 解壓縮。
+
+    Parameters
+    ----------
+    path : str
+        目的檔案路徑（zip 為壓縮包本身）。
+    codec : str
+        壓縮格式 "gz"、"zst" 或 "zip"。
+    limit : int
+        寫入位元組上限（解壓縮後；zip 為壓縮包大小）。
+
+    Raises
+    ------
+    RuntimeError
+        .zst 上傳但未安裝 zstandard 時拋出。
+    """
+
+    def __init__(self, path, codec, limit):
+        self.path = path
+        self.codec = codec
+        self.finished = False
+        self._out = _LimitedWriter(path, limit)
+        self._codec_errors = (zlib.error,)
+        if codec == 'gz':
+            # 16 + MAX_WBITS: expect a gzip header and trailer
+            self._inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif codec == 'zst':
+            try:
+                import zstandard
+            except ImportError:
+                self._out.close()
+                os.remove(path)
+                raise RuntimeError("❌ .zst uploads require the zstandard package (pip install zstandard)")
+            self._zst_writer = zstandard.ZstdDecompressor().stream_writer(self._out, closefd=False)
+            self._codec_errors = (zlib.error, zstandard.ZstdError)
+
+    @property
+    def size(self):
+        return self._out.size
+
+    @property
+    def digest(self):
+        return self._out.sha256.hexdigest()
+
+    def write(self, data):
+        try:
+            self._decode(data)
+        except self._codec_errors as e:
+            self._out.close()
+            raise RuntimeError(f"❌ Corrupt .{self.codec} upload: {e}") from e
+        except Exception:
+            self._out.close()
+            raise
+        return len(data)
+
+    def _decode(self, data):
+        if self.codec == 'gz':
+            # Bound every inflate step so a tiny chunk cannot expand unchecked in memory
+            chunk = self._inflater.decompress(data, _INFLATE_CHUNK)
+            while chunk:
+                self._out.write(chunk)
+                chunk = self._inflater.decompress(self._inflater.unconsumed_tail, _INFLATE_CHUNK)
+        elif self.codec == 'zst':
+            self._zst_writer.write(data)
+        else:
+            self._out.write(data)
+
+    def _finish(self):
+        if self.finished:
+            return
+        self.finished = True
+        try:
+            if self.codec == 'gz':
+                self._out.write(self._inflater.flush())
+                if not self._inflater.eof:
+                    raise RuntimeError("❌ Truncated gzip upload")
+            elif self.codec == 'zst':
+                self._zst_writer.flush()
+        except self._codec_errors as e:
+            raise RuntimeError(f"❌ Corrupt .{self.codec} upload: {e}") from e
+        finally:
+            self._out.close()
+
+    def seek(self, offset, whence=0):
+        # The multipart parser rewinds the container once the part is complete
+        self._finish()
+        return 0
+
+    def tell(self):
+        return self.size
+
+    def read(self, size=-1):
+        return b''
+
+    def close(self):
+        self._finish()
+
+
+def open_upload_stream(filename, staging_dir):
+    """
+    建立串流解壓縮檔案物件
+    ====================
+    供 multipart 解析器使用（Flask Request._get_file_stream）；非壓縮檔返回 None，沿用預設的暫存方式。
+
+    Parameters
+    ----------
+    filename : str or None
+        用戶端提供的檔名（已經過 secure_filename）。
+    staging_dir : str
+        暫存目錄（使用者目錄）。
+
+    Returns
+    -------
+    UploadStream or None
+        壓縮上傳的檔案物件。
+    """
+    model_name, codec = split_compression(filename or '')
+    if codec is None:
+        return None
+    os.makedirs(staging_dir, exist_ok=True)
+    path = os.path.join(staging_dir, f'.upload_{uuid.uuid4().hex[:8]}_{model_name}')
+    return UploadStream(path, codec, MAX_UPLOAD_MB * 1024 * 1024)
+
+
+def _extract_bundle(archive_path, dest_dir):
+    """解壓縮 zip 壓縮包，檢查路徑、檔案數與實際解壓縮大小，返回解壓縮的相對路徑列表。"""
+    extracted = []
+    total = 0
+    limit = MAX_UPLOAD_MB * 1024 * 1024
+    with zipfile.ZipFile(archive_path) as archive:
+        members = [info for info in archive.infolist() if not info.is_dir()]
+        if len(members) > MAX_BUNDLE_MEMBERS:
+            raise RuntimeError(f"❌ Bundle has {len(members)} files (limit {MAX_BUNDLE_MEMBERS})")
+        for info in members:
+            rel_path = os.path.normpath(info.filename)
+            if os.path.isabs(rel_path) or rel_path.startswith('..') or '__MACOSX' in rel_path:
+                continue
+            target = os.path.join(dest_dir, rel_path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            # Count real output bytes; the sizes in the zip headers are attacker-controlled
+            with archive.open(info) as src, open(target, 'wb') as dst:
+                for chunk in iter(lambda: src.read(_INFLATE_CHUNK), b''):
+                    total += len(chunk)
+                    if total > limit:
+                        raise UploadTooLarge(f"❌ Bundle exceeds {MAX_UPLOAD_MB} MB after decompression")
+                    dst.write(chunk)
+            extracted.append(rel_path)
+    return extracted
+
+
+def finish_upload(stream):
+    """
+    完成壓縮上傳
+    ==========
+    結束串流解壓縮；zip 壓縮包解壓縮到獨立暫存目錄並找出其中的模型檔案
+    （ONNX 的外部權重資料保留原本的相對路徑）。
+
+    Parameters
+    ----------
+    stream : UploadStream
+        multipart 解析器寫入完成的檔案物件。
+
+    Returns
+    -------
+    dict
+        {"staged": 暫存檔案或目錄, "model": 模型在暫存位置的相對路徑 (單一檔案為 None),
+         "files": 與模型同行的檔案 (相對於模型目錄), "filename": 模型檔名,
+         "digest": 模型內容 SHA-256, "bytes": 解壓縮後大小}。
+
+    Raises
+    ------
+    RuntimeError
+        解壓縮失敗、超過大小上限或壓縮包中沒有唯一的模型檔案時拋出（暫存檔案會被移除）。
+    """
+    try:
+        stream.close()
+        if stream.codec != 'zip':
+            return {'staged': stream.path, 'model': None, 'files': [], 'digest': stream.digest,
+                    'bytes': stream.size, 'filename': os.path.basename(stream.path).split('_', 2)[-1]}
+        bundle_dir = stream.path[:-len('.zip')] if stream.path.lower().endswith('.zip') else stream.path + '.d'
+        try:
+            extracted = _extract_bundle(stream.path, bundle_dir)
+        except zipfile.BadZipFile as e:
+            shutil.rmtree(bundle_dir, ignore_errors=True)
+            raise RuntimeError(f"❌ Invalid zip bundle: {e}")
+        except Exception:
+            shutil.rmtree(bundle_dir, ignore_errors=True)
+            raise
+        finally:
+            os.remove(stream.path)
+        models = [p for p in extracted if p.lower().endswith(MODEL_EXTENSIONS)]
+        # Prefer top-level models when the bundle also carries nested copies
+        top_level = [p for p in models if os.sep not in p]
+        candidates = top_level or models
+        if len(candidates) != 1:
+            shutil.rmtree(bundle_dir, ignore_errors=True)
+            raise RuntimeError(f"❌ Bundle must contain exactly one .onnx or .tflite model (found {len(candidates)})")
+        # Digest covers every member so weights stored as external data count too
+        h = hashlib.sha256()
+        total = 0
+        for rel_path in sorted(extracted):
+            path = os.path.join(bundle_dir, rel_path)
+            h.update(rel_path.encode('utf-8'))
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(_INFLATE_CHUNK), b''):
+                    h.update(chunk)
+            total += os.path.getsize(path)
+        model_dir = os.path.dirname(candidates[0])
+        companions = [os.path.relpath(p, model_dir or '.') for p in extracted if p != candidates[0]]
+        return {'staged': bundle_dir, 'model': candidates[0], 'digest': h.hexdigest(), 'bytes': total,
+                'filename': os.path.basename(candidates[0]),
+                'files': [p for p in companions if not p.startswith('..')]}
+    except Exception:
+        if os.path.isfile(stream.path):
+            os.remove(stream.path)
+        raise
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+版權所有 © 2025 工業技術研究院 (ITRI) 及貢獻者。
+保留所有權利。
+
+本檔案由 Microsoft 訂閱的 GitHub Copilot AI 助理協助產生與優化，部分內容經人工審閱與修正。
+
+本程式碼僅供學術研究與內部使用，未經授權不得用於商業用途。
+
+重新發佈與使用（無論原始或二進位形式，是否經過修改）僅限於下列條件下：
+
+* 原始碼之再發佈必須保留上述版權聲明、條件列表及下列免責聲明。
+* 二進位形式之再發佈必須於相關文件或其他資料中重現上述版權聲明、條件列表及下列免責聲明。
+* 未經事先書面同意，不得使用工業技術研究院 (ITRI) 或貢獻者之名稱為本軟體衍生產品背書或推廣。
+
+本軟體以「現狀」提供，不附任何明示或暗示之保證，包括但不限於適售性及特定用途之適用性。工業技術研究院 (ITRI) 或貢獻者對於因本軟體使用或無法使用所生之任何直接、間接、附帶、特殊、懲罰性或衍生性損害（包括但不限於替代商品或服務之取得、使用損失、資料遺失、營業中斷等），無論於任何理論下（契約、侵權或其他），即使已被告知可能發生該等損害，亦不負任何責任。
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import threading
+import logging
+from .workqueue import get_queue, local_pipeline, QUEUE_LEASE_SECONDS
+from .log import setup_logging, bind_context
+from .store import store_is_shared, publish_file
+
+"""
+Conversion Worker
+=================
+無狀態的轉換工作節點：從 CONVERSION_QUEUE 取出工作，於本機暫存目錄執行 utils.converter 的
+轉換管線，將每個 SSE 事件與最終產出檔案回傳到佇列後清除本機檔案。可在多台主機上同時執行。
+
+Usage
+-----
+CONVERSION_QUEUE=sqlite:///shared/queue.db python -m utils.worker
+CONVERSION_QUEUE=redis://queue-host:6379/0 python -m utils.worker --concurrency 2
+
+Functions
+---------
+run_job : 執行單一佇列工作
+run_worker : 持續取出並執行工作
+"""
+
+log = logging.getLogger(__name__)
+
+WORKER_WORK_DIR = os.environ.get('WORKER_WORK_DIR', './worker_jobs')
+
+# Seconds between polls of an empty queue
+IDLE_POLL_SECONDS = 1.0
+
+# Completed jobs are purged from the queue on roughly this cadence
+PURGE_INTERVAL_SECONDS = 60 * 60
+
+
+def run_job(queue, job_id, spec, worker_id):
+    """
+    執行佇列工作
+    ==========
+    於本機工作目錄執行轉換管線並回傳事件；最終事件中的產出檔案上傳到佇列，
+    路徑改為僅含檔名（由 Web 服務下載後還原為本機路徑）。設定共用產出儲存時改為發佈至儲存，
+    路徑改為 {"name", "digest"}。
+    租約逾時且工作已由其他節點重新取得時，本次執行不上傳產出、不送出最終事件，也不結束工作。
+
+    Parameters
+    ----------
+    queue : SQLiteQueue or RedisQueue
+        工作佇列。
+    job_id : str
+        佇列工作識別碼。
+    spec : dict
+        工作規格 {"kind", "params"}。
+    worker_id : str
+        工作節點識別碼。
+    """
+    work_dir = os.path.join(WORKER_WORK_DIR, job_id)
+    os.makedirs(work_dir, exist_ok=True)
+    bind_context(job_id=job_id, user_id=spec['params'].get('user_id'), stage=None)
+    stop = threading.Event()
+    lease_lost = threading.Event()
+
+    def keep_alive():
+        while not stop.wait(QUEUE_LEASE_SECONDS / 4):
+            if not queue.heartbeat(job_id, worker_id):
+                lease_lost.set()
+                return
+
+    def holds_lease():
+        state = queue.state(job_id) or {}
+        return not lease_lost.is_set() and state.get('status') == 'running' and state.get('worker') == worker_id
+
+    heartbeat = threading.Thread(target=keep_alive, name=f'heartbeat-{job_id[:8]}', daemon=True)
+    heartbeat.start()
+    final_sent = False
+
+    def publish(payload):
+        # Tagged so the web service can drop events from an attempt that lost its lease
+        queue.publish(job_id, dict(payload, worker=worker_id))
+
+    try:
+        publish({"message": f"🖥️ Running on worker {worker_id}"})
+        input_path = queue.get_file(job_id, 'input', work_dir) if spec['kind'] == 'upload' else None
+        for rel_path in spec.get('inputs', []):
+            queue.get_file(job_id, f'input:{rel_path}', os.path.join(work_dir, os.path.dirname(rel_path)))
+        for chunk in local_pipeline(spec, work_dir, input_path):
+            for line in chunk.splitlines():
+                if not line.startswith('data: '):
+                    continue
+                payload = json.loads(line[6:])
+                if payload.get('final'):
+                    if not holds_lease():
+                        # Another worker re-leased the job; its attempt owns the files and the result
+                        return
+                    # Intermediates stay on this node; only the artifacts travel back
+                    payload.pop('workspace_files', None)
+                    artifacts = {}
+                    for role, path in (payload.get('artifacts') or {}).items():
+                        if not path or not os.path.isfile(path):
+                            continue
+                        if store_is_shared():
+                            artifacts[role] = {'name': os.path.basename(path), 'digest': publish_file(path)}
+                        else:
+                            queue.put_file(job_id, role, os.path.basename(path), path)
+                            artifacts[role] = os.path.basename(path)
+                    payload['artifacts'] = artifacts
+                    final_sent = True
+                publish(payload)
+    except Exception as e:
+        log.exception("Job %s failed", job_id)
+        publish({"message": f"❌ Worker {worker_id} failed: {e}", "error": True})
+    finally:
+        stop.set()
+        if holds_lease():
+            if not final_sent:
+                publish({"message": "❌ Conversion ended without a result", "error": True, "final": True})
+            queue.finish(job_id, worker_id)
+        else:
+            log.warning("Lost the lease on job %s to another worker; dropping this attempt", job_id)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_worker(queue, worker_id, concurrency=1, once=False):
+    """
+    工作節點主迴圈
+    ============
+    以 concurrency 個執行緒持續取出並執行工作。
+
+    Parameters
+    ----------
+    queue : SQLiteQueue or RedisQueue
+        工作佇列。
+    worker_id : str
+        工作節點識別碼。
+    concurrency : int
+        同時執行的工作數。
+    once : bool
+        佇列清空後即結束（測試用）。
+    """
+    def loop(slot):
+        slot_id = f'{worker_id}/{slot}'
+        last_purge = 0
+        while True:
+            if time.time() - last_purge > PURGE_INTERVAL_SECONDS:
+                last_purge = time.time()
+                queue.purge()
+            claimed = queue.claim(slot_id)
+            if claimed is None:
+                if once:
+                    return
+                time.sleep(IDLE_POLL_SECONDS)
+                continue
+            job_id, spec = claimed
+            log.info("%s running %s job %s", slot_id, spec['kind'], job_id)
+            start = time.time()
+            run_job(queue, job_id, spec, slot_id)
+            log.info("%s finished job %s in %.1fs", slot_id, job_id, time.time() - start)
+
+    threads = [threading.Thread(target=loop, args=(i,), name=f'worker-{i}', daemon=True)
+               for i in range(max(1, concurrency))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m utils.worker',
+                                     description='Pull conversion jobs from CONVERSION_QUEUE and run them.')
+    parser.add_argument('--queue', default=None, help='queue URL (default: CONVERSION_QUEUE)')
+    parser.add_argument('--concurrency', type=int, default=1, help='jobs to run in parallel on this node')
+    parser.add_argument('--worker-id', default=f'{socket.gethostname()}:{os.getpid()}')
+    parser.add_argument('--once', action='store_true', help='exit when the queue is empty')
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    queue = get_queue(args.queue)
+    if queue is None:
+        parser.error('set CONVERSION_QUEUE or pass --queue (sqlite:///path or redis://host)')
+    from .converter.sdk import load_sdk_registry
+    load_sdk_registry()
+    log.info("%s polling %s", args.worker_id, args.queue or os.environ.get('CONVERSION_QUEUE'))
+    run_worker(queue, args.worker_id, args.concurrency, once=args.once)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,582 @@
+# -*- coding: utf-8 -*-
+"""
+版權所有 © 2025 工業技術研究院 (ITRI) 及貢獻者。
+保留所有權利。
+
+本檔案由 Microsoft 訂閱的 GitHub Copilot AI 助理協助產生與優化，部分內容經人工審閱與修正。
+
+本程式碼僅供學術研究與內部使用，未經授權不得用於商業用途。
+
+重新發佈與使用（無論原始或二進位形式，是否經過修改）僅限於下列條件下：
+
+* 原始碼之再發佈必須保留上述版權聲明、條件列表及下列免責聲明。
+* 二進位形式之再發佈必須於相關文件或其他資料中重現上述版權聲明、條件列表及下列免責聲明。
+* 未經事先書面同意，不得使用工業技術研究院 (ITRI) 或貢獻者之名稱為本軟體衍生產品背書或推廣。
+
+本軟體以「現狀」提供，不附任何明示或暗示之保證，包括但不限於適售性及特定用途之適用性。工業技術研究院 (ITRI) 或貢獻者對於因本軟體使用或無法使用所生之任何直接、間接、附帶、特殊、懲罰性或衍生性損害（包括但不限於替代商品或服務之取得、使用損失、資料遺失、營業中斷等），無論於任何理論下（契約、侵權或其他），即使已被告知可能發生該等損害，亦不負任何責任。
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from .store import fetch_blob
+
+"""
+Conversion Work Queue
+=====================
+轉換工作佇列抽象層：設定 CONVERSION_QUEUE 後，Web 服務不再於自身行程執行轉換管線，
+而是將工作規格放入佇列，由無狀態的轉換工作節點 (python -m utils.worker) 取出執行，
+節點將 SSE 事件與產出檔案回傳到佇列，Web 服務只負責上傳、事件轉送與下載。
+
+Backends
+--------
+sqlite:///path/to/queue.db : SQLite（單機多行程，或置於支援檔案鎖的共用磁碟）
+redis://host:6379/0        : Redis（多主機，需安裝 redis 套件）
+
+Configuration (環境變數)
+------------------------
+CONVERSION_QUEUE      : 佇列位址，未設定時於 Web 行程內執行轉換（預設）
+QUEUE_LEASE_SECONDS   : 工作節點心跳逾時秒數，逾時的工作會重新排入佇列，預設 120
+QUEUE_POLL_SECONDS    : 事件輪詢間隔秒數，預設 0.5
+QUEUE_IDLE_TIMEOUT    : 工作既無事件也無節點心跳（例如沒有節點在執行）的秒數上限，預設 1800，0 表示不限制
+QUEUE_JOB_TIMEOUT     : 單一工作自排入佇列起的總秒數上限，預設 21600，0 表示不限制
+
+Job Spec
+--------
+{"kind": "pytorch" | "sweep" | "upload", "params": {...轉換函數參數...}}
+上傳工作的輸入檔以 put_file(job_id, "input", 檔名, 路徑) 一併放入佇列（以 FILE_CHUNK_SIZE 分塊串流寫入與讀出，
+不整個載入記憶體）；zip 壓縮包中與模型同行的
+檔案（例如 ONNX 外部權重資料）列於 spec["inputs"]，以 "input:<相對路徑>" 角色放入佇列。
+設定共用產出儲存 (ARTIFACT_STORE) 時，節點將產出檔案發佈至儲存並只回傳 {"name", "digest"}，
+Web 服務再經讀取快取 (fetch_blob) 取得，大型 DLA 不經過佇列傳遞。
+
+Functions
+---------
+SQLiteQueue : SQLite 佇列
+RedisQueue : Redis 佇列
+get_queue : 依 CONVERSION_QUEUE 取得佇列（未設定時返回 None）
+local_pipeline : 於本行程執行工作規格對應的轉換管線
+remote_pipeline : 將工作放入佇列並轉送節點回傳的事件
+dispatch_pipeline : 依設定選擇本機或佇列執行
+"""
+
+CONVERSION_QUEUE = os.environ.get('CONVERSION_QUEUE', '')
+QUEUE_LEASE_SECONDS = int(os.environ.get('QUEUE_LEASE_SECONDS', '120'))
+QUEUE_POLL_SECONDS = float(os.environ.get('QUEUE_POLL_SECONDS', '0.5'))
+QUEUE_IDLE_TIMEOUT = float(os.environ.get('QUEUE_IDLE_TIMEOUT', '1800'))
+QUEUE_JOB_TIMEOUT = float(os.environ.get('QUEUE_JOB_TIMEOUT', '21600'))
+
+# Files travel through the queue in chunks of this size (Redis caps a single value at 512 MB)
+FILE_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Finished jobs (events and files) are purged after this long
+QUEUE_RETENTION_SECONDS = 24 * 60 * 60
+
+
+class SQLiteQueue:
+    """
+    SQLite 佇列
+    =========
+    以三個資料表保存工作、事件與檔案分塊；取出工作時以 BEGIN IMMEDIATE 取得寫入鎖，
+    確保同一工作只會被一個節點取得。每次操作各自開啟連線，可安全地跨執行緒與行程使用。
+
+    Parameters
+    ----------
+    path : str
+        SQLite 資料庫檔案路徑。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY, spec TEXT NOT NULL, status TEXT NOT NULL,
+                    worker TEXT, enqueued_at REAL, heartbeat_at REAL, finished_at REAL);
+                CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, enqueued_at);
+                CREATE TABLE IF NOT EXISTS events (
+                    job_id TEXT NOT NULL, seq INTEGER NOT NULL, payload TEXT NOT NULL,
+                    PRIMARY KEY (job_id, seq));
+                CREATE TABLE IF NOT EXISTS file_chunks (
+                    job_id TEXT NOT NULL, role TEXT NOT NULL, chunk INTEGER NOT NULL, name TEXT NOT NULL,
+                    data BLOB NOT NULL, PRIMARY KEY (job_id, role, chunk));
+            ''')
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        return _ClosingConnection(conn)
+
+    def enqueue(self, job_id, spec):
+        with self._connect() as conn:
+            conn.execute('INSERT INTO jobs (job_id, spec, status, enqueued_at) VALUES (?, ?, ?, ?)',
+                         (job_id, json.dumps(spec), 'queued', time.time()))
+
+    def claim(self, worker_id):
+        """取出最早排入的工作並標記為執行中，逾時未心跳的工作會先重新排入。"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute("UPDATE jobs SET status = 'queued', worker = NULL "
+                             "WHERE status = 'running' AND heartbeat_at < ?", (now - QUEUE_LEASE_SECONDS,))
+                row = conn.execute("SELECT job_id, spec FROM jobs WHERE status = 'queued' "
+                                   "ORDER BY enqueued_at LIMIT 1").fetchone()
+                if row is not None:
+                    conn.execute("UPDATE jobs SET status = 'running', worker = ?, heartbeat_at = ? WHERE job_id = ?",
+                                 (worker_id, now, row[0]))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return (row[0], json.loads(row[1])) if row else None
+
+    def heartbeat(self, job_id, worker_id):
+        """延長租約，工作已由其他節點取得或已結束時返回 False。"""
+        with self._connect() as conn:
+            cursor = conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE job_id = ? AND worker = ? "
+                                  "AND status = 'running'", (time.time(), job_id, worker_id))
+            return cursor.rowcount > 0
+
+    def publish(self, job_id, payload):
+        with self._connect() as conn:
+            # Take the write lock before reading MAX(seq) so concurrent publishers cannot pick the same number
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute('INSERT INTO events (job_id, seq, payload) '
+                             'SELECT ?, COALESCE(MAX(seq), 0) + 1, ? FROM events WHERE job_id = ?',
+                             (job_id, json.dumps(payload), job_id))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+    def events(self, job_id, after=0):
+        with self._connect() as conn:
+            rows = conn.execute('SELECT seq, payload FROM events WHERE job_id = ? AND seq > ? ORDER BY seq',
+                                (job_id, after)).fetchall()
+        return [(seq, json.loads(payload)) for seq, payload in rows]
+
+    def finish(self, job_id, worker_id=None):
+        """標記工作結束；指定 worker_id 時只在該節點仍持有租約時生效，返回是否已標記。"""
+        with self._connect() as conn:
+            if worker_id is None:
+                cursor = conn.execute("UPDATE jobs SET status = 'done', finished_at = ? WHERE job_id = ?",
+                                      (time.time(), job_id))
+            else:
+                cursor = conn.execute("UPDATE jobs SET status = 'done', finished_at = ? "
+                                      "WHERE job_id = ? AND worker = ? AND status = 'running'",
+                                      (time.time(), job_id, worker_id))
+            return cursor.rowcount > 0
+
+    def state(self, job_id):
+        """工作狀態 {"status", "heartbeat_at", "worker"}，不存在時返回 None。"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT status, heartbeat_at, worker FROM jobs WHERE job_id = ?',
+                               (job_id,)).fetchone()
+        return {'status': row[0], 'heartbeat_at': row[1] or 0, 'worker': row[2]} if row else None
+
+    def put_file(self, job_id, role, name, path):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM file_chunks WHERE job_id = ? AND role = ?', (job_id, role))
+            # One row per chunk keeps both sides' memory bounded; readers only look after the final event
+            with open(path, 'rb') as f:
+                for index, data in enumerate(iter(lambda: f.read(FILE_CHUNK_SIZE), b'')):
+                    conn.execute('INSERT INTO file_chunks (job_id, role, chunk, name, data) VALUES (?, ?, ?, ?, ?)',
+                                 (job_id, role, index, name, sqlite3.Binary(data)))
+
+    def get_file(self, job_id, role, dest_dir):
+        with self._connect() as conn:
+            row = conn.execute('SELECT name FROM file_chunks WHERE job_id = ? AND role = ? AND chunk = 0',
+                               (job_id, role)).fetchone()
+            if row is None:
+                return None
+            rows = conn.execute('SELECT data FROM file_chunks WHERE job_id = ? AND role = ? ORDER BY chunk',
+                                (job_id, role))
+            return _write_file(dest_dir, row[0], (data for data, in rows))
+
+    def delete_files(self, job_id):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM file_chunks WHERE job_id = ?', (job_id,))
+
+    def purge(self, older_than=QUEUE_RETENTION_SECONDS):
+        cutoff = time.time() - older_than
+        with self._connect() as conn:
+            expired = [row[0] for row in conn.execute(
+                "SELECT job_id FROM jobs WHERE status = 'done' AND finished_at < ?", (cutoff,))]
+            for job_id in expired:
+                conn.execute('DELETE FROM events WHERE job_id = ?', (job_id,))
+                conn.execute('DELETE FROM file_chunks WHERE job_id = ?', (job_id,))
+                conn.execute('DELETE FROM jobs WHERE job_id = ?', (job_id,))
+        return len(expired)
+
+
+class _ClosingConnection:
+    """sqlite3 連線的 context manager，離開時關閉連線（sqlite3 預設只結束交易）。"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, *exc):
+        self.conn.close()
+
+
+class RedisQueue:
+    """
+    Redis 佇列
+    ========
+    工作以清單 (LMOVE 到執行中清單) 分派，事件存於每個工作的清單，檔案分塊存於每個角色的清單，
+    檔名與分塊鍵記錄於每個工作的雜湊。
+    需要 redis 套件 (pip install redis)。
+
+    Parameters
+    ----------
+    url : str
+        Redis 連線位址，例如 redis://localhost:6379/0。
+    prefix : str
+        鍵名前綴。
+    """
+
+    def __init__(self, url, prefix='neuronpilot'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("❌ CONVERSION_QUEUE uses Redis but the 'redis' package is not installed")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._watch_error = redis.WatchError
+
+    def _key(self, *parts):
+        return ':'.join((self.prefix,) + parts)
+
+    def enqueue(self, job_id, spec):
+        pipe = self.client.pipeline()
+        pipe.hset(self._key('job', job_id), mapping={'spec': json.dumps(spec), 'status': 'queued',
+                                                      'enqueued_at': time.time()})
+        pipe.rpush(self._key('queued'), job_id)
+        pipe.execute()
+
+    def claim(self, worker_id):
+        now = time.time()
+        # Requeue jobs whose worker stopped sending heartbeats
+        for job_id in self.client.lrange(self._key('running'), 0, -1):
+            job_id = job_id.decode()
+            heartbeat = float(self.client.hget(self._key('job', job_id), 'heartbeat_at') or 0)
+            if heartbeat < now - QUEUE_LEASE_SECONDS and self.client.lrem(self._key('running'), 1, job_id):
+                self.client.hset(self._key('job', job_id), mapping={'status': 'queued', 'worker': ''})
+                self.client.lpush(self._key('queued'), job_id)
+        job_id = self.client.lmove(self._key('queued'), self._key('running'), 'LEFT', 'RIGHT')
+        if job_id is None:
+            return None
+        job_id = job_id.decode()
+        self.client.hset(self._key('job', job_id), mapping={'status': 'running', 'worker': worker_id,
+                                                             'heartbeat_at': now})
+        spec = self.client.hget(self._key('job', job_id), 'spec')
+        return job_id, json.loads(spec)
+
+    def heartbeat(self, job_id, worker_id):
+        """延長租約，工作已由其他節點取得或已結束時返回 False。"""
+        status, worker = self.client.hmget(self._key('job', job_id), 'status', 'worker')
+        if status != b'running' or worker != worker_id.encode():
+            return False
+        self.client.hset(self._key('job', job_id), 'heartbeat_at', time.time())
+        return True
+
+    def publish(self, job_id, payload):
+        self.client.rpush(self._key('events', job_id), json.dumps(payload))
+
+    def events(self, job_id, after=0):
+        payloads = self.client.lrange(self._key('events', job_id), after, -1)
+        return [(after + i + 1, json.loads(payload)) for i, payload in enumerate(payloads)]
+
+    def finish(self, job_id, worker_id=None):
+        """標記工作結束；指定 worker_id 時只在該節點仍持有租約時生效，返回是否已標記。"""
+        job_key = self._key('job', job_id)
+        with self.client.pipeline() as pipe:
+            try:
+                if worker_id is not None:
+                    # WATCH aborts the transaction if another worker re-leases the job in between
+                    pipe.watch(job_key)
+                    status, worker = pipe.hmget(job_key, 'status', 'worker')
+                    if status != b'running' or worker != worker_id.encode():
+                        return False
+                pipe.multi()
+                # A job abandoned before any worker claimed it is still in the queued list
+                pipe.lrem(self._key('queued'), 0, job_id)
+                pipe.lrem(self._key('running'), 1, job_id)
+                pipe.hset(job_key, mapping={'status': 'done', 'finished_at': time.time()})
+                for key in (job_key, self._key('events', job_id), self._key('files', job_id)):
+                    pipe.expire(key, QUEUE_RETENTION_SECONDS)
+                pipe.execute()
+            except self._watch_error:
+                return False
+        return True
+
+    def state(self, job_id):
+        """工作狀態 {"status", "heartbeat_at", "worker"}，不存在時返回 None。"""
+        status, heartbeat, worker = self.client.hmget(self._key('job', job_id), 'status', 'heartbeat_at', 'worker')
+        if status is None:
+            return None
+        return {'status': status.decode(), 'heartbeat_at': float(heartbeat or 0),
+                'worker': worker.decode() if worker else None}
+
+    def put_file(self, job_id, role, name, path):
+        chunks_key = self._key('chunks', job_id, role)
+        self.client.delete(chunks_key)
+        with open(path, 'rb') as f:
+            for data in iter(lambda: f.read(FILE_CHUNK_SIZE), b''):
+                self.client.rpush(chunks_key, data)
+        # Chunk lists outlive the job hash by a retention period in case the job never finishes
+        self.client.expire(chunks_key, 2 * QUEUE_RETENTION_SECONDS)
+        self.client.hset(self._key('files', job_id), mapping={f'{role}:name': name, f'{role}:chunks': chunks_key})
+
+    def get_file(self, job_id, role, dest_dir):
+        name, chunks_key = self.client.hmget(self._key('files', job_id), f'{role}:name', f'{role}:chunks')
+        if name is None:
+            return None
+        count = self.client.llen(chunks_key)
+        chunks = (self.client.lindex(chunks_key, index) for index in range(count))
+        return _write_file(dest_dir, name.decode(), chunks)
+
+    def delete_files(self, job_id):
+        files = self.client.hgetall(self._key('files', job_id))
+        keys = [value for field, value in files.items() if field.endswith(b':chunks')]
+        self.client.delete(self._key('files', job_id), *keys)
+
+    def purge(self, older_than=QUEUE_RETENTION_SECONDS):
+        # Finished keys carry a TTL; Redis expires them on its own
+        return 0
+
+
+def _write_file(dest_dir, name, chunks):
+    os.makedirs(dest_dir, exist_ok=True)
+    path = os.path.join(dest_dir, os.path.basename(name))
+    temp_path = f'{path}.{uuid.uuid4().hex[:8]}.part'
+    with open(temp_path, 'wb') as f:
+        for data in chunks:
+            f.write(data)
+    os.replace(temp_path, path)
+    return path
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue(url=None):
+    """
+    取得工作佇列
+    ==========
+    依位址建立佇列後端（行程內共用），未設定 CONVERSION_QUEUE 時返回 None，表示於本行程執行轉換。
+
+    Parameters
+    ----------
+    url : str or None
+        佇列位址，None 時使用 CONVERSION_QUEUE。
+
+    Returns
+    -------
+    SQLiteQueue, RedisQueue or None
+
+    Raises
+    ------
+    RuntimeError
+        位址格式不支援時拋出。
+    """
+    global _queue
+    url = url or CONVERSION_QUEUE
+    if not url:
+        return None
+    with _queue_lock:
+        if _queue is None:
+            if url.startswith('sqlite:///'):
+                _queue = SQLiteQueue(url[len('sqlite:///'):])
+            elif url.startswith(('redis://', 'rediss://', 'unix://')):
+                _queue = RedisQueue(url)
+            else:
+                raise RuntimeError(f"❌ Unsupported CONVERSION_QUEUE: {url} (use sqlite:///path or redis://host)")
+        return _queue
+
+
+def _role_dir(role):
+    """產出角色（例如 "mdla3@1x3x224x224"）轉為安全的子目錄名稱。"""
+    return ''.join(c if c.isalnum() or c in '-_.' else '_' for c in role)
+
+
+def local_pipeline(spec, work_dir, input_path=None):
+    """
+    本機轉換管線
+    ==========
+    依工作規格呼叫 utils.converter / utils.file 的轉換函數（Web 服務與工作節點共用）。
+
+    Parameters
+    ----------
+    spec : dict
+        工作規格 {"kind", "params"}。
+    work_dir : str
+        工作目錄。
+    input_path : str or None
+        上傳工作的輸入檔路徑。
+
+    Returns
+    -------
+    generator
+        產生 SSE 字串的轉換管線。
+
+    Raises
+    ------
+    RuntimeError
+        工作類型未知或缺少上傳檔案時拋出。
+    """
+    from .converter import convert_pytorch_to_tflite, sweep_pytorch_shapes
+    from .file import verify_uploaded_file
+
+    params = dict(spec['params'])
+    if spec['kind'] == 'pytorch':
+        return convert_pytorch_to_tflite(work_dir=work_dir, **params)
+    if spec['kind'] == 'sweep':
+        return sweep_pytorch_shapes(work_dir=work_dir, **params)
+    if spec['kind'] == 'upload':
+        if input_path is None:
+            raise RuntimeError("❌ Uploaded file is missing")
+        return verify_uploaded_file(os.path.basename(input_path), input_path, **params)
+    raise RuntimeError(f"❌ Unknown job kind: {spec['kind']}")
+
+
+def remote_pipeline(queue, spec, work_dir, input_path=None):
+    """
+    遠端轉換管線
+    ==========
+    將工作放入佇列，並以 SSE 字串轉送工作節點回傳的事件；收到最終事件時
+    將節點上傳的產出檔案下載到工作目錄並改寫為本機路徑，之後流程與本機執行相同。
+    工作因心跳逾時重新排入後，只轉送最新節點的事件並略過已轉送過的相同訊息；
+    超過 QUEUE_IDLE_TIMEOUT 或 QUEUE_JOB_TIMEOUT 時取消工作並送出錯誤的最終事件，釋放排程執行槽。
+
+    Parameters
+    ----------
+    queue : SQLiteQueue or RedisQueue
+        工作佇列。
+    spec : dict
+        工作規格 {"kind", "params"}。
+    work_dir : str
+        本機工作目錄，產出檔案下載到此處。
+    input_path : str or None
+        上傳工作的輸入檔路徑。
+
+    Yields
+    ------
+    str
+        Server-sent event 格式的事件。
+    """
+    job_id = uuid.uuid4().hex
+    if input_path:
+        queue.put_file(job_id, 'input', os.path.basename(input_path), input_path)
+        for rel_path in spec.get('inputs', []):
+            queue.put_file(job_id, f'input:{rel_path}', rel_path,
+                           os.path.join(os.path.dirname(input_path), rel_path))
+    queue.enqueue(job_id, spec)
+    yield f'data: {json.dumps({"message": "📨 Dispatched to the conversion worker queue"})}\n\n'
+
+    seq = 0
+    enqueued_at = last_event_at = time.time()
+    current_worker = None
+    seen_workers = set()
+    relayed = set()
+    while True:
+        events = queue.events(job_id, after=seq)
+        if not events:
+            error = _check_stalled(queue, job_id, enqueued_at, last_event_at)
+            if error:
+                queue.finish(job_id)
+                queue.delete_files(job_id)
+                yield f'data: {json.dumps({"message": error, "error": True, "final": True})}\n\n'
+                return
+            time.sleep(QUEUE_POLL_SECONDS)
+            continue
+        last_event_at = time.time()
+        for seq, payload in events:
+            worker = payload.pop('worker', None)
+            if worker != current_worker:
+                if worker in seen_workers:
+                    # A worker that lost its lease may keep running; only the latest attempt counts
+                    continue
+                if current_worker is not None:
+                    yield f'data: {json.dumps({"message": f"🔁 Job requeued; restarted on worker {worker}"})}\n\n'
+                seen_workers.add(worker)
+                current_worker = worker
+            if payload.get('final'):
+                artifacts = {}
+                for role, ref in (payload.get('artifacts') or {}).items():
+                    dest_dir = os.path.join(work_dir, 'remote', _role_dir(role))
+                    if isinstance(ref, dict):
+                        path = fetch_blob(ref['digest'], ref['name'], dest_dir=dest_dir)
+                    else:
+                        path = queue.get_file(job_id, role, dest_dir)
+                    if path:
+                        artifacts[role] = path
+                payload['artifacts'] = artifacts
+                queue.delete_files(job_id)
+                yield f'data: {json.dumps(payload)}\n\n'
+                return
+            event = json.dumps(payload)
+            # A rerun repeats the progress already shown for the previous attempt
+            if event in relayed and len(seen_workers) > 1:
+                continue
+            relayed.add(event)
+            yield f'data: {event}\n\n'
+
+
+def _check_stalled(queue, job_id, enqueued_at, last_event_at):
+    """工作逾時或長時間沒有事件與心跳時返回錯誤訊息，否則返回 None。"""
+    now = time.time()
+    if QUEUE_JOB_TIMEOUT and now - enqueued_at > QUEUE_JOB_TIMEOUT:
+        return f"❌ Conversion job exceeded QUEUE_JOB_TIMEOUT ({QUEUE_JOB_TIMEOUT:g}s)"
+    if not QUEUE_IDLE_TIMEOUT or now - last_event_at <= QUEUE_IDLE_TIMEOUT:
+        return None
+    state = queue.state(job_id) or {}
+    # A running worker heartbeats every QUEUE_LEASE_SECONDS / 4 even through long silent stages
+    if now - state.get('heartbeat_at', 0) <= QUEUE_IDLE_TIMEOUT:
+        return None
+    if state.get('status') == 'queued':
+        return f"❌ No conversion worker picked up the job within {QUEUE_IDLE_TIMEOUT:g}s"
+    return f"❌ Conversion worker stopped responding for {QUEUE_IDLE_TIMEOUT:g}s"
+
+
+def dispatch_pipeline(kind, params, work_dir, input_path=None, input_files=None):
+    """
+    選擇執行位置
+    ==========
+    設定 CONVERSION_QUEUE 時將工作送往佇列，否則於本行程執行。
+
+    Parameters
+    ----------
+    kind : str
+        工作類型："pytorch"、"sweep" 或 "upload"。
+    params : dict
+        轉換函數參數（需可 JSON 序列化）。
+    work_dir : str
+        本機工作目錄。
+    input_path : str or None
+        上傳工作的輸入檔路徑。
+    input_files : list of str or None
+        與輸入檔同行的檔案（相對於輸入檔目錄），例如 ONNX 外部權重資料。
+
+    Returns
+    -------
+    generator
+        產生 SSE 字串的轉換管線。
+    """
+    spec = {'kind': kind, 'params': params}
+    if input_files:
+        spec['inputs'] = list(input_files)
+    queue = get_queue()
+    if queue is None:
+        return local_pipeline(spec, work_dir, input_path)
+    return remote_pipeline(queue, spec, work_dir, input_path)
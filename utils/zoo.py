@@ -0,0 +1,383 @@
+# -*- coding: utf-8 -*-
+"""
+版權所有 © 2025 工業技術研究院 (ITRI) 及貢獻者。
+保留所有權利。
+
+本檔案由 Microsoft 訂閱的 GitHub Copilot AI 助理協助產生與優化，部分內容經人工審閱與修正。
+
+本程式碼僅供學術研究與內部使用，未經授權不得用於商業用途。
+
+重新發佈與使用（無論原始或二進位形式，是否經過修改）僅限於下列條件下：
+
+* 原始碼之再發佈必須保留上述版權聲明、條件列表及下列免責聲明。
+* 二進位形式之再發佈必須於相關文件或其他資料中重現上述版權聲明、條件列表及下列免責聲明。
+* 未經事先書面同意，不得使用工業技術研究院 (ITRI) 或貢獻者之名稱為本軟體衍生產品背書或推廣。
+
+本軟體以「現狀」提供，不附任何明示或暗示之保證，包括但不限於適售性及特定用途之適用性。工業技術研究院 (ITRI) 或貢獻者對於因本軟體使用或無法使用所生之任何直接、間接、附帶、特殊、懲罰性或衍生性損害（包括但不限於替代商品或服務之取得、使用損失、資料遺失、營業中斷等），無論於任何理論下（契約、侵權或其他），即使已被告知可能發生該等損害，亦不負任何責任。
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+import logging
+from .blobstore import intern_paths
+from .log import setup_logging
+
+"""
+Pre-built Model Zoo Cache
+=========================
+參考模型預熱快取：於映像檔建置或服務啟動時，預先轉換 manifest 中列出的常用模型
+（介面預設範例、docs/PYTORCH_EXAMPLES.md 範例、torchvision 分類模型、Ultralytics YOLO），
+記錄其轉換訊息、相容性結果與產出檔案；使用者提交相同的模型時直接回放結果，不再執行冷啟動管線。
+於服務行程內預熱時，管線的 export / TFLite / DLA 階段快取也會一併填入。
+
+Manifest 格式
+-------------
+    [{"name": "editor_default", "code_path": "editor_default.py",
+      "model_entrypoint": "SimpleModel", "input_shape": "(1, 10)"},
+     {"doc_path": "../docs/PYTORCH_EXAMPLES.md"}]
+    - code_path / code : 模型程式碼檔案（相對於 manifest）或程式碼字串
+    - doc_path : Markdown 文件，自動收錄每個範例的程式碼、Model Class Name 與 Input Shape
+
+Configuration (環境變數)
+------------------------
+MODEL_ZOO_MANIFEST : manifest 路徑，預設 ./model_zoo/manifest.json
+MODEL_ZOO_DIR      : 預熱產出與結果紀錄的目錄（不受使用者目錄 24 小時清理影響），預設 ./zoo_cache
+MODEL_ZOO_WARMUP   : 設為 0 時停用啟動時的背景預熱
+
+Functions
+---------
+load_manifest : 讀取 manifest 並展開文件範例
+zoo_key : 計算正規化後的模型鍵值（忽略行尾空白與形狀格式差異）
+lookup_zoo_result : 查詢已預熱的結果
+replay_zoo_result : 以 SSE 回放已預熱的結果
+warm_up : 依 manifest 預熱模型庫
+start_background_warmup : 於背景執行緒預熱，不延遲服務就緒
+"""
+
+log = logging.getLogger(__name__)
+
+MODEL_ZOO_MANIFEST = os.environ.get('MODEL_ZOO_MANIFEST', './model_zoo/manifest.json')
+MODEL_ZOO_DIR = os.environ.get('MODEL_ZOO_DIR', './zoo_cache')
+MODEL_ZOO_WARMUP = os.environ.get('MODEL_ZOO_WARMUP', '1') != '0'
+
+RESULTS_FILENAME = 'results.json'
+
+_results = None
+_results_lock = threading.Lock()
+_warmup_thread = None
+
+
+def _normalize_code(pytorch_code):
+    """移除行尾空白、統一換行並去除首尾空行，使複製貼上的差異不影響比對。"""
+    lines = pytorch_code.replace('\r\n', '\n').replace('\r', '\n').strip('\n').split('\n')
+    return '\n'.join(line.rstrip() for line in lines).strip()
+
+
+def _normalize_shape(input_shape):
+    # Deferred like convert_pytorch_to_tflite: the converter package pulls in onnx
+    from .converter.format import parse_input_shape
+    try:
+        return repr(parse_input_shape(input_shape))
+    except RuntimeError:
+        return str(input_shape).replace(' ', '')
+
+
+def zoo_key(pytorch_code, model_entrypoint, input_shape, sdk_versions=None):
+    """
+    模型庫鍵值
+    ========
+    以正規化後的程式碼、模型類別、輸入形狀與 SDK 版本計算 SHA-256 鍵值。
+
+    Parameters
+    ----------
+    pytorch_code : str
+        PyTorch 模型程式碼。
+    model_entrypoint : str
+        模型類別名稱。
+    input_shape : str or tuple
+        輸入形狀。
+    sdk_versions : list of str or None
+        指定的 SDK 版本，None 或空列表表示預設 SDK。
+
+    Returns
+    -------
+    str
+        十六進位 SHA-256 鍵值。
+    """
+    h = hashlib.sha256()
+    for part in (_normalize_code(pytorch_code), model_entrypoint.strip(), _normalize_shape(input_shape),
+                 ','.join(sdk_versions or [])):
+        h.update(part.encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def _parse_doc_examples(doc_path):
+    """由 Markdown 範例文件取出每個 "## Example" 段落的程式碼、模型類別與輸入形狀。"""
+    with open(doc_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    specs = []
+    for section in re.split(r'^## ', text, flags=re.M)[1:]:
+        title = section.splitlines()[0].strip()
+        code = re.search(r'```python\n(.*?)```', section, re.S)
+        entrypoint = re.search(r'\*\*Model Class Name\*\*:\s*`([^`]+)`', section)
+        shape = re.search(r'\*\*Input Shape\*\*:\s*`([^`]+)`', section)
+        if not (code and entrypoint and shape):
+            continue
+        name = re.sub(r'[^0-9A-Za-z]+', '_', title).strip('_').lower()
+        specs.append({
+            'name': f'docs_{name}',
+            'code': code.group(1),
+            'model_entrypoint': entrypoint.group(1),
+            'input_shape': shape.group(1),
+        })
+    return specs
+
+
+def load_manifest(manifest_path=None):
+    """
+    讀取模型庫 manifest
+    =================
+    讀取 JSON manifest，載入 code_path 指向的程式碼並展開 doc_path 文件中的所有範例。
+
+    Parameters
+    ----------
+    manifest_path : str or None
+        manifest 路徑，None 時使用 MODEL_ZOO_MANIFEST。
+
+    Returns
+    -------
+    list of dict
+        每個元素包含 name、code、model_entrypoint、input_shape 與 sdk_versions。
+    """
+    manifest_path = manifest_path or MODEL_ZOO_MANIFEST
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    specs = []
+    for entry in entries:
+        if 'doc_path' in entry:
+            doc_specs = _parse_doc_examples(os.path.join(base_dir, entry['doc_path']))
+            for spec in doc_specs:
+                spec['sdk_versions'] = entry.get('sdk_versions', [])
+            specs.extend(doc_specs)
+            continue
+        spec = dict(entry)
+        if 'code' not in spec:
+            with open(os.path.join(base_dir, spec['code_path']), 'r', encoding='utf-8') as f:
+                spec['code'] = f.read()
+        spec.setdefault('sdk_versions', [])
+        specs.append(spec)
+    return specs
+
+
+def _results_path():
+    return os.path.join(MODEL_ZOO_DIR, RESULTS_FILENAME)
+
+
+def _load_results():
+    """讀取（並快取）結果紀錄，呼叫端須持有 _results_lock。"""
+    global _results
+    if _results is None:
+        try:
+            with open(_results_path(), 'r', encoding='utf-8') as f:
+                _results = json.load(f)
+        except (OSError, ValueError):
+            _results = {}
+    return _results
+
+
+def _save_results():
+    """以暫存檔加原子替換寫入結果紀錄，呼叫端須持有 _results_lock。"""
+    os.makedirs(MODEL_ZOO_DIR, exist_ok=True)
+    temp_path = _results_path() + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(_results, f, indent=2, ensure_ascii=False)
+    os.replace(temp_path, _results_path())
+
+
+def lookup_zoo_result(pytorch_code, model_entrypoint, input_shape, sdk_versions=None):
+    """
+    查詢預熱結果
+    ==========
+    以正規化鍵值查詢已預熱的結果，產出檔案遺失時視為未命中。
+
+    Parameters
+    ----------
+    pytorch_code : str
+        PyTorch 模型程式碼。
+    model_entrypoint : str
+        模型類別名稱。
+    input_shape : str or tuple
+        輸入形狀。
+    sdk_versions : list of str or None
+        指定的 SDK 版本。
+
+    Returns
+    -------
+    dict or None
+        預熱紀錄 {"name", "messages", "final", "converted_at"}；未命中時返回 None。
+    """
+    key = zoo_key(pytorch_code, model_entrypoint, input_shape, sdk_versions)
+    with _results_lock:
+        record = _load_results().get(key)
+    if not record:
+        return None
+    paths = (record['final'].get('artifacts') or {}).values()
+    if not all(os.path.exists(path) for path in paths):
+        return None
+    return record
+
+
+def replay_zoo_result(record):
+    """
+    回放預熱結果
+    ==========
+    依序輸出預熱時記錄的訊息與最終結果。
+    產出檔案由工作層連結到工作目錄並轉為下載資訊。
+
+    Parameters
+    ----------
+    record : dict
+        lookup_zoo_result 返回的紀錄。
+
+    Yields
+    ------
+    str
+        Server-sent event 格式的訊息與最終結果。
+    """
+    name = record['name']
+    yield f'data: {json.dumps({"message": f"⚡ Matched pre-built model zoo entry: {name}"})}\n\n'
+    for message in record['messages']:
+        yield f'data: {json.dumps(message)}\n\n'
+    final = dict(record['final'])
+    final['zoo'] = record['name']
+    yield f'data: {json.dumps(final)}\n\n'
+
+
+def warm_up(manifest_path=None, force=False):
+    """
+    預熱模型庫
+    ========
+    依序轉換 manifest 中的模型（完整執行 PyTorch → ONNX → TFLite → DLA 管線），
+    記錄訊息、相容性結果與產出檔案路徑；已有有效紀錄的模型會略過。
+
+    Parameters
+    ----------
+    manifest_path : str or None
+        manifest 路徑，None 時使用 MODEL_ZOO_MANIFEST。
+    force : bool
+        是否忽略既有紀錄重新轉換。
+
+    Returns
+    -------
+    list of dict
+        每個模型的 {"name", "status", "seconds"}，status 為 "cached"、"converted" 或 "failed"。
+    """
+    from .converter import convert_pytorch_to_tflite
+
+    summary = []
+    for spec in load_manifest(manifest_path):
+        name = spec['name']
+        sdk_versions = spec.get('sdk_versions') or []
+        if not force and lookup_zoo_result(spec['code'], spec['model_entrypoint'], spec['input_shape'], sdk_versions):
+            summary.append({'name': name, 'status': 'cached', 'seconds': 0})
+            continue
+
+        log.info("Warming up %s (%s %s)", name, spec['model_entrypoint'], spec['input_shape'])
+        start = time.time()
+        messages, final = [], None
+        try:
+            for chunk in convert_pytorch_to_tflite(
+                    user_id=f'zoo_{name}',
+                    pytorch_code=spec['code'],
+                    model_entrypoint=spec['model_entrypoint'],
+                    input_shape=spec['input_shape'],
+                    sdk_versions=sdk_versions,
+                    work_dir=os.path.join(MODEL_ZOO_DIR, name)):
+                for line in chunk.splitlines():
+                    if line.startswith('data: '):
+                        event = json.loads(line[6:])
+                        if event.get('final'):
+                            final = event
+                        else:
+                            messages.append(event)
+        except Exception as e:
+            log.warning("Warm-up of %s failed: %s", name, e)
+        seconds = round(time.time() - start, 3)
+
+        if final is None:
+            summary.append({'name': name, 'status': 'failed', 'seconds': seconds})
+            continue
+        # Zoo outputs share blobs with every user workspace that later receives them
+        workspace_files = final.pop('workspace_files', None) or []
+        intern_paths(workspace_files + [path for path in (final.get('artifacts') or {}).values() if path])
+        record = {
+            'name': name,
+            'messages': messages,
+            'final': final,
+            'converted_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        key = zoo_key(spec['code'], spec['model_entrypoint'], spec['input_shape'], sdk_versions)
+        with _results_lock:
+            _load_results()[key] = record
+            _save_results()
+        status = 'converted' if final.get('success') else 'failed'
+        log.info("%s: %s in %ss", name, status, seconds)
+        summary.append({'name': name, 'status': status, 'seconds': seconds})
+    return summary
+
+
+def start_background_warmup():
+    """
+    背景預熱
+    ======
+    於 daemon 執行緒中執行 warm_up，服務可立即開始接受請求；
+    MODEL_ZOO_WARMUP=0 或 manifest 不存在時不啟動。
+
+    Returns
+    -------
+    threading.Thread or None
+        預熱執行緒；未啟動時返回 None。
+    """
+    global _warmup_thread
+    if not MODEL_ZOO_WARMUP or not os.path.exists(MODEL_ZOO_MANIFEST):
+        return None
+    if _warmup_thread is not None:
+        return _warmup_thread
+
+    def run():
+        try:
+            summary = warm_up()
+            converted = sum(1 for item in summary if item['status'] == 'converted')
+            log.info("Background warm-up finished: %d converted, %d total", converted, len(summary))
+        except Exception:
+            log.exception("Background warm-up failed")
+
+    _warmup_thread = threading.Thread(target=run, name='model-zoo-warmup', daemon=True)
+    _warmup_thread.start()
+    return _warmup_thread
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m utils.zoo',
+                                     description='Pre-convert the reference model zoo (e.g. at image build time).')
+    parser.add_argument('--manifest', default=None, help='manifest path (default: MODEL_ZOO_MANIFEST)')
+    parser.add_argument('--force', action='store_true', help='reconvert entries that already have a result')
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    summary = warm_up(args.manifest, force=args.force)
+    for item in summary:
+        print(f"{item['name']:<40} {item['status']:<10} {item['seconds']}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())